@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+
+# -------------------------------------------------------------------
+# Benchmark Settings
+# -------------------------------------------------------------------
+
+# Timed calls per case, after the warm-up calls
+ITERATIONS = int(os.environ.get("TOOLS_BENCH_ITERATIONS", 20))
+WARM_UP_CALLS = int(os.environ.get("TOOLS_BENCH_WARM_UP", 2))
+# A case regresses when its p95 grows by more than this fraction over the baseline
+MAX_P95_REGRESSION = float(os.environ.get("TOOLS_BENCH_MAX_REGRESSION", 0.2))
+# Seconds to let backends report their table statistics after the pool is closed
+STATS_SETTLE_SECONDS = float(os.environ.get("TOOLS_BENCH_STATS_SETTLE", 0.5))
+
+# Benchmarks measure the queries, not the result cache, and must not open
+# connections to the configured production databases while the modules import
+os.environ.setdefault("TOOLS_CACHE_ENABLED", "0")
+os.environ.setdefault("TOOLS_DB_POOL_WARM_UP", "0")
+os.environ.setdefault("TOOLS_TRACE_SAMPLE_RATE", "0")
+
+import psycopg2
+import psycopg2.extensions
+
+from benchmarks import synthetic_data, workloads
+from tools import (
+    campaign_dimensions, campaign_search, customer_aggregates, customer_segments, db_pool, distinct_sketches, formatters,
+    instrumentation, rollups, unified_metrics
+)
+
+
+# -------------------------------------------------------------------
+# Measurements
+# -------------------------------------------------------------------
+
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _rows_read(stats_connection, tables):
+    """Tuples read by sequential and index scans on tables, from pg_stat_user_tables"""
+    cursor = stats_connection.cursor()
+    try:
+        # Drop the cached stats snapshot so each read sees the latest counters
+        cursor.execute("SELECT pg_stat_clear_snapshot()")
+        cursor.execute(
+            """
+            SELECT COALESCE(SUM(COALESCE(seq_tup_read, 0) + COALESCE(idx_tup_fetch, 0)), 0)
+            FROM pg_stat_user_tables
+            WHERE relname = ANY(%s)
+            """,
+            (list(tables),)
+        )
+        return int(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+
+def _flush_backend_stats():
+    """Close the pooled connections so their backends report table statistics on exit"""
+    db_pool.close_all()
+    time.sleep(STATS_SETTLE_SECONDS)
+
+
+def _is_error(result):
+    return isinstance(result, str) and result.startswith("Error")
+
+
+def run_case(stats_connection, tool, kwargs, iterations=None, warm_up=None):
+    """
+    Time one tool call shape.
+
+    Returns latency percentiles (ms), errors, approximate rows scanned per call,
+    peak Python memory of one call, and rows/output size from the instrumentation.
+    """
+    iterations = iterations or ITERATIONS
+    warm_up = WARM_UP_CALLS if warm_up is None else warm_up
+    tables = list(synthetic_data.TABLES)
+
+    for _ in range(warm_up):
+        tool(**kwargs)
+
+    _flush_backend_stats()
+    instrumentation.reset_histograms()
+    rows_before = _rows_read(stats_connection, tables)
+
+    latencies = []
+    errors = 0
+    last_error = None
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = tool(**kwargs)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if _is_error(result):
+            errors += 1
+            last_error = result
+
+    _flush_backend_stats()
+    rows_scanned = (_rows_read(stats_connection, tables) - rows_before) / iterations
+
+    # Separate pass so tracing overhead does not skew the latencies
+    tracemalloc.start()
+    try:
+        tool(**kwargs)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    histograms = instrumentation.get_histograms()
+    returned = max(histograms.get("rows", {}).values(), key=lambda h: h["count"], default=None)
+    output = max(histograms.get("output_chars", {}).values(), key=lambda h: h["count"], default=None)
+
+    latencies.sort()
+    return {
+        "calls": iterations,
+        "errors": errors,
+        "last_error": last_error[:200] if last_error else None,
+        "p50_ms": _percentile(latencies, 0.50),
+        "p95_ms": _percentile(latencies, 0.95),
+        "p99_ms": _percentile(latencies, 0.99),
+        "max_ms": latencies[-1],
+        "rows_scanned": int(rows_scanned),
+        "rows_returned": int(returned["mean"]) if returned else None,
+        "output_chars": int(output["mean"]) if output else None,
+        "peak_mem_kb": round(peak_bytes / 1024, 1),
+    }
+
+
+# -------------------------------------------------------------------
+# Reporting
+# -------------------------------------------------------------------
+
+_REPORT_COLUMNS = (
+    "case", "calls", "errors", "p50_ms", "p95_ms", "p99_ms",
+    "rows_scanned", "rows_returned", "output_chars", "peak_mem_kb",
+)
+
+
+def _report_rows(results):
+    for case, result in results.items():
+        row = {"case": case}
+        for column in _REPORT_COLUMNS[1:]:
+            value = result[column]
+            row[column] = f"{value:.1f}" if isinstance(value, float) and column.endswith("_ms") else value
+        yield row
+
+
+def compare_to_baseline(results, baseline, max_regression=None):
+    """Cases whose p95 grew by more than max_regression over the baseline run"""
+    max_regression = MAX_P95_REGRESSION if max_regression is None else max_regression
+    regressions = []
+    for case, result in results.items():
+        previous = baseline.get(case)
+        if not previous or not previous.get("p95_ms") or result["p95_ms"] is None:
+            continue
+        change = result["p95_ms"] / previous["p95_ms"] - 1
+        if change > max_regression:
+            regressions.append((case, previous["p95_ms"], result["p95_ms"], change))
+    return regressions
+
+
+# -------------------------------------------------------------------
+# Entry Point
+# -------------------------------------------------------------------
+
+def _point_modules_at(dsn):
+    """Repoint every tools module's DB_CONFIG (in place, so pools and caches follow) at dsn"""
+    config = psycopg2.extensions.parse_dsn(dsn)
+    for module in workloads.tool_modules():
+        module.DB_CONFIG.clear()
+        module.DB_CONFIG.update(config)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every tools module against synthetic data")
+    parser.add_argument("--dsn", default=os.environ.get("TOOLS_BENCH_DSN"),
+                        help="Local PostgreSQL to load and query (default: $TOOLS_BENCH_DSN)")
+    parser.add_argument("--load", action="store_true", help="(Re)create and fill the synthetic tables first")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows per table when loading")
+    parser.add_argument("--tables", nargs="*", help="Subset of tables to load")
+    parser.add_argument("--with-rollups", action="store_true", help="Refresh the daily rollups before running")
+    parser.add_argument("--with-sketches", action="store_true",
+                        help="Refresh the daily distinct-count sketches first (used when TOOLS_APPROX_DISTINCT=1)")
+    parser.add_argument("--with-search-indexes", action="store_true", help="Provision the campaign name search indexes first")
+    parser.add_argument("--with-campaign-dimensions", action="store_true",
+                        help="Build the per-campaign dimension tables first (after the rollups, when both are given)")
+    parser.add_argument("--with-customer-aggregates", action="store_true", help="Build the per-customer aggregate table first")
+    parser.add_argument("--with-customer-segments", action="store_true",
+                        help="Score customer segments first (builds the customer aggregate too)")
+    parser.add_argument("--with-unified-metrics", action="store_true",
+                        help="Build the cross-channel unified metrics table first")
+    parser.add_argument("--modules", nargs="*", help="Subset of tools modules to benchmark")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--json", dest="json_path", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Results file from an earlier run to compare p95 against")
+    parser.add_argument("--max-regression", type=float, default=MAX_P95_REGRESSION)
+    args = parser.parse_args(argv)
+
+    if not args.dsn:
+        parser.error("a local database is required: pass --dsn or set TOOLS_BENCH_DSN")
+
+    setup_connection = psycopg2.connect(args.dsn)
+    try:
+        if args.load:
+            for table, seconds in synthetic_data.load_all(setup_connection, args.rows, args.tables).items():
+                print(f"{table}: loaded {args.rows:,} rows in {seconds:.1f}s")
+        if args.with_rollups:
+            for table, rows in rollups.refresh_all_rollups(setup_connection, full=True).items():
+                print(f"{rollups.rollup_table_name(table)}: {rows} rows refreshed")
+        if args.with_sketches:
+            for table, rows in distinct_sketches.refresh_all_sketches(setup_connection, full=True).items():
+                print(f"{distinct_sketches.sketch_table_name(table)}: {rows} rows refreshed")
+        if args.with_campaign_dimensions:
+            for table, campaigns in campaign_dimensions.refresh_all_dimensions(setup_connection).items():
+                print(f"{campaign_dimensions.dimension_table_name(table)}: {campaigns} campaigns refreshed")
+        if args.with_search_indexes:
+            for table in campaign_search.SEARCH_SPECS:
+                trigram = campaign_search.ensure_search_indexes(setup_connection, table)
+                print(f"{table}: {'pg_trgm' if trigram else 'in-process n-gram'} search")
+        if args.with_customer_aggregates or args.with_customer_segments:
+            customers = customer_aggregates.refresh_customer_aggregates(setup_connection)
+            print(f"{customer_aggregates.AGGREGATE_TABLE}: {customers} customers")
+        if args.with_customer_segments:
+            scored = customer_segments.refresh_segments(setup_connection, full=True)
+            print(f"{customer_segments.SCORES_TABLE}: {scored} customers scored")
+        if args.with_unified_metrics:
+            for channel, rows in unified_metrics.refresh_unified_metrics(setup_connection, full=True).items():
+                print(f"{unified_metrics.UNIFIED_TABLE} ({channel}): {rows} rows refreshed")
+    finally:
+        setup_connection.close()
+
+    _point_modules_at(args.dsn)
+
+    stats_connection = psycopg2.connect(args.dsn)
+    stats_connection.autocommit = True
+    results = {}
+    try:
+        for module_name, cases in workloads.build_workloads().items():
+            if args.modules and module_name not in args.modules:
+                continue
+            for case_name, tool, kwargs in cases:
+                case = f"{module_name}.{case_name}"
+                results[case] = run_case(stats_connection, tool, kwargs, iterations=args.iterations)
+                print(f"{case}: p95 {results[case]['p95_ms']:.1f} ms")
+    finally:
+        stats_connection.close()
+        db_pool.close_all()
+
+    print()
+    print(formatters.render_rows(_report_rows(results), "markdown", columns=_REPORT_COLUMNS))
+    for case, result in results.items():
+        if result["errors"]:
+            print(f"{case}: {result['errors']} error results, last: {result['last_error']}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.max_regression)
+        for case, before, after, change in regressions:
+            print(f"REGRESSION {case}: p95 {before:.1f} ms -> {after:.1f} ms (+{change:.0%})")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    # Usage: python -m benchmarks.run --dsn "dbname=bench" --load --rows 10000000 --json bench.json
+    sys.exit(main())
@@ -0,0 +1,279 @@
+import os
+import time
+
+
+# -------------------------------------------------------------------
+# Generator Settings
+# -------------------------------------------------------------------
+
+# Rows generated server-side per INSERT ... SELECT (each batch is its own transaction)
+BATCH_SIZE = int(os.environ.get("TOOLS_BENCH_BATCH_SIZE", 1_000_000))
+# Synthetic dates are spread over this many days back from today
+DATE_SPAN_DAYS = int(os.environ.get("TOOLS_BENCH_DATE_SPAN_DAYS", 730))
+# Passed to setseed() so repeated loads produce the same data
+SEED = float(os.environ.get("TOOLS_BENCH_SEED", 0.42))
+
+# Shared expression fragments; g is the generate_series row number
+_DAY = f"(CURRENT_DATE - (random() * {DATE_SPAN_DAYS})::int)"
+# Skewed pick in [0, n): a few entities get most of the rows, like real campaigns do
+_SKEWED = "floor({n} * power(random(), 2))::int"
+_CAMPAIGN_WORDS = (
+    "(ARRAY['Spring','Summer','Autumn','Winter','Holiday','Brand','Retargeting','Launch'])[1 + {c} % 8] || ' ' || "
+    "(ARRAY['Sale','Awareness','Promo','Leads','App Install','Video','Search','Lookalike'])[1 + ({c} / 8) % 8] || ' ' || {c}"
+)
+
+
+def _campaign_columns(n_campaigns):
+    campaign = _SKEWED.format(n=n_campaigns)
+    return campaign, _CAMPAIGN_WORDS.format(c="c")
+
+
+# Each table: DDL column list, rows per distinct campaign / page / customer (c),
+# and the SELECT list + FROM clause that produce one row per generate_series value.
+_AD_CHANNEL = {
+    "columns": """
+        date DATE NOT NULL,
+        campaign_id TEXT NOT NULL,
+        campaign_name TEXT NOT NULL,
+        impressions BIGINT NOT NULL,
+        clicks BIGINT NOT NULL,
+        spend NUMERIC(12, 2) NOT NULL,
+        conversions BIGINT NOT NULL,
+        source TEXT
+    """,
+    "rows_per_entity": 2000,
+    "select": """
+        day AS date,
+        'cmp_' || c AS campaign_id,
+        {campaign_name} AS campaign_name,
+        impressions,
+        clicks,
+        ROUND((clicks * (0.2 + random() * 3))::numeric, 2) AS spend,
+        (clicks * random() * 0.1)::bigint AS conversions,
+        {source} AS source
+    """,
+    "from": """
+        FROM (
+            SELECT {day} AS day, {campaign} AS c, imp AS impressions,
+                   (imp * (0.002 + random() * 0.03))::bigint AS clicks
+            FROM (
+                SELECT g, (100 + random() * random() * 50000)::bigint AS imp
+                FROM generate_series(%s, %s) AS g
+            ) base
+        ) r
+    """,
+}
+
+TABLES = {
+    "facebook_campaigns_ads": dict(_AD_CHANNEL, source="'Facebook Ads'"),
+    "tiktok_campaign_ad_details": dict(_AD_CHANNEL, source="'TikTok Ads'"),
+    "linkedin_ads": dict(_AD_CHANNEL, source="'LinkedIn Ads'"),
+    # The Bing tools filter on source = 'Bing Ads'; a slice of other sources keeps that filter honest
+    "bing_advertising_data": dict(_AD_CHANNEL, source="CASE WHEN random() < 0.9 THEN 'Bing Ads' ELSE 'Bing Shopping' END"),
+    "email_campaigns": {
+        "columns": """
+            date DATE NOT NULL,
+            campaign_id TEXT NOT NULL,
+            subject_line TEXT NOT NULL,
+            emails_sent BIGINT NOT NULL,
+            open_rate NUMERIC(6, 4) NOT NULL,
+            click_through_rate NUMERIC(6, 4) NOT NULL,
+            conversions BIGINT NOT NULL,
+            unsubscribes BIGINT NOT NULL,
+            source TEXT
+        """,
+        "rows_per_entity": 500,
+        "select": """
+            day AS date,
+            'em_' || c AS campaign_id,
+            (ARRAY['Last chance:','New arrivals -','Your weekly','Exclusive offer:','Thanks for joining -','Reminder:'])[1 + c % 6]
+                || ' ' || {campaign_name} AS subject_line,
+            sent AS emails_sent,
+            ROUND((0.1 + random() * 0.4)::numeric, 4) AS open_rate,
+            ROUND((0.005 + random() * 0.08)::numeric, 4) AS click_through_rate,
+            (sent * random() * 0.01)::bigint AS conversions,
+            (sent * random() * 0.002)::bigint AS unsubscribes,
+            (ARRAY['Newsletter','Promotional','Transactional','Automation'])[1 + c % 4] AS source
+        """,
+        "from": """
+            FROM (
+                SELECT {day} AS day, {campaign} AS c, (500 + random() * 100000)::bigint AS sent
+                FROM generate_series(%s, %s) AS g
+            ) r
+        """,
+    },
+    "seo_organic_ads": {
+        "columns": """
+            ad_date DATE NOT NULL,
+            page_url TEXT NOT NULL,
+            sessions BIGINT NOT NULL,
+            unique_visitors BIGINT NOT NULL,
+            bounce_rate NUMERIC(6, 4) NOT NULL,
+            avg_session_duration_sec NUMERIC(10, 2) NOT NULL,
+            conversions BIGINT NOT NULL,
+            source TEXT
+        """,
+        "rows_per_entity": 1000,
+        "select": """
+            day AS ad_date,
+            (ARRAY['/blog/','/products/','/search/','/app/','/docs/','/pricing/'])[1 + c % 6] || 'page-' || c AS page_url,
+            sessions,
+            (sessions * (0.5 + random() * 0.5))::bigint AS unique_visitors,
+            ROUND((0.2 + random() * 0.6)::numeric, 4) AS bounce_rate,
+            ROUND((10 + random() * 400)::numeric, 2) AS avg_session_duration_sec,
+            (sessions * random() * 0.05)::bigint AS conversions,
+            (ARRAY['google','bing','duckduckgo','yahoo','direct'])[1 + (c + g) % 5] AS source
+        """,
+        "from": """
+            FROM (
+                SELECT g, {day} AS day, {campaign} AS c, (10 + random() * random() * 20000)::bigint AS sessions
+                FROM generate_series(%s, %s) AS g
+            ) r
+        """,
+    },
+    "linear_tv_ads": {
+        "columns": """
+            date DATE NOT NULL,
+            network TEXT NOT NULL,
+            program TEXT NOT NULL,
+            impressions BIGINT NOT NULL,
+            reach BIGINT NOT NULL,
+            frequency NUMERIC(8, 2) NOT NULL,
+            conversions BIGINT NOT NULL,
+            source TEXT
+        """,
+        "rows_per_entity": 5000,
+        "select": """
+            day AS date,
+            (ARRAY['ABC','CBS','NBC','FOX','ESPN','CNN','HGTV','TNT','AMC','Bravo'])[1 + c % 10] AS network,
+            (ARRAY['Morning News','Prime Drama','Late Show','Sports Live','Reality Hour','Movie Night'])[1 + (c / 10) % 6]
+                || ' ' || c AS program,
+            impressions,
+            reach,
+            ROUND((impressions::numeric / GREATEST(reach, 1)), 2) AS frequency,
+            (impressions * random() * 0.001)::bigint AS conversions,
+            (ARRAY['Nielsen','Comscore','iSpot'])[1 + c % 3] AS source
+        """,
+        "from": """
+            FROM (
+                SELECT {day} AS day, {campaign} AS c, imp AS impressions, (imp * (0.3 + random() * 0.6))::bigint AS reach
+                FROM (
+                    SELECT g, (10000 + random() * random() * 2000000)::bigint AS imp
+                    FROM generate_series(%s, %s) AS g
+                ) base
+            ) r
+        """,
+    },
+    "connected_tv_ads": {
+        "columns": """
+            date DATE NOT NULL,
+            platform TEXT NOT NULL,
+            ad_slot TEXT NOT NULL,
+            impressions BIGINT NOT NULL,
+            completion_rate NUMERIC(6, 4) NOT NULL,
+            click_through_rate NUMERIC(6, 4) NOT NULL,
+            conversions BIGINT NOT NULL,
+            source TEXT
+        """,
+        "rows_per_entity": 2000,
+        "select": """
+            day AS date,
+            (ARRAY['Roku','Hulu','Samsung TV Plus','Pluto TV','YouTube TV','Fire TV'])[1 + c % 6] AS platform,
+            (ARRAY['pre-roll','mid-roll','post-roll','pause-ad','home-screen'])[1 + (c / 6) % 5] || '-' || c AS ad_slot,
+            impressions,
+            ROUND((0.5 + random() * 0.5)::numeric, 4) AS completion_rate,
+            ROUND((0.001 + random() * 0.02)::numeric, 4) AS click_through_rate,
+            (impressions * random() * 0.002)::bigint AS conversions,
+            'CTV' AS source
+        """,
+        "from": """
+            FROM (
+                SELECT {day} AS day, {campaign} AS c, (1000 + random() * random() * 500000)::bigint AS impressions
+                FROM generate_series(%s, %s) AS g
+            ) r
+        """,
+    },
+    "consolidated_profit": {
+        "columns": """
+            "Customer ID" TEXT NOT NULL,
+            "Category" TEXT NOT NULL,
+            "Merchant_Name" TEXT NOT NULL,
+            "Gross Profit" NUMERIC(12, 2) NOT NULL,
+            "Net Profit" NUMERIC(12, 2) NOT NULL,
+            "Customer Payment" NUMERIC(12, 2) NOT NULL
+        """,
+        "rows_per_entity": 20,
+        "select": """
+            'CUST' || lpad(c::text, 8, '0') AS "Customer ID",
+            (ARRAY['Electronics','Grocery','Apparel','Travel','Dining','Home','Health','Entertainment'])[1 + (c + g) % 8] AS "Category",
+            (ARRAY['Amazon','Walmart','Target','Costco','Best Buy','Starbucks','Delta','Home Depot','CVS','Netflix'])[1 + (c * 7 + g) % 10] AS "Merchant_Name",
+            gross AS "Gross Profit",
+            ROUND(gross * (0.3 + random() * 0.6), 2) AS "Net Profit",
+            CASE WHEN random() < 0.1 THEN 0 ELSE ROUND(gross * (1 + random() * 4), 2) END AS "Customer Payment"
+        """,
+        "from": """
+            FROM (
+                SELECT g, {campaign} AS c, ROUND((1 + random() * random() * 2000)::numeric, 2) AS gross
+                FROM generate_series(%s, %s) AS g
+            ) r
+        """,
+    },
+}
+
+
+# -------------------------------------------------------------------
+# Loading
+# -------------------------------------------------------------------
+
+def _insert_sql(table, rows):
+    spec = TABLES[table]
+    entities = max(10, rows // spec["rows_per_entity"])
+    campaign, campaign_name = _campaign_columns(entities)
+    select = spec["select"].format(campaign_name=campaign_name, source=spec.get("source", "NULL"))
+    source = spec["from"].format(day=_DAY, campaign=campaign)
+    # The SELECT list uses the SQL modulo operator; escape it for psycopg2's %s placeholders
+    return f"INSERT INTO {table} SELECT {select.replace('%', '%%')} {source}"
+
+
+def load_table(connection, table, rows, batch_size=None):
+    """
+    Drop and recreate table, then fill it with rows synthetic rows generated server-side.
+
+    Returns the seconds taken. Nothing leaves the database, so 100M rows cost no
+    client memory; each batch is committed separately.
+    """
+    if table not in TABLES:
+        raise Exception(f"No synthetic spec for table '{table}'; choose from {', '.join(TABLES)}")
+
+    batch_size = batch_size or BATCH_SIZE
+    insert_sql = _insert_sql(table, rows)
+    started = time.perf_counter()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT setseed(%s)", (SEED,))
+        cursor.execute(f"DROP TABLE IF EXISTS {table} CASCADE")
+        cursor.execute(f"CREATE TABLE {table} ({TABLES[table]['columns']})")
+        connection.commit()
+
+        for start in range(1, rows + 1, batch_size):
+            end = min(start + batch_size - 1, rows)
+            cursor.execute(insert_sql, (start, end))
+            connection.commit()
+            print(f"{table}: {end:,}/{rows:,} rows")
+
+        # VACUUM cannot run inside a transaction block
+        connection.autocommit = True
+        cursor.execute(f"VACUUM ANALYZE {table}")
+    finally:
+        connection.autocommit = False
+        cursor.close()
+    return time.perf_counter() - started
+
+
+def load_all(connection, rows, tables=None, batch_size=None):
+    """Load every table (or the given subset); rows may be an int or {table: rows}"""
+    timings = {}
+    for table in tables or TABLES:
+        table_rows = rows[table] if isinstance(rows, dict) else rows
+        timings[table] = load_table(connection, table, table_rows, batch_size)
+    return timings
@@ -0,0 +1,157 @@
+from datetime import date, timedelta
+
+
+# -------------------------------------------------------------------
+# Argument Mixes
+# -------------------------------------------------------------------
+
+def _days_ago(days):
+    return (date.today() - timedelta(days=days)).isoformat()
+
+
+def _ad_channel_cases(performance, batch, trends, search):
+    """Shared mix for the four paid-social/search channels (same schema, same tool shapes)"""
+    return [
+        ("performance_30d_top10", performance, dict(date_from=_days_ago(30), date_to=_days_ago(0), limit=10)),
+        ("performance_campaign_1y", performance, dict(campaign_name="Spring Sale", date_from=_days_ago(365), date_to=_days_ago(0), limit=50)),
+        ("performance_by_id", performance, dict(campaign_id="cmp_1", limit=10)),
+        ("performance_batch_10_ids", batch, dict(campaign_ids=[f"cmp_{i}" for i in range(1, 11)])),
+        ("performance_compact_500", performance, dict(date_from=_days_ago(90), date_to=_days_ago(0), limit=500, output_format="compact")),
+        ("trends_daily_30d", trends, dict(period="daily", days_back=30)),
+        ("trends_weekly_campaign", trends, dict(campaign_name="Holiday", period="weekly", metric="spend", days_back=180)),
+        ("trends_monthly_2y", trends, dict(period="monthly", metric="ctr", date_from=_days_ago(730), date_to=_days_ago(0))),
+        ("search_term", search, dict(search_term="Promo", limit=20)),
+        ("search_filtered", search, dict(search_term="Summer", date_from=_days_ago(90), date_to=_days_ago(0), min_spend=100.0, has_conversions=True)),
+        # Undated threshold search: answered from the campaign dimension table when it is built
+        ("search_lifetime_min_spend", search, dict(min_spend=1000.0, has_conversions=True, limit=20)),
+    ]
+
+
+def build_workloads():
+    """
+    {module_name: [(case_name, tool, kwargs), ...]} covering every data tool.
+
+    The agent tools (which call an LLM) are left out. Imported lazily so the
+    benchmark runner can configure the environment before the tools modules load.
+    """
+    from tools import (
+        Connected_tv_ads,
+        Linear_tv_ads,
+        Linkedin_ads_tool,
+        bing_tools,
+        consolidated_sales_tool,
+        cross_channel_tool,
+        email_tools,
+        facebook_ads,
+        seo_organic_tools,
+        tiktok_ads_tool,
+    )
+
+    bing_cases = _ad_channel_cases(
+        bing_tools.get_campaign_performance_for_bing, bing_tools.get_campaign_performance_batch_for_bing,
+        bing_tools.get_campaign_trends, bing_tools.search_similar_campaigns
+    )
+    # limit=None streams the whole range through a server-side cursor
+    bing_cases.append(("performance_unbounded_90d", bing_tools.get_campaign_performance_for_bing,
+                       dict(date_from=_days_ago(90), date_to=_days_ago(0), limit=None, output_format="compact")))
+
+    return {
+        "facebook_ads": _ad_channel_cases(
+            facebook_ads.get_campaign_performance, facebook_ads.get_campaign_performance_batch,
+            facebook_ads.get_campaign_trends, facebook_ads.search_similar_campaigns
+        ),
+        "tiktok_ads_tool": _ad_channel_cases(
+            tiktok_ads_tool.get_campaign_performance, tiktok_ads_tool.get_campaign_performance_batch,
+            tiktok_ads_tool.get_campaign_trends, tiktok_ads_tool.search_similar_campaigns
+        ),
+        "Linkedin_ads_tool": _ad_channel_cases(
+            Linkedin_ads_tool.linkedin_get_campaign_performance,
+            Linkedin_ads_tool.linkedin_get_campaign_performance_batch,
+            Linkedin_ads_tool.linkedin_get_campaign_trends,
+            Linkedin_ads_tool.linkedin_search_similar_campaigns,
+        ),
+        "bing_tools": bing_cases,
+        "email_tools": [
+            ("performance_conversion_top3", email_tools.get_campaign_performance, dict(start_date=_days_ago(30), end_date=_days_ago(0))),
+            ("performance_open_rate_top50", email_tools.get_campaign_performance, dict(metric="open_rate", limit=50, start_date=_days_ago(365), end_date=_days_ago(0))),
+            ("summary_campaign", email_tools.get_campaign_summary, dict(campaign_id="em_1")),
+            ("summary_all_90d", email_tools.get_campaign_summary, dict(start_date=_days_ago(90), end_date=_days_ago(0))),
+            ("trends_30d", email_tools.get_campaign_trends, dict(days_to_look_for=30)),
+            ("trends_1y", email_tools.get_campaign_trends, dict(days_to_look_for=365)),
+            ("search_subject", email_tools.search_campaigns_by_subject, dict(subject_keyword="offer", limit="20")),
+        ],
+        "seo_organic_tools": [
+            ("pages_30d", seo_organic_tools.get_page_analytics, dict(start_date=_days_ago(30), end_date=_days_ago(0))),
+            ("pages_filtered", seo_organic_tools.get_page_analytics,
+             dict(page_url="/blog/", min_sessions=500, max_bounce_rate=0.6, source="google", sort_by="sessions", limit=50)),
+            ("summary_overall", seo_organic_tools.get_analytics_summary, dict(start_date=_days_ago(90), end_date=_days_ago(0))),
+            ("summary_by_source", seo_organic_tools.get_analytics_summary, dict(group_by="source", start_date=_days_ago(365), end_date=_days_ago(0))),
+            ("summary_daily_trends", seo_organic_tools.get_analytics_summary, dict(group_by="daily_trends", days_for_trends=90)),
+        ],
+        "Linear_tv_ads": [
+            ("network_30d", Linear_tv_ads.linear_tv_analyze_tv_network, dict(start_date=_days_ago(30), end_date=_days_ago(0))),
+            ("network_filtered_summary", Linear_tv_ads.linear_tv_analyze_tv_network,
+             dict(network="NBC", program_keyword="News", min_impressions=100000, sort_by="impressions", limit=50, include_summary=True)),
+            ("trends_daily", Linear_tv_ads.linear_tv_get_network_and_program_trends, dict(period="daily", days_back=30)),
+            ("trends_weekly_network", Linear_tv_ads.linear_tv_get_network_and_program_trends,
+             dict(network="CBS", period="weekly", metric="reach", days_back=180)),
+            ("comparison_top10", Linear_tv_ads.linear_tv_get_network_comparison, dict(days_back=90)),
+            ("comparison_pair", Linear_tv_ads.linear_tv_get_network_comparison,
+             dict(compare_network_1="ABC", compare_network_2="FOX", metric="conversions", days_back=365)),
+        ],
+        "Connected_tv_ads": [
+            ("platform_30d", Connected_tv_ads.get_platform_performance, dict(date_from=_days_ago(30), date_to=_days_ago(0))),
+            ("platform_roku_1y", Connected_tv_ads.get_platform_performance,
+             dict(platform="Roku", date_from=_days_ago(365), date_to=_days_ago(0), limit=50)),
+            ("trends_daily", Connected_tv_ads.get_platform_trends, dict(period="daily", days_back=30)),
+            ("trends_monthly_platform", Connected_tv_ads.get_platform_trends,
+             dict(platform="Hulu", period="monthly", metric="completion_rate", days_back=365)),
+            ("search_slot", Connected_tv_ads.search_similar_ad_slot, dict(search_term="mid-roll", limit=20)),
+            ("search_filtered", Connected_tv_ads.search_similar_ad_slot,
+             dict(search_term="pre-roll", platform="Pluto TV", min_impressions=10000, has_conversions=True)),
+        ],
+        "consolidated_sales_tool": [
+            ("customer_profile", consolidated_sales_tool.analyze_customer_purchase_behavior, dict(customer_id="CUST00000001")),
+            ("customer_profile_batch_10", consolidated_sales_tool.analyze_customer_purchase_behavior_batch,
+             dict(customer_ids=[f"CUST{i:08d}" for i in range(1, 11)])),
+            ("profitability_top20", consolidated_sales_tool.analyze_customer_purchase_behavior, dict(analysis_type="profitability_analysis")),
+            ("category_preferences", consolidated_sales_tool.analyze_customer_purchase_behavior,
+             dict(analysis_type="category_preferences", category="Electronics")),
+            ("merchant_relationships", consolidated_sales_tool.analyze_customer_purchase_behavior,
+             dict(analysis_type="merchant_relationships", merchant_name="Amazon", min_transactions=3)),
+            ("payment_behavior", consolidated_sales_tool.analyze_customer_purchase_behavior, dict(analysis_type="payment_behavior")),
+            ("lifetime_value_markdown", consolidated_sales_tool.analyze_customer_purchase_behavior,
+             dict(analysis_type="lifetime_value", limit=100, output_format="markdown")),
+            ("segment_summary", consolidated_sales_tool.analyze_customer_segments, dict()),
+            ("segment_champions", consolidated_sales_tool.analyze_customer_segments, dict(segment="champions", limit=50)),
+        ],
+        "cross_channel_tool": [
+            ("totals_30d", cross_channel_tool.cross_channel_comparison, dict(date_from=_days_ago(30), date_to=_days_ago(0))),
+            ("totals_and_weekly_trends", cross_channel_tool.cross_channel_comparison,
+             dict(campaign_name="Brand", period="weekly", days_back=180)),
+            ("unified_by_channel", cross_channel_tool.unified_channel_metrics, dict(days_back=30)),
+            ("unified_top_campaigns", cross_channel_tool.unified_channel_metrics,
+             dict(group_by="campaign", date_from=_days_ago(90), date_to=_days_ago(0), limit=25)),
+            ("unified_weekly_by_channel", cross_channel_tool.unified_channel_metrics,
+             dict(group_by="channel_period", period="weekly", days_back=180)),
+        ],
+    }
+
+
+def tool_modules():
+    """Every tools module that reads its own DB_CONFIG, so the runner can repoint them"""
+    from tools import (
+        Connected_tv_ads,
+        Linear_tv_ads,
+        Linkedin_ads_tool,
+        bing_tools,
+        consolidated_sales_tool,
+        email_tools,
+        facebook_ads,
+        seo_organic_tools,
+        tiktok_ads_tool,
+    )
+    return [
+        facebook_ads, tiktok_ads_tool, Linkedin_ads_tool, bing_tools, email_tools,
+        seo_organic_tools, Linear_tv_ads, Connected_tv_ads, consolidated_sales_tool,
+    ]
@@ -1,9 +1,16 @@
+import asyncio
+import logging
 from typing import Optional,Literal,List
 from strands import Agent, tool
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from psycopg2 import Error
-import psycopg2.pool
+from tools import db_pool, distinct_sketches, pagination, rollups
+from tools.result_cache import cached_tool
+from tools import agent_factory, async_db, trend_analytics
+
+
+logger = logging.getLogger("tools.Linear_tv_ads")
 
 
 # Database configuration - update with your Aurora PostgreSQL details
@@ -17,45 +24,26 @@ DB_CONFIG = {
 
 TABLE_NAME = "linear_tv_ads"  
 
-# Global connection pool
-connection_pool = None
-
-
 # -------------------------------------------------------------------
 # Connection Pool Setup
 # -------------------------------------------------------------------
 
 def initialize_connection_pool():
-    """Initialize connection pool"""                                                     
-    global connection_pool
-    try:
-        connection_pool = psycopg2.pool.SimpleConnectionPool(
-            1, 20,  # min and max connections
-            **DB_CONFIG
-        )
-        return connection_pool
-    except Error as e:
-        raise Exception(f"Connection pool initialization failed: {e}")
+    """Initialize (or reuse) the process-wide connection pool"""
+    return db_pool.get_pool(DB_CONFIG)
 
 
 def get_db_connection():
-    """Get database connection from pool"""
-    global connection_pool
-    if connection_pool is None:
-        initialize_connection_pool()
-
-    try:
-        connection = connection_pool.getconn()
-        return connection
-    except Error as e:
-        raise Exception(f"Database connection failed: {e}")
+    """Get database connection from the shared pool"""
+    return db_pool.get_connection(DB_CONFIG)
 
 
 def return_connection(connection):
-    """Return connection to pool"""
-    global connection_pool
-    if connection_pool and connection:
-        connection_pool.putconn(connection)
+    """Return connection to the shared pool"""
+    db_pool.return_connection(connection)
+
+
+db_pool.warm_up(DB_CONFIG)
 
 def combine_results_as_dict(results, summary):
     """Combine results and summary into a structured dictionary"""
@@ -70,6 +58,159 @@ def combine_results_as_dict(results, summary):
 # Merged TV network Analysis Tools
 # -------------------------------------------------------------------
 
+# Hidden columns carrying each row's keyset position; dropped before rows are returned
+_NETWORK_KEY_COLUMNS = ["page_sort_key", "page_row_id"]
+
+_NETWORK_SORT_MAPPING = {
+    "date": "date",
+    "impressions": "impressions",
+    "reach": "reach",
+    "frequency": "frequency",
+    "conversions": "conversions",
+    "conversion_rate": "conversions * 100.0 / NULLIF(impressions, 0)"
+}
+
+
+def _network_analysis_scope(start_date, end_date, network, program_keyword, min_impressions, min_reach, min_conversion_rate, sort_by, sort_order):
+    return pagination.scope(
+        TABLE_NAME, start_date, end_date, network, program_keyword, min_impressions, min_reach, min_conversion_rate, sort_by, sort_order
+    )
+
+
+def _network_analysis_query(start_date, end_date, network, program_keyword, min_impressions, min_reach, min_conversion_rate, sort_by, sort_order, limit, page_key=None):
+    """
+    Build the detail query; returns (query, params, filters).
+
+    filters is (where_conditions, params) for the filters alone, without the page
+    position or limit, so the summary covers every matching row.
+    """
+    sort_field = _NETWORK_SORT_MAPPING.get(sort_by, "date")
+    order = "ASC" if sort_order.lower() == "asc" else "DESC"
+    # The row id breaks ties so page tokens resume at an exact row
+    key_expressions = [sort_field, pagination.ROW_TIE_BREAKER]
+
+    query = f"""
+        SELECT date, network, program, impressions, reach, frequency, conversions, source,
+               ROUND(
+                   CAST(conversions * 100.0 / NULLIF(impressions, 0) AS NUMERIC), 
+                   4
+               ) as conversion_rate_pct,
+               ROUND(
+                   CAST(impressions * 1.0 / NULLIF(reach, 0) AS NUMERIC), 
+                   2
+               ) as calculated_frequency,
+               {sort_field} as page_sort_key,
+               {pagination.ROW_TIE_BREAKER} as page_row_id
+        FROM {TABLE_NAME}
+    """
+
+    where_conditions = []
+    params = []
+
+    if start_date:
+        where_conditions.append("date >= %s")
+        params.append(start_date)
+    if end_date:
+        where_conditions.append("date <= %s")
+        params.append(end_date)
+    if network:
+        where_conditions.append("UPPER(network) = UPPER(%s)")
+        params.append(network)
+    if program_keyword:
+        where_conditions.append("program ILIKE %s")
+        params.append(f"%{program_keyword}%")
+    if min_impressions:
+        where_conditions.append("impressions >= %s")
+        params.append(min_impressions)
+    if min_reach:
+        where_conditions.append("reach >= %s")
+        params.append(min_reach)
+    if min_conversion_rate:
+        where_conditions.append("(conversions * 100.0 / NULLIF(impressions, 0)) >= %s")
+        params.append(min_conversion_rate)
+
+    filters = (list(where_conditions), list(params))
+
+    if page_key:
+        condition, key_params = pagination.keyset_condition(key_expressions, order, page_key, nullable=True)
+        where_conditions.append(condition)
+        params.extend(key_params)
+
+    if where_conditions:
+        query += " WHERE " + " AND ".join(where_conditions)
+
+    query += f" ORDER BY {pagination.order_by(key_expressions, order, nullable=True)} LIMIT %s"
+    params.append(limit)
+
+    return query, params, filters
+
+
+def _network_summary_query(filters):
+    """Build the summary query over the detail query's filters; returns (query, params)"""
+    where_conditions, filter_params = filters
+    summary_query = f"""
+        SELECT 
+            COUNT(*) as total_networks,
+            COUNT(DISTINCT network) as unique_networks,
+            SUM(impressions) as total_impressions,
+            SUM(reach) as total_reach,
+            ROUND(AVG(frequency), 2) as avg_frequency,
+            SUM(conversions) as total_conversions,
+            ROUND(
+                CAST(SUM(conversions) * 100.0 / NULLIF(SUM(impressions), 0) AS NUMERIC), 
+                4
+            ) as overall_conversion_rate,
+            MIN(date) as earliest_network,
+            MAX(date) as latest_network
+        FROM {TABLE_NAME}
+    """
+
+    if where_conditions:
+        summary_query += " WHERE " + " AND ".join(where_conditions)
+
+    return summary_query, filter_params
+
+
+def _format_network_analysis(results, summary):
+    """Shape the detail rows and optional summary for the agent"""
+    if not results:
+        return "No TV networks found matching the criteria."
+
+    # Add summary to output
+    if summary:
+        return results,summary
+    else:
+        return results
+        # output += (
+        #     "NETWORK SUMMARY\n"
+        #     + "=" * 40 + "\n"
+        #     f"Period: {summary['earliest_network']} to {summary['latest_network']}\n"
+        #     f"Total Records: {summary['total_networks']:,}\n"
+        #     f"Unique Networks: {summary['unique_networks']}\n"
+        #     f"Total Impressions: {summary['total_impressions']:,}\n"
+        #     f"Total Reach: {summary['total_reach']:,}\n"
+        #     f"Average Frequency: {summary['avg_frequency']}\n"
+        #     f"Total Conversions: {summary['total_conversions']:,}\n"
+        #     f"Overall Conversion Rate: {summary['overall_conversion_rate'] or 0}%\n\n"
+        # )
+
+    # Add detailed results to output
+    # output += f"DETAILED RESULTS ({len(results)} records):\n" + "=" * 50 + "\n\n"
+
+    # for i, row in enumerate(results, 1):
+    #     output += (
+    #         f"{i}. Date: {row['date']} | Network: {row['network']}\n"
+    #         f"   Program: {row['program']}\n"
+    #         f"   Impressions: {row['impressions']:,} | Reach: {row['reach']:,}\n"
+    #         f"   Frequency: {row['frequency']} | Conversions: {row['conversions']}\n"
+    #         f"   Conversion Rate: {row['conversion_rate_pct'] or 0}%\n"
+    #         f"   Source: {row['source']}\n"
+    #         + "-" * 50 + "\n"
+    #     )
+    # print("output:::::::::",output)
+    # return output
+
+
 @tool(name='linear_tv_analyze_tv_network', description=(
         "Retrieve detailed linear TV advertising performance at the network and program level. "
         "This tool allows filtering by date range, network name, program keyword, impressions, reach, and conversion rate. "
@@ -82,6 +223,7 @@ def combine_results_as_dict(results, summary):
         "within a specified time range. Always include the key insights from the retrieved result"
     )
     )
+@cached_tool(TABLE_NAME, DB_CONFIG)
 def linear_tv_analyze_tv_network(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
@@ -93,161 +235,274 @@ def linear_tv_analyze_tv_network(
     sort_by: Optional[str] = "date",
     sort_order: Optional[str] = "desc",
     limit: Optional[int] = 10,
-    include_summary: Optional[bool] = False
+    include_summary: Optional[bool] = False,
+    page_token: Optional[str] = None
 ) -> str:
     """
     Comprehensive TV network analysis tool that retrieves, filters, and sorts network data.
-    Can also include summary statistics when requested.
+    Can also include summary statistics when requested (first page only).
+    Pass the returned next_page_token as page_token to fetch the following page.
     """
     connection = None
+    cursor = None
+    
     try:
+        page_scope = _network_analysis_scope(
+            start_date, end_date, network, program_keyword, min_impressions, min_reach, min_conversion_rate, sort_by, sort_order
+        )
+        page_key = pagination.decode_token(page_token, page_scope) if page_token else None
+        query, params, filters = _network_analysis_query(
+            start_date, end_date, network, program_keyword, min_impressions, min_reach, min_conversion_rate, sort_by, sort_order,
+            pagination.fetch_limit(limit), page_key
+        )
+        
         connection = get_db_connection()
         cursor = connection.cursor(cursor_factory=RealDictCursor)
 
-        # Build main query
-
-        
-        query = f"""
-            SELECT date, network, program, impressions, reach, frequency, conversions, source,
-                   ROUND(
-                       CAST(conversions * 100.0 / NULLIF(impressions, 0) AS NUMERIC), 
-                       4
-                   ) as conversion_rate_pct,
-                   ROUND(
-                       CAST(impressions * 1.0 / NULLIF(reach, 0) AS NUMERIC), 
-                       2
-                   ) as calculated_frequency
-            FROM {TABLE_NAME}
-        """
-
-        where_conditions = []
-        params = []
-        
-        if start_date:
-            where_conditions.append("date >= %s")
-            params.append(start_date)
-        if end_date:
-            where_conditions.append("date <= %s")
-            params.append(end_date)
-        if network:
-            where_conditions.append("UPPER(network) = UPPER(%s)")
-            params.append(network)
-        if program_keyword:
-            where_conditions.append("program ILIKE %s")
-            params.append(f"%{program_keyword}%")
-        if min_impressions:
-            where_conditions.append("impressions >= %s")
-            params.append(min_impressions)
-        if min_reach:
-            where_conditions.append("reach >= %s")
-            params.append(min_reach)
-        if min_conversion_rate:
-            where_conditions.append("(conversions * 100.0 / NULLIF(impressions, 0)) >= %s")
-            params.append(min_conversion_rate)
-
-        if where_conditions:
-            query += " WHERE " + " AND ".join(where_conditions)
-
-        # Add sorting
-        sort_mapping = {
-            "date": "date",
-            "impressions": "impressions",
-            "reach": "reach",
-            "frequency": "frequency",
-            "conversions": "conversions",
-            "conversion_rate": "conversions * 100.0 / NULLIF(impressions, 0)"
-        }
-        
-        sort_field = sort_mapping.get(sort_by, "date")
-        order = "ASC" if sort_order.lower() == "asc" else "DESC"
-        query += f" ORDER BY {sort_field} {order} LIMIT %s"
-        params.append(limit)
-        
-        print("Query:", query)
-        print("Params:", params)
-        
         # Execute main query
         cursor.execute(query, params)
-        results = cursor.fetchall()
-
-        if not results:
-            return "No TV networks found matching the criteria."
-        
-
-        # Initialize output
-        output = ""
+        results, next_page_token = pagination.next_page(cursor.fetchall(), limit, _NETWORK_KEY_COLUMNS, page_scope)
+        results = pagination.drop_key_columns(results, _NETWORK_KEY_COLUMNS)
         summary = None
         
         # Get summary if requested
-        if include_summary:
-            summary_query = f"""
-                SELECT 
-                    COUNT(*) as total_networks,
-                    COUNT(DISTINCT network) as unique_networks,
-                    SUM(impressions) as total_impressions,
-                    SUM(reach) as total_reach,
-                    ROUND(AVG(frequency), 2) as avg_frequency,
-                    SUM(conversions) as total_conversions,
-                    ROUND(
-                        CAST(SUM(conversions) * 100.0 / NULLIF(SUM(impressions), 0) AS NUMERIC), 
-                        4
-                    ) as overall_conversion_rate,
-                    MIN(date) as earliest_network,
-                    MAX(date) as latest_network
-                FROM {TABLE_NAME}
-            """
-            
-            summary_params = []
-            if where_conditions:
-                summary_query += " WHERE " + " AND ".join(where_conditions)
-                summary_params = params[:-1]  # Exclude limit param
-            
+        if results and include_summary and not page_key:
+            summary_query, summary_params = _network_summary_query(filters)
             cursor.execute(summary_query, summary_params)
             summary = cursor.fetchone()
-            print("Summary result:", summary)
-            
-            # Add summary to output
-            if summary:
-                return results,summary
-            else:
-                return results
-                # output += (
-                #     "NETWORK SUMMARY\n"
-                #     + "=" * 40 + "\n"
-                #     f"Period: {summary['earliest_network']} to {summary['latest_network']}\n"
-                #     f"Total Records: {summary['total_networks']:,}\n"
-                #     f"Unique Networks: {summary['unique_networks']}\n"
-                #     f"Total Impressions: {summary['total_impressions']:,}\n"
-                #     f"Total Reach: {summary['total_reach']:,}\n"
-                #     f"Average Frequency: {summary['avg_frequency']}\n"
-                #     f"Total Conversions: {summary['total_conversions']:,}\n"
-                #     f"Overall Conversion Rate: {summary['overall_conversion_rate'] or 0}%\n\n"
-                # )
-
-        # Add detailed results to output
-        # output += f"DETAILED RESULTS ({len(results)} records):\n" + "=" * 50 + "\n\n"
         
-        # for i, row in enumerate(results, 1):
-        #     output += (
-        #         f"{i}. Date: {row['date']} | Network: {row['network']}\n"
-        #         f"   Program: {row['program']}\n"
-        #         f"   Impressions: {row['impressions']:,} | Reach: {row['reach']:,}\n"
-        #         f"   Frequency: {row['frequency']} | Conversions: {row['conversions']}\n"
-        #         f"   Conversion Rate: {row['conversion_rate_pct'] or 0}%\n"
-        #         f"   Source: {row['source']}\n"
-        #         + "-" * 50 + "\n"
-        #     )
-        # print("output:::::::::",output)
-        # return output
+        return pagination.attach_token(_format_network_analysis(results, summary), next_page_token)
 
     except Exception as e:
-        print(f"Error occurred: {str(e)}")
+        logger.exception("TV network analysis failed")
         return f"Error analyzing TV networks: {str(e)}"
     finally:
-        if connection:
+        if cursor:
             cursor.close()
+        if connection:
             return_connection(connection)
 
+
+async def linear_tv_analyze_tv_network_async(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    network: Optional[str] = None,
+    program_keyword: Optional[str] = None,
+    min_impressions: Optional[int] = None,
+    min_reach: Optional[int] = None,
+    min_conversion_rate: Optional[float] = None,
+    sort_by: Optional[str] = "date",
+    sort_order: Optional[str] = "desc",
+    limit: Optional[int] = 10,
+    include_summary: Optional[bool] = False,
+    page_token: Optional[str] = None
+) -> str:
+    """Async variant of linear_tv_analyze_tv_network; the detail and summary queries run concurrently"""
+    try:
+        page_scope = _network_analysis_scope(
+            start_date, end_date, network, program_keyword, min_impressions, min_reach, min_conversion_rate, sort_by, sort_order
+        )
+        page_key = pagination.decode_token(page_token, page_scope) if page_token else None
+        query, params, filters = _network_analysis_query(
+            start_date, end_date, network, program_keyword, min_impressions, min_reach, min_conversion_rate, sort_by, sort_order,
+            pagination.fetch_limit(limit), page_key
+        )
+        
+        if include_summary and not page_key:
+            summary_query, summary_params = _network_summary_query(filters)
+            rows, summary = await asyncio.gather(
+                async_db.fetch_all(DB_CONFIG, query, params),
+                async_db.fetch_one(DB_CONFIG, summary_query, summary_params)
+            )
+        else:
+            rows, summary = await async_db.fetch_all(DB_CONFIG, query, params), None
+        
+        results, next_page_token = pagination.next_page(rows, limit, _NETWORK_KEY_COLUMNS, page_scope)
+        results = pagination.drop_key_columns(results, _NETWORK_KEY_COLUMNS)
+        return pagination.attach_token(_format_network_analysis(results, summary), next_page_token)
+
+    except Exception as e:
+        logger.exception("TV network analysis failed")
+        return f"Error analyzing TV networks: {str(e)}"
+
+def _network_trends_query(trend_table, aggregates, network, program, source, period, date_from, date_to, days_back, sketch_table=None):
+    """
+    Build the trends query against trend_table; returns (query, params)
+
+    With a sketch_table (and no network / program filter, which the sketches are not
+    keyed by) the distinct counts come from merged daily HyperLogLog sketches.
+    """
+    # Build WHERE conditions
+    where_conditions = []
+    params = []
+
+    if network:
+        where_conditions.append("LOWER(network) LIKE LOWER(%s)")
+        params.append(f"%{network}%")
+
+    if program:
+        where_conditions.append("LOWER(program) LIKE LOWER(%s)")
+        params.append(f"%{program}%")
+
+    if source:
+        where_conditions.append("LOWER(source) LIKE LOWER(%s)")
+        params.append(f"%{source}%")
+
+    if date_from:
+        where_conditions.append("date >= %s")
+        params.append(date_from)
+    elif not date_to:  # If no date range specified, use days_back
+        where_conditions.append(f"date >= CURRENT_DATE - INTERVAL '{days_back} days'")
+
+    if date_to:
+        where_conditions.append("date <= %s")
+        params.append(date_to)
+
+    where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+
+    # Build period grouping
+    if period == 'weekly':
+        period_group = "DATE_TRUNC('week', date)"
+        period_format = "TO_CHAR(DATE_TRUNC('week', date), 'YYYY-MM-DD')"
+    elif period == 'monthly':
+        period_group = "DATE_TRUNC('month', date)"
+        period_format = "TO_CHAR(DATE_TRUNC('month', date), 'YYYY-MM')"
+    else:  # daily
+        period_group = "date"
+        period_format = "TO_CHAR(date, 'YYYY-MM-DD')"
+
+    distinct_columns = ["network", "program", "source"]
+    if sketch_table and not network and not program:
+        distinct_counts = distinct_sketches.distinct_counts_query(
+            sketch_table, distinct_columns, {"period_key": period_group}, where_clause
+        )
+        with_clause = f"WITH distinct_counts AS ({distinct_counts})"
+        from_clause = f"{trend_table} LEFT JOIN distinct_counts ON distinct_counts.period_key = {period_group}"
+        counts = [f"COALESCE(MAX(distinct_counts.{column}_count), 0) as {column}_count" for column in distinct_columns]
+        # The sketch CTE takes the same filters first
+        params = params + params
+    else:
+        with_clause = ""
+        from_clause = trend_table
+        counts = [f"COUNT(DISTINCT {column}) as {column}_count" for column in distinct_columns]
+    distinct_select = ",\n        ".join(counts)
+
+    query = f"""
+    {with_clause}
+    SELECT 
+        {period_format} as period,
+        SUM(impressions) as total_impressions,
+        SUM(reach) as total_reach,
+        ROUND({aggregates['avg_frequency']}, 3) as avg_frequency,
+        SUM(conversions) as total_conversions,
+        ROUND((SUM(conversions)::DECIMAL / NULLIF(SUM(impressions), 0)) * 100, 4) as conversion_rate,
+        ROUND((SUM(reach)::DECIMAL / NULLIF(SUM(impressions), 0)), 4) as reach_rate,
+        {distinct_select},
+        {aggregates['row_count']} as record_count
+    FROM {from_clause} 
+    {where_clause}
+    GROUP BY {period_group}
+    ORDER BY {period_group}
+    """
+
+    return query, params
+
+
+def _format_network_trends(trend_results, network, program, source, period, metric):
+    """Render the per-period network/program trend report"""
+    if not trend_results:
+        return f"No trend data found for the specified criteria."
+
+    # Build filter description
+    filter_desc = []
+    if network:
+        filter_desc.append(f"Network: {network}")
+    if program:
+        filter_desc.append(f"Program: {program}")
+    if source:
+        filter_desc.append(f"Source: {source}")
+
+    filter_text = f" (Filtered by: {', '.join(filter_desc)})" if filter_desc else ""
+
+    output = f"network_and_program Trends Analysis - {period.title()} View{filter_text}\n" + "=" * 80 + "\n\n"
+
+    # One pass over the rows feeds both the trend analytics and the summary statistics
+    metric_key = f"total_{metric}" if metric in ['impressions', 'reach', 'conversions'] else f"avg_{metric}"
+    summary_columns = ['total_impressions', 'total_reach', 'total_conversions', 'avg_frequency',
+                       'network_count', 'program_count', 'source_count']
+    stats = trend_analytics.analyze(trend_results, list(dict.fromkeys([metric_key] + summary_columns)), period)
+
+    # Calculate trend direction and percentage change
+    if len(trend_results) > 1:
+        first_value = float(trend_results[0].get(metric_key) or 0)
+        last_value = float(trend_results[-1].get(metric_key) or 0)
+
+        if first_value > 0:
+            percent_change = ((last_value - first_value) / first_value) * 100
+            trend_direction = "increasing" if last_value > first_value else "decreasing"
+            output += f" Trend Analysis for {metric.upper()}:\n"
+            output += f"   Direction: {trend_direction.title()} ({percent_change:+.1f}%)\n"
+            output += f"   First Period: {first_value:,.0f}\n"
+            output += f"   Last Period: {last_value:,.0f}\n"
+            output += f"   Periods Analyzed: {len(trend_results)}\n\n"
+
+    if stats:
+        output += trend_analytics.describe(stats[metric_key], metric.upper(), indent=" ", value_format=",.3f" if metric == 'frequency' else ",.0f")
+
+    # Summary statistics
+    if stats:
+        total_impressions = int(stats['total_impressions']['total'])
+        total_reach = int(stats['total_reach']['total'])
+        total_conversions = int(stats['total_conversions']['total'])
+        avg_frequency = stats['avg_frequency']['mean'] or 0
+        max_networks, max_programs, max_sources = (
+            int(stats[column]['max'] or 0) for column in ['network_count', 'program_count', 'source_count']
+        )
+    else:
+        total_impressions = sum(row['total_impressions'] for row in trend_results)
+        total_reach = sum(row['total_reach'] for row in trend_results)
+        total_conversions = sum(row['total_conversions'] for row in trend_results)
+        avg_frequency = sum(row['avg_frequency'] for row in trend_results) / len(trend_results)
+        max_networks = max(row['network_count'] for row in trend_results)
+        max_programs = max(row['program_count'] for row in trend_results)
+        max_sources = max(row['source_count'] for row in trend_results)
+
+    output += f"Summary Statistics:\n"
+    output += f"   Total Impressions: {total_impressions:,}\n"
+    output += f"   Total Reach: {total_reach:,}\n"
+    output += f"   Total Conversions: {total_conversions:,}\n"
+    output += f"   Average Frequency: {avg_frequency:.3f}\n"
+    if total_impressions > 0:
+        output += f"   Overall Conversion Rate: {(total_conversions / total_impressions * 100):.4f}%\n"
+    output += f"   Unique Networks: {max_networks}\n"
+    output += f"   Unique Programs: {max_programs}\n"
+    output += f"   Unique Sources: {max_sources}\n\n"
+
+    # Detailed period breakdown
+    output += f"Detailed {period.title()} Breakdown:\n"
+    output += "-" * 120 + "\n"
+    output += f"{'Period':<12} {'Impressions':<12} {'Reach':<10} {'Frequency':<10} {'Conversions':<12} {'Conv.Rate':<10} {'Reach Rate':<11} {'Networks':<9} {'Programs':<9}\n"
+    output += "-" * 120 + "\n"
+
+    for row in trend_results:
+        conv_rate = (row['total_conversions'] / row['total_impressions'] * 100) if row['total_impressions'] > 0 else 0
+        reach_rate = (row['total_reach'] / row['total_impressions']) if row['total_impressions'] > 0 else 0
+
+        output += (
+            f"{row['period']:<12} "
+            f"{row['total_impressions']:>11,} "
+            f"{row['total_reach']:>9,} "
+            f"{row['avg_frequency']:>9.3f} "
+            f"{row['total_conversions']:>11,} "
+            f"{conv_rate:>9.2f}% "
+            f"{reach_rate:>10.4f} "
+            f"{row['network_count']:>8} "
+            f"{row['program_count']:>8}\n"
+        )
+
+    return output
+
+
 @tool(
     name="linear_tv_get_network_trends", 
     description="""
@@ -257,6 +512,7 @@ def linear_tv_analyze_tv_network(
     Use this when users ask about performance trends, network comparisons, seasonal patterns, or time-based analysis.
     """
 )
+@cached_tool(TABLE_NAME, DB_CONFIG)
 def linear_tv_get_network_and_program_trends(
     network: Optional[str] = None,
     program: Optional[str] = None,
@@ -284,148 +540,19 @@ def linear_tv_get_network_and_program_trends(
     cursor = None
     
     try:
-        # Build WHERE conditions
-        where_conditions = []
-        params = []
-        
-        if network:
-            where_conditions.append("LOWER(network) LIKE LOWER(%s)")
-            params.append(f"%{network}%")
-        
-        if program:
-            where_conditions.append("LOWER(program) LIKE LOWER(%s)")
-            params.append(f"%{program}%")
-        
-        if source:
-            where_conditions.append("LOWER(source) LIKE LOWER(%s)")
-            params.append(f"%{source}%")
-        
-        if date_from:
-            where_conditions.append("date >= %s")
-            params.append(date_from)
-        elif not date_to:  # If no date range specified, use days_back
-            where_conditions.append(f"date >= CURRENT_DATE - INTERVAL '{days_back} days'")
-        
-        if date_to:
-            where_conditions.append("date <= %s")
-            params.append(date_to)
-        
-        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-        
-        # Build period grouping
-        if period == 'weekly':
-            period_group = "DATE_TRUNC('week', date)"
-            period_format = "TO_CHAR(DATE_TRUNC('week', date), 'YYYY-MM-DD')"
-        elif period == 'monthly':
-            period_group = "DATE_TRUNC('month', date)"
-            period_format = "TO_CHAR(DATE_TRUNC('month', date), 'YYYY-MM')"
-        else:  # daily
-            period_group = "date"
-            period_format = "TO_CHAR(date, 'YYYY-MM-DD')"
-        
-        query = f"""
-        SELECT 
-            {period_format} as period,
-            SUM(impressions) as total_impressions,
-            SUM(reach) as total_reach,
-            ROUND(AVG(frequency), 3) as avg_frequency,
-            SUM(conversions) as total_conversions,
-            ROUND((SUM(conversions)::DECIMAL / NULLIF(SUM(impressions), 0)) * 100, 4) as conversion_rate,
-            ROUND((SUM(reach)::DECIMAL / NULLIF(SUM(impressions), 0)), 4) as reach_rate,
-            COUNT(DISTINCT network) as network_count,
-            COUNT(DISTINCT program) as program_count,
-            COUNT(DISTINCT source) as source_count,
-            COUNT(*) as record_count
-        FROM {TABLE_NAME} 
-        {where_clause}
-        GROUP BY {period_group}
-        ORDER BY {period_group}
-        """
-        
-        print(f"Executing trends query: {query}")
-        print(f"Parameters: {params}")
-        
         connection = get_db_connection()
         cursor = connection.cursor(cursor_factory=RealDictCursor)
-        cursor.execute(query, params)
-        trend_results = cursor.fetchall()
-        
-        if not trend_results:
-            return f"No trend data found for the specified criteria."
-        
-        # Build filter description
-        filter_desc = []
-        if network:
-            filter_desc.append(f"Network: {network}")
-        if program:
-            filter_desc.append(f"Program: {program}")
-        if source:
-            filter_desc.append(f"Source: {source}")
-        
-        filter_text = f" (Filtered by: {', '.join(filter_desc)})" if filter_desc else ""
-        
-        output = f"network_and_program Trends Analysis - {period.title()} View{filter_text}\n" + "=" * 80 + "\n\n"
-        
-        # Calculate trend direction and percentage change
-        if len(trend_results) > 1:
-            metric_key = f"total_{metric}" if metric in ['impressions', 'reach', 'conversions'] else f"avg_{metric}"
-            
-            first_value = float(trend_results[0].get(metric_key, 0))
-            last_value = float(trend_results[-1].get(metric_key, 0))
-            
-            if first_value > 0:
-                percent_change = ((last_value - first_value) / first_value) * 100
-                trend_direction = "increasing" if last_value > first_value else "decreasing"
-                output += f" Trend Analysis for {metric.upper()}:\n"
-                output += f"   Direction: {trend_direction.title()} ({percent_change:+.1f}%)\n"
-                output += f"   First Period: {first_value:,.0f}\n"
-                output += f"   Last Period: {last_value:,.0f}\n"
-                output += f"   Periods Analyzed: {len(trend_results)}\n\n"
-        
-        # Summary statistics
-        total_impressions = sum(row['total_impressions'] for row in trend_results)
-        total_reach = sum(row['total_reach'] for row in trend_results)
-        total_conversions = sum(row['total_conversions'] for row in trend_results)
-        avg_frequency = sum(row['avg_frequency'] for row in trend_results) / len(trend_results)
-        
-        output += f"Summary Statistics:\n"
-        output += f"   Total Impressions: {total_impressions:,}\n"
-        output += f"   Total Reach: {total_reach:,}\n"
-        output += f"   Total Conversions: {total_conversions:,}\n"
-        output += f"   Average Frequency: {avg_frequency:.3f}\n"
-        if total_impressions > 0:
-            output += f"   Overall Conversion Rate: {(total_conversions / total_impressions * 100):.4f}%\n"
-        output += f"   Unique Networks: {max(row['network_count'] for row in trend_results)}\n"
-        output += f"   Unique Programs: {max(row['program_count'] for row in trend_results)}\n"
-        output += f"   Unique Sources: {max(row['source_count'] for row in trend_results)}\n\n"
         
-        # Detailed period breakdown
-        output += f"Detailed {period.title()} Breakdown:\n"
-        output += "-" * 120 + "\n"
-        output += f"{'Period':<12} {'Impressions':<12} {'Reach':<10} {'Frequency':<10} {'Conversions':<12} {'Conv.Rate':<10} {'Reach Rate':<11} {'Networks':<9} {'Programs':<9}\n"
-        output += "-" * 120 + "\n"
-        
-        for row in trend_results:
-            conv_rate = (row['total_conversions'] / row['total_impressions'] * 100) if row['total_impressions'] > 0 else 0
-            reach_rate = (row['total_reach'] / row['total_impressions']) if row['total_impressions'] > 0 else 0
-            
-            output += (
-                f"{row['period']:<12} "
-                f"{row['total_impressions']:>11,} "
-                f"{row['total_reach']:>9,} "
-                f"{row['avg_frequency']:>9.3f} "
-                f"{row['total_conversions']:>11,} "
-                f"{conv_rate:>9.2f}% "
-                f"{reach_rate:>10.4f} "
-                f"{row['network_count']:>8} "
-                f"{row['program_count']:>8}\n"
-            )
-        
-        return output
+        # Read the per-day network/program rollup when it is available, raw rows otherwise.
+        # network, program and source are rollup dimensions, so the distinct counts stay exact.
+        trend_table, aggregates = rollups.trend_source(cursor, TABLE_NAME)
+        sketch_table = distinct_sketches.sketch_source(cursor, TABLE_NAME)
+        query, params = _network_trends_query(trend_table, aggregates, network, program, source, period, date_from, date_to, days_back, sketch_table)
         
+        cursor.execute(query, params)
+        return _format_network_trends(cursor.fetchall(), network, program, source, period, metric)
     except Exception as e:
         return f" Error processing trends: {str(e)}"
-    
     finally:
         if cursor:
             cursor.close()
@@ -433,7 +560,110 @@ def linear_tv_get_network_and_program_trends(
             return_connection(connection)
 
 
+async def linear_tv_get_network_and_program_trends_async(
+    network: Optional[str] = None,
+    program: Optional[str] = None,
+    source: Optional[str] = None,
+    period: Literal['daily', 'weekly', 'monthly'] = 'daily',
+    metric: Literal['impressions', 'reach', 'frequency', 'conversions'] = 'impressions',
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    days_back: Optional[int] = 30
+) -> str:
+    """Async variant of linear_tv_get_network_and_program_trends on the psycopg 3 pool"""
+    try:
+        async with async_db.connection(DB_CONFIG) as connection:
+            async with connection.cursor() as cursor:
+                trend_table, aggregates = await rollups.trend_source_async(cursor, TABLE_NAME)
+                sketch_table = await distinct_sketches.sketch_source_async(cursor, TABLE_NAME)
+                query, params = _network_trends_query(trend_table, aggregates, network, program, source, period, date_from, date_to, days_back, sketch_table)
+                await async_db.execute(cursor, query, params)
+                trend_results = await cursor.fetchall()
+        return _format_network_trends(trend_results, network, program, source, period, metric)
+    except Exception as e:
+        return f" Error processing trends: {str(e)}"
+
+
 # Additional helper function for network-specific analysis
+def _network_comparison_query(date_from, date_to, compare_network_1, compare_network_2, days_back, metric, top_n):
+    """Build the per-network comparison query; returns (query, params)"""
+    # Build WHERE conditions for date filtering
+    where_conditions = ["impressions > 0 AND reach > 0"]
+    params = []
+
+    if compare_network_1 and compare_network_2: 
+        where_conditions.append("network ILIKE LOWER(%s) OR network ILIKE LOWER(%s)")
+        params.append(f"%{compare_network_1}%")
+        params.append(f"%{compare_network_2}%")
+
+    if date_from:
+        where_conditions.append("date >= %s")
+        params.append(date_from)
+    elif not date_to:
+        where_conditions.append(f"date >= CURRENT_DATE - INTERVAL '{days_back} days'")
+
+    if date_to:
+        where_conditions.append("date <= %s")
+        params.append(date_to)
+
+    where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+
+    # Determine ORDER BY clause based on metric
+    order_metric = f"total_{metric}" if metric in ['impressions', 'reach', 'conversions'] else f"avg_{metric}"
+
+    query = f"""
+    SELECT 
+        network,
+        SUM(impressions) AS total_impressions,
+        SUM(reach) AS total_reach,
+        ROUND(AVG(frequency), 2) AS avg_frequency,
+        SUM(conversions) AS total_conversions,
+        ROUND(SUM(conversions) * 100.0 / NULLIF(SUM(impressions), 0), 4) AS conversion_rate_pct
+    FROM {TABLE_NAME} 
+    {where_clause}
+    GROUP BY network
+    ORDER BY {order_metric} DESC
+    {f'LIMIT {top_n}' if top_n else ''}
+    """
+
+    return query, params
+
+
+def _format_network_comparison(network_results):
+    """Shape the network comparison rows for the agent"""
+    if not network_results:
+        return "No network data found for the specified criteria."
+    else:
+        return network_results
+
+    # output = f"Network Performance Comparison (Ranked by {metric.title()})\n" + "=" * 90 + "\n\n"
+
+    # # Summary totals
+    # total_impressions = sum(row['total_impressions'] for row in network_results)
+    # total_reach = sum(row['total_reach'] for row in network_results)
+    # total_conversions = sum(row['total_conversions'] for row in network_results)
+
+    # output += f"Overall Totals: {total_impressions:,} impressions, {total_reach:,} reach, {total_conversions:,} conversions\n\n"
+
+    # # Network breakdown
+    # output += f"{'Network':<15} {'Impressions':<12} {'Reach':<10} {'Frequency':<10} {'Conversions':<12} {'Conv.Rate':<10} {'Programs':<9} {'Sources':<8}\n"
+    # output += "-" * 90 + "\n"
+
+    # for i, row in enumerate(network_results, 1):
+    #     output += (
+    #         f"{row['network']:<15} "
+    #         f"{row['total_impressions']:>11,} "
+    #         f"{row['total_reach']:>9,} "
+    #         f"{row['avg_frequency']:>9.3f} "
+    #         f"{row['total_conversions']:>11,} "
+    #         f"{row['conversion_rate']:>9.2f}% "
+    #         f"{row['program_count']:>8} "
+    #         f"{row['source_count']:>7}\n"
+    #     )
+
+    # return output
+
+
 @tool(
     name="linear_tv_get_network_comparison",
     description="""
@@ -442,6 +672,7 @@ def linear_tv_get_network_and_program_trends(
     Use when users want to compare network performance or identify top-performing networks.
     """
 )
+@cached_tool(TABLE_NAME, DB_CONFIG)
 def linear_tv_get_network_comparison(
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
@@ -467,95 +698,39 @@ def linear_tv_get_network_comparison(
     cursor = None
     
     try:
-        # Build WHERE conditions for date filtering
-        where_conditions = ["impressions > 0 AND reach > 0"]
-        params = []
-        
-        if compare_network_1 and compare_network_2: 
-            where_conditions.append("network ILIKE LOWER(%s) OR network ILIKE LOWER(%s)")
-            params.append(f"%{compare_network_1}%")
-            params.append(f"%{compare_network_2}%")
-
-
-        if date_from:
-            where_conditions.append("date >= %s")
-            params.append(date_from)
-        elif not date_to:
-            where_conditions.append(f"date >= CURRENT_DATE - INTERVAL '{days_back} days'")
-        
-        if date_to:
-            where_conditions.append("date <= %s")
-            params.append(date_to)
-        
-        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-        
-        # Determine ORDER BY clause based on metric
-        order_metric = f"total_{metric}" if metric in ['impressions', 'reach', 'conversions'] else f"avg_{metric}"
-
-        query = f"""
-        SELECT 
-            network,
-            SUM(impressions) AS total_impressions,
-            SUM(reach) AS total_reach,
-            ROUND(AVG(frequency), 2) AS avg_frequency,
-            SUM(conversions) AS total_conversions,
-            ROUND(SUM(conversions) * 100.0 / NULLIF(SUM(impressions), 0), 4) AS conversion_rate_pct
-        FROM {TABLE_NAME} 
-        {where_clause}
-        GROUP BY network
-        ORDER BY {order_metric} DESC
-        {f'LIMIT {top_n}' if top_n else ''}
-        """
-        
-        print(f"Executing network comparison query: {query}")
-        print(f"Parameters: {params}")
+        query, params = _network_comparison_query(date_from, date_to, compare_network_1, compare_network_2, days_back, metric, top_n)
         
         connection = get_db_connection()
         cursor = connection.cursor(cursor_factory=RealDictCursor)
         cursor.execute(query, params)
-        network_results = cursor.fetchall()
-        
-        if not network_results:
-            return "No network data found for the specified criteria."
-        else:
-            return network_results
-        
-        # output = f"Network Performance Comparison (Ranked by {metric.title()})\n" + "=" * 90 + "\n\n"
-        
-        # # Summary totals
-        # total_impressions = sum(row['total_impressions'] for row in network_results)
-        # total_reach = sum(row['total_reach'] for row in network_results)
-        # total_conversions = sum(row['total_conversions'] for row in network_results)
-        
-        # output += f"Overall Totals: {total_impressions:,} impressions, {total_reach:,} reach, {total_conversions:,} conversions\n\n"
-        
-        # # Network breakdown
-        # output += f"{'Network':<15} {'Impressions':<12} {'Reach':<10} {'Frequency':<10} {'Conversions':<12} {'Conv.Rate':<10} {'Programs':<9} {'Sources':<8}\n"
-        # output += "-" * 90 + "\n"
-        
-        # for i, row in enumerate(network_results, 1):
-        #     output += (
-        #         f"{row['network']:<15} "
-        #         f"{row['total_impressions']:>11,} "
-        #         f"{row['total_reach']:>9,} "
-        #         f"{row['avg_frequency']:>9.3f} "
-        #         f"{row['total_conversions']:>11,} "
-        #         f"{row['conversion_rate']:>9.2f}% "
-        #         f"{row['program_count']:>8} "
-        #         f"{row['source_count']:>7}\n"
-        #     )
-        
-        # return output
-        
+        return _format_network_comparison(cursor.fetchall())
     except Exception as e:
         return f"Error processing network comparison: {str(e)}"
-    
     finally:
         if cursor:
             cursor.close()
         if connection:
             return_connection(connection)
 
+
+async def linear_tv_get_network_comparison_async(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    compare_network_1:Optional[str] = None,
+    compare_network_2:Optional[str] = None,
+    days_back: Optional[int] = 30,
+    metric: Literal['impressions', 'reach', 'frequency', 'conversions'] = 'impressions',
+    top_n: Optional[int] = 10
+) -> str:
+    """Async variant of linear_tv_get_network_comparison on the psycopg 3 pool"""
+    try:
+        query, params = _network_comparison_query(date_from, date_to, compare_network_1, compare_network_2, days_back, metric, top_n)
+        network_results = await async_db.fetch_all(DB_CONFIG, query, params)
+        return _format_network_comparison(network_results)
+    except Exception as e:
+        return f"Error processing network comparison: {str(e)}"
+
+
 @tool(name="Linear_TV_advertising_agent", 
      description=(
         "An intelligent Linear TV advertising analytics agent that interprets natural language queries "
@@ -575,20 +750,22 @@ def Linear_TV_advertising_agent(prompt: str) -> str:
     """
     Intelligent TV advertising analysis agent that orchestrates the merged analysis tools.
     """
-    agent = Agent(system_prompt="You are a helpful tv advertising agent who always return the the response in detailed manner with the mandatory key insights from the retrieved data",tools=[
+    response = agent_factory.run_agent(__name__, _build_supervisor_agent, prompt)
+    return str(response)
+
+
+def _build_supervisor_agent():
+    """Build the supervisor once; agent_factory reuses it with a fresh conversation per prompt"""
+    return Agent(system_prompt="You are a helpful tv advertising agent who always return the the response in detailed manner with the mandatory key insights from the retrieved data",tools=[
         linear_tv_analyze_tv_network,
         linear_tv_get_network_comparison,
         linear_tv_get_network_and_program_trends
     ])
-    response = agent(prompt)
-    return response
 
 
 def cleanup_connections():
     """Clean up connection pool"""
-    global connection_pool
-    if connection_pool:
-        connection_pool.closeall()
+    db_pool.close_all()
 
 
 # TV_advertising_agent("Give me weekly trends for the CBS network in the first quarter in 2023 also include the per month details")
\ No newline at end of file
@@ -0,0 +1,142 @@
+import copy
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+
+logger = logging.getLogger("tools.agent_factory")
+
+
+# -------------------------------------------------------------------
+# Factory Settings
+# -------------------------------------------------------------------
+
+# Idle supervisor agents kept per module; extra agents built under load are dropped on return
+AGENT_POOL_MAX_IDLE = int(os.environ.get("TOOLS_AGENT_POOL_MAX_IDLE", 4))
+
+# agent key -> list of idle agents ready for a new prompt
+_idle_agents = {}
+# id(agent) -> conversation state captured right after construction
+_initial_state = {}
+_lock = threading.Lock()
+
+_stats = {
+    "builds": 0,
+    "reuses": 0,
+    "discarded": 0,
+}
+
+
+# -------------------------------------------------------------------
+# Conversation Isolation
+# -------------------------------------------------------------------
+
+def _snapshot(agent):
+    """Copy of the agent's conversation state as it was built"""
+    state = getattr(agent, "state", None)
+    return {
+        "messages": copy.deepcopy(list(agent.messages)),
+        "state": copy.deepcopy(state.get()) if state is not None else None,
+    }
+
+
+def _restore(agent, snapshot):
+    """Put the agent back into its freshly built state so no prompt sees another's history"""
+    agent.messages = copy.deepcopy(snapshot["messages"])
+    state = getattr(agent, "state", None)
+    if state is not None and snapshot["state"] is not None:
+        for key in list(state.get()):
+            state.delete(key)
+        for key, value in copy.deepcopy(snapshot["state"]).items():
+            state.set(key, value)
+
+
+# -------------------------------------------------------------------
+# Checkout / Return
+# -------------------------------------------------------------------
+
+def checkout_agent(key, build):
+    """
+    Take an idle agent for key, building one with build() when none is free.
+
+    Each checked-out agent is used by exactly one caller at a time; concurrent
+    prompts get separate agents instead of sharing one conversation.
+    """
+    with _lock:
+        idle = _idle_agents.get(key)
+        if idle:
+            _stats["reuses"] += 1
+            return idle.pop()
+
+    agent = build()
+    with _lock:
+        _initial_state[id(agent)] = _snapshot(agent)
+        _stats["builds"] += 1
+    return agent
+
+
+def checkin_agent(key, agent, discard=False):
+    """Reset the agent's conversation and make it available for the next prompt"""
+    with _lock:
+        snapshot = _initial_state.get(id(agent))
+        idle = _idle_agents.setdefault(key, [])
+        keep = not discard and snapshot is not None and len(idle) < AGENT_POOL_MAX_IDLE
+        if not keep:
+            _initial_state.pop(id(agent), None)
+            _stats["discarded"] += 1
+            return
+
+    try:
+        _restore(agent, snapshot)
+    except Exception as e:
+        logger.warning("Discarding agent %s after failed reset: %s", key, e)
+        with _lock:
+            _initial_state.pop(id(agent), None)
+            _stats["discarded"] += 1
+        return
+
+    with _lock:
+        _idle_agents.setdefault(key, []).append(agent)
+
+
+@contextmanager
+def pooled_agent(key, build):
+    """Context manager around checkout_agent / checkin_agent"""
+    agent = checkout_agent(key, build)
+    failed = False
+    try:
+        yield agent
+    except BaseException:
+        # An interrupted invocation can leave the agent mid-turn; never hand it out again
+        failed = True
+        raise
+    finally:
+        checkin_agent(key, agent, discard=failed)
+
+
+def run_agent(key, build, prompt):
+    """Answer one prompt on a pooled agent with a fresh conversation"""
+    with pooled_agent(key, build) as agent:
+        return agent(prompt)
+
+
+# -------------------------------------------------------------------
+# Metrics
+# -------------------------------------------------------------------
+
+def agent_stats():
+    """Build/reuse counters plus idle agents per key"""
+    with _lock:
+        stats = dict(_stats)
+        stats["idle"] = {key: len(agents) for key, agents in _idle_agents.items()}
+    return stats
+
+
+def clear_agents(key=None):
+    """Drop idle agents, e.g. after changing a module's tool list"""
+    with _lock:
+        keys = [key] if key is not None else list(_idle_agents)
+        for agent_key in keys:
+            for agent in _idle_agents.pop(agent_key, []):
+                _initial_state.pop(id(agent), None)
@@ -0,0 +1,289 @@
+import math
+import os
+import sys
+from datetime import date, timedelta
+
+import psycopg2
+from psycopg2 import Error
+from psycopg2.extras import execute_values
+
+from tools import rollups
+from tools.query_utils import stream_rows
+
+
+# -------------------------------------------------------------------
+# Detector Settings
+# -------------------------------------------------------------------
+
+# Weight of the newest day in each series' exponentially weighted mean / variance
+EWMA_ALPHA = float(os.environ.get("TOOLS_ANOMALY_ALPHA", 0.1))
+# Flag a day whose value is this many EW standard deviations from the EW mean
+ANOMALY_THRESHOLD = float(os.environ.get("TOOLS_ANOMALY_THRESHOLD", 3.0))
+# Days a series must have been observed before its days are scored
+WARMUP_DAYS = int(os.environ.get("TOOLS_ANOMALY_WARMUP_DAYS", 7))
+# Days of history the first run learns from
+INITIAL_LOOKBACK_DAYS = int(os.environ.get("TOOLS_ANOMALY_LOOKBACK_DAYS", 90))
+# Floor on the standard deviation, as a share of the mean, so a perfectly flat series
+# (a fixed daily budget) still flags a jump instead of having no spread to score against
+MIN_RELATIVE_STD = float(os.environ.get("TOOLS_ANOMALY_MIN_RELATIVE_STD", 0.05))
+
+STATE_TABLE = "channel_metric_anomaly_state"
+ANOMALY_TABLE = "channel_metric_anomalies"
+
+# Per source table: the entity each series belongs to, a display label for it, and
+# the daily metrics to watch. Metrics are computed from the day's sums, so they read
+# the same from the source table and its daily rollup; {avg_<name>} placeholders take
+# rollups.trend_source's average expressions. filter is an optional condition on
+# columns the rollup keeps as dimensions, ANDed into the daily read.
+DETECTOR_SPECS = {
+    "facebook_campaigns_ads": {
+        "entity": "campaign_id",
+        "label": "MAX(campaign_name)",
+        "filter": None,
+        "metrics": {
+            "spend": "SUM(spend)",
+            "ctr": "SUM(clicks)::DECIMAL / NULLIF(SUM(impressions), 0)",
+            "cpc": "SUM(spend) / NULLIF(SUM(clicks), 0)",
+        },
+    },
+    "tiktok_campaign_ad_details": {
+        "entity": "campaign_id",
+        "label": "MAX(campaign_name)",
+        "filter": None,
+        "metrics": {
+            "spend": "SUM(spend)",
+            "ctr": "SUM(clicks)::DECIMAL / NULLIF(SUM(impressions), 0)",
+            "cpc": "SUM(spend) / NULLIF(SUM(clicks), 0)",
+        },
+    },
+    "linkedin_ads": {
+        "entity": "campaign_id",
+        "label": "MAX(campaign_name)",
+        "filter": None,
+        "metrics": {
+            "spend": "SUM(spend)",
+            "ctr": "SUM(clicks)::DECIMAL / NULLIF(SUM(impressions), 0)",
+            "cpc": "SUM(spend) / NULLIF(SUM(clicks), 0)",
+        },
+    },
+    "bing_advertising_data": {
+        "entity": "campaign_id",
+        "label": "MAX(campaign_name)",
+        "filter": "source = 'Bing Ads'",
+        "metrics": {
+            "spend": "SUM(spend)",
+            "ctr": "SUM(clicks)::DECIMAL / NULLIF(SUM(impressions), 0)",
+            "cpc": "SUM(spend) / NULLIF(SUM(clicks), 0)",
+        },
+    },
+    "linear_tv_ads": {
+        "entity": "network",
+        "label": "network",
+        "filter": None,
+        "metrics": {
+            "impressions": "SUM(impressions)",
+            "reach": "SUM(reach)",
+            "conversions": "SUM(conversions)",
+            "frequency": "{avg_frequency}",
+        },
+    },
+}
+
+
+# -------------------------------------------------------------------
+# Streaming Statistics
+# -------------------------------------------------------------------
+
+def score(state, value):
+    """
+    Z-score of value against a series' state, or None while the series is warming up.
+
+    state is [mean, variance, observations, last_date]; it is not modified.
+    """
+    mean, variance, observations, _ = state
+    std = max(math.sqrt(max(variance, 0.0)), MIN_RELATIVE_STD * abs(mean))
+    if observations < WARMUP_DAYS or std == 0:
+        return None
+    return (value - mean) / std
+
+
+def update(state, value, day):
+    """Fold one day into the series' exponentially weighted mean and variance (O(1) per series)"""
+    mean, variance, observations, _ = state
+    if observations == 0:
+        state[:] = [value, 0.0, 1, day]
+        return state
+    diff = value - mean
+    increment = EWMA_ALPHA * diff
+    state[:] = [mean + increment, (1 - EWMA_ALPHA) * (variance + diff * increment), observations + 1, day]
+    return state
+
+
+# -------------------------------------------------------------------
+# Maintenance
+# -------------------------------------------------------------------
+
+def ensure_anomaly_tables(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            source_table TEXT NOT NULL,
+            entity TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            ewma_mean DOUBLE PRECISION NOT NULL,
+            ewma_variance DOUBLE PRECISION NOT NULL,
+            observations BIGINT NOT NULL,
+            last_date DATE NOT NULL,
+            PRIMARY KEY (source_table, entity, metric)
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ANOMALY_TABLE} (
+            source_table TEXT NOT NULL,
+            entity TEXT NOT NULL,
+            entity_label TEXT,
+            metric TEXT NOT NULL,
+            metric_date DATE NOT NULL,
+            value DOUBLE PRECISION NOT NULL,
+            expected DOUBLE PRECISION NOT NULL,
+            z_score DOUBLE PRECISION NOT NULL,
+            detected_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (source_table, entity, metric, metric_date)
+        )
+    """)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {ANOMALY_TABLE}_date_idx ON {ANOMALY_TABLE} (metric_date DESC)")
+
+
+def _daily_query(cursor, source_table, since):
+    """One row per entity and completed day after `since`, read from the rollup when it is ready"""
+    spec = DETECTOR_SPECS[source_table]
+    date_column = rollups.ROLLUP_SPECS[source_table]["date_column"]
+    table, aggregates = rollups.trend_source(cursor, source_table)
+    metrics = [f"{expression.format(**aggregates)} AS {name}" for name, expression in spec["metrics"].items()]
+    conditions = [f"{date_column} > %s", f"{date_column} < CURRENT_DATE", f"{spec['entity']} IS NOT NULL"]
+    if spec["filter"]:
+        conditions.append(spec["filter"])
+
+    query = f"""
+        SELECT
+            {date_column}::date AS metric_date,
+            {spec['entity']}::text AS entity,
+            {spec['label']}::text AS entity_label,
+            {', '.join(metrics)}
+        FROM {table}
+        WHERE {' AND '.join(conditions)}
+        GROUP BY {date_column}::date, {spec['entity']}
+        ORDER BY {date_column}::date
+    """
+    return query, [since]
+
+
+def detect_anomalies(connection, source_table):
+    """
+    Score every completed day since the last run for each entity and metric of source_table.
+
+    Each series keeps only its EW mean, variance, observation count and last scored
+    day, so a run reads just the new days and touches each series once per day.
+    Flagged days are written to ANOMALY_TABLE; returns them as dicts.
+    """
+    spec = DETECTOR_SPECS[source_table]
+    cursor = connection.cursor()
+    try:
+        ensure_anomaly_tables(cursor)
+        cursor.execute(f"""
+            SELECT entity, metric, ewma_mean, ewma_variance, observations, last_date
+            FROM {STATE_TABLE}
+            WHERE source_table = %s
+        """, (source_table,))
+        states = {(entity, metric): [mean, variance, observations, last_date]
+                  for entity, metric, mean, variance, observations, last_date in cursor.fetchall()}
+        since = max((state[3] for state in states.values()), default=None)
+        if since is None:
+            since = date.today() - timedelta(days=INITIAL_LOOKBACK_DAYS + 1)
+
+        query, params = _daily_query(cursor, source_table, since)
+        changed = set()
+        anomalies = []
+        for row in stream_rows(connection, query, params):
+            for metric in spec["metrics"]:
+                if row[metric] is None:
+                    continue
+                key = (row["entity"], metric)
+                state = states.setdefault(key, [0.0, 0.0, 0, None])
+                if state[3] is not None and row["metric_date"] <= state[3]:
+                    continue
+                value = float(row[metric])
+                z_score = score(state, value)
+                if z_score is not None and abs(z_score) >= ANOMALY_THRESHOLD:
+                    anomalies.append({
+                        "source_table": source_table,
+                        "entity": row["entity"],
+                        "entity_label": row["entity_label"],
+                        "metric": metric,
+                        "metric_date": row["metric_date"],
+                        "value": value,
+                        "expected": state[0],
+                        "z_score": z_score,
+                    })
+                update(state, value, row["metric_date"])
+                changed.add(key)
+
+        if changed:
+            execute_values(
+                cursor,
+                f"""
+                INSERT INTO {STATE_TABLE} (source_table, entity, metric, ewma_mean, ewma_variance, observations, last_date)
+                VALUES %s
+                ON CONFLICT (source_table, entity, metric) DO UPDATE SET
+                    ewma_mean = EXCLUDED.ewma_mean,
+                    ewma_variance = EXCLUDED.ewma_variance,
+                    observations = EXCLUDED.observations,
+                    last_date = EXCLUDED.last_date
+                """,
+                [(source_table, entity, metric, *states[(entity, metric)]) for entity, metric in changed],
+                page_size=1000,
+            )
+        if anomalies:
+            columns = ["source_table", "entity", "entity_label", "metric", "metric_date", "value", "expected", "z_score"]
+            execute_values(
+                cursor,
+                f"INSERT INTO {ANOMALY_TABLE} ({', '.join(columns)}) VALUES %s ON CONFLICT DO NOTHING",
+                [tuple(anomaly[column] for column in columns) for anomaly in anomalies],
+            )
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        raise Exception(f"Anomaly detection failed for {source_table}: {e}")
+    finally:
+        cursor.close()
+    return anomalies
+
+
+def detect_all_anomalies(connection):
+    """Run detection for every source table; returns {source_table: anomalies}"""
+    return {
+        source_table: detect_anomalies(connection, source_table)
+        for source_table in DETECTOR_SPECS
+    }
+
+
+def format_anomaly(anomaly):
+    """One-line description of a flagged day"""
+    direction = "above" if anomaly["z_score"] > 0 else "below"
+    return (
+        f"{anomaly['metric_date']} {anomaly['source_table']} {anomaly['entity_label'] or anomaly['entity']}: "
+        f"{anomaly['metric']} {anomaly['value']:,.4g} is {abs(anomaly['z_score']):.1f} std {direction} "
+        f"expected {anomaly['expected']:,.4g}"
+    )
+
+
+if __name__ == "__main__":
+    # Usage: TOOLS_DB_DSN="host=... dbname=..." python -m tools.anomaly_detection
+    # Run after each ingest (after python -m tools.rollups, so the rollups are current)
+    detect_connection = psycopg2.connect(os.environ["TOOLS_DB_DSN"])
+    try:
+        for table, found in detect_all_anomalies(detect_connection).items():
+            print(f"{table}: {len(found)} anomalies")
+            for anomaly in found:
+                print(f"   {format_anomaly(anomaly)}")
+    finally:
+        detect_connection.close()
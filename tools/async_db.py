@@ -0,0 +1,127 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from tools import db_pool, instrumentation, query_advisor
+
+
+# -------------------------------------------------------------------
+# Async Pool Setup
+# -------------------------------------------------------------------
+
+# Async pools are bound to the event loop that opened them: loop -> {database config: pool}.
+# Pools of loops that have since closed (e.g. asyncio.run() per request) are dropped on
+# the next lookup; run on one long-lived loop to actually reuse connections.
+# Sizing follows the sync pool settings in db_pool.
+_pools = {}
+_pool_locks = {}
+
+
+def _psycopg():
+    """psycopg 3 and psycopg_pool, imported on first async use so the sync tools only need psycopg2"""
+    try:
+        import psycopg.conninfo
+        import psycopg.rows
+        import psycopg_pool
+    except ImportError:
+        raise Exception("The async tools need psycopg 3: pip install 'psycopg[pool]'")
+    return psycopg, psycopg_pool
+
+
+def _conninfo(db_config):
+    """psycopg2-style DB_CONFIG -> libpq connection string"""
+    psycopg, _ = _psycopg()
+    config = dict(db_config)
+    if "database" in config:
+        config["dbname"] = config.pop("database")
+    config.setdefault("connect_timeout", db_pool.CONNECT_TIMEOUT)
+    return psycopg.conninfo.make_conninfo(**{key: str(value) for key, value in config.items()})
+
+
+def _drop_closed_loops():
+    """Forget pools whose loop is closed; their connections are released when the pools are collected"""
+    for loop in [loop for loop in _pools if loop.is_closed()]:
+        _pools.pop(loop, None)
+        _pool_locks.pop(loop, None)
+
+
+async def get_async_pool(db_config):
+    """Return the async pool for db_config on the running loop, opening it on first use"""
+    loop = asyncio.get_running_loop()
+    key = tuple(sorted(db_config.items()))
+    pool = _pools.get(loop, {}).get(key)
+    if pool is not None:
+        return pool
+
+    _drop_closed_loops()
+    lock = _pool_locks.setdefault(loop, {}).setdefault(key, asyncio.Lock())
+    async with lock:
+        pool = _pools.get(loop, {}).get(key)
+        if pool is None:
+            psycopg, psycopg_pool = _psycopg()
+            pool = psycopg_pool.AsyncConnectionPool(
+                _conninfo(db_config),
+                min_size=min(db_pool.POOL_MIN_CONNECTIONS, db_pool.POOL_MAX_CONNECTIONS),
+                max_size=db_pool.POOL_MAX_CONNECTIONS,
+                timeout=db_pool.POOL_WAIT_TIMEOUT,
+                kwargs={"row_factory": psycopg.rows.dict_row},
+                open=False,
+            )
+            try:
+                await pool.open(wait=False)
+            except Exception as e:
+                raise Exception(f"Async connection pool initialization failed: {e}")
+            _pools.setdefault(loop, {})[key] = pool
+    return pool
+
+
+async def close_all():
+    """Close the async pools opened on the running loop"""
+    loop = asyncio.get_running_loop()
+    _pool_locks.pop(loop, None)
+    for pool in _pools.pop(loop, {}).values():
+        await pool.close()
+
+
+# -------------------------------------------------------------------
+# Query Helpers
+# -------------------------------------------------------------------
+
+@asynccontextmanager
+async def connection(db_config):
+    """Check a connection out of the async pool; rows come back as dicts like RealDictCursor"""
+    pool = await get_async_pool(db_config)
+    _, psycopg_pool = _psycopg()
+    wait_started = time.perf_counter()
+    try:
+        async with pool.connection() as conn:
+            instrumentation.record_pool_wait(time.perf_counter() - wait_started)
+            yield conn
+    except psycopg_pool.PoolTimeout as e:
+        raise Exception(f"Database connection failed: {e}")
+
+
+async def execute(cursor, query, params=None):
+    """cursor.execute() that reports to the current tool call's instrumentation"""
+    started = time.perf_counter()
+    await cursor.execute(query, params)
+    seconds = time.perf_counter() - started
+    instrumentation.record_query(query, seconds, cursor.rowcount if cursor.rowcount >= 0 else None)
+    if query_advisor.ADVISOR_ENABLED:
+        await query_advisor.capture_plan_async(cursor.connection, query, params, seconds)
+
+
+async def fetch_all(db_config, query, params=None):
+    """Run one query and return every row"""
+    async with connection(db_config) as conn:
+        async with conn.cursor() as cursor:
+            await execute(cursor, query, params)
+            return await cursor.fetchall()
+
+
+async def fetch_one(db_config, query, params=None):
+    """Run one query and return its first row (or None)"""
+    async with connection(db_config) as conn:
+        async with conn.cursor() as cursor:
+            await execute(cursor, query, params)
+            return await cursor.fetchone()
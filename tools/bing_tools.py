@@ -1,10 +1,20 @@
+import logging
 from typing import Optional, Literal, List, Dict, Any
 from datetime import datetime
 from strands import Agent, tool
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from psycopg2 import Error
-import psycopg2.pool
+from tools import db_pool, rollups, campaign_search, campaign_dimensions
+from tools.result_cache import cached_tool
+from tools import agent_factory, async_db, formatters, pagination, trend_analytics
+from tools.query_utils import (
+    SINGLE_SCAN_KEY_COLUMNS, batch_ids, build_grouped_summary_query, build_keyset_detail_query,
+    build_single_scan_query, match_requested_ids, split_single_scan_rows, stream_rows
+)
+
+
+logger = logging.getLogger("tools.bing_tools")
 
 # Database configuration - update with your actual PostgreSQL details
 DB_CONFIG = {
@@ -17,48 +27,26 @@ DB_CONFIG = {
 
 TABLE_NAME = "bing_advertising_data"  # Update with your actual table name
 
-# Global connection pool
-connection_pool = None
-
 # -------------------------------------------------------------------
 # Connection Pool Setup
 # -------------------------------------------------------------------
 
 def initialize_connection_pool():
-    """Initialize connection pool"""
-    global connection_pool
-    try:
-        connection_pool = psycopg2.pool.SimpleConnectionPool(
-            1, 20,  # min and max connections
-            **DB_CONFIG
-        )
-        return connection_pool
-    except Error as e:
-        raise Exception(f"Connection pool initialization failed: {e}")
+    """Initialize (or reuse) the process-wide connection pool"""
+    return db_pool.get_pool(DB_CONFIG)
+
 
 def get_db_connection():
-    """Get database connection from pool"""
-    global connection_pool
-    if connection_pool is None:
-        try:
-            initialize_connection_pool()
-        except Exception as e:
-            print(f"Failed to initialize connection pool: {e}")
-            raise
+    """Get database connection from the shared pool"""
+    return db_pool.get_connection(DB_CONFIG)
 
-    try:
-        connection = connection_pool.getconn()
-        if connection is None:
-            raise Exception("Failed to get connection from pool")
-        return connection
-    except Error as e:
-        raise Exception(f"Database connection failed: {e}")
 
 def return_connection(connection):
-    """Return connection to pool"""
-    global connection_pool
-    if connection_pool and connection:
-        connection_pool.putconn(connection)
+    """Return connection to the shared pool"""
+    db_pool.return_connection(connection)
+
+
+db_pool.warm_up(DB_CONFIG)
 
 # -------------------------------------------------------------------
 # Tools
@@ -67,24 +55,318 @@ def return_connection(connection):
 def bing_agent_tools(prompt: str) -> str:
     """Main Bing Ads agent tool that routes to appropriate sub-tools"""
     try:
-        print(f"Bing agent received prompt: {prompt}")
-        supervisor_agent = Agent(
-            tools=[get_campaign_performance_for_bing, get_campaign_trends, search_similar_campaigns]
-        )
-        
-        response = supervisor_agent(prompt)
-        print(f"Bing agent response: {response}")
+        logger.debug("Bing agent received prompt: %s", prompt)
+        response = agent_factory.run_agent(__name__, _build_supervisor_agent, prompt)
+        logger.debug("Bing agent response: %s", response)
         return str(response)  # Ensure string return
 
     except Exception as e:
         error_msg = f"Error in bing_agent_tools: {str(e)}"
-        print(error_msg)
+        logger.exception("Bing agent failed")
         return error_msg
 
+
+def _build_supervisor_agent():
+    """Build the supervisor once; agent_factory reuses it with a fresh conversation per prompt"""
+    return Agent(
+        tools=[get_campaign_performance_for_bing, get_campaign_performance_batch_for_bing, get_campaign_trends, search_similar_campaigns]
+    )
+
     
 
+# Totals shared by the performance summary and the per-campaign batch summaries
+_PERFORMANCE_SUMMARY_SELECT = """
+            SUM(impressions) as total_impressions,
+            SUM(clicks) as total_clicks,
+            ROUND(SUM(spend), 2) as total_spend,
+            SUM(conversions) as total_conversions,
+            ROUND(AVG((clicks::DECIMAL / NULLIF(impressions, 0)) * 100), 2) as average_ctr,
+            ROUND(AVG(spend::DECIMAL / NULLIF(clicks, 0)), 2) as average_cpc,
+            ROUND((SUM(conversions)::DECIMAL / NULLIF(SUM(clicks), 0)) * 100, 2) as overall_conversion_rate,
+            COUNT(DISTINCT campaign_id) as campaign_count,
+            MIN(date) as start_date,
+            MAX(date) as end_date"""
+
+
+def _performance_filter(name_condition, campaign_id, date_from, date_to, time_operator, metrics):
+    """Detail column list, WHERE clause and params shared by the performance queries"""
+    # Build SELECT clause
+    if metrics:
+        metric_columns = ', '.join(metrics)
+        select_clause = f"date, campaign_id, campaign_name, {metric_columns}"
+    else:
+        select_clause = "date, campaign_id, campaign_name, impressions, clicks, spend, conversions"
+
+    # Build WHERE conditions
+    where_conditions = ["source = 'Bing Ads'"]
+    params = []
+
+    campaign_search.add_name_filter(where_conditions, params, name_condition)
+
+    if campaign_id:
+        where_conditions.append("campaign_id = %s")
+        params.append(campaign_id)
+
+    # Date filtering
+    if date_from and date_to and time_operator == 'between':
+        where_conditions.append("date BETWEEN %s AND %s")
+        params.extend([date_from, date_to])
+    elif date_from:
+        where_conditions.append(f"date {time_operator} %s")
+        params.append(date_from)
+
+    where_clause = "WHERE " + " AND ".join(where_conditions)
+
+    detail_select = f"""{select_clause},
+           ROUND((clicks::DECIMAL / NULLIF(impressions, 0)) * 100, 2) as ctr,
+           ROUND(spend::DECIMAL / NULLIF(clicks, 0), 2) as cpc,
+           ROUND((conversions::DECIMAL / NULLIF(clicks, 0)) * 100, 2) as conversion_rate,
+           ROUND(spend::DECIMAL / NULLIF(conversions, 0), 2) as cost_per_conversion"""
+    return detail_select, where_clause, params
+
+
+def _campaign_performance_query(name_condition, campaign_id, date_from, date_to, time_operator, metrics, limit, page_key=None):
+    """Build the single-scan performance query (or a keyset continuation page); returns (query, params)"""
+    detail_select, where_clause, params = _performance_filter(
+        name_condition, campaign_id, date_from, date_to, time_operator, metrics
+    )
+
+    if page_key:
+        # Later pages resume after the token's (spend, ctid) and skip the summary
+        condition, keyset_params = pagination.keyset_condition(_PAGE_KEY, "DESC", page_key, nullable=True)
+        where_clause += " AND " + condition
+        params.extend(keyset_params)
+        query = build_keyset_detail_query(
+            TABLE_NAME, where_clause, detail_select, "spend", "DESC", pagination.ROW_TIE_BREAKER, nullable=True
+        )
+    else:
+        # Ranked detail rows and summary totals are read in a single scan;
+        # top N campaigns by spend when limited, otherwise every row by date
+        query = build_single_scan_query(
+            TABLE_NAME,
+            where_clause,
+            detail_select=detail_select,
+            sort_expression="spend" if limit else "date",
+            sort_order="DESC",
+            summary_select=_PERFORMANCE_SUMMARY_SELECT,
+            with_limit=bool(limit),
+            tie_breaker=pagination.ROW_TIE_BREAKER,
+            nullable=True
+        )
+
+    if limit:
+        params.append(limit)
+
+    return query, params
+
+
+def _streaming_performance_queries(name_condition, campaign_id, date_from, date_to, time_operator, metrics):
+    """
+    The unlimited report as a summary aggregate and a plain detail read; returns
+    ((summary_query, params), (detail_query, params)).
+
+    Unlike the single-scan query, the detail read shares no CTE with the summary
+    and sorts only by date, so its rows can start arriving before the scan finishes.
+    """
+    detail_select, where_clause, params = _performance_filter(
+        name_condition, campaign_id, date_from, date_to, time_operator, metrics
+    )
+    summary_query = f"SELECT {_PERFORMANCE_SUMMARY_SELECT} FROM {TABLE_NAME} {where_clause}"
+    detail_query = f"SELECT {detail_select} FROM {TABLE_NAME} {where_clause} ORDER BY date DESC"
+    return (summary_query, params), (detail_query, list(params))
+
+
+# Keyset of the performance ranking: spend, then physical row id for ties
+_PAGE_KEY = ["spend", pagination.ROW_TIE_BREAKER]
+
+_PERFORMANCE_SUMMARY_COLUMNS = (
+    "total_impressions",
+    "total_clicks",
+    "total_spend",
+    "total_conversions",
+    "average_ctr",
+    "average_cpc",
+    "overall_conversion_rate",
+    "campaign_count",
+    "start_date",
+    "end_date",
+)
+
+
+def _page_scope(campaign_name, campaign_id, date_from, date_to, time_operator, metrics):
+    return pagination.scope(TABLE_NAME, campaign_name, campaign_id, date_from, date_to, time_operator, metrics)
+
+
+def _split_performance_page(rows, limit, page_key, page_scope):
+    """(campaign_results, summary, next_page_token) from the rows fetched for one page"""
+    rows, next_page_token = pagination.next_page(rows, limit, SINGLE_SCAN_KEY_COLUMNS, page_scope)
+    campaign_results, summary = split_single_scan_rows(rows, () if page_key else _PERFORMANCE_SUMMARY_COLUMNS)
+    return campaign_results, summary, next_page_token
+
+
+def fetch_campaign_performance(
+    campaign_name=None,
+    campaign_id=None,
+    date_from=None,
+    date_to=None,
+    time_operator='between',
+    metrics=None,
+    limit=10,
+    page_token=None
+):
+    """
+    Run the performance query; returns (campaign_results, summary_result, next_page_token) for the tool and cross-channel callers.
+
+    With page_token the rows continue an earlier ranking and summary_result is empty.
+    """
+    if page_token and not limit:
+        raise Exception("page_token needs a limit; unlimited reports are streamed in full")
+    page_scope = _page_scope(campaign_name, campaign_id, date_from, date_to, time_operator, metrics)
+    page_key = pagination.decode_token(page_token, page_scope) if page_token else None
+    connection = None
+    cursor = None
+    
+    try:
+        connection = get_db_connection()
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        name_condition = campaign_search.name_filter(cursor, TABLE_NAME, campaign_name)
+        query, params = _campaign_performance_query(
+            name_condition, campaign_id, date_from, date_to, time_operator, metrics, pagination.fetch_limit(limit), page_key
+        )
+        cursor.execute(query, params)
+        return _split_performance_page(cursor.fetchall(), limit, page_key, page_scope)
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            return_connection(connection)
+
+
+async def fetch_campaign_performance_async(
+    campaign_name=None,
+    campaign_id=None,
+    date_from=None,
+    date_to=None,
+    time_operator='between',
+    metrics=None,
+    limit=10,
+    page_token=None
+):
+    """Async variant of fetch_campaign_performance on the psycopg 3 pool"""
+    if page_token and not limit:
+        raise Exception("page_token needs a limit; unlimited reports are streamed in full")
+    page_scope = _page_scope(campaign_name, campaign_id, date_from, date_to, time_operator, metrics)
+    page_key = pagination.decode_token(page_token, page_scope) if page_token else None
+    async with async_db.connection(DB_CONFIG) as connection:
+        async with connection.cursor() as cursor:
+            name_condition = await campaign_search.name_filter_async(cursor, TABLE_NAME, campaign_name)
+            query, params = _campaign_performance_query(
+                name_condition, campaign_id, date_from, date_to, time_operator, metrics, pagination.fetch_limit(limit), page_key
+            )
+            await async_db.execute(cursor, query, params)
+            rows = await cursor.fetchall()
+    return _split_performance_page(rows, limit, page_key, page_scope)
+
+
+def stream_campaign_performance(
+    campaign_name=None,
+    campaign_id=None,
+    date_from=None,
+    date_to=None,
+    time_operator='between',
+    metrics=None,
+    itersize=None,
+    output_format='report'
+):
+    """
+    Yield the unlimited performance report in text chunks.
+
+    The summary totals are read first by their own aggregate query; the detail
+    rows then come from a server-side cursor itersize at a time and are formatted
+    as they arrive, so memory stays flat however many rows match. The connection
+    is held until the generator is exhausted or closed.
+    """
+    connection = None
+    rows = None
+
+    try:
+        connection = get_db_connection()
+        with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+            name_condition = campaign_search.name_filter(cursor, TABLE_NAME, campaign_name)
+            summary, detail = _streaming_performance_queries(
+                name_condition, campaign_id, date_from, date_to, time_operator, metrics
+            )
+            cursor.execute(*summary)
+            summary_result = cursor.fetchone()
+        # No matching rows: the aggregate still returns one row, of NULLs
+        summary_result = dict(summary_result) if summary_result and summary_result["end_date"] is not None else {}
+
+        rows = stream_rows(connection, *detail, itersize)
+        campaign_results = rows
+        if output_format != 'report':
+            yield from formatters.iter_rows(campaign_results, output_format, summary=summary_result)
+        else:
+            yield from _iter_campaign_performance(campaign_results, summary_result)
+    finally:
+        if rows is not None:
+            rows.close()
+        if connection:
+            return_connection(connection)
+
+
+def _format_campaign_performance(campaign_results, summary_result):
+    """Render the performance report from the detail rows and summary totals"""
+    return "".join(_iter_campaign_performance(campaign_results, summary_result, len(campaign_results)))
+
+
+def _iter_campaign_performance(campaign_results, summary_result, row_count=None):
+    """
+    Yield the performance report piece by piece.
+
+    campaign_results may be any iterable of rows; row_count is shown in the
+    details header when it is known up front (it is not while streaming).
+    """
+    yield "Campaign Performance Report\n" + "=" * 50 + "\n\n"
+
+    if summary_result:
+        yield (
+            f"Summary Statistics:\n"
+            f"Total Campaigns: {summary_result['campaign_count']:,}\n"
+            f"Date Range: {summary_result['start_date']} to {summary_result['end_date']}\n"
+            f"Total Impressions: {summary_result['total_impressions']:,}\n"
+            f"Total Clicks: {summary_result['total_clicks']:,}\n"
+            f"Total Spend: ${summary_result['total_spend']:,.2f}\n"
+            f"Total Conversions: {summary_result['total_conversions']:,}\n"
+            f"Average CTR: {summary_result['average_ctr'] or 0}%\n"
+            f"Average CPC: ${summary_result['average_cpc'] or 0:.2f}\n"
+            f"Overall Conversion Rate: {summary_result['overall_conversion_rate'] or 0}%\n\n"
+        )
+
+    listed = 0
+    for row in campaign_results:
+        if not listed:
+            if row_count is not None:
+                yield f"Campaign Details ({row_count} campaigns):\n" + "-" * 50 + "\n"
+            else:
+                yield "Campaign Details:\n" + "-" * 50 + "\n"
+        listed += 1
+        yield (
+            f"Date: {row['date']}\n"
+            f"Campaign: {row['campaign_name']} (ID: {row['campaign_id']})\n"
+            f"Impressions: {row['impressions']:,} | Clicks: {row['clicks']:,}\n"
+            f"Spend: ${row['spend']:.2f} | Conversions: {row['conversions']}\n"
+            f"CTR: {row['ctr'] or 0}% | CPC: ${row['cpc'] or 0:.2f}\n"
+            f"Conversion Rate: {row['conversion_rate'] or 0}%\n"
+            + "-" * 50 + "\n"
+        )
+
+    if not listed:
+        yield "No campaign data found matching the criteria.\n"
+
+
 @tool(name="get_campaign_performance_for_bing", 
       description="Get campaign performance metrics including impressions, clicks, spend, conversions for specific campaigns or time periods. Use this when users ask about campaign performance, ROI, CTR, or conversion rates.")
+@cached_tool(TABLE_NAME, DB_CONFIG, uncached_when=lambda arguments: not arguments["limit"] and not arguments["page_token"])
 def get_campaign_performance_for_bing(
     campaign_name: Optional[str] = None,
     campaign_id: Optional[str] = None,
@@ -93,7 +375,9 @@ def get_campaign_performance_for_bing(
     date_to: Optional[str] = None,
     time_operator: Literal['>', '<', '>=', '<=', '=', 'between'] = 'between',
     metrics: Optional[List[str]] = None,
-    limit: Optional[int] = None
+    limit: Optional[int] = None,
+    output_format: Literal['report', 'compact', 'markdown'] = 'report',
+    page_token: Optional[str] = None
 ) -> str:
     """
     Get campaign performance data with flexible filtering
@@ -106,131 +390,322 @@ def get_campaign_performance_for_bing(
         date_to: End date (YYYY-MM-DD format) 
         time_operator: How to apply date filtering
         metrics: List of metrics to return ['impressions', 'clicks', 'spend', 'conversions']
-        limit: Return top N campaigns by spend
+        limit: Return top N campaigns by spend (all rows, streamed, when omitted)
+        output_format: 'report' (readable text), 'compact' (column names once + value lists) or 'markdown' (table)
+        page_token: next_page_token from the previous call, to fetch the following page
     """
+    try:
+        if not limit and not page_token:
+            # Unbounded: stream rows through a server-side cursor instead of fetching them all.
+            # The tool returns a str, so the joined report itself is still built in memory;
+            # callers that need flat memory iterate stream_campaign_performance directly.
+            return "".join(stream_campaign_performance(
+                campaign_name=campaign_name, campaign_id=campaign_id, date_from=date_from, date_to=date_to,
+                time_operator=time_operator, metrics=metrics, output_format=output_format
+            ))
+        campaign_results, summary_result, next_page_token = fetch_campaign_performance(
+            campaign_name=campaign_name, campaign_id=campaign_id, date_from=date_from, date_to=date_to,
+            time_operator=time_operator, metrics=metrics, limit=limit, page_token=page_token
+        )
+        if output_format != 'report':
+            return formatters.render_rows(
+                campaign_results, output_format, summary=pagination.summary_with_token(summary_result, next_page_token)
+            )
+        return pagination.attach_token(_format_campaign_performance(campaign_results, summary_result), next_page_token)
+    except Exception as e:
+        return f"Error processing request: {str(e)}"
+
+
+async def get_campaign_performance_for_bing_async(
+    campaign_name: Optional[str] = None,
+    campaign_id: Optional[str] = None,
+    source: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    time_operator: Literal['>', '<', '>=', '<=', '=', 'between'] = 'between',
+    metrics: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    output_format: Literal['report', 'compact', 'markdown'] = 'report',
+    page_token: Optional[str] = None
+) -> str:
+    """Async variant of get_campaign_performance_for_bing on the psycopg 3 pool"""
+    try:
+        campaign_results, summary_result, next_page_token = await fetch_campaign_performance_async(
+            campaign_name=campaign_name, campaign_id=campaign_id, date_from=date_from, date_to=date_to,
+            time_operator=time_operator, metrics=metrics, limit=limit, page_token=page_token
+        )
+        if output_format != 'report':
+            return formatters.render_rows(
+                campaign_results, output_format, summary=pagination.summary_with_token(summary_result, next_page_token)
+            )
+        return pagination.attach_token(_format_campaign_performance(campaign_results, summary_result), next_page_token)
+    except Exception as e:
+        return f"Error processing request: {str(e)}"
+
+
+def _campaign_batch_query(campaign_ids, date_from, date_to, time_operator):
+    """Build one grouped summary query for several campaign ids; returns (query, params)"""
+    where_conditions = ["campaign_id = ANY(%s)", "source = 'Bing Ads'"]
+    params = [campaign_ids]
+
+    # Date filtering
+    if date_from and date_to and time_operator == 'between':
+        where_conditions.append("date BETWEEN %s AND %s")
+        params.extend([date_from, date_to])
+    elif date_from:
+        where_conditions.append(f"date {time_operator} %s")
+        params.append(date_from)
+
+    where_clause = "WHERE " + " AND ".join(where_conditions)
+    query = build_grouped_summary_query(
+        TABLE_NAME, "campaign_id", where_clause, f"\n            MAX(campaign_name) as campaign_name,{_PERFORMANCE_SUMMARY_SELECT}"
+    )
+
+    return query, params
+
+
+def fetch_campaign_performance_batch(campaign_ids, date_from=None, date_to=None, time_operator='between'):
+    """Run the batch query; returns (summaries in request order, ids with no rows)"""
+    campaign_ids = batch_ids(campaign_ids, "campaign_ids")
     connection = None
+    cursor = None
+    
     try:
         connection = get_db_connection()
         cursor = connection.cursor(cursor_factory=RealDictCursor)
-        
-        # Build SELECT clause
-        if metrics:
-            metric_columns = ', '.join(metrics)
-            select_clause = f"date, campaign_id, campaign_name, {metric_columns}"
-        else:
-            select_clause = "date, campaign_id, campaign_name, impressions, clicks, spend, conversions"
-        
-        # Build base query with calculated metrics
-        query = f"""
-        SELECT {select_clause},
-               ROUND((clicks::DECIMAL / NULLIF(impressions, 0)) * 100, 2) as ctr,
-               ROUND(spend::DECIMAL / NULLIF(clicks, 0), 2) as cpc,
-               ROUND((conversions::DECIMAL / NULLIF(clicks, 0)) * 100, 2) as conversion_rate,
-               ROUND(spend::DECIMAL / NULLIF(conversions, 0), 2) as cost_per_conversion
-        FROM {TABLE_NAME} 
-        """
-        
-        # Build WHERE conditions
-        where_conditions = ["source = 'Bing Ads'"]
-        params = []
-        
-        if campaign_name:
-            where_conditions.append("LOWER(campaign_name) LIKE LOWER(%s)")
-            params.append(f"%{campaign_name}%")
-        
-        if campaign_id:
-            where_conditions.append("campaign_id = %s")
-            params.append(campaign_id)
-        
-        # Date filtering
-        if date_from and date_to and time_operator == 'between':
-            where_conditions.append("date BETWEEN %s AND %s")
-            params.extend([date_from, date_to])
-        elif date_from:
-            where_conditions.append(f"date {time_operator} %s")
-            params.append(date_from)
-        
-        if where_conditions:
-            query += " WHERE " + " AND ".join(where_conditions)
-        
-        # Add ORDER BY and LIMIT
-        if limit:
-            query += " ORDER BY spend DESC LIMIT %s"
-            params.append(limit)
-        else:
-            query += " ORDER BY date DESC"
-        
-        print(f"Executing query: {query}")
-        print(f"Parameters: {params}")
-        
+        query, params = _campaign_batch_query(campaign_ids, date_from, date_to, time_operator)
         cursor.execute(query, params)
-        campaign_results = cursor.fetchall()
-        
-        # Get summary statistics
-        summary_query = f"""
-        SELECT 
-            SUM(impressions) as total_impressions,
-            SUM(clicks) as total_clicks,
-            ROUND(SUM(spend), 2) as total_spend,
-            SUM(conversions) as total_conversions,
-            ROUND(AVG((clicks::DECIMAL / NULLIF(impressions, 0)) * 100), 2) as average_ctr,
-            ROUND(AVG(spend::DECIMAL / NULLIF(clicks, 0)), 2) as average_cpc,
-            ROUND((SUM(conversions)::DECIMAL / NULLIF(SUM(clicks), 0)) * 100, 2) as overall_conversion_rate,
-            COUNT(DISTINCT campaign_id) as campaign_count,
-            MIN(date) as start_date,
-            MAX(date) as end_date
-        FROM {TABLE_NAME}
-        """
-        
-        if where_conditions:
-            summary_query += " WHERE " + " AND ".join(where_conditions)
-        
-        cursor.execute(summary_query, params[:-1] if limit and params else params)
-        summary_result = cursor.fetchone()
-        
-        # Format output
-        output = "Campaign Performance Report\n" + "=" * 50 + "\n\n"
-        
-        if summary_result:
-            output += (
-                f"Summary Statistics:\n"
-                f"Total Campaigns: {summary_result['campaign_count']:,}\n"
-                f"Date Range: {summary_result['start_date']} to {summary_result['end_date']}\n"
-                f"Total Impressions: {summary_result['total_impressions']:,}\n"
-                f"Total Clicks: {summary_result['total_clicks']:,}\n"
-                f"Total Spend: ${summary_result['total_spend']:,.2f}\n"
-                f"Total Conversions: {summary_result['total_conversions']:,}\n"
-                f"Average CTR: {summary_result['average_ctr'] or 0}%\n"
-                f"Average CPC: ${summary_result['average_cpc'] or 0:.2f}\n"
-                f"Overall Conversion Rate: {summary_result['overall_conversion_rate'] or 0}%\n\n"
-            )
-        
-        if campaign_results:
-            output += f"Campaign Details ({len(campaign_results)} campaigns):\n" + "-" * 50 + "\n"
-            for row in campaign_results:
-                output += (
-                    f"Date: {row['date']}\n"
-                    f"Campaign: {row['campaign_name']} (ID: {row['campaign_id']})\n"
-                    f"Impressions: {row['impressions']:,} | Clicks: {row['clicks']:,}\n"
-                    f"Spend: ${row['spend']:.2f} | Conversions: {row['conversions']}\n"
-                    f"CTR: {row['ctr'] or 0}% | CPC: ${row['cpc'] or 0:.2f}\n"
-                    f"Conversion Rate: {row['conversion_rate'] or 0}%\n"
-                    + "-" * 50 + "\n"
-                )
-        else:
-            output += "No campaign data found matching the criteria.\n"
-        
-        return output
-        
+        return match_requested_ids(cursor.fetchall(), "campaign_id", campaign_ids)
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            return_connection(connection)
+
+
+async def fetch_campaign_performance_batch_async(campaign_ids, date_from=None, date_to=None, time_operator='between'):
+    """Async variant of fetch_campaign_performance_batch on the psycopg 3 pool"""
+    campaign_ids = batch_ids(campaign_ids, "campaign_ids")
+    query, params = _campaign_batch_query(campaign_ids, date_from, date_to, time_operator)
+    rows = await async_db.fetch_all(DB_CONFIG, query, params)
+    return match_requested_ids(rows, "campaign_id", campaign_ids)
+
+
+def _format_campaign_batch(summaries, missing_ids):
+    """Render one summary block per requested campaign"""
+    output = [f"Bing Ads Campaign Batch Report ({len(summaries)} campaigns)\n" + "=" * 60 + "\n\n"]
+
+    for summary_data in summaries:
+        output.append(
+                f"Campaign ID: {summary_data['campaign_id']}\n"
+                f"Campaign Name: {summary_data.get('campaign_name') or 'N/A'}\n"
+                f"Date Range: {summary_data.get('start_date', 'N/A')} to {summary_data.get('end_date', 'N/A')}\n"
+                f"Total Impressions: {summary_data.get('total_impressions') or 0:,}\n"
+                f"Total Clicks: {summary_data.get('total_clicks') or 0:,}\n"
+                f"Total Spend: ${summary_data.get('total_spend') or 0:,.2f}\n"
+                f"Total Conversions: {summary_data.get('total_conversions') or 0:,}\n"
+                f"Average CTR: {summary_data.get('average_ctr') or 0}%\n"
+                f"Average CPC: ${summary_data.get('average_cpc') or 0}\n"
+                f"Conversion Rate: {summary_data.get('overall_conversion_rate') or 0}%\n"
+                + "-" * 60 + "\n"
+        )
+
+    if missing_ids:
+        output.append(f"No data found for campaign IDs: {', '.join(missing_ids)}\n")
+
+    return "".join(output)
+
+
+def _render_campaign_batch(summaries, missing_ids, output_format):
+    if output_format != 'report':
+        return formatters.render_rows(
+            summaries, output_format, summary={"missing_campaign_ids": missing_ids} if missing_ids else None
+        )
+    return _format_campaign_batch(summaries, missing_ids)
+
+
+@tool(
+    name="get_campaign_performance_batch_for_bing",
+    description="""
+    Get Bing Ads performance totals (impressions, clicks, spend, conversions, CTR, CPC, conversion rate)
+    for several campaign IDs at once, one summary per campaign, in a single query.
+    Use this instead of calling get_campaign_performance_for_bing once per campaign when the user names multiple campaign IDs.
+    """
+)
+@cached_tool(TABLE_NAME, DB_CONFIG)
+def get_campaign_performance_batch_for_bing(
+    campaign_ids: List[str],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    time_operator: Literal['>', '<', '>=', '<=', '=', 'between'] = 'between',
+    output_format: Literal['report', 'compact', 'markdown'] = 'report'
+) -> str:
+    """
+    Get per-campaign performance summaries for a list of campaign IDs
+    
+    Args:
+        campaign_ids: Campaign IDs to summarize (exact match)
+        date_from: Start date (YYYY-MM-DD format)
+        date_to: End date (YYYY-MM-DD format)
+        time_operator: How to apply date filtering
+        output_format: 'report' (readable text), 'compact' (column names once + value lists) or 'markdown' (table)
+    """
+    try:
+        summaries, missing_ids = fetch_campaign_performance_batch(campaign_ids, date_from, date_to, time_operator)
+        return _render_campaign_batch(summaries, missing_ids, output_format)
     except Exception as e:
         return f"Error processing request: {str(e)}"
+
+
+async def get_campaign_performance_batch_for_bing_async(
+    campaign_ids: List[str],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    time_operator: Literal['>', '<', '>=', '<=', '=', 'between'] = 'between',
+    output_format: Literal['report', 'compact', 'markdown'] = 'report'
+) -> str:
+    """Async variant of get_campaign_performance_batch_for_bing on the psycopg 3 pool"""
+    try:
+        summaries, missing_ids = await fetch_campaign_performance_batch_async(campaign_ids, date_from, date_to, time_operator)
+        return _render_campaign_batch(summaries, missing_ids, output_format)
+    except Exception as e:
+        return f"Error processing request: {str(e)}"
+
+
+def _campaign_trends_query(trend_table, name_condition, period, date_from, date_to, days_back):
+    """Build the trends query against trend_table; returns (query, params)"""
+    # Build WHERE conditions
+    where_conditions = ["source = 'Bing Ads'"]
+    params = []
+
+    campaign_search.add_name_filter(where_conditions, params, name_condition)
+
+    if date_from:
+        where_conditions.append("date >= %s")
+        params.append(date_from)
+    elif not date_to:  # If no date range specified, use days_back
+        where_conditions.append(f"date >= CURRENT_DATE - INTERVAL '{days_back} DAYS'")
+
+    if date_to:
+        where_conditions.append("date <= %s")
+        params.append(date_to)
+
+    where_clause = " AND ".join(where_conditions)
+
+    # Build period grouping
+    if period == 'weekly':
+        period_group = "DATE_TRUNC('week', date)"
+        period_format = "TO_CHAR(DATE_TRUNC('week', date), 'YYYY-MM-DD')"
+    elif period == 'monthly':
+        period_group = "DATE_TRUNC('month', date)"
+        period_format = "TO_CHAR(DATE_TRUNC('month', date), 'YYYY-MM')"
+    else:  # daily
+        period_group = "date"
+        period_format = "TO_CHAR(date, 'YYYY-MM-DD')"
+
+    query = f"""
+    SELECT 
+        {period_format} as period,
+        SUM(impressions) as impressions,
+        SUM(clicks) as clicks,
+        ROUND(SUM(spend), 2) as spend,
+        SUM(conversions) as conversions,
+        ROUND((SUM(clicks)::DECIMAL / NULLIF(SUM(impressions), 0)) * 100, 2) as ctr,
+        ROUND(SUM(spend)::DECIMAL / NULLIF(SUM(clicks), 0), 2) as cpc
+    FROM {trend_table} 
+    WHERE {where_clause}
+    GROUP BY {period_group}
+    ORDER BY {period_group}
+    """
+
+    return query, params
+
+
+def fetch_campaign_trends(
+    campaign_name=None,
+    period='daily',
+    date_from=None,
+    date_to=None,
+    days_back=30
+):
+    """Run the trends query; returns one row per period"""
+    connection = None
+    cursor = None
+    
+    try:
+        connection = get_db_connection()
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        
+        # Read the per-day campaign rollup when it is available, raw rows otherwise
+        trend_table, _ = rollups.trend_source(cursor, TABLE_NAME)
+        name_condition = campaign_search.name_filter(cursor, TABLE_NAME, campaign_name)
+        query, params = _campaign_trends_query(trend_table, name_condition, period, date_from, date_to, days_back)
+        
+        cursor.execute(query, params)
+        return cursor.fetchall()
     finally:
-        if connection:
+        if cursor:
             cursor.close()
+        if connection:
             return_connection(connection)
 
+
+async def fetch_campaign_trends_async(
+    campaign_name=None,
+    period='daily',
+    date_from=None,
+    date_to=None,
+    days_back=30
+):
+    """Async variant of fetch_campaign_trends on the psycopg 3 pool"""
+    async with async_db.connection(DB_CONFIG) as connection:
+        async with connection.cursor() as cursor:
+            trend_table, _ = await rollups.trend_source_async(cursor, TABLE_NAME)
+            name_condition = await campaign_search.name_filter_async(cursor, TABLE_NAME, campaign_name)
+            query, params = _campaign_trends_query(trend_table, name_condition, period, date_from, date_to, days_back)
+            await async_db.execute(cursor, query, params)
+            return await cursor.fetchall()
+
+
+def _format_campaign_trends(trend_results, period, metric):
+    """Render the per-period trend report"""
+    if not trend_results:
+        return f"No trend data found for the specified criteria."
+
+    output = [f"Campaign Trends Analysis ({period.title()})\n" + "=" * 50 + "\n\n"]
+
+    if len(trend_results) > 1:
+        first_value = float(trend_results[0].get(metric, 0))
+        last_value = float(trend_results[-1].get(metric, 0))
+
+        if first_value > 0:
+            percent_change = ((last_value - first_value) / first_value) * 100
+            trend_direction = "increasing" if last_value > first_value else "decreasing"
+            output.append(f"Trend Direction: {trend_direction.title()} ({percent_change:+.1f}%)\n")
+            output.append(f"Periods Analyzed: {len(trend_results)}\n\n")
+
+        stats = trend_analytics.analyze(trend_results, [metric], period)
+        if stats:
+            output.append(trend_analytics.describe(stats[metric], metric.upper()))
+
+    # Display trend data
+    for row in trend_results:
+        output.append(
+            f"{row['period']}: "
+            f"Impressions: {row['impressions']:,} | "
+            f"Clicks: {row['clicks']:,} | "
+            f"Spend: ${row['spend']:,.2f} | "
+            f"Conversions: {row['conversions']} | "
+            f"CTR: {row['ctr'] or 0}% | "
+            f"CPC: ${row['cpc'] or 0:.2f}\n"
+        )
+
+    return "".join(output)
+
+
 @tool(name="get_campaign_trends", 
       description="Analyze campaign performance trends over time. Use this when users ask about performance trends, seasonal patterns, or time-based analysis.")
+@cached_tool(TABLE_NAME, DB_CONFIG)
 def get_campaign_trends(
     campaign_name: Optional[str] = None,
     period: Literal['daily', 'weekly', 'monthly'] = 'daily',
@@ -250,103 +725,149 @@ def get_campaign_trends(
         date_to: End date (YYYY-MM-DD)
         days_back: Number of days to look back if no date range specified
     """
-    connection = None
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        
-        # Build WHERE conditions
-        where_conditions = ["source = 'Bing Ads'"]
-        params = []
-        
-        if campaign_name:
-            where_conditions.append("LOWER(campaign_name) LIKE LOWER(%s)")
-            params.append(f"%{campaign_name}%")
-        
-        if date_from:
-            where_conditions.append("date >= %s")
-            params.append(date_from)
-        elif not date_to:  # If no date range specified, use days_back
-            where_conditions.append(f"date >= CURRENT_DATE - INTERVAL '{days_back} DAYS'")
-        
-        if date_to:
-            where_conditions.append("date <= %s")
-            params.append(date_to)
-        
-        where_clause = " AND ".join(where_conditions)
-        
-        # Build period grouping
-        if period == 'weekly':
-            period_group = "DATE_TRUNC('week', date)"
-            period_format = "TO_CHAR(DATE_TRUNC('week', date), 'YYYY-MM-DD')"
-        elif period == 'monthly':
-            period_group = "DATE_TRUNC('month', date)"
-            period_format = "TO_CHAR(DATE_TRUNC('month', date), 'YYYY-MM')"
-        else:  # daily
-            period_group = "date"
-            period_format = "TO_CHAR(date, 'YYYY-MM-DD')"
-        
-        query = f"""
-        SELECT 
-            {period_format} as period,
-            SUM(impressions) as impressions,
-            SUM(clicks) as clicks,
-            ROUND(SUM(spend), 2) as spend,
-            SUM(conversions) as conversions,
-            ROUND((SUM(clicks)::DECIMAL / NULLIF(SUM(impressions), 0)) * 100, 2) as ctr,
-            ROUND(SUM(spend)::DECIMAL / NULLIF(SUM(clicks), 0), 2) as cpc
-        FROM {TABLE_NAME} 
-        WHERE {where_clause}
-        GROUP BY {period_group}
-        ORDER BY {period_group}
-        """
-        
-        print(f"Executing trends query: {query}")
-        print(f"Parameters: {params}")
-        
-        cursor.execute(query, params)
-        trend_results = cursor.fetchall()
-        
-        if not trend_results:
-            return f"No trend data found for the specified criteria."
-        
-        output = f"Campaign Trends Analysis ({period.title()})\n" + "=" * 50 + "\n\n"
-        
-        if len(trend_results) > 1:
-            first_value = float(trend_results[0].get(metric, 0))
-            last_value = float(trend_results[-1].get(metric, 0))
-            
-            if first_value > 0:
-                percent_change = ((last_value - first_value) / first_value) * 100
-                trend_direction = "increasing" if last_value > first_value else "decreasing"
-                output += f"Trend Direction: {trend_direction.title()} ({percent_change:+.1f}%)\n"
-                output += f"Periods Analyzed: {len(trend_results)}\n\n"
-        
-        # Display trend data
-        for row in trend_results:
-            output += (
-                f"{row['period']}: "
-                f"Impressions: {row['impressions']:,} | "
-                f"Clicks: {row['clicks']:,} | "
-                f"Spend: ${row['spend']:,.2f} | "
-                f"Conversions: {row['conversions']} | "
-                f"CTR: {row['ctr'] or 0}% | "
-                f"CPC: ${row['cpc'] or 0:.2f}\n"
-            )
-        
-        return output
-        
+        trend_results = fetch_campaign_trends(
+            campaign_name=campaign_name, period=period, date_from=date_from, date_to=date_to,
+            days_back=days_back
+        )
+        return _format_campaign_trends(trend_results, period, metric)
     except Exception as e:
         return f"Error processing trends: {str(e)}"
-    finally:
-        if connection:
-            cursor.close()
-            return_connection(connection)
 
 
+async def get_campaign_trends_async(
+    campaign_name: Optional[str] = None,
+    period: Literal['daily', 'weekly', 'monthly'] = 'daily',
+    metric: Literal['impressions', 'clicks', 'spend', 'conversions', 'ctr', 'cpc'] = 'spend',
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    days_back: Optional[int] = 30
+) -> str:
+    """Async variant of get_campaign_trends on the psycopg 3 pool"""
+    try:
+        trend_results = await fetch_campaign_trends_async(
+            campaign_name=campaign_name, period=period, date_from=date_from, date_to=date_to,
+            days_back=days_back
+        )
+        return _format_campaign_trends(trend_results, period, metric)
+    except Exception as e:
+        return f"Error processing trends: {str(e)}"
+
+
+# Search columns read from the campaign dimension table (same output as the GROUP BY search)
+_SEARCH_DIMENSION_SELECT = """
+        campaign_id,
+        campaign_name,
+        ROUND(total_spend, 2) as total_spend,
+        total_conversions,
+        total_clicks,
+        total_impressions,
+        first_date as start_date,
+        last_date as end_date,
+        days_active,
+        ROUND((total_clicks::DECIMAL / NULLIF(total_impressions, 0)) * 100, 2) as ctr,
+        ROUND((total_conversions::DECIMAL / NULLIF(total_clicks, 0)) * 100, 2) as conversion_rate"""
+
+
+def _search_campaigns_query(name_condition, date_from, date_to, min_spend, has_conversions, limit, dimension_table=None):
+    """Build the campaign search query; returns (query, params)"""
+    if dimension_table:
+        # Lifetime totals are precomputed per campaign; thresholds become index range scans
+        return campaign_dimensions.search_query(
+            dimension_table, _SEARCH_DIMENSION_SELECT, name_condition, min_spend, None, has_conversions, limit
+        )
+
+    # Build WHERE conditions
+    where_conditions = ["source = 'Bing Ads'"]
+    params = []
+
+    campaign_search.add_name_filter(where_conditions, params, name_condition)
+
+    if date_from:
+        where_conditions.append("date >= %s")
+        params.append(date_from)
+    if date_to:
+        where_conditions.append("date <= %s")
+        params.append(date_to)
+
+    where_clause = " AND ".join(where_conditions)
+
+    # Build HAVING conditions for aggregated filters
+    having_conditions = []
+    if min_spend:
+        having_conditions.append("SUM(spend) >= %s")
+        params.append(min_spend)
+
+    if has_conversions is not None:
+        if has_conversions:
+            having_conditions.append("SUM(conversions) > 0")
+        else:
+            having_conditions.append("SUM(conversions) = 0")
+
+    having_clause = ""
+    if having_conditions:
+        having_clause = f"HAVING {' AND '.join(having_conditions)}"
+
+    query = f"""
+    SELECT 
+        campaign_id,
+        campaign_name,
+        ROUND(SUM(spend), 2) as total_spend,
+        SUM(conversions) as total_conversions,
+        SUM(clicks) as total_clicks,
+        SUM(impressions) as total_impressions,
+        MIN(date) as start_date,
+        MAX(date) as end_date,
+        COUNT(DISTINCT date) as days_active,
+        ROUND((SUM(clicks)::DECIMAL / NULLIF(SUM(impressions), 0)) * 100, 2) as ctr,
+        ROUND((SUM(conversions)::DECIMAL / NULLIF(SUM(clicks), 0)) * 100, 2) as conversion_rate
+    FROM {TABLE_NAME}
+    WHERE {where_clause}
+    GROUP BY campaign_id, campaign_name
+    {having_clause}
+    ORDER BY total_spend DESC
+    LIMIT %s
+    """
+
+    params.append(limit)
+
+    return query, params
+
+
+def _format_search_campaigns(results, search_term, date_from, date_to, min_spend, has_conversions):
+    """Render the campaign search results"""
+    if not results:
+        return f"No campaigns found matching the search criteria."
+
+    # Format output
+    output = [f"Campaign Search Results\n" + "=" * 40 + "\n"]
+    output.append(f"Search Criteria: {search_term or 'All campaigns'}\n")
+    if date_from or date_to:
+        output.append(f"Date Range: {date_from or 'Start'} to {date_to or 'End'}\n")
+    if min_spend:
+        output.append(f"Minimum Spend: ${min_spend:,.2f}\n")
+    if has_conversions is not None:
+        output.append(f"Has Conversions: {'Yes' if has_conversions else 'No'}\n")
+    output.append(f"Found {len(results)} campaigns\n\n")
+
+    for row in results:
+        output.append(
+            f"Campaign: {row['campaign_name']}\n"
+            f"ID: {row['campaign_id']}\n"
+            f"Period: {row['start_date']} to {row['end_date']} ({row['days_active']} days)\n"
+            f"Total Spend: ${row['total_spend']:,.2f}\n"
+            f"Impressions: {row['total_impressions']:,} | Clicks: {row['total_clicks']:,}\n"
+            f"Conversions: {row['total_conversions']} | CTR: {row['ctr'] or 0}%\n"
+            f"Conversion Rate: {row['conversion_rate'] or 0}%\n"
+            + "-" * 50 + "\n"
+        )
+
+    return "".join(output)
+
 
 @tool(name="search_similar_campaigns", 
       description="Search for campaigns by name or get campaigns from specific time periods. Use this when users want to find specific campaigns or explore what campaigns were running.")
+@cached_tool(TABLE_NAME, DB_CONFIG)
 def search_similar_campaigns(
     search_term: Optional[str] = None,
     date_from: Optional[str] = None,
@@ -367,110 +888,50 @@ def search_similar_campaigns(
         limit: Maximum number of results to return
     """
     connection = None
+    cursor = None
+    
     try:
         connection = get_db_connection()
         cursor = connection.cursor(cursor_factory=RealDictCursor)
-        
-        # Build WHERE conditions
-        where_conditions = ["source = 'Bing Ads'"]
-        params = []
-        
-        if search_term:
-            where_conditions.append("LOWER(campaign_name) LIKE LOWER(%s)")
-            params.append(f"%{search_term}%")
-        
-        if date_from:
-            where_conditions.append("date >= %s")
-            params.append(date_from)
-        if date_to:
-            where_conditions.append("date <= %s")
-            params.append(date_to)
-        
-        where_clause = " AND ".join(where_conditions)
-        
-        # Build HAVING conditions for aggregated filters
-        having_conditions = []
-        if min_spend:
-            having_conditions.append("SUM(spend) >= %s")
-            params.append(min_spend)
-        
-        if has_conversions is not None:
-            if has_conversions:
-                having_conditions.append("SUM(conversions) > 0")
-            else:
-                having_conditions.append("SUM(conversions) = 0")
-        
-        having_clause = ""
-        if having_conditions:
-            having_clause = f"HAVING {' AND '.join(having_conditions)}"
-        
-        query = f"""
-        SELECT 
-            campaign_id,
-            campaign_name,
-            ROUND(SUM(spend), 2) as total_spend,
-            SUM(conversions) as total_conversions,
-            SUM(clicks) as total_clicks,
-            SUM(impressions) as total_impressions,
-            MIN(date) as start_date,
-            MAX(date) as end_date,
-            COUNT(DISTINCT date) as days_active,
-            ROUND((SUM(clicks)::DECIMAL / NULLIF(SUM(impressions), 0)) * 100, 2) as ctr,
-            ROUND((SUM(conversions)::DECIMAL / NULLIF(SUM(clicks), 0)) * 100, 2) as conversion_rate
-        FROM {TABLE_NAME}
-        WHERE {where_clause}
-        GROUP BY campaign_id, campaign_name
-        {having_clause}
-        ORDER BY total_spend DESC
-        LIMIT %s
-        """
-        
-        params.append(limit)
-        
-        print(f"Executing search campaigns query: {query}")
-        print(f"Parameters: {params}")
-        
+        name_condition = campaign_search.name_filter(cursor, TABLE_NAME, search_term)
+        dimension_table = campaign_dimensions.dimension_source(cursor, TABLE_NAME) if campaign_dimensions.serves(date_from, date_to) else None
+        query, params = _search_campaigns_query(name_condition, date_from, date_to, min_spend, has_conversions, limit, dimension_table)
         cursor.execute(query, params)
-        results = cursor.fetchall()
-        
-        if not results:
-            return f"No campaigns found matching the search criteria."
-        
-        # Format output
-        output = f"Campaign Search Results\n" + "=" * 40 + "\n"
-        output += f"Search Criteria: {search_term or 'All campaigns'}\n"
-        if date_from or date_to:
-            output += f"Date Range: {date_from or 'Start'} to {date_to or 'End'}\n"
-        if min_spend:
-            output += f"Minimum Spend: ${min_spend:,.2f}\n"
-        if has_conversions is not None:
-            output += f"Has Conversions: {'Yes' if has_conversions else 'No'}\n"
-        output += f"Found {len(results)} campaigns\n\n"
-        
-        for row in results:
-            output += (
-                f"Campaign: {row['campaign_name']}\n"
-                f"ID: {row['campaign_id']}\n"
-                f"Period: {row['start_date']} to {row['end_date']} ({row['days_active']} days)\n"
-                f"Total Spend: ${row['total_spend']:,.2f}\n"
-                f"Impressions: {row['total_impressions']:,} | Clicks: {row['total_clicks']:,}\n"
-                f"Conversions: {row['total_conversions']} | CTR: {row['ctr'] or 0}%\n"
-                f"Conversion Rate: {row['conversion_rate'] or 0}%\n"
-                + "-" * 50 + "\n"
-            )
-        
-        return output
-        
+        return _format_search_campaigns(cursor.fetchall(), search_term, date_from, date_to, min_spend, has_conversions)
     except Exception as e:
         return f"Error searching campaigns: {str(e)}"
     finally:
-        if connection:
+        if cursor:
             cursor.close()
+        if connection:
             return_connection(connection)
 
+
+async def search_similar_campaigns_async(
+    search_term: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    min_spend: Optional[float] = None,
+    has_conversions: Optional[bool] = None,
+    limit: Optional[int] = 20
+) -> str:
+    """Async variant of search_similar_campaigns on the psycopg 3 pool"""
+    try:
+        async with async_db.connection(DB_CONFIG) as connection:
+            async with connection.cursor() as cursor:
+                name_condition = await campaign_search.name_filter_async(cursor, TABLE_NAME, search_term)
+                dimension_table = None
+                if campaign_dimensions.serves(date_from, date_to):
+                    dimension_table = await campaign_dimensions.dimension_source_async(cursor, TABLE_NAME)
+                query, params = _search_campaigns_query(name_condition, date_from, date_to, min_spend, has_conversions, limit, dimension_table)
+                await async_db.execute(cursor, query, params)
+                results = await cursor.fetchall()
+        return _format_search_campaigns(results, search_term, date_from, date_to, min_spend, has_conversions)
+    except Exception as e:
+        return f"Error searching campaigns: {str(e)}"
+
+
 def cleanup_connections():
     """Clean up connection pool"""
-    global connection_pool
-    if connection_pool:
-        connection_pool.closeall()
+    db_pool.close_all()
 
@@ -0,0 +1,309 @@
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2 import Error
+
+from tools import rollups
+
+
+# -------------------------------------------------------------------
+# Dimension Definitions
+# -------------------------------------------------------------------
+
+# Answer undated campaign searches from the per-campaign dimension tables when they are
+# populated and kept current by their ingest triggers
+ROUTE_TO_CAMPAIGN_DIMENSIONS = os.environ.get("TOOLS_USE_CAMPAIGN_DIMENSIONS", "1") == "1"
+
+# One row per (campaign_name, campaign_id) with lifetime totals. filter restricts the
+# rows folded in, matching what the channel's search tool reads.
+DIMENSION_SPECS = {
+    "facebook_campaigns_ads": {"filter": None},
+    "tiktok_campaign_ad_details": {"filter": None},
+    "linkedin_ads": {"filter": None},
+    "bing_advertising_data": {"filter": "source = 'Bing Ads'"},
+}
+
+# Search thresholds and the spend ranking, each served by a B-tree range scan
+_INDEXED_COLUMNS = ["total_spend", "total_impressions", "total_conversions"]
+
+# source table -> (ready, checked_at)
+_readiness = {}
+_readiness_lock = threading.Lock()
+
+
+def dimension_table_name(source_table):
+    """Name of the campaign dimension table for a source table"""
+    return f"{source_table}_campaigns"
+
+
+_DIMENSION_SELECT = """
+            campaign_name,
+            campaign_id,
+            SUM(impressions) AS total_impressions,
+            SUM(clicks) AS total_clicks,
+            SUM(spend) AS total_spend,
+            SUM(conversions) AS total_conversions,
+            MIN(date)::date AS first_date,
+            MAX(date)::date AS last_date,
+            COUNT(*) AS total_records,
+            COUNT(DISTINCT date::date) AS days_active"""
+
+
+def _where(source_table, *conditions):
+    conditions = [condition for condition in (DIMENSION_SPECS[source_table]["filter"], *conditions) if condition]
+    return "WHERE " + " AND ".join(conditions) if conditions else ""
+
+
+def _recompute_sql(source_table, changed):
+    """Statements that rebuild the dimension rows of the campaigns in the `changed` subquery"""
+    dimension_table = dimension_table_name(source_table)
+    keys = f"SELECT campaign_id, campaign_name FROM {changed}"
+    null_key = f"EXISTS (SELECT 1 FROM {changed} WHERE campaign_id IS NULL OR campaign_name IS NULL)"
+    # One advisory lock per touched campaign, taken in key order so concurrent loads cannot deadlock
+    lock_keys = (
+        f"SELECT DISTINCT hashtext(COALESCE(campaign_id::text, '') || ':' || COALESCE(campaign_name::text, '')) AS lock_key "
+        f"FROM {changed}"
+    )
+    return f"""
+        PERFORM pg_advisory_xact_lock(hashtext('{dimension_table}'), lock_key)
+        FROM ({lock_keys} ORDER BY lock_key) AS campaign_locks;
+        DELETE FROM {dimension_table} WHERE (campaign_id, campaign_name) IN ({keys});
+        INSERT INTO {dimension_table}
+        SELECT {_DIMENSION_SELECT}
+        FROM {source_table}
+        {_where(source_table, f"(campaign_id, campaign_name) IN ({keys})")}
+        GROUP BY campaign_name, campaign_id;
+        -- Equality never matches NULL keys, so those campaigns are rebuilt on their own
+        IF {null_key} THEN
+            DELETE FROM {dimension_table} WHERE campaign_id IS NULL OR campaign_name IS NULL;
+            INSERT INTO {dimension_table}
+            SELECT {_DIMENSION_SELECT}
+            FROM {source_table}
+            {_where(source_table, "(campaign_id IS NULL OR campaign_name IS NULL)")}
+            GROUP BY campaign_name, campaign_id;
+        END IF;"""
+
+
+# -------------------------------------------------------------------
+# Maintenance
+# -------------------------------------------------------------------
+
+def ensure_dimension_table(cursor, source_table):
+    """Create the dimension table, its indexes and the source index the triggers look campaigns up by"""
+    dimension_table = dimension_table_name(source_table)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {dimension_table} AS
+        SELECT {_DIMENSION_SELECT}
+        FROM {source_table}
+        GROUP BY campaign_name, campaign_id
+        WITH NO DATA
+    """)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {dimension_table}_key_idx ON {dimension_table} (campaign_id, campaign_name)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {dimension_table}_last_date_idx ON {dimension_table} (last_date)")
+    for column in _INDEXED_COLUMNS:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {dimension_table}_{column}_idx ON {dimension_table} ({column} DESC)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {source_table}_campaign_key_idx ON {source_table} (campaign_id, campaign_name)")
+
+
+def _sync_trigger_name(source_table, event):
+    return f"{dimension_table_name(source_table)}_{event.lower()}"
+
+
+def install_triggers(cursor, source_table):
+    """
+    Keep the dimension table in step with every write to its source table.
+
+    Statement-level triggers read the transition tables, so a bulk load recomputes
+    each touched campaign once; TRUNCATE empties the dimension table.
+    """
+    dimension_table = dimension_table_name(source_table)
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION {dimension_table}_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                TRUNCATE {dimension_table};
+            ELSIF TG_OP = 'INSERT' THEN
+                {_recompute_sql(source_table, "new_rows")}
+            ELSIF TG_OP = 'DELETE' THEN
+                {_recompute_sql(source_table, "old_rows")}
+            ELSE
+                {_recompute_sql(source_table, "(SELECT campaign_id, campaign_name FROM old_rows UNION SELECT campaign_id, campaign_name FROM new_rows) AS changed")}
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    # Transition tables need one trigger per event; TRUNCATE has none
+    transitions = {
+        "INSERT": "REFERENCING NEW TABLE AS new_rows",
+        "UPDATE": "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+        "DELETE": "REFERENCING OLD TABLE AS old_rows",
+        "TRUNCATE": "",
+    }
+    for event, referencing in transitions.items():
+        trigger = _sync_trigger_name(source_table, event)
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {source_table}")
+        cursor.execute(f"""
+            CREATE TRIGGER {trigger}
+            AFTER {event} ON {source_table}
+            {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION {dimension_table}_sync()
+        """)
+
+
+def refresh_dimensions(connection, source_table):
+    """
+    Rebuild one campaign dimension table from its source table and (re)install its triggers.
+
+    Needed once; afterwards the triggers update just the campaigns each write touches.
+    Returns the number of campaigns written.
+    """
+    dimension_table = dimension_table_name(source_table)
+    cursor = connection.cursor()
+    try:
+        ensure_dimension_table(cursor, source_table)
+        # Block writers until the triggers are in place so no change is missed
+        cursor.execute(f"LOCK TABLE {source_table} IN SHARE MODE")
+        cursor.execute(f"TRUNCATE {dimension_table}")
+        cursor.execute(f"""
+            INSERT INTO {dimension_table}
+            SELECT {_DIMENSION_SELECT}
+            FROM {source_table}
+            {_where(source_table)}
+            GROUP BY campaign_name, campaign_id
+        """)
+        written = cursor.rowcount
+        install_triggers(cursor, source_table)
+        cursor.execute(f"ANALYZE {dimension_table}")
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        raise Exception(f"Campaign dimension refresh failed for {source_table}: {e}")
+    finally:
+        cursor.close()
+
+    with _readiness_lock:
+        _readiness.pop(source_table, None)
+    return written
+
+
+def refresh_all_dimensions(connection):
+    """Refresh every campaign dimension table; returns {source_table: campaigns written}"""
+    return {
+        source_table: refresh_dimensions(connection, source_table)
+        for source_table in DIMENSION_SPECS
+    }
+
+
+# -------------------------------------------------------------------
+# Query Routing
+# -------------------------------------------------------------------
+
+def serves(date_from=None, date_to=None):
+    """True when a search can use lifetime totals (date bounds apply to rows before grouping)"""
+    return ROUTE_TO_CAMPAIGN_DIMENSIONS and not date_from and not date_to
+
+
+def _cached_readiness(source_table):
+    """(known, ready) from the readiness cache"""
+    if not ROUTE_TO_CAMPAIGN_DIMENSIONS or source_table not in DIMENSION_SPECS:
+        return True, False
+    with _readiness_lock:
+        cached = _readiness.get(source_table)
+    if cached and time.monotonic() - cached[1] < rollups.READINESS_CHECK_TTL:
+        return True, cached[0]
+    return False, None
+
+
+def _store_readiness(source_table, ready):
+    with _readiness_lock:
+        _readiness[source_table] = (ready, time.monotonic())
+    return ready
+
+
+def _maintained_query(source_table):
+    """Readiness check: the table exists and the ingest trigger keeping it current is installed"""
+    return (
+        "SELECT to_regclass(%s) IS NOT NULL AND EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = %s) AS ready",
+        (dimension_table_name(source_table), _sync_trigger_name(source_table, "INSERT")),
+    )
+
+
+def dimension_source(cursor, source_table):
+    """The dimension table to search, or None to group the source table"""
+    known, ready = _cached_readiness(source_table)
+    if not known:
+        dimension_table = dimension_table_name(source_table)
+        cursor.execute(*_maintained_query(source_table))
+        ready = rollups.first_value(cursor.fetchone())
+        if ready:
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {dimension_table}) AS ready")
+            ready = rollups.first_value(cursor.fetchone())
+        _store_readiness(source_table, ready)
+    return dimension_table_name(source_table) if ready else None
+
+
+async def dimension_source_async(cursor, source_table):
+    """dimension_source for an async (psycopg 3) cursor; shares the same readiness cache"""
+    known, ready = _cached_readiness(source_table)
+    if not known:
+        dimension_table = dimension_table_name(source_table)
+        await cursor.execute(*_maintained_query(source_table))
+        ready = rollups.first_value(await cursor.fetchone())
+        if ready:
+            await cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {dimension_table}) AS ready")
+            ready = rollups.first_value(await cursor.fetchone())
+        _store_readiness(source_table, ready)
+    return dimension_table_name(source_table) if ready else None
+
+
+def search_query(dimension_table, select, name_condition, min_spend=None, min_impressions=None, has_conversions=None, limit=20):
+    """
+    Campaign search over a dimension table; returns (query, params).
+
+    select is the tool's column list written against the dimension columns. The
+    thresholds are plain WHERE conditions on indexed totals instead of HAVING
+    over a GROUP BY of the whole fact table.
+    """
+    where_conditions = []
+    params = []
+
+    if name_condition:
+        condition, condition_params = name_condition
+        where_conditions.append(condition)
+        params.extend(condition_params)
+
+    if min_spend:
+        where_conditions.append("total_spend >= %s")
+        params.append(min_spend)
+
+    if min_impressions:
+        where_conditions.append("total_impressions >= %s")
+        params.append(min_impressions)
+
+    if has_conversions is not None:
+        where_conditions.append("total_conversions > 0" if has_conversions else "total_conversions = 0")
+
+    where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+
+    query = f"""
+    SELECT {select}
+    FROM {dimension_table}
+    {where_clause}
+    ORDER BY {dimension_table}.total_spend DESC
+    LIMIT %s
+    """
+    params.append(limit)
+    return query, params
+
+
+if __name__ == "__main__":
+    # Usage: TOOLS_DB_DSN="host=... dbname=..." python -m tools.campaign_dimensions
+    refresh_connection = psycopg2.connect(os.environ["TOOLS_DB_DSN"])
+    try:
+        for table, campaigns in refresh_all_dimensions(refresh_connection).items():
+            print(f"{dimension_table_name(table)}: {campaigns} campaigns refreshed")
+    finally:
+        refresh_connection.close()
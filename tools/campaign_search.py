@@ -0,0 +1,230 @@
+import logging
+import os
+import sys
+import threading
+import time
+
+import psycopg2
+from psycopg2 import Error
+
+from tools import rollups
+
+
+logger = logging.getLogger("tools.campaign_search")
+
+
+# -------------------------------------------------------------------
+# Search Settings
+# -------------------------------------------------------------------
+
+# 'auto': pg_trgm index when provisioned, in-process n-gram index otherwise;
+# 'ngram': always resolve names to ids in process; 'scan': plain ILIKE, no index
+SEARCH_STRATEGY = os.environ.get("TOOLS_CAMPAIGN_SEARCH", "auto")
+# How long a trigram index check / in-process name index is trusted before it is rebuilt
+SEARCH_INDEX_TTL = float(os.environ.get("TOOLS_CAMPAIGN_SEARCH_TTL", 600))
+# Above this many matching campaigns an id list stops paying off; fall back to ILIKE
+NGRAM_MAX_IDS = int(os.environ.get("TOOLS_CAMPAIGN_SEARCH_MAX_IDS", 5000))
+
+# Searchable tables: name column searched, id column the names resolve to
+SEARCH_SPECS = {
+    "facebook_campaigns_ads": {"name_column": "campaign_name", "id_column": "campaign_id"},
+    "tiktok_campaign_ad_details": {"name_column": "campaign_name", "id_column": "campaign_id"},
+    "linkedin_ads": {"name_column": "campaign_name", "id_column": "campaign_id"},
+    "bing_advertising_data": {"name_column": "campaign_name", "id_column": "campaign_id"},
+}
+
+# table -> (trigram index present, checked_at)
+_trigram_ready = {}
+# table -> (name index, built_at)
+_name_indexes = {}
+_lock = threading.Lock()
+
+
+def trigram_index_name(table):
+    return f"{table}_{SEARCH_SPECS[table]['name_column']}_trgm_idx"
+
+
+# -------------------------------------------------------------------
+# Provisioning
+# -------------------------------------------------------------------
+
+def ensure_search_indexes(connection, table):
+    """
+    Create the pg_trgm GIN index on the name column and a B-tree on the id column.
+
+    Indexes are built CONCURRENTLY so writers are not blocked. When pg_trgm cannot
+    be installed (no privilege) only the id index is created and searches use the
+    in-process n-gram index. Returns True when the trigram index exists.
+    """
+    spec = SEARCH_SPECS[table]
+    previous_autocommit = connection.autocommit
+    connection.autocommit = True
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {table}_{spec['id_column']}_idx "
+            f"ON {table} ({spec['id_column']})"
+        )
+        try:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {trigram_index_name(table)} "
+                f"ON {table} USING gin ({spec['name_column']} gin_trgm_ops)"
+            )
+            trigram = True
+        except Error as e:
+            logger.warning("pg_trgm index not created for %s, using in-process search: %s", table, e)
+            trigram = False
+    except Error as e:
+        raise Exception(f"Search index setup failed for {table}: {e}")
+    finally:
+        cursor.close()
+        connection.autocommit = previous_autocommit
+
+    with _lock:
+        _trigram_ready.pop(table, None)
+        _name_indexes.pop(table, None)
+    return trigram
+
+
+# -------------------------------------------------------------------
+# In-process N-gram Index
+# -------------------------------------------------------------------
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def build_name_index(rows):
+    """
+    Trigram index over distinct (id, name) pairs.
+
+    Returns {"names": [(lowered name, id), ...], "grams": {trigram: set of positions}}.
+    """
+    names = [(str(name).lower(), campaign_id) for campaign_id, name in rows if name is not None]
+    grams = {}
+    for position, (name, _) in enumerate(names):
+        for gram in _trigrams(name):
+            grams.setdefault(gram, set()).add(position)
+    return {"names": names, "grams": grams}
+
+
+def match_ids(name_index, term):
+    """Ids whose name contains term (case-insensitive), as a sorted list"""
+    term = term.lower()
+    names = name_index["names"]
+    if len(term) < 3:
+        candidates = range(len(names))
+    else:
+        postings = [name_index["grams"].get(gram, set()) for gram in _trigrams(term)]
+        candidates = set.intersection(*sorted(postings, key=len))
+    return sorted({names[position][1] for position in candidates if term in names[position][0]})
+
+
+def _distinct_names_query(source_table, table):
+    spec = SEARCH_SPECS[table]
+    return f"SELECT DISTINCT {spec['id_column']}, {spec['name_column']} FROM {source_table}"
+
+
+def _rows_as_pairs(rows):
+    return [tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in rows]
+
+
+# -------------------------------------------------------------------
+# Query Filters
+# -------------------------------------------------------------------
+
+def _cached(cache, table):
+    with _lock:
+        cached = cache.get(table)
+    if cached and time.monotonic() - cached[1] < SEARCH_INDEX_TTL:
+        return cached[0]
+    return None
+
+
+def _store(cache, table, value):
+    with _lock:
+        cache[table] = (value, time.monotonic())
+    return value
+
+
+def _ilike(table, term):
+    return f"{SEARCH_SPECS[table]['name_column']} ILIKE %s", [f"%{term}%"]
+
+
+def _ids_filter(table, name_index, term):
+    ids = match_ids(name_index, term)
+    if len(ids) > NGRAM_MAX_IDS:
+        return _ilike(table, term)
+    return f"{SEARCH_SPECS[table]['id_column']} = ANY(%s)", [ids]
+
+
+def name_filter(cursor, table, term):
+    """
+    WHERE condition and params matching rows whose name contains term.
+
+    Uses ILIKE when the pg_trgm index exists (an index lookup), otherwise resolves
+    the term to ids through the in-process n-gram index. Returns None without a term.
+    """
+    if not term:
+        return None
+    if SEARCH_STRATEGY == "scan":
+        return _ilike(table, term)
+
+    if SEARCH_STRATEGY == "auto":
+        trigram = _cached(_trigram_ready, table)
+        if trigram is None:
+            cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS ready", (trigram_index_name(table),))
+            trigram = _store(_trigram_ready, table, rollups.first_value(cursor.fetchone()))
+        if trigram:
+            return _ilike(table, term)
+
+    name_index = _cached(_name_indexes, table)
+    if name_index is None:
+        # The rollup holds the same names in far fewer rows
+        source = rollups.rollup_source(table, rollups.rollup_watermark(cursor, table))
+        cursor.execute(_distinct_names_query(source, table))
+        name_index = _store(_name_indexes, table, build_name_index(_rows_as_pairs(cursor.fetchall())))
+    return _ids_filter(table, name_index, term)
+
+
+async def name_filter_async(cursor, table, term):
+    """name_filter for an async (psycopg 3) cursor; shares the same caches"""
+    if not term:
+        return None
+    if SEARCH_STRATEGY == "scan":
+        return _ilike(table, term)
+
+    if SEARCH_STRATEGY == "auto":
+        trigram = _cached(_trigram_ready, table)
+        if trigram is None:
+            await cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS ready", (trigram_index_name(table),))
+            trigram = _store(_trigram_ready, table, rollups.first_value(await cursor.fetchone()))
+        if trigram:
+            return _ilike(table, term)
+
+    name_index = _cached(_name_indexes, table)
+    if name_index is None:
+        source = rollups.rollup_source(table, await rollups.rollup_watermark_async(cursor, table))
+        await cursor.execute(_distinct_names_query(source, table))
+        name_index = _store(_name_indexes, table, build_name_index(_rows_as_pairs(await cursor.fetchall())))
+    return _ids_filter(table, name_index, term)
+
+
+def add_name_filter(where_conditions, params, name_condition):
+    """Append a name_filter() result to a builder's WHERE conditions"""
+    if name_condition:
+        condition, condition_params = name_condition
+        where_conditions.append(condition)
+        params.extend(condition_params)
+
+
+if __name__ == "__main__":
+    # Usage: TOOLS_DB_DSN="host=... dbname=..." python -m tools.campaign_search [table ...]
+    setup_connection = psycopg2.connect(os.environ["TOOLS_DB_DSN"])
+    try:
+        for table in sys.argv[1:] or SEARCH_SPECS:
+            trigram = ensure_search_indexes(setup_connection, table)
+            print(f"{table}: {'pg_trgm' if trigram else 'in-process n-gram'} search")
+    finally:
+        setup_connection.close()
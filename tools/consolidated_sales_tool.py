@@ -3,7 +3,10 @@ from strands import Agent, tool
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from psycopg2 import Error
-import psycopg2.pool
+from tools import db_pool
+from tools.result_cache import cached_tool
+from tools import agent_factory, async_db, customer_aggregates, customer_segments, formatters
+from tools.query_utils import batch_ids, match_requested_ids
 
 # Database configuration - update with your actual PostgreSQL details
 DB_CONFIG = {
@@ -16,48 +19,370 @@ DB_CONFIG = {
 
 TABLE_NAME = "consolidated_profit"  # Update with your actual table name
 
-# Global connection pool
-connection_pool = None
+# -------------------------------------------------------------------
+# Connection Pool Setup
+# -------------------------------------------------------------------
 
 def initialize_connection_pool():
-    """Initialize connection pool"""                                                     
-    global connection_pool
-    try:
-        connection_pool = psycopg2.pool.SimpleConnectionPool(
-            1, 20,  # min and max connections
-            **DB_CONFIG
-        )
-        return connection_pool
-    except Error as e:
-        raise Exception(f"Connection pool initialization failed: {e}")
+    """Initialize (or reuse) the process-wide connection pool"""
+    return db_pool.get_pool(DB_CONFIG)
+
 
 def get_db_connection():
-    """Get database connection from pool"""
-    global connection_pool
-    if connection_pool is None:
-        initialize_connection_pool()
+    """Get database connection from the shared pool"""
+    return db_pool.get_connection(DB_CONFIG)
 
-    try:
-        connection = connection_pool.getconn()
-        return connection
-    except Error as e:
-        raise Exception(f"Database connection failed: {e}")
 
 def return_connection(connection):
-    """Return connection to pool"""
-    global connection_pool
-    if connection_pool and connection:
-        connection_pool.putconn(connection)
+    """Return connection to the shared pool"""
+    db_pool.return_connection(connection)
+
+
+db_pool.warm_up(DB_CONFIG)
 
 def customer_behavior_agent(prompt: str) -> str:
     """Main customer behavior analysis agent"""
-    supervisor_agent = Agent(
-        tools=[analyze_customer_purchase_behavior]
-    )
-    
-    response = supervisor_agent(prompt)
+    response = agent_factory.run_agent(__name__, _build_supervisor_agent, prompt)
     return str(response)
 
+
+def _build_supervisor_agent():
+    """Build the supervisor once; agent_factory reuses it with a fresh conversation per prompt"""
+    return Agent(
+        tools=[analyze_customer_purchase_behavior, analyze_customer_purchase_behavior_batch, analyze_customer_segments]
+    )
+
+def _customer_behavior_query(customer_id, category, merchant_name, analysis_type, min_gross_profit, min_net_profit, min_transactions, sort_by, limit, customer_ids=None, use_aggregates=False):
+    """Build the per-customer query for analysis_type; returns (query, params)"""
+    if use_aggregates:
+        return _customer_aggregate_query(customer_id, analysis_type, min_gross_profit, min_net_profit, min_transactions, sort_by, limit, customer_ids)
+
+    # Build WHERE conditions
+    where_conditions = []
+    params = []
+
+    if customer_id:
+        where_conditions.append("\"Customer ID\" = %s")
+        params.append(customer_id)
+
+    if customer_ids:
+        # Several customers in one round trip, sent as a single array parameter
+        where_conditions.append("\"Customer ID\" = ANY(%s)")
+        params.append(customer_ids)
+
+    if category:
+        where_conditions.append("UPPER(\"Category\") = UPPER(%s)")
+        params.append(category)
+
+    if merchant_name:
+        where_conditions.append("UPPER(\"Merchant_Name\") = UPPER(%s)")
+        params.append(merchant_name)
+
+    where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+
+    # Build HAVING conditions for aggregated metrics
+    having_conditions = []
+    if min_gross_profit:
+        having_conditions.append("SUM(\"Gross Profit\") >= %s")
+        params.append(min_gross_profit)
+
+    if min_net_profit:
+        having_conditions.append("SUM(\"Net Profit\") >= %s")
+        params.append(min_net_profit)
+
+    if min_transactions:
+        having_conditions.append("COUNT(*) >= %s")
+        params.append(min_transactions)
+
+    having_clause = "HAVING " + " AND ".join(having_conditions) if having_conditions else ""
+
+    # Base query for customer behavior analysis
+    if analysis_type == 'customer_profile':
+        query = f"""
+        SELECT 
+            "Customer ID",
+            COUNT(*) as transaction_count,
+            SUM("Gross Profit") as total_gross_profit,
+            SUM("Net Profit") as total_net_profit,
+            SUM("Customer Payment") as total_payments,
+            AVG("Gross Profit") as avg_gross_profit,
+            AVG("Net Profit") as avg_net_profit,
+            AVG("Customer Payment") as avg_payment,
+            ROUND((SUM("Net Profit") / NULLIF(SUM("Gross Profit"), 0)) * 100, 2) as profit_margin_pct,
+            COUNT(DISTINCT "Category") as categories_purchased,
+            COUNT(DISTINCT "Merchant_Name") as merchants_used,
+            STRING_AGG(DISTINCT "Category", ', ') as preferred_categories,
+            STRING_AGG(DISTINCT "Merchant_Name", ', ') as used_merchants,
+            MIN("Gross Profit") as min_transaction_gross,
+            MAX("Gross Profit") as max_transaction_gross
+        FROM {TABLE_NAME}
+        {where_clause}
+        GROUP BY "Customer ID"
+        {having_clause}
+        ORDER BY {sort_by} DESC
+        LIMIT %s
+        """
+
+    elif analysis_type == 'category_preferences':
+        query = f"""
+        SELECT 
+            "Customer ID",
+            "Category",
+            COUNT(*) as transactions_in_category,
+            SUM("Gross Profit") as category_gross_profit,
+            SUM("Net Profit") as category_net_profit,
+            SUM("Customer Payment") as category_payments,
+            AVG("Gross Profit") as avg_category_gross_profit,
+            ROUND((COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (PARTITION BY "Customer ID")), 2) as category_percentage
+        FROM {TABLE_NAME}
+        {where_clause}
+        GROUP BY "Customer ID", "Category"
+        {having_clause}
+        ORDER BY "Customer ID", category_gross_profit DESC
+        LIMIT %s
+        """
+
+    elif analysis_type == 'merchant_relationships':
+        query = f"""
+        SELECT 
+            "Customer ID",
+            "Merchant_Name",
+            COUNT(*) as transactions_with_merchant,
+            SUM("Gross Profit") as merchant_gross_profit,
+            SUM("Net Profit") as merchant_net_profit,
+            SUM("Customer Payment") as merchant_payments,
+            AVG("Gross Profit") as avg_merchant_gross_profit,
+            ROUND((COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (PARTITION BY "Customer ID")), 2) as merchant_percentage
+        FROM {TABLE_NAME}
+        {where_clause}
+        GROUP BY "Customer ID", "Merchant_Name"
+        {having_clause}
+        ORDER BY "Customer ID", merchant_gross_profit DESC
+        LIMIT %s
+        """
+
+    elif analysis_type == 'payment_behavior':
+        query = f"""
+        SELECT 
+            "Customer ID",
+            COUNT(*) as total_transactions,
+            SUM("Customer Payment") as total_payments,
+            SUM("Gross Profit") as total_gross_profit,
+            AVG("Customer Payment") as avg_payment_amount,
+            COUNT(CASE WHEN "Customer Payment" = 0 THEN 1 END) as zero_payment_count,
+            COUNT(CASE WHEN "Customer Payment" > 0 THEN 1 END) as paid_transaction_count,
+            ROUND((COUNT(CASE WHEN "Customer Payment" = 0 THEN 1 END) * 100.0 / COUNT(*)), 2) as zero_payment_percentage,
+            ROUND((SUM("Customer Payment") / NULLIF(SUM("Gross Profit"), 0)) * 100, 2) as payment_to_profit_ratio
+        FROM {TABLE_NAME}
+        {where_clause}
+        GROUP BY "Customer ID"
+        {having_clause}
+        ORDER BY {sort_by} DESC
+        LIMIT %s
+        """
+
+    elif analysis_type == 'lifetime_value':
+        query = f"""
+        SELECT 
+            "Customer ID",
+            COUNT(*) as lifetime_transactions,
+            SUM("Gross Profit") as lifetime_gross_profit,
+            SUM("Net Profit") as lifetime_net_profit,
+            SUM("Customer Payment") as lifetime_payments,
+            AVG("Gross Profit") as avg_transaction_value,
+            ROUND(SUM("Net Profit") / COUNT(*), 2) as avg_profit_per_transaction,
+            COUNT(DISTINCT "Category") as category_diversity,
+            COUNT(DISTINCT "Merchant_Name") as merchant_diversity,
+            ROUND((SUM("Net Profit") / NULLIF(SUM("Gross Profit"), 0)) * 100, 2) as overall_margin_pct
+        FROM {TABLE_NAME}
+        {where_clause}
+        GROUP BY "Customer ID"
+        {having_clause}
+        ORDER BY {sort_by} DESC
+        LIMIT %s
+        """
+
+    else:  # profitability_analysis
+        query = f"""
+        SELECT 
+            "Customer ID",
+            COUNT(*) as transaction_count,
+            SUM("Gross Profit") as total_gross_profit,
+            SUM("Net Profit") as total_net_profit,
+            SUM("Gross Profit") - SUM("Net Profit") as total_costs,
+            ROUND((SUM("Net Profit") / NULLIF(SUM("Gross Profit"), 0)) * 100, 2) as profit_margin,
+            ROUND(SUM("Net Profit") / COUNT(*), 2) as avg_profit_per_transaction,
+            MAX("Net Profit") as highest_profit_transaction,
+            MIN("Net Profit") as lowest_profit_transaction
+        FROM {TABLE_NAME}
+        {where_clause}
+        GROUP BY "Customer ID"
+        {having_clause}
+        ORDER BY {sort_by} DESC
+        LIMIT %s
+        """
+
+    params.append(limit)
+
+    return query, params
+
+
+# Same output columns as _customer_behavior_query, computed from the per-customer aggregate
+_CUSTOMER_AGGREGATE_SELECT = {
+    'customer_profile': """
+            "Customer ID",
+            transaction_count,
+            total_gross_profit,
+            total_net_profit,
+            total_payments,
+            total_gross_profit::NUMERIC / NULLIF(gross_profit_count, 0) as avg_gross_profit,
+            total_net_profit::NUMERIC / NULLIF(net_profit_count, 0) as avg_net_profit,
+            total_payments::NUMERIC / NULLIF(payment_count, 0) as avg_payment,
+            ROUND((total_net_profit / NULLIF(total_gross_profit, 0)) * 100, 2) as profit_margin_pct,
+            CARDINALITY(categories) as categories_purchased,
+            CARDINALITY(merchants) as merchants_used,
+            NULLIF(ARRAY_TO_STRING(categories, ', '), '') as preferred_categories,
+            NULLIF(ARRAY_TO_STRING(merchants, ', '), '') as used_merchants,
+            min_gross_profit as min_transaction_gross,
+            max_gross_profit as max_transaction_gross""",
+    'payment_behavior': """
+            "Customer ID",
+            transaction_count as total_transactions,
+            total_payments,
+            total_gross_profit,
+            total_payments::NUMERIC / NULLIF(payment_count, 0) as avg_payment_amount,
+            zero_payment_count,
+            paid_transaction_count,
+            ROUND((zero_payment_count * 100.0 / transaction_count), 2) as zero_payment_percentage,
+            ROUND((total_payments / NULLIF(total_gross_profit, 0)) * 100, 2) as payment_to_profit_ratio""",
+    'lifetime_value': """
+            "Customer ID",
+            transaction_count as lifetime_transactions,
+            total_gross_profit as lifetime_gross_profit,
+            total_net_profit as lifetime_net_profit,
+            total_payments as lifetime_payments,
+            total_gross_profit::NUMERIC / NULLIF(gross_profit_count, 0) as avg_transaction_value,
+            ROUND(total_net_profit / transaction_count, 2) as avg_profit_per_transaction,
+            CARDINALITY(categories) as category_diversity,
+            CARDINALITY(merchants) as merchant_diversity,
+            ROUND((total_net_profit / NULLIF(total_gross_profit, 0)) * 100, 2) as overall_margin_pct""",
+    'profitability_analysis': """
+            "Customer ID",
+            transaction_count,
+            total_gross_profit,
+            total_net_profit,
+            total_gross_profit - total_net_profit as total_costs,
+            ROUND((total_net_profit / NULLIF(total_gross_profit, 0)) * 100, 2) as profit_margin,
+            ROUND(total_net_profit / transaction_count, 2) as avg_profit_per_transaction,
+            max_net_profit as highest_profit_transaction,
+            min_net_profit as lowest_profit_transaction""",
+}
+
+
+def _customer_aggregate_query(customer_id, analysis_type, min_gross_profit, min_net_profit, min_transactions, sort_by, limit, customer_ids=None):
+    """
+    Per-customer query against the maintained aggregate table; returns (query, params).
+
+    The HAVING thresholds become plain WHERE filters, and ranking by a stored total is
+    an index scan rather than a GROUP BY over every transaction.
+    """
+    where_conditions = []
+    params = []
+
+    if customer_id:
+        where_conditions.append("\"Customer ID\" = %s")
+        params.append(customer_id)
+
+    if customer_ids:
+        where_conditions.append("\"Customer ID\" = ANY(%s)")
+        params.append(customer_ids)
+
+    if min_gross_profit:
+        where_conditions.append("total_gross_profit >= %s")
+        params.append(min_gross_profit)
+
+    if min_net_profit:
+        where_conditions.append("total_net_profit >= %s")
+        params.append(min_net_profit)
+
+    if min_transactions:
+        where_conditions.append("transaction_count >= %s")
+        params.append(min_transactions)
+
+    where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+
+    query = f"""
+        SELECT {_CUSTOMER_AGGREGATE_SELECT[analysis_type]}
+        FROM {customer_aggregates.AGGREGATE_TABLE}
+        {where_clause}
+        ORDER BY {sort_by} DESC
+        LIMIT %s
+        """
+    params.append(limit)
+
+    return query, params
+
+
+def _format_customer_behavior(results, analysis_type, output_format='report'):
+    """Format the per-customer rows for analysis_type"""
+    if not results:
+        return f"No customer data found matching the specified criteria."
+
+    if output_format != 'report':
+        return formatters.render_rows(results, output_format)
+
+    # Format output based on analysis type
+    output = [f"Customer Purchase Behavior Analysis - {analysis_type.replace('_', ' ').title()}\n" + "=" * 80 + "\n\n"]
+
+    if analysis_type == 'customer_profile':
+        for row in results:
+            output.append(
+                f"Customer ID: {row['Customer ID']}\n"
+                f"Total Transactions: {row['transaction_count']}\n"
+                f"Total Gross Profit: ${row['total_gross_profit']:,.2f}\n"
+                f"Total Net Profit: ${row['total_net_profit']:,.2f}\n"
+                f"Total Payments: ${row['total_payments']:,.2f}\n"
+                f"Average Transaction (Gross): ${row['avg_gross_profit']:,.2f}\n"
+                f"Average Transaction (Net): ${row['avg_net_profit']:,.2f}\n"
+                f"Average Payment: ${row['avg_payment']:,.2f}\n"
+                f"Profit Margin: {row['profit_margin_pct']}%\n"
+                f"Categories Purchased: {row['categories_purchased']}\n"
+                f"Merchants Used: {row['merchants_used']}\n"
+                f"Preferred Categories: {row['preferred_categories']}\n"
+                f"Transaction Range: ${row['min_transaction_gross']:,.2f} - ${row['max_transaction_gross']:,.2f}\n"
+                + "-" * 80 + "\n"
+            )
+
+    elif analysis_type == 'payment_behavior':
+        for row in results:
+            output.append(
+                f"Customer ID: {row['Customer ID']}\n"
+                f"Total Transactions: {row['total_transactions']}\n"
+                f"Total Payments Made: ${row['total_payments']:,.2f}\n"
+                f"Average Payment: ${row['avg_payment_amount']:,.2f}\n"
+                f"Zero Payment Transactions: {row['zero_payment_count']}\n"
+                f"Paid Transactions: {row['paid_transaction_count']}\n"
+                f"Zero Payment Rate: {row['zero_payment_percentage']}%\n"
+                f"Payment to Profit Ratio: {row['payment_to_profit_ratio']}%\n"
+                + "-" * 80 + "\n"
+            )
+    else:
+        # Generic formatting for other analysis types
+        for row in results:
+            output.append(f"Customer ID: {row['Customer ID']}\n")
+            for key, value in row.items():
+                if key != 'Customer ID':
+                    if isinstance(value, (int, float)) and 'profit' in key.lower():
+                        output.append(f"{key.replace('_', ' ').title()}: ${value:,.2f}\n")
+                    elif isinstance(value, float):
+                        output.append(f"{key.replace('_', ' ').title()}: {value:,.2f}\n")
+                    else:
+                        output.append(f"{key.replace('_', ' ').title()}: {value}\n")
+            output.append("-" * 80 + "\n")
+
+    return "".join(output)
+
+
 @tool(
     name="analyze_customer_purchase_behavior", 
     description="""
@@ -69,6 +394,7 @@ def customer_behavior_agent(prompt: str) -> str:
     or get insights into customer profitability and preferences.
     """
 )
+@cached_tool(TABLE_NAME, DB_CONFIG, date_column=None)
 def analyze_customer_purchase_behavior(
     customer_id: Optional[str] = None,
     category: Optional[str] = None,
@@ -78,7 +404,8 @@ def analyze_customer_purchase_behavior(
     min_net_profit: Optional[float] = None,
     min_transactions: Optional[int] = 1,
     sort_by: Literal['total_gross_profit', 'total_net_profit', 'transaction_count', 'avg_payment', 'customer_id'] = 'total_gross_profit',
-    limit: Optional[int] = 20
+    limit: Optional[int] = 20,
+    output_format: Literal['report', 'compact', 'markdown'] = 'report'
 ) -> str:
     """
     Analyze customer purchase behavior using Customer ID and profit data
@@ -93,240 +420,288 @@ def analyze_customer_purchase_behavior(
         min_transactions: Minimum number of transactions required
         sort_by: How to sort the results
         limit: Maximum number of customers to analyze
+        output_format: 'report' (readable text), 'compact' (column names once + value lists) or 'markdown' (table)
     """
     connection = None
     cursor = None
     
     try:
-        # Build WHERE conditions
-        where_conditions = []
-        params = []
-        
-        if customer_id:
-            where_conditions.append("\"Customer ID\" = %s")
-            params.append(customer_id)
-        
-        if category:
-            where_conditions.append("UPPER(\"Category\") = UPPER(%s)")
-            params.append(category)
-            
-        if merchant_name:
-            where_conditions.append("UPPER(\"Merchant_Name\") = UPPER(%s)")
-            params.append(merchant_name)
-        
-        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-        
-        # Build HAVING conditions for aggregated metrics
-        having_conditions = []
-        if min_gross_profit:
-            having_conditions.append("SUM(\"Gross Profit\") >= %s")
-            params.append(min_gross_profit)
-            
-        if min_net_profit:
-            having_conditions.append("SUM(\"Net Profit\") >= %s")
-            params.append(min_net_profit)
-            
-        if min_transactions:
-            having_conditions.append("COUNT(*) >= %s")
-            params.append(min_transactions)
-        
-        having_clause = "HAVING " + " AND ".join(having_conditions) if having_conditions else ""
-        
-        # Base query for customer behavior analysis
-        if analysis_type == 'customer_profile':
-            query = f"""
-            SELECT 
-                "Customer ID",
-                COUNT(*) as transaction_count,
-                SUM("Gross Profit") as total_gross_profit,
-                SUM("Net Profit") as total_net_profit,
-                SUM("Customer Payment") as total_payments,
-                AVG("Gross Profit") as avg_gross_profit,
-                AVG("Net Profit") as avg_net_profit,
-                AVG("Customer Payment") as avg_payment,
-                ROUND((SUM("Net Profit") / NULLIF(SUM("Gross Profit"), 0)) * 100, 2) as profit_margin_pct,
-                COUNT(DISTINCT "Category") as categories_purchased,
-                COUNT(DISTINCT "Merchant_Name") as merchants_used,
-                STRING_AGG(DISTINCT "Category", ', ') as preferred_categories,
-                STRING_AGG(DISTINCT "Merchant_Name", ', ') as used_merchants,
-                MIN("Gross Profit") as min_transaction_gross,
-                MAX("Gross Profit") as max_transaction_gross
-            FROM {TABLE_NAME}
-            {where_clause}
-            GROUP BY "Customer ID"
-            {having_clause}
-            ORDER BY {sort_by} DESC
-            LIMIT %s
-            """
-            
-        elif analysis_type == 'category_preferences':
-            query = f"""
-            SELECT 
-                "Customer ID",
-                "Category",
-                COUNT(*) as transactions_in_category,
-                SUM("Gross Profit") as category_gross_profit,
-                SUM("Net Profit") as category_net_profit,
-                SUM("Customer Payment") as category_payments,
-                AVG("Gross Profit") as avg_category_gross_profit,
-                ROUND((COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (PARTITION BY "Customer ID")), 2) as category_percentage
-            FROM {TABLE_NAME}
-            {where_clause}
-            GROUP BY "Customer ID", "Category"
-            {having_clause}
-            ORDER BY "Customer ID", category_gross_profit DESC
-            LIMIT %s
-            """
-            
-        elif analysis_type == 'merchant_relationships':
-            query = f"""
-            SELECT 
-                "Customer ID",
-                "Merchant_Name",
-                COUNT(*) as transactions_with_merchant,
-                SUM("Gross Profit") as merchant_gross_profit,
-                SUM("Net Profit") as merchant_net_profit,
-                SUM("Customer Payment") as merchant_payments,
-                AVG("Gross Profit") as avg_merchant_gross_profit,
-                ROUND((COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (PARTITION BY "Customer ID")), 2) as merchant_percentage
-            FROM {TABLE_NAME}
-            {where_clause}
-            GROUP BY "Customer ID", "Merchant_Name"
-            {having_clause}
-            ORDER BY "Customer ID", merchant_gross_profit DESC
-            LIMIT %s
-            """
-            
-        elif analysis_type == 'payment_behavior':
-            query = f"""
-            SELECT 
-                "Customer ID",
-                COUNT(*) as total_transactions,
-                SUM("Customer Payment") as total_payments,
-                SUM("Gross Profit") as total_gross_profit,
-                AVG("Customer Payment") as avg_payment_amount,
-                COUNT(CASE WHEN "Customer Payment" = 0 THEN 1 END) as zero_payment_count,
-                COUNT(CASE WHEN "Customer Payment" > 0 THEN 1 END) as paid_transaction_count,
-                ROUND((COUNT(CASE WHEN "Customer Payment" = 0 THEN 1 END) * 100.0 / COUNT(*)), 2) as zero_payment_percentage,
-                ROUND((SUM("Customer Payment") / NULLIF(SUM("Gross Profit"), 0)) * 100, 2) as payment_to_profit_ratio
-            FROM {TABLE_NAME}
-            {where_clause}
-            GROUP BY "Customer ID"
-            {having_clause}
-            ORDER BY {sort_by} DESC
-            LIMIT %s
-            """
-            
-        elif analysis_type == 'lifetime_value':
-            query = f"""
-            SELECT 
-                "Customer ID",
-                COUNT(*) as lifetime_transactions,
-                SUM("Gross Profit") as lifetime_gross_profit,
-                SUM("Net Profit") as lifetime_net_profit,
-                SUM("Customer Payment") as lifetime_payments,
-                AVG("Gross Profit") as avg_transaction_value,
-                ROUND(SUM("Net Profit") / COUNT(*), 2) as avg_profit_per_transaction,
-                COUNT(DISTINCT "Category") as category_diversity,
-                COUNT(DISTINCT "Merchant_Name") as merchant_diversity,
-                ROUND((SUM("Net Profit") / NULLIF(SUM("Gross Profit"), 0)) * 100, 2) as overall_margin_pct
-            FROM {TABLE_NAME}
-            {where_clause}
-            GROUP BY "Customer ID"
-            {having_clause}
-            ORDER BY {sort_by} DESC
-            LIMIT %s
-            """
-            
-        else:  # profitability_analysis
-            query = f"""
-            SELECT 
-                "Customer ID",
-                COUNT(*) as transaction_count,
-                SUM("Gross Profit") as total_gross_profit,
-                SUM("Net Profit") as total_net_profit,
-                SUM("Gross Profit") - SUM("Net Profit") as total_costs,
-                ROUND((SUM("Net Profit") / NULLIF(SUM("Gross Profit"), 0)) * 100, 2) as profit_margin,
-                ROUND(SUM("Net Profit") / COUNT(*), 2) as avg_profit_per_transaction,
-                MAX("Net Profit") as highest_profit_transaction,
-                MIN("Net Profit") as lowest_profit_transaction
-            FROM {TABLE_NAME}
-            {where_clause}
-            GROUP BY "Customer ID"
-            {having_clause}
-            ORDER BY {sort_by} DESC
-            LIMIT %s
-            """
-        
-        params.append(limit)
-        
-        print(f"Executing query: {query}")
-        print(f"Parameters: {params}")
-        
         connection = get_db_connection()
         cursor = connection.cursor(cursor_factory=RealDictCursor)
+        use_aggregates = customer_aggregates.serves(analysis_type, category, merchant_name) and customer_aggregates.aggregates_ready(cursor)
+        query, params = _customer_behavior_query(customer_id, category, merchant_name, analysis_type, min_gross_profit, min_net_profit, min_transactions, sort_by, limit, use_aggregates=use_aggregates)
         cursor.execute(query, params)
-        results = cursor.fetchall()
-        
-        if not results:
-            return f"No customer data found matching the specified criteria."
-        
-        # Format output based on analysis type
-        output = f"Customer Purchase Behavior Analysis - {analysis_type.replace('_', ' ').title()}\n" + "=" * 80 + "\n\n"
-        
-        if analysis_type == 'customer_profile':
-            for row in results:
-                output += (
-                    f"Customer ID: {row['Customer ID']}\n"
-                    f"Total Transactions: {row['transaction_count']}\n"
-                    f"Total Gross Profit: ${row['total_gross_profit']:,.2f}\n"
-                    f"Total Net Profit: ${row['total_net_profit']:,.2f}\n"
-                    f"Total Payments: ${row['total_payments']:,.2f}\n"
-                    f"Average Transaction (Gross): ${row['avg_gross_profit']:,.2f}\n"
-                    f"Average Transaction (Net): ${row['avg_net_profit']:,.2f}\n"
-                    f"Average Payment: ${row['avg_payment']:,.2f}\n"
-                    f"Profit Margin: {row['profit_margin_pct']}%\n"
-                    f"Categories Purchased: {row['categories_purchased']}\n"
-                    f"Merchants Used: {row['merchants_used']}\n"
-                    f"Preferred Categories: {row['preferred_categories']}\n"
-                    f"Transaction Range: ${row['min_transaction_gross']:,.2f} - ${row['max_transaction_gross']:,.2f}\n"
-                    + "-" * 80 + "\n"
-                )
-                
-        elif analysis_type == 'payment_behavior':
-            for row in results:
-                output += (
-                    f"Customer ID: {row['Customer ID']}\n"
-                    f"Total Transactions: {row['total_transactions']}\n"
-                    f"Total Payments Made: ${row['total_payments']:,.2f}\n"
-                    f"Average Payment: ${row['avg_payment_amount']:,.2f}\n"
-                    f"Zero Payment Transactions: {row['zero_payment_count']}\n"
-                    f"Paid Transactions: {row['paid_transaction_count']}\n"
-                    f"Zero Payment Rate: {row['zero_payment_percentage']}%\n"
-                    f"Payment to Profit Ratio: {row['payment_to_profit_ratio']}%\n"
-                    + "-" * 80 + "\n"
-                )
-        else:
-            # Generic formatting for other analysis types
-            for row in results:
-                output += f"Customer ID: {row['Customer ID']}\n"
-                for key, value in row.items():
-                    if key != 'Customer ID':
-                        if isinstance(value, (int, float)) and 'profit' in key.lower():
-                            output += f"{key.replace('_', ' ').title()}: ${value:,.2f}\n"
-                        elif isinstance(value, float):
-                            output += f"{key.replace('_', ' ').title()}: {value:,.2f}\n"
-                        else:
-                            output += f"{key.replace('_', ' ').title()}: {value}\n"
-                output += "-" * 80 + "\n"
-        
-        return output
+        return _format_customer_behavior(cursor.fetchall(), analysis_type, output_format)
+    except Exception as e:
+        return f"Error analyzing customer behavior: {str(e)}"
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            return_connection(connection)
+
+
+async def analyze_customer_purchase_behavior_async(
+    customer_id: Optional[str] = None,
+    category: Optional[str] = None,
+    merchant_name: Optional[str] = None,
+    analysis_type: Literal['customer_profile', 'profitability_analysis', 'category_preferences', 'merchant_relationships', 'payment_behavior', 'lifetime_value'] = 'customer_profile',
+    min_gross_profit: Optional[float] = None,
+    min_net_profit: Optional[float] = None,
+    min_transactions: Optional[int] = 1,
+    sort_by: Literal['total_gross_profit', 'total_net_profit', 'transaction_count', 'avg_payment', 'customer_id'] = 'total_gross_profit',
+    limit: Optional[int] = 20,
+    output_format: Literal['report', 'compact', 'markdown'] = 'report'
+) -> str:
+    """Async variant of analyze_customer_purchase_behavior on the psycopg 3 pool"""
+    try:
+        async with async_db.connection(DB_CONFIG) as connection:
+            async with connection.cursor() as cursor:
+                use_aggregates = customer_aggregates.serves(analysis_type, category, merchant_name) and await customer_aggregates.aggregates_ready_async(cursor)
+                query, params = _customer_behavior_query(customer_id, category, merchant_name, analysis_type, min_gross_profit, min_net_profit, min_transactions, sort_by, limit, use_aggregates=use_aggregates)
+                await async_db.execute(cursor, query, params)
+                results = await cursor.fetchall()
+        return _format_customer_behavior(results, analysis_type, output_format)
+    except Exception as e:
+        return f"Error analyzing customer behavior: {str(e)}"
+
+
+def _customer_batch_query(customer_ids, category, merchant_name, analysis_type, min_transactions, use_aggregates=False):
+    """Build the batch query: every row for the requested customers, no limit; returns (query, params)"""
+    return _customer_behavior_query(
+        None, category, merchant_name, analysis_type, None, None, min_transactions, '"Customer ID"', None,
+        customer_ids=customer_ids, use_aggregates=use_aggregates
+    )
+
+
+def _format_customer_batch(results, missing_ids, analysis_type, output_format):
+    """Format the batch rows, noting requested customers with no matching rows"""
+    if output_format != 'report':
+        return formatters.render_rows(
+            results, output_format, summary={"missing_customer_ids": missing_ids} if missing_ids else None
+        )
+    output = _format_customer_behavior(results, analysis_type)
+    if missing_ids:
+        output += f"\nNo data found for customer IDs: {', '.join(missing_ids)}\n"
+    return output
+
+
+@tool(
+    name="analyze_customer_purchase_behavior_batch",
+    description="""
+    Customer purchase behavior analysis for several specific customer IDs at once, in a single query.
+    Returns the same per-customer analysis as analyze_customer_purchase_behavior (profile, profitability,
+    category preferences, merchant relationships, payment behavior or lifetime value) for every requested customer.
+    Use this instead of calling analyze_customer_purchase_behavior once per customer when the user names multiple customers.
+    """
+)
+@cached_tool(TABLE_NAME, DB_CONFIG, date_column=None)
+def analyze_customer_purchase_behavior_batch(
+    customer_ids: List[str],
+    category: Optional[str] = None,
+    merchant_name: Optional[str] = None,
+    analysis_type: Literal['customer_profile', 'profitability_analysis', 'category_preferences', 'merchant_relationships', 'payment_behavior', 'lifetime_value'] = 'customer_profile',
+    min_transactions: Optional[int] = 1,
+    output_format: Literal['report', 'compact', 'markdown'] = 'report'
+) -> str:
+    """
+    Analyze purchase behavior for a list of customers in one round trip
+    
+    Args:
+        customer_ids: Customer IDs to analyze (exact match)
+        category: Filter by product/service category
+        merchant_name: Filter by specific merchant
+        analysis_type: Type of analysis to perform
+        min_transactions: Minimum number of transactions required
+        output_format: 'report' (readable text), 'compact' (column names once + value lists) or 'markdown' (table)
+    """
+    connection = None
+    cursor = None
+    
+    try:
+        customer_ids = batch_ids(customer_ids, "customer_ids")
         
+        connection = get_db_connection()
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        use_aggregates = customer_aggregates.serves(analysis_type, category, merchant_name) and customer_aggregates.aggregates_ready(cursor)
+        query, params = _customer_batch_query(customer_ids, category, merchant_name, analysis_type, min_transactions, use_aggregates)
+        cursor.execute(query, params)
+        results, missing_ids = match_requested_ids(cursor.fetchall(), "Customer ID", customer_ids)
+        return _format_customer_batch(results, missing_ids, analysis_type, output_format)
+    except Exception as e:
+        return f"Error analyzing customer behavior: {str(e)}"
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            return_connection(connection)
+
+
+async def analyze_customer_purchase_behavior_batch_async(
+    customer_ids: List[str],
+    category: Optional[str] = None,
+    merchant_name: Optional[str] = None,
+    analysis_type: Literal['customer_profile', 'profitability_analysis', 'category_preferences', 'merchant_relationships', 'payment_behavior', 'lifetime_value'] = 'customer_profile',
+    min_transactions: Optional[int] = 1,
+    output_format: Literal['report', 'compact', 'markdown'] = 'report'
+) -> str:
+    """Async variant of analyze_customer_purchase_behavior_batch on the psycopg 3 pool"""
+    try:
+        customer_ids = batch_ids(customer_ids, "customer_ids")
+        async with async_db.connection(DB_CONFIG) as connection:
+            async with connection.cursor() as cursor:
+                use_aggregates = customer_aggregates.serves(analysis_type, category, merchant_name) and await customer_aggregates.aggregates_ready_async(cursor)
+                query, params = _customer_batch_query(customer_ids, category, merchant_name, analysis_type, min_transactions, use_aggregates)
+                await async_db.execute(cursor, query, params)
+                rows = await cursor.fetchall()
+        results, missing_ids = match_requested_ids(rows, "Customer ID", customer_ids)
+        return _format_customer_batch(results, missing_ids, analysis_type, output_format)
     except Exception as e:
         return f"Error analyzing customer behavior: {str(e)}"
+
+
+# Segments and orderings offered by analyze_customer_segments; the recency ones only when
+# customer_segments.RECENCY_DATE_COLUMN is set
+SegmentName = Literal[tuple(customer_segments.AVAILABLE_SEGMENTS)]
+SegmentSort = Literal[tuple(customer_segments.SORT_COLUMNS)]
+
+_RECENCY_NOTE = "" if customer_segments.RECENCY_DATE_COLUMN else f"""
+    Recency is not tracked (TOOLS_RFM_DATE_COLUMN is unset), so {', '.join(customer_segments.RECENCY_SEGMENTS)} and sorting by recency are unavailable."""
+
+
+def _customer_segments_query(segment, sort_by, limit):
+    """Segment summary (no segment) or the top customers of one segment, from the precomputed scores; returns (query, params)"""
+    if segment and segment not in customer_segments.AVAILABLE_SEGMENTS:
+        raise Exception(f"Segment {segment} is not available; choose one of {', '.join(customer_segments.AVAILABLE_SEGMENTS)}")
+    if sort_by not in customer_segments.SORT_COLUMNS:
+        raise Exception(f"Cannot sort by {sort_by}; choose one of {', '.join(customer_segments.SORT_COLUMNS)}")
+
+    if not segment:
+        query = f"""
+        SELECT 
+            segment,
+            COUNT(*) as customers,
+            SUM(lifetime_value) as total_lifetime_value,
+            AVG(lifetime_value) as avg_lifetime_value,
+            AVG(frequency) as avg_transactions,
+            AVG(monetary) as avg_gross_profit,
+            ROUND((SUM(lifetime_value) * 100.0 / NULLIF(SUM(SUM(lifetime_value)) OVER (), 0))::NUMERIC, 2) as value_share_pct
+        FROM {customer_segments.SCORES_TABLE}
+        GROUP BY segment
+        ORDER BY total_lifetime_value DESC NULLS LAST
+        """
+        return query, []
+
+    # Most recent buyers first for recency; otherwise highest first (lifetime_value is the indexed order)
+    direction = "ASC" if sort_by == 'recency_days' else "DESC"
+    query = f"""
+        SELECT 
+            "Customer ID",
+            segment,
+            rfm_score,
+            frequency as transaction_count,
+            monetary as total_gross_profit,
+            lifetime_value as total_net_profit,
+            recency_days,
+            ltv_score
+        FROM {customer_segments.SCORES_TABLE}
+        WHERE segment = %s
+        ORDER BY {sort_by} {direction} NULLS LAST
+        LIMIT %s
+        """
+    return query, [segment, limit]
+
+
+def _format_customer_segments(results, segment, output_format):
+    """Format the segment summary or member list"""
+    if not results:
+        return f"No scored customers found{f' in segment {segment}' if segment else ''}."
+
+    if output_format != 'report':
+        return formatters.render_rows(results, output_format)
+
+    if not segment:
+        output = ["Customer Segments (RFM / Lifetime Value)\n" + "=" * 80 + "\n\n"]
+        for row in results:
+            output.append(
+                f"{row['segment'].replace('_', ' ').title()}: {row['customers']:,} customers\n"
+                f"  Lifetime Value (Net Profit): ${row['total_lifetime_value'] or 0:,.2f} ({row['value_share_pct'] or 0}% of total)\n"
+                f"  Average Lifetime Value: ${row['avg_lifetime_value'] or 0:,.2f}\n"
+                f"  Average Transactions: {row['avg_transactions']:,.1f}\n"
+                f"  Average Gross Profit: ${row['avg_gross_profit'] or 0:,.2f}\n"
+            )
+        return "".join(output)
+
+    output = [f"Customers in Segment: {segment.replace('_', ' ').title()}\n" + "=" * 80 + "\n\n"]
+    for row in results:
+        output.append(
+            f"Customer ID: {row['Customer ID']}\n"
+            f"RFM Score: {row['rfm_score']} (LTV score {row['ltv_score']})\n"
+            f"Transactions: {row['transaction_count']}\n"
+            f"Total Gross Profit: ${row['total_gross_profit'] or 0:,.2f}\n"
+            f"Total Net Profit: ${row['total_net_profit'] or 0:,.2f}\n"
+            + (f"Days Since Last Purchase: {row['recency_days']:.0f}\n" if row['recency_days'] is not None else "")
+            + "-" * 80 + "\n"
+        )
+    return "".join(output)
+
+
+@tool(
+    name="analyze_customer_segments",
+    description=f"""
+    Customer segmentation from precomputed RFM (recency, frequency, monetary) and lifetime-value scores.
+    Without a segment, summarizes every segment (customer count, lifetime value and its share of the total).
+    With a segment, lists that segment's top customers.
+    Segments: {', '.join(customer_segments.AVAILABLE_SEGMENTS)}.{_RECENCY_NOTE}
+    Use this for questions about customer segments, high-value customers, or which customers fall in a segment,
+    instead of aggregating raw transactions with analyze_customer_purchase_behavior.
+    """
+)
+@cached_tool(customer_segments.SCORES_TABLE, DB_CONFIG, date_column=None)
+def analyze_customer_segments(
+    segment: Optional[SegmentName] = None,
+    sort_by: SegmentSort = 'lifetime_value',
+    limit: Optional[int] = 20,
+    output_format: Literal['report', 'compact', 'markdown'] = 'report'
+) -> str:
+    """
+    Summarize customer segments or list the customers in one segment
     
+    Args:
+        segment: Segment to list customers for; omit for a summary of all segments
+        sort_by: Order of the listed customers (recency_days, when tracked, lists the most recent buyers first)
+        limit: Maximum number of customers to list
+        output_format: 'report' (readable text), 'compact' (column names once + value lists) or 'markdown' (table)
+    """
+    connection = None
+    cursor = None
+    
+    try:
+        query, params = _customer_segments_query(segment, sort_by, limit)
+        
+        connection = get_db_connection()
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(query, params)
+        return _format_customer_segments(cursor.fetchall(), segment, output_format)
+    except Exception as e:
+        return f"Error analyzing customer segments: {str(e)}"
     finally:
         if cursor:
             cursor.close()
         if connection:
-            return_connection(connection)
\ No newline at end of file
+            return_connection(connection)
+
+
+async def analyze_customer_segments_async(
+    segment: Optional[SegmentName] = None,
+    sort_by: SegmentSort = 'lifetime_value',
+    limit: Optional[int] = 20,
+    output_format: Literal['report', 'compact', 'markdown'] = 'report'
+) -> str:
+    """Async variant of analyze_customer_segments on the psycopg 3 pool"""
+    try:
+        query, params = _customer_segments_query(segment, sort_by, limit)
+        results = await async_db.fetch_all(DB_CONFIG, query, params)
+        return _format_customer_segments(results, segment, output_format)
+    except Exception as e:
+        return f"Error analyzing customer segments: {str(e)}"
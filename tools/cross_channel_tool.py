@@ -0,0 +1,442 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional, Literal, List
+
+from psycopg2.extras import RealDictCursor
+from strands import tool
+
+from tools import db_pool, facebook_ads, tiktok_ads_tool, Linkedin_ads_tool, bing_tools, unified_metrics
+from tools.result_cache import cached_tool
+
+
+# -------------------------------------------------------------------
+# Fan-out Settings
+# -------------------------------------------------------------------
+
+# Channel name -> module exposing fetch_campaign_performance / fetch_campaign_trends
+CHANNELS = {
+    "facebook": facebook_ads,
+    "tiktok": tiktok_ads_tool,
+    "linkedin": Linkedin_ads_tool,
+    "bing": bing_tools,
+}
+
+# Queries run at once (totals + trends per channel); each holds one pooled connection while it runs
+CROSS_CHANNEL_MAX_WORKERS = int(os.environ.get("TOOLS_CROSS_CHANNEL_WORKERS", 2 * len(CHANNELS)))
+# Seconds a channel query may run, counted from when it starts; also set as its statement_timeout
+CROSS_CHANNEL_TIMEOUT = float(os.environ.get("TOOLS_CROSS_CHANNEL_TIMEOUT", 60))
+
+# Shared across calls so threads are not spawned per request
+_executor = ThreadPoolExecutor(max_workers=CROSS_CHANNEL_MAX_WORKERS, thread_name_prefix="cross-channel")
+
+# All four channels live in the same database; the unified metrics table sits beside them
+DB_CONFIG = facebook_ads.DB_CONFIG
+
+
+def _to_float(value):
+    return float(value) if value is not None else 0.0
+
+
+def _ratio(numerator, denominator, scale=1.0):
+    return numerator / denominator * scale if denominator else None
+
+
+# -------------------------------------------------------------------
+# Per-channel Work
+# -------------------------------------------------------------------
+
+def _date_filter(date_from, date_to):
+    """
+    (date_from, date_to, time_operator) for a channel performance query.
+
+    Those queries apply BETWEEN only when both dates are set and otherwise compare
+    date_from with time_operator, so a lone upper bound is passed as date_from with '<='.
+    """
+    if date_from and date_to:
+        return date_from, date_to, 'between'
+    if date_from:
+        return date_from, None, '>='
+    if date_to:
+        return date_to, None, '<='
+    return None, None, 'between'
+
+
+def _channel_totals(module, campaign_name, date_from, date_to):
+    """Summary totals from the channel's performance query (detail rows are not needed)"""
+    date_from, date_to, time_operator = _date_filter(date_from, date_to)
+    _, summary, _ = module.fetch_campaign_performance(
+        campaign_name=campaign_name,
+        date_from=date_from,
+        date_to=date_to,
+        time_operator=time_operator,
+        limit=1
+    )
+    return {
+        "impressions": _to_float(summary.get("total_impressions")),
+        "clicks": _to_float(summary.get("total_clicks")),
+        "spend": _to_float(summary.get("total_spend")),
+        "conversions": _to_float(summary.get("total_conversions")),
+    }
+
+
+def _channel_trends(module, campaign_name, period, date_from, date_to, days_back):
+    """Per-period rows from the channel's trends query"""
+    return module.fetch_campaign_trends(
+        campaign_name=campaign_name,
+        period=period,
+        date_from=date_from,
+        date_to=date_to,
+        days_back=days_back
+    )
+
+
+def _unified_comparison(channels, campaign_name, period, date_from, date_to, days_back):
+    """
+    Totals (and per-period rows) for every channel from the unified metrics table.
+
+    Returns (totals_by_channel, trends_by_channel), or None when the table is not
+    ready or behind any selected channel's source table, and the per-channel
+    queries have to run instead.
+    """
+    connection = None
+    cursor = None
+    try:
+        connection = db_pool.get_connection(DB_CONFIG)
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        if not unified_metrics.unified_ready(cursor) or not unified_metrics.unified_current(cursor, channels):
+            return None
+
+        query, params = unified_metrics.metrics_query(
+            group_by="channel", channels=channels, campaign_name=campaign_name, date_from=date_from, date_to=date_to
+        )
+        cursor.execute(query, params)
+        totals_by_channel = {
+            row["channel"]: {metric: _to_float(row[metric]) for metric in ("impressions", "clicks", "spend", "conversions")}
+            for row in cursor.fetchall()
+        }
+
+        trends_by_channel = {}
+        if period:
+            query, params = unified_metrics.metrics_query(
+                group_by="channel_period", period=period, channels=channels, campaign_name=campaign_name,
+                date_from=date_from, date_to=date_to, days_back=days_back
+            )
+            cursor.execute(query, params)
+            for row in cursor.fetchall():
+                trends_by_channel.setdefault(row["channel"], []).append(row)
+        return totals_by_channel, trends_by_channel
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            db_pool.return_connection(connection)
+
+
+def _run_job(started, name, func, args):
+    """Run one fan-out job under the channel statement timeout, noting when it started"""
+    started[name] = time.monotonic()
+    with db_pool.statement_timeout(CROSS_CHANNEL_TIMEOUT):
+        result = func(*args)
+    return result, time.monotonic() - started[name]
+
+
+def _fan_out(jobs):
+    """
+    Run {name: (func, args)} concurrently on the shared executor.
+
+    Returns {name: (result, seconds, error)}; a failing or slow channel only
+    affects its own entry. Each job gets CROSS_CHANNEL_TIMEOUT from the moment a
+    worker picks it up, and its queries are stopped server-side at that limit, so
+    a timed-out channel does not keep a worker and a connection busy.
+    """
+    started = {}
+    futures = {name: _executor.submit(_run_job, started, name, func, args) for name, (func, args) in jobs.items()}
+
+    pending = set(futures)
+    timed_out = set()
+    while pending:
+        now = time.monotonic()
+        for name in [name for name in pending if name in started and now - started[name] >= CROSS_CHANNEL_TIMEOUT]:
+            pending.discard(name)
+            timed_out.add(name)
+        if not pending:
+            break
+        # Queued jobs have no deadline until a worker starts them; the next pass picks it up
+        deadlines = [started[name] + CROSS_CHANNEL_TIMEOUT for name in pending if name in started]
+        timeout = max(min(deadlines) - now, 0) if deadlines else CROSS_CHANNEL_TIMEOUT
+        done, _ = wait([futures[name] for name in pending], timeout=timeout, return_when=FIRST_COMPLETED)
+        pending -= {name for name in pending if futures[name] in done}
+
+    outcomes = {}
+    for name, future in futures.items():
+        if name in timed_out and not future.done():
+            outcomes[name] = (None, None, f"timed out after {CROSS_CHANNEL_TIMEOUT:.0f}s")
+            continue
+        try:
+            result, seconds = future.result()
+            outcomes[name] = (result, seconds, None)
+        except Exception as e:
+            outcomes[name] = (None, None, str(e))
+    return outcomes
+
+
+# -------------------------------------------------------------------
+# Normalization
+# -------------------------------------------------------------------
+
+def normalize_channel_totals(totals_by_channel):
+    """
+    Derive comparable efficiency metrics from each channel's raw totals.
+
+    Rates are recomputed from the summed totals (not averaged per row) so every
+    channel is measured the same way regardless of how its own tool reports them.
+    """
+    total_spend = sum(totals["spend"] for totals in totals_by_channel.values())
+    rows = []
+    for channel, totals in totals_by_channel.items():
+        rows.append({
+            "channel": channel,
+            "impressions": totals["impressions"],
+            "clicks": totals["clicks"],
+            "spend": totals["spend"],
+            "conversions": totals["conversions"],
+            "ctr_percent": _ratio(totals["clicks"], totals["impressions"], 100),
+            "cpc": _ratio(totals["spend"], totals["clicks"]),
+            "cpm": _ratio(totals["spend"], totals["impressions"], 1000),
+            "conversion_rate": _ratio(totals["conversions"], totals["clicks"], 100),
+            "cost_per_conversion": _ratio(totals["spend"], totals["conversions"]),
+            "spend_share": _ratio(totals["spend"], total_spend, 100),
+        })
+    rows.sort(key=lambda row: (row["cost_per_conversion"] is None, row["cost_per_conversion"] or 0))
+    return rows
+
+
+def _fmt(value, pattern, missing="N/A"):
+    return pattern.format(value) if value is not None else missing
+
+
+# -------------------------------------------------------------------
+# Tool
+# -------------------------------------------------------------------
+
+@tool(
+    name="cross_channel_comparison",
+    description="""
+    Compare spend efficiency across Facebook, TikTok, LinkedIn and Bing Ads in one call.
+    Runs each channel's campaign performance query concurrently and returns one normalized table
+    with impressions, clicks, spend, conversions, CTR, CPC, CPM, conversion rate, cost per conversion
+    and share of spend per channel. Optionally adds a per-period trend of one metric for every channel.
+    Use this when users ask to compare channels, rank platforms by efficiency, or see where budget goes.
+    """
+)
+def cross_channel_comparison(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    channels: Optional[List[str]] = None,
+    campaign_name: Optional[str] = None,
+    period: Optional[Literal['daily', 'weekly', 'monthly']] = None,
+    trend_metric: Literal['impressions', 'clicks', 'spend', 'conversions'] = 'spend',
+    days_back: Optional[int] = 30
+) -> str:
+    """
+    Compare channels side by side using their existing performance and trend queries
+
+    Args:
+        date_from: Start date (YYYY-MM-DD format)
+        date_to: End date (YYYY-MM-DD format)
+        channels: Subset of ['facebook', 'tiktok', 'linkedin', 'bing']; all when omitted
+        campaign_name: Only include campaigns whose name contains this text
+        period: Add a daily/weekly/monthly trend section when set
+        trend_metric: Metric shown in the trend section
+        days_back: Trend window when no date range is given
+    """
+    try:
+        selected = [channel.strip().lower() for channel in channels] if channels else list(CHANNELS)
+        unknown = [channel for channel in selected if channel not in CHANNELS]
+        if unknown:
+            return f"Error processing request: unknown channels {unknown}; choose from {list(CHANNELS)}"
+
+        started = time.perf_counter()
+        failures = {}
+        unified = _unified_comparison(selected, campaign_name, period, date_from, date_to, days_back)
+        if unified is not None:
+            # One scan of the unified table instead of one query per channel
+            totals_by_channel, trends_by_channel = unified
+            query_note = f"from {unified_metrics.UNIFIED_TABLE}"
+        else:
+            jobs = {
+                ("totals", channel): (_channel_totals, (CHANNELS[channel], campaign_name, date_from, date_to))
+                for channel in selected
+            }
+            if period:
+                for channel in selected:
+                    jobs[("trends", channel)] = (
+                        _channel_trends,
+                        (CHANNELS[channel], campaign_name, period, date_from, date_to, days_back)
+                    )
+
+            outcomes = _fan_out(jobs)
+
+            totals_by_channel = {}
+            trends_by_channel = {}
+            slowest = 0.0
+            for (kind, channel), (result, seconds, error) in outcomes.items():
+                if error:
+                    failures[f"{channel} {kind}"] = error
+                    continue
+                slowest = max(slowest, seconds)
+                if kind == "totals":
+                    totals_by_channel[channel] = result
+                else:
+                    trends_by_channel[channel] = result
+            query_note = f"slowest channel {slowest:.2f}s"
+        wall_seconds = time.perf_counter() - started
+
+        output = "Cross-Channel Performance Comparison\n" + "=" * 60 + "\n\n"
+        output += f"Date Range: {date_from or 'all'} to {date_to or 'latest'}\n"
+        output += f"Channels: {', '.join(selected)}\n"
+        output += f"Query Time: {wall_seconds:.2f}s ({query_note})\n\n"
+
+        if totals_by_channel:
+            output += (
+                "| Channel | Impressions | Clicks | Spend | Conversions | CTR | CPC | CPM | Conv. Rate | Cost/Conv. | Spend Share |\n"
+                "|---|---|---|---|---|---|---|---|---|---|---|\n"
+            )
+            for row in normalize_channel_totals(totals_by_channel):
+                output += (
+                    f"| {row['channel']} "
+                    f"| {row['impressions']:,.0f} "
+                    f"| {row['clicks']:,.0f} "
+                    f"| ${row['spend']:,.2f} "
+                    f"| {row['conversions']:,.0f} "
+                    f"| {_fmt(row['ctr_percent'], '{:.2f}%')} "
+                    f"| {_fmt(row['cpc'], '${:.2f}')} "
+                    f"| {_fmt(row['cpm'], '${:.2f}')} "
+                    f"| {_fmt(row['conversion_rate'], '{:.2f}%')} "
+                    f"| {_fmt(row['cost_per_conversion'], '${:.2f}')} "
+                    f"| {_fmt(row['spend_share'], '{:.1f}%')} |\n"
+                )
+            output += "\nChannels are ordered by cost per conversion (lowest first).\n"
+        else:
+            output += "No campaign data found for the selected channels.\n"
+
+        if period:
+            trend_rows = {}
+            for channel in selected:
+                for row in trends_by_channel.get(channel) or []:
+                    trend_rows.setdefault(row["period"], {})[channel] = row.get(trend_metric)
+
+            output += f"\n{trend_metric.title()} by {period} period\n" + "-" * 60 + "\n"
+            output += "| Period | " + " | ".join(selected) + " |\n"
+            output += "|---|" + "---|" * len(selected) + "\n"
+            for period_label in sorted(trend_rows):
+                values = trend_rows[period_label]
+                output += f"| {period_label} | " + " | ".join(
+                    f"{_to_float(values[channel]):,.2f}" if channel in values else "-"
+                    for channel in selected
+                ) + " |\n"
+
+        if failures:
+            output += "\nChannels with errors:\n"
+            for name, error in failures.items():
+                output += f"- {name}: {error}\n"
+
+        return output
+
+    except Exception as e:
+        return f"Error processing request: {str(e)}"
+
+
+@tool(
+    name="unified_channel_metrics",
+    description="""
+    Query blended Facebook, TikTok, LinkedIn and Bing Ads metrics from one normalized daily table.
+    Groups by channel, campaign, period, or channel and period, and reports impressions, clicks, spend,
+    conversions, CTR, CPC, CPM, conversion rate (per click) and cost per conversion computed the same way
+    for every channel. Use this for blended cross-channel totals, top campaigns across all channels,
+    or combined spend over time.
+    """
+)
+@cached_tool(unified_metrics.UNIFIED_TABLE, DB_CONFIG)
+def unified_channel_metrics(
+    group_by: Literal['channel', 'campaign', 'period', 'channel_period'] = 'channel',
+    period: Literal['daily', 'weekly', 'monthly'] = 'daily',
+    channels: Optional[List[str]] = None,
+    campaign_name: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    days_back: Optional[int] = None,
+    limit: Optional[int] = 50
+) -> str:
+    """
+    Blended cross-channel metrics in one query over the unified metrics table
+
+    Args:
+        group_by: channel, campaign, period, or channel_period
+        period: Period size for the period groupings (daily, weekly, monthly)
+        channels: Subset of ['facebook', 'tiktok', 'linkedin', 'bing']; all when omitted
+        campaign_name: Only include campaigns whose name contains this text
+        date_from: Start date (YYYY-MM-DD format)
+        date_to: End date (YYYY-MM-DD format)
+        days_back: Look back this many days when no date range is given
+        limit: Maximum number of rows returned
+    """
+    connection = None
+    cursor = None
+    try:
+        selected = [channel.strip().lower() for channel in channels] if channels else None
+        unknown = [channel for channel in selected or [] if channel not in unified_metrics.CHANNEL_TABLES]
+        if unknown:
+            return f"Error processing request: unknown channels {unknown}; choose from {list(unified_metrics.CHANNEL_TABLES)}"
+
+        connection = db_pool.get_connection(DB_CONFIG)
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        if not unified_metrics.unified_ready(cursor):
+            return (
+                f"Error processing request: {unified_metrics.UNIFIED_TABLE} is not populated; "
+                f"run python -m tools.unified_metrics or use cross_channel_comparison"
+            )
+
+        query, params = unified_metrics.metrics_query(
+            group_by=group_by, period=period, channels=selected, campaign_name=campaign_name,
+            date_from=date_from, date_to=date_to, days_back=days_back, limit=limit
+        )
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        if not rows:
+            return "No campaign data found for the specified criteria."
+
+        keys = unified_metrics.GROUPINGS[group_by]
+        output = f"Unified Channel Metrics by {group_by.replace('_', ' ')}\n" + "=" * 60 + "\n\n"
+        output += f"Date Range: {date_from or 'all'} to {date_to or 'latest'}\n"
+        output += f"Channels: {', '.join(selected or unified_metrics.CHANNEL_TABLES)}\n\n"
+        output += (
+            "| " + " | ".join(key.replace('_', ' ').title() for key in keys) +
+            " | Impressions | Clicks | Spend | Conversions | CTR | CPC | CPM | Conv. Rate | Cost/Conv. | Campaigns |\n"
+            "|" + "---|" * (len(keys) + 10) + "\n"
+        )
+        for row in rows:
+            output += (
+                "| " + " | ".join(str(row[key]) for key in keys) + " "
+                f"| {_to_float(row['impressions']):,.0f} "
+                f"| {_to_float(row['clicks']):,.0f} "
+                f"| ${_to_float(row['spend']):,.2f} "
+                f"| {_to_float(row['conversions']):,.0f} "
+                f"| {_fmt(row['ctr_percent'], '{:.2f}%')} "
+                f"| {_fmt(row['cpc'], '${:.2f}')} "
+                f"| {_fmt(row['cpm'], '${:.2f}')} "
+                f"| {_fmt(row['conversion_rate'], '{:.2f}%')} "
+                f"| {_fmt(row['cost_per_conversion'], '${:.2f}')} "
+                f"| {row['campaign_count']} |\n"
+            )
+        output += "\nConversion rate is conversions per click on every channel.\n"
+        return output
+
+    except Exception as e:
+        return f"Error processing request: {str(e)}"
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            db_pool.return_connection(connection)
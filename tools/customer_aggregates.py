@@ -0,0 +1,239 @@
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2 import Error
+
+from tools import rollups
+
+
+# -------------------------------------------------------------------
+# Aggregate Definition
+# -------------------------------------------------------------------
+
+# Route customer-level analyses to the aggregate table when it exists and is populated
+ROUTE_TO_CUSTOMER_AGGREGATES = os.environ.get("TOOLS_USE_CUSTOMER_AGGREGATES", "1") == "1"
+
+SOURCE_TABLE = "consolidated_profit"
+AGGREGATE_TABLE = "consolidated_profit_customer_aggregates"
+
+# analysis_types that group by "Customer ID" alone and can read the aggregate instead
+AGGREGATED_ANALYSES = {"customer_profile", "profitability_analysis", "payment_behavior", "lifetime_value"}
+
+# One row per customer. Averages are kept as sum + non-null count so they stay exact;
+# the category / merchant sets are sorted arrays (what STRING_AGG(DISTINCT ...) lists).
+# updated_at is the writing transaction's start time, so consumers can pick up changed customers.
+_AGGREGATE_SELECT = """
+            "Customer ID",
+            COUNT(*) AS transaction_count,
+            SUM("Gross Profit") AS total_gross_profit,
+            SUM("Net Profit") AS total_net_profit,
+            SUM("Customer Payment") AS total_payments,
+            COUNT("Gross Profit") AS gross_profit_count,
+            COUNT("Net Profit") AS net_profit_count,
+            COUNT("Customer Payment") AS payment_count,
+            MIN("Gross Profit") AS min_gross_profit,
+            MAX("Gross Profit") AS max_gross_profit,
+            MIN("Net Profit") AS min_net_profit,
+            MAX("Net Profit") AS max_net_profit,
+            COUNT(CASE WHEN "Customer Payment" = 0 THEN 1 END) AS zero_payment_count,
+            COUNT(CASE WHEN "Customer Payment" > 0 THEN 1 END) AS paid_transaction_count,
+            COALESCE(ARRAY_AGG(DISTINCT "Category") FILTER (WHERE "Category" IS NOT NULL), '{}') AS categories,
+            COALESCE(ARRAY_AGG(DISTINCT "Merchant_Name") FILTER (WHERE "Merchant_Name" IS NOT NULL), '{}') AS merchants,
+            now() AS updated_at"""
+
+# Top-N orderings the tool offers, each served by an index scan
+_RANKING_COLUMNS = ["total_gross_profit", "total_net_profit", "transaction_count"]
+
+# (ready, checked_at)
+_readiness = None
+_readiness_lock = threading.Lock()
+
+
+def _recompute_sql(changed):
+    """Statements that rebuild the aggregate rows of the customers in the `changed` subquery"""
+    customers = f'SELECT "Customer ID" FROM {changed}'
+    null_customer = f'EXISTS (SELECT 1 FROM {changed} WHERE "Customer ID" IS NULL)'
+    # One advisory lock per touched customer, taken in key order so concurrent loads cannot deadlock
+    lock_keys = f"""SELECT DISTINCT hashtext(COALESCE("Customer ID"::text, '')) AS lock_key FROM {changed}"""
+    return f"""
+        PERFORM pg_advisory_xact_lock(hashtext('{AGGREGATE_TABLE}'), lock_key)
+        FROM ({lock_keys} ORDER BY lock_key) AS customer_locks;
+        DELETE FROM {AGGREGATE_TABLE} WHERE "Customer ID" IN ({customers});
+        INSERT INTO {AGGREGATE_TABLE}
+        SELECT {_AGGREGATE_SELECT}
+        FROM {SOURCE_TABLE}
+        WHERE "Customer ID" IN ({customers})
+        GROUP BY "Customer ID";
+        IF {null_customer} THEN
+            DELETE FROM {AGGREGATE_TABLE} WHERE "Customer ID" IS NULL;
+            INSERT INTO {AGGREGATE_TABLE}
+            SELECT {_AGGREGATE_SELECT}
+            FROM {SOURCE_TABLE}
+            WHERE "Customer ID" IS NULL
+            GROUP BY "Customer ID";
+        END IF;"""
+
+
+# -------------------------------------------------------------------
+# Maintenance
+# -------------------------------------------------------------------
+
+def ensure_aggregate_table(cursor):
+    """Create the aggregate table, its indexes and the source index the triggers look customers up by"""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {AGGREGATE_TABLE} AS
+        SELECT {_AGGREGATE_SELECT}
+        FROM {SOURCE_TABLE}
+        GROUP BY "Customer ID"
+        WITH NO DATA
+    """)
+    cursor.execute(f"ALTER TABLE {AGGREGATE_TABLE} ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ")
+    cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {AGGREGATE_TABLE}_customer_idx ON {AGGREGATE_TABLE} ("Customer ID")')
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {AGGREGATE_TABLE}_updated_at_idx ON {AGGREGATE_TABLE} (updated_at)")
+    for column in _RANKING_COLUMNS:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {AGGREGATE_TABLE}_{column}_idx ON {AGGREGATE_TABLE} ({column} DESC)")
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {SOURCE_TABLE}_customer_id_idx ON {SOURCE_TABLE} ("Customer ID")')
+
+
+def install_triggers(cursor):
+    """
+    Keep the aggregate in step with every write to the source table.
+
+    Statement-level triggers read the transition tables, so a bulk load recomputes each
+    touched customer once. Writers take a transaction-level advisory lock per customer,
+    so two loads touching the same customer cannot interleave their delete / insert
+    while loads of different customers run in parallel. TRUNCATE empties the aggregate.
+    """
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION {AGGREGATE_TABLE}_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                TRUNCATE {AGGREGATE_TABLE};
+            ELSIF TG_OP = 'INSERT' THEN
+                {_recompute_sql("new_rows")}
+            ELSIF TG_OP = 'DELETE' THEN
+                {_recompute_sql("old_rows")}
+            ELSE
+                {_recompute_sql('(SELECT "Customer ID" FROM old_rows UNION SELECT "Customer ID" FROM new_rows) AS changed')}
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    # Transition tables need one trigger per event; TRUNCATE has none
+    transitions = {
+        "INSERT": "REFERENCING NEW TABLE AS new_rows",
+        "UPDATE": "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+        "DELETE": "REFERENCING OLD TABLE AS old_rows",
+        "TRUNCATE": "",
+    }
+    for event, referencing in transitions.items():
+        trigger = f"{AGGREGATE_TABLE}_{event.lower()}"
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {SOURCE_TABLE}")
+        cursor.execute(f"""
+            CREATE TRIGGER {trigger}
+            AFTER {event} ON {SOURCE_TABLE}
+            {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION {AGGREGATE_TABLE}_sync()
+        """)
+
+
+def refresh_customer_aggregates(connection):
+    """
+    Rebuild the aggregate from the source table and (re)install its triggers.
+
+    Needed once; afterwards the triggers update just the customers each write touches.
+    Returns the number of customer rows written.
+    """
+    global _readiness
+    cursor = connection.cursor()
+    try:
+        ensure_aggregate_table(cursor)
+        # Block writers until the triggers are in place so no change is missed
+        cursor.execute(f"LOCK TABLE {SOURCE_TABLE} IN SHARE MODE")
+        cursor.execute(f"TRUNCATE {AGGREGATE_TABLE}")
+        cursor.execute(f"""
+            INSERT INTO {AGGREGATE_TABLE}
+            SELECT {_AGGREGATE_SELECT}
+            FROM {SOURCE_TABLE}
+            GROUP BY "Customer ID"
+        """)
+        written = cursor.rowcount
+        install_triggers(cursor)
+        cursor.execute(f"ANALYZE {AGGREGATE_TABLE}")
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        raise Exception(f"Customer aggregate refresh failed: {e}")
+    finally:
+        cursor.close()
+
+    with _readiness_lock:
+        _readiness = None
+    return written
+
+
+# -------------------------------------------------------------------
+# Query Routing
+# -------------------------------------------------------------------
+
+def serves(analysis_type, category=None, merchant_name=None):
+    """
+    True when the aggregate can answer the analysis.
+
+    Category / merchant filters apply to individual transactions before grouping,
+    so those calls keep reading the source table.
+    """
+    return ROUTE_TO_CUSTOMER_AGGREGATES and analysis_type in AGGREGATED_ANALYSES and not category and not merchant_name
+
+
+def _cached_readiness():
+    with _readiness_lock:
+        cached = _readiness
+    if cached and time.monotonic() - cached[1] < rollups.READINESS_CHECK_TTL:
+        return True, cached[0]
+    return False, None
+
+
+def _store_readiness(ready):
+    global _readiness
+    with _readiness_lock:
+        _readiness = (ready, time.monotonic())
+    return ready
+
+
+def aggregates_ready(cursor):
+    """True when the aggregate table exists and has been populated"""
+    known, ready = _cached_readiness()
+    if known:
+        return ready
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS ready", (AGGREGATE_TABLE,))
+    ready = rollups.first_value(cursor.fetchone())
+    if ready:
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {AGGREGATE_TABLE}) AS ready")
+        ready = rollups.first_value(cursor.fetchone())
+    return _store_readiness(ready)
+
+
+async def aggregates_ready_async(cursor):
+    """aggregates_ready for an async (psycopg 3) cursor; shares the same readiness cache"""
+    known, ready = _cached_readiness()
+    if known:
+        return ready
+    await cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS ready", (AGGREGATE_TABLE,))
+    ready = rollups.first_value(await cursor.fetchone())
+    if ready:
+        await cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {AGGREGATE_TABLE}) AS ready")
+        ready = rollups.first_value(await cursor.fetchone())
+    return _store_readiness(ready)
+
+
+if __name__ == "__main__":
+    # Usage: TOOLS_DB_DSN="host=... dbname=..." python -m tools.customer_aggregates
+    refresh_connection = psycopg2.connect(os.environ["TOOLS_DB_DSN"])
+    try:
+        print(f"{AGGREGATE_TABLE}: {refresh_customer_aggregates(refresh_connection)} customers")
+    finally:
+        refresh_connection.close()
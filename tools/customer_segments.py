@@ -0,0 +1,319 @@
+import os
+import sys
+from datetime import timedelta
+
+import psycopg2
+from psycopg2 import Error
+from psycopg2.extras import execute_values
+
+from tools import customer_aggregates
+
+
+# -------------------------------------------------------------------
+# Segmentation Settings
+# -------------------------------------------------------------------
+
+# Transaction date column for recency; consolidated_profit has none, so by default
+# customers are scored on frequency and monetary value only
+RECENCY_DATE_COLUMN = os.environ.get("TOOLS_RFM_DATE_COLUMN") or None
+# When more than this share of scored customers changed, everyone is re-scored on fresh breakpoints
+FULL_RESCORE_FRACTION = float(os.environ.get("TOOLS_RFM_FULL_RESCORE_FRACTION", 0.2))
+# Incremental runs re-read customers changed this long before the last run, for late-committing writes
+INCREMENTAL_OVERLAP_SECONDS = int(os.environ.get("TOOLS_RFM_OVERLAP_SECONDS", 300))
+
+SCORES_TABLE = "consolidated_profit_customer_segments"
+BREAKPOINTS_TABLE = "consolidated_profit_segment_breakpoints"
+
+# In priority order: a customer lands in the first segment whose rule matches
+SEGMENTS = ["champions", "at_risk", "hibernating", "loyal", "big_spenders", "new_customers", "promising", "low_value"]
+# Segments whose rules need recency; without RECENCY_DATE_COLUMN they are always empty
+RECENCY_SEGMENTS = ["at_risk", "hibernating", "new_customers"]
+
+# What the segment tools can offer with the current settings
+AVAILABLE_SEGMENTS = [segment for segment in SEGMENTS if RECENCY_DATE_COLUMN or segment not in RECENCY_SEGMENTS]
+SORT_COLUMNS = ["lifetime_value", "monetary", "frequency"] + (["recency_days"] if RECENCY_DATE_COLUMN else [])
+
+# Scores are quintiles: 1 (worst fifth) to 5 (best fifth)
+_QUANTILES = (0.2, 0.4, 0.6, 0.8)
+# metric -> True when larger values score higher
+_METRICS = {"recency_days": False, "frequency": True, "monetary": True, "lifetime_value": True}
+
+_SCORE_COLUMNS = [
+    '"Customer ID"', "recency_days", "frequency", "monetary", "lifetime_value",
+    "r_score", "f_score", "m_score", "ltv_score", "rfm_score", "segment", "source_updated_at",
+]
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise Exception("Customer segmentation needs NumPy: pip install numpy")
+    return numpy
+
+
+# -------------------------------------------------------------------
+# Scoring
+# -------------------------------------------------------------------
+
+def compute_breakpoints(inputs):
+    """metric -> quintile boundaries over the current customer population"""
+    np = _numpy()
+    breakpoints = {}
+    for metric in _METRICS:
+        values = inputs.get(metric)
+        if values is not None and len(values):
+            finite = values[~np.isnan(values)]
+            if len(finite):
+                breakpoints[metric] = np.quantile(finite, _QUANTILES).tolist()
+    return breakpoints
+
+
+def quintile_scores(values, breakpoints, higher_is_better=True):
+    """Vectorized 1-5 score of each value against quintile boundaries (NaN scores 1)"""
+    np = _numpy()
+    bucket = np.searchsorted(np.asarray(breakpoints, dtype=float), values, side="right")
+    scores = bucket + 1 if higher_is_better else 5 - bucket
+    return np.where(np.isnan(values), 1, scores)
+
+
+def assign_segments(r_scores, f_scores, m_scores):
+    """Segment name per customer; r_scores is None when recency is not tracked"""
+    np = _numpy()
+    if r_scores is None:
+        recent = np.ones(len(f_scores), dtype=bool)
+        lapsed = np.zeros(len(f_scores), dtype=bool)
+        new = lapsed
+    else:
+        recent = r_scores >= 4
+        lapsed = r_scores <= 2
+        new = recent & (f_scores <= 1)
+    conditions = [
+        recent & (f_scores >= 4) & (m_scores >= 4),
+        lapsed & ((f_scores >= 4) | (m_scores >= 4)),
+        lapsed,
+        f_scores >= 4,
+        m_scores >= 4,
+        new,
+        (f_scores >= 3) | (m_scores >= 3),
+    ]
+    return np.select(conditions, SEGMENTS[:-1], default=SEGMENTS[-1])
+
+
+def _inputs(rows):
+    """Aggregate rows -> column arrays"""
+    np = _numpy()
+    inputs = {
+        "customer_ids": [row[0] for row in rows],
+        "frequency": np.array([row[1] for row in rows], dtype=float),
+        "monetary": np.array([row[2] if row[2] is not None else np.nan for row in rows], dtype=float),
+        "lifetime_value": np.array([row[3] if row[3] is not None else np.nan for row in rows], dtype=float),
+        "updated_at": [row[4] for row in rows],
+    }
+    if RECENCY_DATE_COLUMN:
+        inputs["recency_days"] = np.array([row[5] if row[5] is not None else np.nan for row in rows], dtype=float)
+    return inputs
+
+
+def score_customers(inputs, breakpoints):
+    """
+    Score every customer in one pass over the arrays; returns rows for SCORES_TABLE.
+
+    A metric without breakpoints (no customer has a value for it) scores 1 for
+    everyone, the same as a single missing value.
+    """
+    np = _numpy()
+    scores = {
+        metric: (
+            quintile_scores(inputs[metric], breakpoints[metric], higher_is_better)
+            if metric in breakpoints else np.ones(len(inputs[metric]), dtype=int)
+        )
+        for metric, higher_is_better in _METRICS.items()
+        if metric in inputs
+    }
+    r_scores = scores.get("recency_days")
+    f_scores = scores.get("frequency")
+    m_scores = scores.get("monetary")
+    segments = assign_segments(r_scores, f_scores, m_scores)
+
+    recency = inputs.get("recency_days")
+    rows = []
+    for index, customer_id in enumerate(inputs["customer_ids"]):
+        r_score = int(r_scores[index]) if r_scores is not None else None
+        f_score, m_score = int(f_scores[index]), int(m_scores[index])
+        rows.append((
+            customer_id,
+            None if recency is None else _nullable(recency[index]),
+            int(inputs["frequency"][index]),
+            _nullable(inputs["monetary"][index]),
+            _nullable(inputs["lifetime_value"][index]),
+            r_score,
+            f_score,
+            m_score,
+            int(scores["lifetime_value"][index]),
+            f"{r_score or '-'}{f_score}{m_score}",
+            str(segments[index]),
+            inputs["updated_at"][index],
+        ))
+    return rows
+
+
+def _nullable(value):
+    return None if value != value else float(value)
+
+
+# -------------------------------------------------------------------
+# Maintenance
+# -------------------------------------------------------------------
+
+def ensure_segment_tables(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SCORES_TABLE} (
+            "Customer ID" TEXT PRIMARY KEY,
+            recency_days DOUBLE PRECISION,
+            frequency BIGINT NOT NULL,
+            monetary DOUBLE PRECISION,
+            lifetime_value DOUBLE PRECISION,
+            r_score SMALLINT,
+            f_score SMALLINT NOT NULL,
+            m_score SMALLINT NOT NULL,
+            ltv_score SMALLINT NOT NULL,
+            rfm_score TEXT NOT NULL,
+            segment TEXT NOT NULL,
+            source_updated_at TIMESTAMPTZ,
+            scored_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+    # "Customers in segment X" is a top-N read of this index
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {SCORES_TABLE}_segment_idx ON {SCORES_TABLE} (segment, lifetime_value DESC)")
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {BREAKPOINTS_TABLE} (
+            metric TEXT PRIMARY KEY,
+            breakpoints DOUBLE PRECISION[] NOT NULL,
+            customers BIGINT NOT NULL,
+            computed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+
+def _input_query(since):
+    """Per-customer inputs from the customer aggregate; only customers changed since `since` when given"""
+    columns = ['a."Customer ID"', "a.transaction_count", "a.total_gross_profit", "a.total_net_profit", "a.updated_at"]
+    recency_join = ""
+    if RECENCY_DATE_COLUMN:
+        columns.append("CURRENT_DATE - r.last_purchase::date AS recency_days")
+        recency_join = f"""
+        LEFT JOIN LATERAL (
+            SELECT MAX({RECENCY_DATE_COLUMN}) AS last_purchase
+            FROM {customer_aggregates.SOURCE_TABLE} p
+            WHERE p."Customer ID" = a."Customer ID"
+        ) r ON true"""
+
+    where_conditions = ['a."Customer ID" IS NOT NULL']
+    params = []
+    if since is not None:
+        where_conditions.append("a.updated_at >= %s")
+        params.append(since)
+
+    query = f"""
+        SELECT {', '.join(columns)}
+        FROM {customer_aggregates.AGGREGATE_TABLE} a{recency_join}
+        WHERE {' AND '.join(where_conditions)}
+    """
+    return query, params
+
+
+def _load_breakpoints(cursor):
+    cursor.execute(f"SELECT metric, breakpoints FROM {BREAKPOINTS_TABLE}")
+    breakpoints = {metric: list(values) for metric, values in cursor.fetchall()}
+    required = {"frequency", "monetary", "lifetime_value"} | ({"recency_days"} if RECENCY_DATE_COLUMN else set())
+    return breakpoints if required <= set(breakpoints) else None
+
+
+def _store_breakpoints(cursor, breakpoints, customers):
+    cursor.execute(f"TRUNCATE {BREAKPOINTS_TABLE}")
+    execute_values(
+        cursor,
+        f"INSERT INTO {BREAKPOINTS_TABLE} (metric, breakpoints, customers) VALUES %s",
+        [(metric, values, customers) for metric, values in breakpoints.items()],
+    )
+
+
+def refresh_segments(connection, full=False):
+    """
+    Score customers into RFM / lifetime-value segments.
+
+    Incremental runs score only the customers whose aggregate row changed since the
+    last run, against the stored quintile breakpoints. A full run (first run, full=True,
+    or more than FULL_RESCORE_FRACTION of customers changed) recomputes the breakpoints
+    and re-scores everyone. Returns the number of customers scored.
+    """
+    cursor = connection.cursor()
+    try:
+        if not customer_aggregates.aggregates_ready(cursor):
+            raise Exception(f"{customer_aggregates.AGGREGATE_TABLE} is not populated; run python -m tools.customer_aggregates first")
+        ensure_segment_tables(cursor)
+
+        breakpoints = None if full else _load_breakpoints(cursor)
+        since = None
+        if breakpoints is not None:
+            cursor.execute(f"SELECT MAX(source_updated_at), COUNT(*) FROM {SCORES_TABLE}")
+            scored_through, scored = cursor.fetchone()
+            if scored_through is not None:
+                since = scored_through - timedelta(seconds=INCREMENTAL_OVERLAP_SECONDS)
+
+        rows = []
+        if since is not None:
+            query, params = _input_query(since)
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            if len(rows) > FULL_RESCORE_FRACTION * scored:
+                # The population has shifted enough that the old quintiles are stale
+                since = None
+        if since is None:
+            query, params = _input_query(None)
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            if not rows:
+                cursor.execute(f"TRUNCATE {SCORES_TABLE}")
+                connection.commit()
+                return 0
+            breakpoints = compute_breakpoints(_inputs(rows))
+            _store_breakpoints(cursor, breakpoints, len(rows))
+            cursor.execute(f"TRUNCATE {SCORES_TABLE}")
+        else:
+            # Customers whose transactions were all deleted
+            cursor.execute(f"""
+                DELETE FROM {SCORES_TABLE} s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {customer_aggregates.AGGREGATE_TABLE} a WHERE a."Customer ID" = s."Customer ID"
+                )
+            """)
+
+        if rows:
+            updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in _SCORE_COLUMNS[1:])
+            execute_values(
+                cursor,
+                f"""
+                INSERT INTO {SCORES_TABLE} ({', '.join(_SCORE_COLUMNS)}) VALUES %s
+                ON CONFLICT ("Customer ID") DO UPDATE SET {updates}, scored_at = now()
+                """,
+                score_customers(_inputs(rows), breakpoints),
+                page_size=1000,
+            )
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        raise Exception(f"Customer segment refresh failed: {e}")
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    # Usage: TOOLS_DB_DSN="host=... dbname=..." python -m tools.customer_segments [--full]
+    refresh_connection = psycopg2.connect(os.environ["TOOLS_DB_DSN"])
+    try:
+        print(f"{SCORES_TABLE}: {refresh_segments(refresh_connection, full='--full' in sys.argv)} customers scored")
+    finally:
+        refresh_connection.close()
@@ -0,0 +1,280 @@
+import contextlib
+import logging
+import os
+import threading
+import time
+
+import psycopg2
+import psycopg2.pool
+from psycopg2 import Error
+
+from tools import instrumentation, query_advisor, snapshot, statement_cache
+
+
+logger = logging.getLogger("tools.db_pool")
+
+
+# -------------------------------------------------------------------
+# Pool Settings
+# -------------------------------------------------------------------
+
+# Connections opened when a pool is created and kept open while idle
+POOL_MIN_CONNECTIONS = int(os.environ.get("TOOLS_DB_POOL_MIN", 2))
+# Hard cap on connections checked out at once across every tools module
+POOL_MAX_CONNECTIONS = int(os.environ.get("TOOLS_DB_POOL_MAX", 20))
+# Seconds a caller waits for a free connection before giving up
+POOL_WAIT_TIMEOUT = float(os.environ.get("TOOLS_DB_POOL_TIMEOUT", 30))
+# Idle connections older than this are pinged before being handed out
+LIVENESS_CHECK_AFTER_IDLE = float(os.environ.get("TOOLS_DB_LIVENESS_IDLE", 30))
+# Seconds allowed for establishing a new connection
+CONNECT_TIMEOUT = int(os.environ.get("TOOLS_DB_CONNECT_TIMEOUT", 10))
+# Open the minimum connections as soon as a tools module is imported
+WARM_UP_ON_LOAD = os.environ.get("TOOLS_DB_POOL_WARM_UP", "1") == "1"
+
+# One ThreadedConnectionPool per distinct database config
+_pools = {}
+# id(connection) -> (pool key, connection) for connections currently checked out
+_checked_out = {}
+# id(connection) -> monotonic time it was last returned to the pool
+_last_returned = {}
+_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(POOL_MAX_CONNECTIONS)
+# Per-thread settings applied to connections as they are checked out
+_thread_settings = threading.local()
+
+_stats = {
+    "checkouts": 0,
+    "wait_timeouts": 0,
+    "total_wait_seconds": 0.0,
+    "max_wait_seconds": 0.0,
+    "liveness_checks": 0,
+    "dead_connections_discarded": 0,
+}
+
+
+def _pool_key(db_config):
+    return tuple(sorted(db_config.items()))
+
+
+# -------------------------------------------------------------------
+# Pool Lifecycle
+# -------------------------------------------------------------------
+
+def configure_pool(min_connections=None, max_connections=None, wait_timeout=None):
+    """Change pool sizing; only allowed before any pool has been created"""
+    global POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS, POOL_WAIT_TIMEOUT, _slots
+    with _lock:
+        if _pools or _checked_out:
+            raise Exception("Connection pool already initialized; return connections and call close_all() before reconfiguring")
+        if min_connections is not None:
+            POOL_MIN_CONNECTIONS = min_connections
+        if max_connections is not None:
+            POOL_MAX_CONNECTIONS = max_connections
+            _slots = threading.BoundedSemaphore(max_connections)
+        if wait_timeout is not None:
+            POOL_WAIT_TIMEOUT = wait_timeout
+
+
+def get_pool(db_config):
+    """Return the shared thread-safe pool for db_config, creating it on first use"""
+    key = _pool_key(db_config)
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            connect_kwargs = dict(db_config)
+            connect_kwargs.setdefault("connect_timeout", CONNECT_TIMEOUT)
+            factory = statement_cache.connection_factory(instrumentation.INSTRUMENTATION_ENABLED)
+            if query_advisor.ADVISOR_ENABLED:
+                # Runs from the instrumented cursors, so it needs TOOLS_INSTRUMENTATION as well
+                instrumentation.add_query_hook(query_advisor.capture_plan)
+            if factory is not None:
+                connect_kwargs.setdefault("connection_factory", factory)
+            try:
+                pool = psycopg2.pool.ThreadedConnectionPool(
+                    min(POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS),
+                    POOL_MAX_CONNECTIONS,
+                    **connect_kwargs
+                )
+            except Error as e:
+                raise Exception(f"Connection pool initialization failed: {e}")
+            _pools[key] = pool
+    return pool
+
+
+def warm_up(db_config):
+    """Create the pool (opening its minimum connections) without failing the import"""
+    if not WARM_UP_ON_LOAD or snapshot.enabled():
+        return
+    try:
+        get_pool(db_config)
+    except Exception as e:
+        logger.warning("Connection pool warm-up skipped: %s", e)
+
+
+def close_all():
+    """
+    Close every pooled connection in the process.
+
+    Connections still checked out are closed too but stay tracked, so their
+    return_connection still frees the slot they hold.
+    """
+    with _lock:
+        for pool in _pools.values():
+            pool.closeall()
+        _pools.clear()
+        _last_returned.clear()
+
+
+# -------------------------------------------------------------------
+# Checkout / Return
+# -------------------------------------------------------------------
+
+def _is_alive(connection):
+    """Ping a connection that has been idle long enough to have been dropped"""
+    if connection.closed:
+        return False
+
+    idle_since = _last_returned.get(id(connection))
+    if idle_since is None or time.monotonic() - idle_since < LIVENESS_CHECK_AFTER_IDLE:
+        return True
+
+    with _lock:
+        _stats["liveness_checks"] += 1
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT 1")
+        cursor.close()
+        connection.rollback()
+        return True
+    except Error:
+        return False
+
+
+@contextlib.contextmanager
+def statement_timeout(seconds):
+    """Cap each statement on connections this thread checks out inside the block, on the server"""
+    previous = getattr(_thread_settings, "statement_timeout", None)
+    _thread_settings.statement_timeout = seconds
+    try:
+        yield
+    finally:
+        _thread_settings.statement_timeout = previous
+
+
+def _apply_statement_timeout(connection, seconds):
+    """SET LOCAL statement_timeout; it ends with the transaction, which the pool rolls back on return"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT set_config('statement_timeout', %s, true)", (f"{int(seconds * 1000)}ms",))
+    cursor.close()
+
+
+def get_connection(db_config):
+    """Check a live connection out of the shared pool, waiting for a free slot if needed"""
+    if snapshot.enabled():
+        # Offline mode: the same queries run against the local Parquet snapshot
+        return snapshot.connect()
+
+    pool = get_pool(db_config)
+
+    wait_started = time.monotonic()
+    if not _slots.acquire(timeout=POOL_WAIT_TIMEOUT):
+        with _lock:
+            _stats["wait_timeouts"] += 1
+        raise Exception(f"Database connection failed: no free connection after {POOL_WAIT_TIMEOUT}s")
+    waited = time.monotonic() - wait_started
+
+    try:
+        # Every slot can hold at most one dead connection, so this always terminates
+        for _ in range(POOL_MAX_CONNECTIONS + 1):
+            connection = pool.getconn()
+            if _is_alive(connection):
+                break
+            _last_returned.pop(id(connection), None)
+            pool.putconn(connection, close=True)
+            with _lock:
+                _stats["dead_connections_discarded"] += 1
+        else:
+            raise Exception("Database connection failed: no live connection available")
+    except Error as e:
+        _slots.release()
+        raise Exception(f"Database connection failed: {e}")
+    except Exception:
+        _slots.release()
+        raise
+
+    with _lock:
+        _checked_out[id(connection)] = (_pool_key(db_config), connection)
+        _stats["checkouts"] += 1
+        _stats["total_wait_seconds"] += waited
+        _stats["max_wait_seconds"] = max(_stats["max_wait_seconds"], waited)
+    instrumentation.record_pool_wait(waited)
+
+    timeout = getattr(_thread_settings, "statement_timeout", None)
+    if timeout:
+        try:
+            _apply_statement_timeout(connection, timeout)
+        except Error as e:
+            return_connection(connection, close=True)
+            raise Exception(f"Database connection failed: {e}")
+    return connection
+
+
+def return_connection(connection, close=False):
+    """Return a connection to the pool it came from"""
+    if connection is None:
+        return
+    if isinstance(connection, snapshot.SnapshotConnection):
+        connection.close()
+        return
+
+    with _lock:
+        entry = _checked_out.pop(id(connection), None)
+    if entry is None:
+        return
+
+    key, _ = entry
+    pool = _pools.get(key)
+    try:
+        if pool is not None:
+            discard = close or connection.closed
+            if discard:
+                _last_returned.pop(id(connection), None)
+            else:
+                _last_returned[id(connection)] = time.monotonic()
+            pool.putconn(connection, close=discard)
+            # The pool closes connections beyond its minimum instead of keeping them idle
+            if connection.closed:
+                _last_returned.pop(id(connection), None)
+        elif not connection.closed:
+            # Its pool was closed while it was out; nothing to return it to
+            connection.close()
+    finally:
+        _slots.release()
+
+
+# -------------------------------------------------------------------
+# Metrics
+# -------------------------------------------------------------------
+
+def get_pool_stats():
+    """Snapshot of pool usage and wait metrics"""
+    with _lock:
+        stats = dict(_stats)
+        stats["in_use"] = len(_checked_out)
+        stats["pools"] = len(_pools)
+    stats["max_connections"] = POOL_MAX_CONNECTIONS
+    stats["avg_wait_seconds"] = (
+        stats["total_wait_seconds"] / stats["checkouts"] if stats["checkouts"] else 0.0
+    )
+    return stats
+
+
+def reset_pool_stats():
+    """Zero the counters, e.g. between benchmark runs"""
+    with _lock:
+        for key in _stats:
+            _stats[key] = 0 if isinstance(_stats[key], int) else 0.0
@@ -0,0 +1,217 @@
+import os
+import sys
+import threading
+import time
+
+import psycopg2
+from psycopg2 import Error
+
+from tools import rollups
+
+
+# -------------------------------------------------------------------
+# Sketch Definitions
+# -------------------------------------------------------------------
+
+# Opt-in: answer COUNT(DISTINCT ...) from HyperLogLog sketches (about 2% error with
+# the hll extension's defaults) instead of exact sorts / hash aggregates over raw rows
+APPROX_DISTINCT_ENABLED = os.environ.get("TOOLS_APPROX_DISTINCT", "0") == "1"
+
+# One sketch row per day per dimension combination, holding an HLL sketch of each
+# column. Dimensions are the columns tools filter or group the distinct counts by;
+# the date and dimension columns keep their source names so filters apply unchanged.
+SKETCH_SPECS = {
+    "linear_tv_ads": {
+        "date_column": "date",
+        "dimensions": ["source"],
+        "columns": ["network", "program", "source"],
+    },
+    "seo_organic_ads": {
+        "date_column": "ad_date",
+        "dimensions": ["source"],
+        "columns": ["page_url"],
+    },
+}
+
+# source table -> (ready, checked_at)
+_readiness = {}
+_readiness_lock = threading.Lock()
+
+
+def sketch_table_name(source_table):
+    """Name of the daily sketch table for a source table"""
+    return f"{source_table}_daily_sketches"
+
+
+def _sketch_select(source_table):
+    """SELECT list that folds raw rows into one sketch row per day and dimension combination"""
+    spec = SKETCH_SPECS[source_table]
+    date_column = spec["date_column"]
+    columns = [f"{date_column}::date AS {date_column}"]
+    columns += spec["dimensions"]
+    columns += [f"hll_add_agg(hll_hash_text({column}::text)) AS {column}_sketch" for column in spec["columns"]]
+    return ",\n            ".join(columns)
+
+
+def _group_by(source_table):
+    spec = SKETCH_SPECS[source_table]
+    return ", ".join([f"{spec['date_column']}::date"] + spec["dimensions"])
+
+
+# -------------------------------------------------------------------
+# Maintenance
+# -------------------------------------------------------------------
+
+def ensure_sketch_table(cursor, source_table):
+    """Create the hll extension, the sketch table and its date index if they do not exist yet"""
+    spec = SKETCH_SPECS[source_table]
+    sketch_table = sketch_table_name(source_table)
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS hll")
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {sketch_table} AS
+        SELECT
+            {_sketch_select(source_table)}
+        FROM {source_table}
+        GROUP BY {_group_by(source_table)}
+        WITH NO DATA
+    """)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {sketch_table}_date_idx ON {sketch_table} ({spec['date_column']})")
+
+
+def refresh_sketches(connection, source_table, full=False):
+    """
+    Bring one sketch table up to date with its source table.
+
+    Same watermark scheme as rollups.refresh_rollup: incremental refreshes rebuild the
+    latest sketched day onwards; full=True rebuilds everything. Returns rows written.
+    """
+    spec = SKETCH_SPECS[source_table]
+    sketch_table = sketch_table_name(source_table)
+    date_column = spec["date_column"]
+
+    cursor = connection.cursor()
+    try:
+        ensure_sketch_table(cursor, source_table)
+
+        watermark = None
+        if full:
+            cursor.execute(f"TRUNCATE {sketch_table}")
+        else:
+            cursor.execute(f"SELECT MAX({date_column}) FROM {sketch_table}")
+            watermark = cursor.fetchone()[0]
+
+        where_clause = ""
+        params = []
+        if watermark is not None:
+            cursor.execute(f"DELETE FROM {sketch_table} WHERE {date_column} >= %s", (watermark,))
+            where_clause = f"WHERE {date_column} >= %s"
+            params.append(watermark)
+
+        cursor.execute(f"""
+            INSERT INTO {sketch_table}
+            SELECT
+                {_sketch_select(source_table)}
+            FROM {source_table}
+            {where_clause}
+            GROUP BY {_group_by(source_table)}
+        """, params)
+        written = cursor.rowcount
+
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        raise Exception(f"Sketch refresh failed for {source_table}: {e}")
+    finally:
+        cursor.close()
+
+    with _readiness_lock:
+        _readiness.pop(source_table, None)
+    return written
+
+
+def refresh_all_sketches(connection, full=False):
+    """Refresh every sketch table; returns {source_table: rows written}"""
+    return {
+        source_table: refresh_sketches(connection, source_table, full=full)
+        for source_table in SKETCH_SPECS
+    }
+
+
+# -------------------------------------------------------------------
+# Query Routing
+# -------------------------------------------------------------------
+
+def _cached_readiness(source_table):
+    """(known, ready) from the readiness cache"""
+    if not APPROX_DISTINCT_ENABLED or source_table not in SKETCH_SPECS:
+        return True, False
+    with _readiness_lock:
+        cached = _readiness.get(source_table)
+    if cached and time.monotonic() - cached[1] < rollups.READINESS_CHECK_TTL:
+        return True, cached[0]
+    return False, None
+
+
+def _store_readiness(source_table, ready):
+    with _readiness_lock:
+        _readiness[source_table] = (ready, time.monotonic())
+    return ready
+
+
+def sketch_source(cursor, source_table):
+    """The sketch table to take distinct counts from, or None for exact counts"""
+    known, ready = _cached_readiness(source_table)
+    if not known:
+        sketch_table = sketch_table_name(source_table)
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS ready", (sketch_table,))
+        ready = rollups.first_value(cursor.fetchone())
+        if ready:
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {sketch_table}) AS ready")
+            ready = rollups.first_value(cursor.fetchone())
+        _store_readiness(source_table, ready)
+    return sketch_table_name(source_table) if ready else None
+
+
+async def sketch_source_async(cursor, source_table):
+    """sketch_source for an async (psycopg 3) cursor; shares the same readiness cache"""
+    known, ready = _cached_readiness(source_table)
+    if not known:
+        sketch_table = sketch_table_name(source_table)
+        await cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS ready", (sketch_table,))
+        ready = rollups.first_value(await cursor.fetchone())
+        if ready:
+            await cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {sketch_table}) AS ready")
+            ready = rollups.first_value(await cursor.fetchone())
+        _store_readiness(source_table, ready)
+    return sketch_table_name(source_table) if ready else None
+
+
+def distinct_counts_query(sketch_table, columns, group_by=None, where_clause=""):
+    """
+    Approximate COUNT(DISTINCT column) for each column by merging the daily sketches.
+
+    group_by maps output aliases to expressions over the sketch table (e.g. a period
+    bucket of its date column); each count comes back as <column>_count. Meant to be
+    used as a CTE and joined to the exact query on the group_by aliases.
+    """
+    group_by = group_by or {}
+    select = [f"{expression} AS {alias}" for alias, expression in group_by.items()]
+    select += [f"ROUND(hll_cardinality(hll_union_agg({column}_sketch)))::BIGINT AS {column}_count" for column in columns]
+    query = f"""
+        SELECT {', '.join(select)}
+        FROM {sketch_table}
+        {where_clause}
+    """
+    if group_by:
+        query += f"GROUP BY {', '.join(group_by.values())}\n"
+    return query
+
+
+if __name__ == "__main__":
+    # Usage: TOOLS_DB_DSN="host=... dbname=..." python -m tools.distinct_sketches [--full]
+    refresh_connection = psycopg2.connect(os.environ["TOOLS_DB_DSN"])
+    try:
+        for table, rows in refresh_all_sketches(refresh_connection, full="--full" in sys.argv).items():
+            print(f"{sketch_table_name(table)}: {rows} rows refreshed")
+    finally:
+        refresh_connection.close()
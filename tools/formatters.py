@@ -0,0 +1,88 @@
+import itertools
+import json
+
+
+# -------------------------------------------------------------------
+# Output Formats
+# -------------------------------------------------------------------
+
+# 'report' is each tool's own human-readable text; the other two are shared here
+OUTPUT_FORMATS = ("report", "compact", "markdown")
+
+
+def _cell(value):
+    """Markdown-safe text for one value"""
+    if value is None:
+        return ""
+    return str(value).replace("|", "\\|").replace("\n", " ")
+
+
+def _peek(rows):
+    """(first_row, iterator over every row) without materializing rows"""
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return None, iter(())
+    return first, itertools.chain((first,), rows)
+
+
+# -------------------------------------------------------------------
+# Renderers
+# -------------------------------------------------------------------
+
+def iter_compact(rows, columns=None, summary=None):
+    """
+    Yield a JSON document with the column names once and one value list per row.
+
+    {"summary": {...}, "columns": [...], "rows": [[...], ...]}
+    Dates and decimals are written as strings.
+    """
+    first, rows = _peek(rows)
+    columns = list(columns or (first.keys() if first else []))
+
+    yield "{"
+    if summary:
+        yield '"summary":' + json.dumps(dict(summary), default=str, separators=(",", ":")) + ","
+    yield '"columns":' + json.dumps(columns) + ',"rows":['
+    for index, row in enumerate(rows):
+        yield ("," if index else "") + json.dumps([row.get(column) for column in columns], default=str, separators=(",", ":"))
+    yield "]}"
+
+
+def iter_markdown(rows, columns=None, summary=None):
+    """Yield a markdown table (preceded by a one-line summary when given)"""
+    first, rows = _peek(rows)
+    columns = list(columns or (first.keys() if first else []))
+
+    if summary:
+        yield "Summary: " + ", ".join(f"{key}={_cell(value)}" for key, value in summary.items()) + "\n\n"
+    if first is None:
+        yield "No rows found.\n"
+        return
+
+    yield "| " + " | ".join(columns) + " |\n"
+    yield "|" + "---|" * len(columns) + "\n"
+    for row in rows:
+        yield "| " + " | ".join(_cell(row.get(column)) for column in columns) + " |\n"
+
+
+def iter_rows(rows, output_format, columns=None, summary=None):
+    """Yield rows rendered in a shared output format ('compact' or 'markdown')"""
+    if output_format == "compact":
+        return iter_compact(rows, columns, summary)
+    if output_format == "markdown":
+        return iter_markdown(rows, columns, summary)
+    raise Exception(f"Unsupported output_format '{output_format}'; choose from {', '.join(OUTPUT_FORMATS)}")
+
+
+def render_rows(rows, output_format, columns=None, summary=None):
+    """
+    Render rows as a single string in one join.
+
+    Args:
+        rows: Iterable of dict rows (RealDictRow, dict_row or plain dicts)
+        output_format: 'compact' (JSON columns + value lists) or 'markdown' (table)
+        columns: Column order; taken from the first row when omitted
+        summary: Optional dict of totals shown once ahead of the rows
+    """
+    return "".join(iter_rows(rows, output_format, columns, summary))
@@ -0,0 +1,329 @@
+import bisect
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2.extensions
+
+
+logger = logging.getLogger("tools.instrumentation")
+
+
+# -------------------------------------------------------------------
+# Instrumentation Settings
+# -------------------------------------------------------------------
+
+INSTRUMENTATION_ENABLED = os.environ.get("TOOLS_INSTRUMENTATION", "1") == "1"
+# Share of ordinary tool calls logged at INFO; histograms always see every call
+TRACE_SAMPLE_RATE = float(os.environ.get("TOOLS_TRACE_SAMPLE_RATE", 0.1))
+# Tool calls and queries at least this slow are always logged at WARNING
+SLOW_QUERY_SECONDS = float(os.environ.get("TOOLS_SLOW_QUERY_SECONDS", 1.0))
+
+# Histogram bucket upper bounds per metric (anything larger lands in the overflow bucket)
+_SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+_CHAR_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+HISTOGRAM_BUCKETS = {
+    "call_seconds": _SECONDS_BUCKETS,
+    "pool_wait_seconds": _SECONDS_BUCKETS,
+    "query_seconds": _SECONDS_BUCKETS,
+    "rows": _ROW_BUCKETS,
+    "output_chars": _CHAR_BUCKETS,
+}
+
+# Record of the tool call running in this thread / task (None outside a tool)
+_current_call = contextvars.ContextVar("tools_current_call", default=None)
+
+# (metric, key) -> {"counts": [...], "count": n, "sum": x, "max": x}
+_histograms = {}
+# fingerprint -> normalized query text
+_fingerprints = {}
+# Called as hook(connection, query, vars, seconds) after each statement on an unnamed cursor
+_query_hooks = []
+_lock = threading.Lock()
+
+
+# -------------------------------------------------------------------
+# Query Fingerprints
+# -------------------------------------------------------------------
+
+_COMMENT = re.compile(r"--[^\n]*")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(query):
+    """
+    Stable id for a query shape: literals become ?, whitespace and comments are dropped.
+
+    Returns (fingerprint, normalized_text). Queries that differ only in interpolated
+    values (days back, limits, IN lists) share a fingerprint.
+    """
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    normalized = _COMMENT.sub(" ", str(query))
+    normalized = _STRING_LITERAL.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = normalized.replace("%s", "?")
+    normalized = _PLACEHOLDER_LIST.sub("(?...)", normalized)
+    normalized = _WHITESPACE.sub(" ", normalized).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12], normalized
+
+
+# -------------------------------------------------------------------
+# Histograms
+# -------------------------------------------------------------------
+
+def observe(metric, key, value):
+    """Add one observation to the (metric, key) histogram"""
+    if value is None:
+        return
+    buckets = HISTOGRAM_BUCKETS[metric]
+    index = bisect.bisect_left(buckets, value)
+    with _lock:
+        histogram = _histograms.get((metric, key))
+        if histogram is None:
+            histogram = {"counts": [0] * (len(buckets) + 1), "count": 0, "sum": 0.0, "max": value}
+            _histograms[(metric, key)] = histogram
+        histogram["counts"][index] += 1
+        histogram["count"] += 1
+        histogram["sum"] += value
+        histogram["max"] = max(histogram["max"], value)
+
+
+def _percentile(buckets, histogram, fraction):
+    """Upper bound of the bucket holding the given fraction of observations"""
+    target = fraction * histogram["count"]
+    seen = 0
+    for bound, count in zip(buckets, histogram["counts"]):
+        seen += count
+        if seen >= target:
+            return min(bound, histogram["max"])
+    return histogram["max"]
+
+
+def get_histograms(metric=None):
+    """
+    Snapshot of the in-process histograms.
+
+    Returns {metric: {key: {count, mean, max, p50, p95, p99}}}; keys are tool names,
+    except for query_seconds which is keyed by query fingerprint. Percentiles are
+    bucket upper bounds, so they are estimates.
+    """
+    with _lock:
+        items = [(name, key, dict(histogram, counts=list(histogram["counts"])))
+                 for (name, key), histogram in _histograms.items()
+                 if metric is None or name == metric]
+
+    snapshot = {}
+    for name, key, histogram in items:
+        buckets = HISTOGRAM_BUCKETS[name]
+        snapshot.setdefault(name, {})[key] = {
+            "count": histogram["count"],
+            "mean": histogram["sum"] / histogram["count"],
+            "max": histogram["max"],
+            "p50": _percentile(buckets, histogram, 0.50),
+            "p95": _percentile(buckets, histogram, 0.95),
+            "p99": _percentile(buckets, histogram, 0.99),
+        }
+    return snapshot
+
+
+def get_fingerprints():
+    """fingerprint -> normalized query text for every query seen so far"""
+    with _lock:
+        return dict(_fingerprints)
+
+
+def reset_histograms():
+    """Drop all observations, e.g. between benchmark runs"""
+    with _lock:
+        _histograms.clear()
+        _fingerprints.clear()
+
+
+# -------------------------------------------------------------------
+# Per-call Records
+# -------------------------------------------------------------------
+
+def current_call():
+    """The record of the tool call in progress, or None"""
+    return _current_call.get()
+
+
+def annotate(**fields):
+    """Attach extra fields (e.g. cache_hit=True) to the current tool call record"""
+    record = _current_call.get()
+    if record is not None:
+        record.update(fields)
+
+
+def record_pool_wait(seconds):
+    """Called by the connection pools after a checkout"""
+    if not INSTRUMENTATION_ENABLED:
+        return
+    record = _current_call.get()
+    if record is not None:
+        record["pool_wait_seconds"] += seconds
+    observe("pool_wait_seconds", record["tool"] if record else "-", seconds)
+
+
+def record_query(query, seconds, rows):
+    """Called after each statement executes; rows is None when not known yet (server-side cursors)"""
+    if not INSTRUMENTATION_ENABLED:
+        return
+    query_id, normalized = fingerprint(query)
+    with _lock:
+        _fingerprints.setdefault(query_id, normalized)
+
+    record = _current_call.get()
+    if record is not None:
+        record["queries"].append(query_id)
+        record["query_seconds"] += seconds
+        if rows is not None:
+            record["rows"] += rows
+    observe("query_seconds", query_id, seconds)
+
+    if seconds >= SLOW_QUERY_SECONDS:
+        logger.warning("slow query %s", json.dumps({
+            "fingerprint": query_id,
+            "tool": record["tool"] if record else None,
+            "seconds": round(seconds, 4),
+            "rows": rows,
+            "query": normalized[:500],
+        }))
+
+
+def add_query_hook(hook):
+    """Register hook(connection, query, vars, seconds) to run after each successful sync statement"""
+    if hook not in _query_hooks:
+        _query_hooks.append(hook)
+
+
+def _output_size(result):
+    if result is None:
+        return 0
+    return len(result) if isinstance(result, str) else len(str(result))
+
+
+def _emit(record):
+    """Update histograms for a finished call and log it when sampled or slow"""
+    tool = record["tool"]
+    observe("call_seconds", tool, record["call_seconds"])
+    observe("rows", tool, record["rows"])
+    observe("output_chars", tool, record["output_chars"])
+
+    slow = record["call_seconds"] >= SLOW_QUERY_SECONDS
+    if not slow and not (logger.isEnabledFor(logging.INFO) and random.random() < TRACE_SAMPLE_RATE):
+        return
+
+    payload = dict(record)
+    for field in ("call_seconds", "pool_wait_seconds", "query_seconds"):
+        payload[field] = round(payload[field], 4)
+    message = json.dumps(payload, default=str)
+    if slow:
+        logger.warning("slow tool call %s", message)
+    else:
+        logger.info("tool call %s", message)
+
+
+@contextmanager
+def tool_call(tool):
+    """Collect pool wait, query fingerprints/timings, rows and output size for one tool call"""
+    record = {
+        "tool": tool,
+        "queries": [],
+        "pool_wait_seconds": 0.0,
+        "query_seconds": 0.0,
+        "rows": 0,
+        "output_chars": None,
+        "call_seconds": 0.0,
+        "error": None,
+    }
+    token = _current_call.set(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = str(e)
+        raise
+    finally:
+        record["call_seconds"] = time.perf_counter() - started
+        _current_call.reset(token)
+        _emit(record)
+
+
+def instrumented_tool(func):
+    """Wrap a tool function so each call is recorded; the tool's signature is preserved"""
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not INSTRUMENTATION_ENABLED:
+            return func(*args, **kwargs)
+        with tool_call(name) as record:
+            result = func(*args, **kwargs)
+            record["output_chars"] = _output_size(result)
+            return result
+
+    return wrapper
+
+
+# -------------------------------------------------------------------
+# psycopg2 Hooks
+# -------------------------------------------------------------------
+
+class _InstrumentedCursorMixin:
+    """Times execute() and reports the statement's fingerprint and row count"""
+
+    def execute(self, query, vars=None):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("executing %s params=%r", query, vars)
+        started = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        finally:
+            seconds = time.perf_counter() - started
+            # Named (server-side) cursors only know their row count once fetched
+            rows = self.rowcount if self.name is None and self.rowcount >= 0 else None
+            record_query(query, seconds, rows)
+        if self.name is None:
+            for hook in _query_hooks:
+                hook(self.connection, query, vars, seconds)
+        return result
+
+
+_cursor_classes = {}
+
+
+def _instrumented_cursor_class(cursor_factory):
+    cls = _cursor_classes.get(cursor_factory)
+    if cls is None:
+        cls = type(f"Instrumented{cursor_factory.__name__}", (_InstrumentedCursorMixin, cursor_factory), {})
+        _cursor_classes[cursor_factory] = cls
+    return cls
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    """
+    psycopg2 connection whose cursors report to the current tool call.
+
+    Used as the pool's connection_factory, so tools keep calling
+    connection.cursor(cursor_factory=RealDictCursor) unchanged.
+    """
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _instrumented_cursor_class(factory)
+        return super().cursor(*args, **kwargs)
@@ -0,0 +1,119 @@
+import base64
+import hashlib
+import json
+
+
+# -------------------------------------------------------------------
+# Continuation Tokens
+# -------------------------------------------------------------------
+
+# Row-level tables have no primary key; the physical row id breaks ties in the sort key.
+# Rows moved by UPDATE / VACUUM FULL between two page calls can be skipped or repeated.
+ROW_TIE_BREAKER = "ctid"
+
+
+def scope(*parts):
+    """Fingerprint of everything that shapes a ranking (tool, filters, sort) except limit and token"""
+    text = json.dumps(parts, default=str, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_token(query_scope, key_values):
+    """Opaque token holding the sort key values of the last row returned"""
+    payload = json.dumps({"s": query_scope, "k": list(key_values)}, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_token(token, query_scope):
+    """Key values from a token; raises if it is malformed or came from a different query"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        token_scope, key_values = payload["s"], payload["k"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise Exception(f"Invalid page_token: {e}")
+    if token_scope != query_scope:
+        raise Exception("page_token was issued for different filters or sorting; request the first page again")
+    return key_values
+
+
+def fetch_limit(limit):
+    """Rows to fetch for a page: one extra row tells whether another page exists"""
+    return limit + 1 if limit else limit
+
+
+def next_page(rows, limit, key_columns, query_scope):
+    """
+    Trim rows fetched with fetch_limit() to the page and build the token for the next one.
+
+    Returns (page_rows, next_page_token); the token is None on the last page.
+    key_columns name the columns holding the sort key values, in keyset order.
+    """
+    if not limit or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_token(query_scope, [last[column] for column in key_columns])
+
+
+def drop_key_columns(rows, key_columns):
+    """Remove helper key columns that were only selected to build the token"""
+    for row in rows:
+        for column in key_columns:
+            row.pop(column, None)
+    return rows
+
+
+# -------------------------------------------------------------------
+# Keyset SQL
+# -------------------------------------------------------------------
+
+def order_by(expressions, sort_order, nullable=False):
+    """ORDER BY list for a keyset; a nullable leading key sorts its NULLs last"""
+    sort_order = "ASC" if sort_order.upper() == "ASC" else "DESC"
+    terms = [f"{expression} {sort_order}" for expression in expressions]
+    if nullable:
+        terms.insert(0, f"({expressions[0]}) IS NULL")
+    return ", ".join(terms)
+
+
+def keyset_condition(expressions, sort_order, key_values, nullable=False):
+    """
+    Condition selecting the rows that follow key_values in order_by(expressions, sort_order).
+
+    All keys share one direction so a row comparison works, and the leading key is
+    also bounded on its own so an index on it can start the scan at the token.
+    Returns (condition, params).
+    """
+    after = "<" if sort_order.upper() != "ASC" else ">"
+    leading, rest = expressions[0], expressions[1:]
+    if nullable and key_values[0] is None:
+        # Already inside the trailing NULL block: only the tie-breakers move on
+        row = ", ".join(rest)
+        return f"({leading}) IS NULL AND ({row}) {after} ({', '.join(['%s'] * len(rest))})", list(key_values[1:])
+
+    row = ", ".join(expressions)
+    placeholders = ", ".join(["%s"] * len(expressions))
+    if nullable:
+        return f"(({leading}) IS NULL OR ({row}) {after} ({placeholders}))", list(key_values)
+    return f"{leading} {after}= %s AND ({row}) {after} ({placeholders})", [key_values[0]] + list(key_values)
+
+
+# -------------------------------------------------------------------
+# Tool Output
+# -------------------------------------------------------------------
+
+def attach_token(output, next_page_token):
+    """Add the continuation token to a tool's result (text gets a trailing line, other shapes a wrapper dict)"""
+    if not next_page_token:
+        return output
+    if isinstance(output, str):
+        return f"{output}\nnext_page_token: {next_page_token}\n"
+    return {"results": output, "next_page_token": next_page_token}
+
+
+def summary_with_token(summary, next_page_token):
+    """Summary dict for the shared output formats with the continuation token included"""
+    if not next_page_token:
+        return summary
+    return dict(summary or {}, next_page_token=next_page_token)
@@ -0,0 +1,330 @@
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+
+import psycopg2
+import psycopg2.extensions
+
+from tools import instrumentation
+
+
+logger = logging.getLogger("tools.query_advisor")
+
+
+# -------------------------------------------------------------------
+# Advisor Settings
+# -------------------------------------------------------------------
+
+# Opt-in: capturing a plan runs the slow query a second time under EXPLAIN ANALYZE
+ADVISOR_ENABLED = os.environ.get("TOOLS_QUERY_ADVISOR", "0") == "1"
+# Statements at least this slow get their plan captured (once per query shape)
+CAPTURE_SECONDS = float(os.environ.get("TOOLS_ADVISOR_SLOW_SECONDS", instrumentation.SLOW_QUERY_SECONDS))
+# Captured plans are written here as <fingerprint>.json so the report can run in another process
+PLAN_DIR = os.environ.get("TOOLS_ADVISOR_PLAN_DIR", "query_plans")
+MAX_CAPTURES = int(os.environ.get("TOOLS_ADVISOR_MAX_PLANS", 200))
+
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+# fingerprint -> capture record
+_captures = {}
+# fingerprints being explained right now, so concurrent slow calls capture a shape once
+_capturing = set()
+_lock = threading.Lock()
+
+
+# -------------------------------------------------------------------
+# Plan Capture
+# -------------------------------------------------------------------
+
+def _reserve(query, seconds):
+    """The query's fingerprint when its plan should be captured now, else None"""
+    if not ADVISOR_ENABLED or seconds < CAPTURE_SECONDS:
+        return None
+    if not isinstance(query, str) or not _EXPLAINABLE.match(query):
+        return None
+    query_id, _ = instrumentation.fingerprint(query)
+    with _lock:
+        if query_id in _captures or query_id in _capturing or len(_captures) >= MAX_CAPTURES:
+            return None
+        _capturing.add(query_id)
+    return query_id
+
+
+def _store(query_id, query, seconds, plan):
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    record = instrumentation.current_call()
+    capture = {
+        "fingerprint": query_id,
+        "tool": record["tool"] if record else None,
+        "seconds": round(seconds, 4),
+        "query": instrumentation.fingerprint(query)[1],
+        "captured_at": datetime.now(timezone.utc).isoformat(),
+        "plan": plan,
+        "scans": plan_scans(plan),
+    }
+    with _lock:
+        _captures[query_id] = capture
+    try:
+        os.makedirs(PLAN_DIR, exist_ok=True)
+        with open(os.path.join(PLAN_DIR, f"{query_id}.json"), "w") as plan_file:
+            json.dump(capture, plan_file, default=str)
+    except OSError as e:
+        logger.warning("could not write plan %s: %s", query_id, e)
+    logger.info("captured plan %s (%.2fs, %d sequential scans)", query_id, seconds, len(capture["scans"]))
+
+
+def capture_plan(connection, query, vars, seconds):
+    """
+    instrumentation query hook: EXPLAIN (ANALYZE, BUFFERS) a slow statement once per shape.
+
+    Runs on a plain cursor so the EXPLAIN itself is neither instrumented nor prepared,
+    inside a savepoint so a failed EXPLAIN leaves the tool's transaction usable.
+    """
+    query_id = _reserve(query, seconds)
+    if query_id is None:
+        return
+    in_transaction = not connection.autocommit
+    cursor = psycopg2.extensions.cursor(connection)
+    try:
+        if in_transaction:
+            cursor.execute("SAVEPOINT tools_query_advisor")
+        try:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", vars)
+            plan = cursor.fetchone()[0]
+        except psycopg2.Error as e:
+            if in_transaction:
+                cursor.execute("ROLLBACK TO SAVEPOINT tools_query_advisor")
+            logger.warning("EXPLAIN failed for %s: %s", query_id, e)
+            return
+        if in_transaction:
+            cursor.execute("RELEASE SAVEPOINT tools_query_advisor")
+        _store(query_id, query, seconds, plan)
+    finally:
+        cursor.close()
+        with _lock:
+            _capturing.discard(query_id)
+
+
+async def capture_plan_async(connection, query, params, seconds):
+    """capture_plan for an async (psycopg 3) connection"""
+    query_id = _reserve(query, seconds)
+    if query_id is None:
+        return
+    try:
+        async with connection.transaction():
+            async with connection.cursor() as cursor:
+                await cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", params)
+                row = await cursor.fetchone()
+        plan = next(iter(row.values())) if isinstance(row, dict) else row[0]
+        _store(query_id, query, seconds, plan)
+    except Exception as e:
+        logger.warning("EXPLAIN failed for %s: %s", query_id, e)
+    finally:
+        with _lock:
+            _capturing.discard(query_id)
+
+
+def get_captures():
+    """fingerprint -> capture record for the plans captured in this process"""
+    with _lock:
+        return dict(_captures)
+
+
+def load_captures(plan_dir=None):
+    """Captures written to PLAN_DIR, by any process"""
+    plan_dir = plan_dir or PLAN_DIR
+    captures = {}
+    if not os.path.isdir(plan_dir):
+        return captures
+    for file_name in sorted(os.listdir(plan_dir)):
+        if not file_name.endswith(".json"):
+            continue
+        with open(os.path.join(plan_dir, file_name)) as plan_file:
+            capture = json.load(plan_file)
+        captures[capture["fingerprint"]] = capture
+    return captures
+
+
+def reset_captures():
+    with _lock:
+        _captures.clear()
+
+
+# -------------------------------------------------------------------
+# Plan Analysis
+# -------------------------------------------------------------------
+
+# "(campaign_id)::text = ANY (...)", "date >= ...", "(\"Customer ID\")::text = ..."
+_CONDITION = re.compile(
+    r"(?:\b\w+\.)?(\"[^\"]+\"|[A-Za-z_]\w*)\)?(?:::[\w ]+?(?:\[\])?)?\s*(=|<>|>=|<=|>|<|~~\*|~~)\s"
+)
+_SORT_COLUMN = re.compile(r"^(?:\w+\.)?(\"[^\"]+\"|[A-Za-z_]\w*)(?:\s+(?:ASC|DESC))?(?:\s+NULLS\s+(?:FIRST|LAST))?$")
+_NOT_COLUMNS = {"and", "or", "not", "any", "all", "current_date", "now", "null", "true", "false"}
+_RANGE_OPERATORS = {">=", "<=", ">", "<"}
+
+
+def _column(name):
+    return None if name.lower() in _NOT_COLUMNS else name
+
+
+def filter_columns(condition):
+    """Split a plan Filter into (equality columns, range columns), in order of appearance"""
+    equality, ranges = [], []
+    for name, operator in _CONDITION.findall(condition or ""):
+        column = _column(name)
+        if column is None or operator in ("<>", "~~", "~~*"):
+            # Inequality and LIKE filters cannot use a b-tree index prefix
+            continue
+        target = ranges if operator in _RANGE_OPERATORS else equality
+        if column not in target:
+            target.append(column)
+    return equality, [column for column in ranges if column not in equality]
+
+
+def plan_scans(plan):
+    """Sequential scans in an EXPLAIN (FORMAT JSON) plan with the columns they filter and sort on"""
+    scans = []
+
+    def walk(node, sort_columns):
+        if node.get("Node Type") == "Sort":
+            sort_columns = []
+            for key in node.get("Sort Key", []):
+                match = _SORT_COLUMN.match(key.strip())
+                if match and _column(match.group(1)):
+                    sort_columns.append(match.group(1))
+        if node.get("Node Type") == "Seq Scan" and node.get("Relation Name"):
+            equality, ranges = filter_columns(node.get("Filter"))
+            scans.append({
+                "table": node["Relation Name"],
+                "equality_columns": equality,
+                "range_columns": ranges,
+                "sort_columns": sort_columns or [],
+                "rows_removed": node.get("Rows Removed by Filter", 0),
+                "actual_rows": node.get("Actual Rows"),
+                "total_ms": node.get("Actual Total Time"),
+            })
+        children = node.get("Plans", [])
+        for child in children:
+            # A sort only carries down to a scan it reads directly (not through joins)
+            walk(child, sort_columns if len(children) == 1 else None)
+
+    for statement in plan if isinstance(plan, list) else [plan]:
+        walk(statement.get("Plan", statement), None)
+    return scans
+
+
+def recommended_columns(scan):
+    """Index columns for one sequential scan: equality filters, then one range or sort column"""
+    columns = list(scan["equality_columns"])
+    trailing = scan["range_columns"][:1] or [column for column in scan["sort_columns"][:1] if column not in columns]
+    return tuple(columns + trailing)
+
+
+# -------------------------------------------------------------------
+# Index Recommendations
+# -------------------------------------------------------------------
+
+def existing_index_columns(connection, tables):
+    """table -> list of column tuples for the indexes already on those tables"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT t.relname, array_agg(a.attname ORDER BY k.ord)
+            FROM pg_index x
+            JOIN pg_class t ON t.oid = x.indrelid
+            CROSS JOIN LATERAL unnest(x.indkey) WITH ORDINALITY AS k(attnum, ord)
+            JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+            WHERE t.relname = ANY(%s)
+            GROUP BY t.relname, x.indexrelid
+        """, (list(tables),))
+        indexes = {}
+        for table, columns in cursor.fetchall():
+            indexes.setdefault(table, []).append(tuple(columns))
+        return indexes
+    finally:
+        cursor.close()
+
+
+def _covered(columns, indexes):
+    bare = tuple(column.strip('"') for column in columns)
+    return any(index[:len(bare)] == bare for index in indexes)
+
+
+def index_recommendations(captures=None, existing_indexes=None):
+    """
+    table -> recommendations, most captured time first.
+
+    Each recommendation is {columns, shapes, seconds, rows_removed, tools}; column sets
+    already leading an existing index are left out when existing_indexes is given.
+    """
+    captures = get_captures() if captures is None else captures
+    existing_indexes = existing_indexes or {}
+    by_table = {}
+    for capture in captures.values():
+        for scan in capture["scans"]:
+            columns = recommended_columns(scan)
+            if not columns or _covered(columns, existing_indexes.get(scan["table"], [])):
+                continue
+            entry = by_table.setdefault(scan["table"], {}).setdefault(columns, {
+                "columns": columns, "shapes": set(), "seconds": 0.0, "rows_removed": 0, "tools": set(),
+            })
+            if capture["fingerprint"] not in entry["shapes"]:
+                entry["seconds"] += capture["seconds"]
+            entry["shapes"].add(capture["fingerprint"])
+            entry["rows_removed"] += scan["rows_removed"] or 0
+            if capture["tool"]:
+                entry["tools"].add(capture["tool"])
+
+    recommendations = {}
+    for table, entries in by_table.items():
+        recommendations[table] = sorted(
+            [dict(entry, shapes=len(entry["shapes"]), tools=sorted(entry["tools"])) for entry in entries.values()],
+            key=lambda entry: entry["seconds"],
+            reverse=True,
+        )
+    return recommendations
+
+
+def index_statement(table, columns):
+    name = "_".join(re.sub(r"\W+", "_", column.strip('"')).lower() for column in columns)
+    return f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {table}_{name}_idx ON {table} ({', '.join(columns)});"
+
+
+def index_report(connection=None, captures=None):
+    """Markdown index recommendation report; pass a connection to skip indexes that already exist"""
+    captures = get_captures() if captures is None else captures
+    tables = {scan["table"] for capture in captures.values() for scan in capture["scans"]}
+    existing = existing_index_columns(connection, tables) if connection is not None and tables else None
+    recommendations = index_recommendations(captures, existing)
+
+    lines = ["# Index Recommendations", "", f"{len(captures)} slow query shapes captured.", ""]
+    if not recommendations:
+        lines.append("No sequential scans with indexable filters were captured.")
+        return "\n".join(lines)
+    for table in sorted(recommendations, key=lambda t: -sum(r["seconds"] for r in recommendations[t])):
+        lines.append(f"## {table}")
+        for entry in recommendations[table]:
+            lines.append(
+                f"- ({', '.join(entry['columns'])}): {entry['shapes']} query shapes, "
+                f"{entry['seconds']:.2f}s, {entry['rows_removed']:,} rows filtered out"
+                + (f" ({', '.join(entry['tools'])})" if entry["tools"] else "")
+            )
+            lines.append(f"  `{index_statement(table, entry['columns'])}`")
+        lines.append("")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Usage: [TOOLS_DB_DSN="host=... dbname=..."] python -m tools.query_advisor [plan_dir]
+    report_captures = load_captures(sys.argv[1] if len(sys.argv) > 1 else None)
+    report_connection = psycopg2.connect(os.environ["TOOLS_DB_DSN"]) if os.environ.get("TOOLS_DB_DSN") else None
+    try:
+        print(index_report(report_connection, report_captures))
+    finally:
+        if report_connection is not None:
+            report_connection.close()
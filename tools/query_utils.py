@@ -0,0 +1,195 @@
+import itertools
+import os
+
+from psycopg2.extras import RealDictCursor
+
+from tools import pagination
+
+
+# -------------------------------------------------------------------
+# Single-scan detail + summary queries
+# -------------------------------------------------------------------
+
+# Helper columns added by build_single_scan_query and stripped by split_single_scan_rows
+_SINGLE_SCAN_COLUMNS = ("detail_row", "detail_sort_key", "detail_tie_key")
+# Columns holding a detail row's keyset position when a tie_breaker is used
+SINGLE_SCAN_KEY_COLUMNS = ("detail_sort_key", "detail_tie_key")
+
+
+def build_single_scan_query(
+    table_name,
+    where_clause,
+    detail_select,
+    sort_expression,
+    sort_order,
+    summary_select,
+    with_limit=True,
+    tie_breaker=None,
+    nullable=False
+):
+    """
+    Build one query returning the ranked detail rows and the summary totals together.
+
+    The filtered rows are read once into a CTE that both the top-N detail query and
+    the summary aggregate consume, instead of scanning the table twice. Every output
+    row carries the summary columns; if nothing matches, a single row with only the
+    summary columns populated is returned.
+
+    Args:
+        table_name: Table to read
+        where_clause: Full "WHERE ..." clause (or empty string) shared by both parts
+        detail_select: Column list of the detail query, evaluated against the filtered rows
+        sort_expression: Expression used to rank the detail rows
+        sort_order: ASC or DESC
+        summary_select: Aggregate column list of the summary query
+        with_limit: Append "LIMIT %s" to the detail query (limit is the last parameter)
+        tie_breaker: Column of table_name that makes the detail order total (e.g. ctid),
+            returned as detail_tie_key so a keyset page token can be built
+        nullable: sort_expression can be NULL; those rows sort last, as
+            pagination.keyset_condition(..., nullable=True) expects
+    """
+    limit_clause = "LIMIT %s" if with_limit else ""
+    tie_select = f", {tie_breaker} AS detail_tie_key" if tie_breaker else ""
+    tie_column = ",\n               detail_tie_key" if tie_breaker else ""
+    tie_key = ["detail_tie_key"] if tie_breaker else []
+    detail_order = pagination.order_by([sort_expression] + tie_key, sort_order, nullable)
+    final_order = pagination.order_by([f"detail.{key}" for key in ["detail_sort_key"] + tie_key], sort_order, nullable)
+    return f"""
+    WITH filtered AS (
+        SELECT *{tie_select} FROM {table_name}
+        {where_clause}
+    ),
+    detail AS (
+        SELECT {detail_select},
+               {sort_expression} as detail_sort_key{tie_column},
+               TRUE as detail_row
+        FROM filtered
+        ORDER BY {detail_order}
+        {limit_clause}
+    ),
+    summary AS (
+        SELECT {summary_select}
+        FROM filtered
+    )
+    SELECT summary.*, detail.*
+    FROM summary
+    LEFT JOIN detail ON TRUE
+    ORDER BY {final_order}
+    """
+
+
+def build_keyset_detail_query(table_name, where_clause, detail_select, sort_expression, sort_order, tie_breaker, nullable=False):
+    """
+    Detail-only continuation of build_single_scan_query for a keyset page.
+
+    where_clause already holds the keyset condition. The summary is not repeated on
+    later pages, so the query is a plain ordered range read ending in "LIMIT %s".
+    Rows carry the same helper columns and split with split_single_scan_rows(rows, ()).
+    """
+    return f"""
+    SELECT {detail_select},
+           {sort_expression} as detail_sort_key,
+           {tie_breaker} as detail_tie_key,
+           TRUE as detail_row
+    FROM {table_name}
+    {where_clause}
+    ORDER BY {pagination.order_by([sort_expression, tie_breaker], sort_order, nullable)}
+    LIMIT %s
+    """
+
+
+def split_single_scan_rows(rows, summary_columns):
+    """
+    Split the rows of a single-scan query back into (detail_rows, summary_data).
+
+    Args:
+        rows: Rows fetched with a RealDictCursor
+        summary_columns: Names of the columns produced by the summary select
+    """
+    if not rows:
+        return [], {}
+
+    summary_data = {column: rows[0][column] for column in summary_columns}
+    hidden = set(summary_columns) | set(_SINGLE_SCAN_COLUMNS)
+    detail_rows = [
+        {key: value for key, value in row.items() if key not in hidden}
+        for row in rows
+        if row.get("detail_row")
+    ]
+    return detail_rows, summary_data
+
+
+# -------------------------------------------------------------------
+# Streaming (server-side cursors)
+# -------------------------------------------------------------------
+
+# Rows fetched per network round trip by a streaming cursor
+STREAM_ITERSIZE = int(os.environ.get("TOOLS_STREAM_ITERSIZE", 2000))
+
+_stream_ids = itertools.count(1)
+
+
+def stream_rows(connection, query, params=None, itersize=None):
+    """
+    Yield the rows of query one at a time from a named (server-side) cursor.
+
+    Only itersize rows are held in memory at once, however many the query
+    returns. The cursor lives inside the connection's transaction, so the
+    connection must stay checked out until the generator is exhausted or closed;
+    the pool rolls the transaction back when the connection is returned.
+
+    Args:
+        connection: psycopg2 connection (not in autocommit mode)
+        query: SQL to run
+        params: Query parameters
+        itersize: Rows per round trip; defaults to STREAM_ITERSIZE
+    """
+    cursor = connection.cursor(name=f"tools_stream_{next(_stream_ids)}", cursor_factory=RealDictCursor)
+    cursor.itersize = itersize or STREAM_ITERSIZE
+    try:
+        cursor.execute(query, params)
+        for row in cursor:
+            yield row
+    finally:
+        cursor.close()
+
+
+# -------------------------------------------------------------------
+# Batch lookups (several ids, one round trip)
+# -------------------------------------------------------------------
+
+# Upper bound on ids per batch call so one request cannot turn into an unbounded IN list
+MAX_BATCH_IDS = int(os.environ.get("TOOLS_MAX_BATCH_IDS", 500))
+
+
+def batch_ids(ids, label="ids"):
+    """Requested ids de-duplicated in order; raises when empty or over MAX_BATCH_IDS"""
+    ids = list(dict.fromkeys(str(value) for value in ids or () if value not in (None, "")))
+    if not ids:
+        raise Exception(f"{label} must contain at least one id")
+    if len(ids) > MAX_BATCH_IDS:
+        raise Exception(f"{label} has {len(ids)} ids; at most {MAX_BATCH_IDS} are allowed per call")
+    return ids
+
+
+def build_grouped_summary_query(table_name, id_column, where_clause, summary_select):
+    """
+    Summary per id in one scan.
+
+    where_clause must already hold the "{id_column} = ANY(%s)" filter so the
+    ids are sent as a single array parameter.
+    """
+    return f"""
+    SELECT {id_column},{summary_select}
+    FROM {table_name}
+    {where_clause}
+    GROUP BY {id_column}
+    """
+
+
+def match_requested_ids(rows, id_column, ids):
+    """(rows in the order the ids were requested, ids with no rows)"""
+    position = {value: index for index, value in enumerate(ids)}
+    rows = sorted(rows, key=lambda row: position.get(str(row[id_column]), len(ids)))
+    found = {str(row[id_column]) for row in rows}
+    return rows, [value for value in ids if value not in found]
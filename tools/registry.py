@@ -0,0 +1,280 @@
+import ast
+import importlib
+import os
+import threading
+import time
+
+
+# -------------------------------------------------------------------
+# Registry Settings
+# -------------------------------------------------------------------
+
+PACKAGE = "tools"
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Comma-separated tools modules loaded by preload() when no modules are named
+PRELOAD_MODULES = [name.strip() for name in os.environ.get("TOOLS_PRELOAD_MODULES", "").split(",") if name.strip()]
+
+# "module.tool_name" -> tool spec, filled from source by discover()
+_specs = {}
+# module name -> imported module
+_loaded = {}
+# module name -> seconds its import took
+_load_seconds = {}
+_lock = threading.Lock()
+
+_JSON_TYPES = {"str": "string", "int": "integer", "float": "number", "bool": "boolean", "dict": "object", "Dict": "object"}
+
+
+# -------------------------------------------------------------------
+# Source Parsing
+# -------------------------------------------------------------------
+
+def _decorator_call(node):
+    """The @tool decorator on a function node as (found, keyword dict)"""
+    for decorator in node.decorator_list:
+        if isinstance(decorator, ast.Name) and decorator.id == "tool":
+            return True, {}
+        if isinstance(decorator, ast.Call) and getattr(decorator.func, "id", None) == "tool":
+            return True, {keyword.arg: keyword.value for keyword in decorator.keywords}
+    return False, {}
+
+
+def _literal(node, default=None):
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, SyntaxError):
+        return default
+
+
+def _json_schema(annotation):
+    """JSON schema for a parameter annotation; (schema, optional)"""
+    if annotation is None:
+        return {}, False
+    if isinstance(annotation, ast.Name):
+        return {"type": _JSON_TYPES.get(annotation.id, "string")}, False
+    if isinstance(annotation, ast.Subscript):
+        outer = getattr(annotation.value, "id", None)
+        inner = annotation.slice
+        if outer == "Optional":
+            schema, _ = _json_schema(inner)
+            return schema, True
+        if outer == "Literal":
+            values = inner.elts if isinstance(inner, ast.Tuple) else [inner]
+            return {"type": "string", "enum": [_literal(value) for value in values]}, False
+        if outer in ("List", "list"):
+            items, _ = _json_schema(inner)
+            return {"type": "array", "items": items}, False
+        if outer in ("Dict", "dict"):
+            return {"type": "object"}, False
+    return {}, False
+
+
+def _parse_docstring(docstring):
+    """(description, {param: description}) from a Google-style docstring"""
+    if not docstring:
+        return "", {}
+    description, _, args_section = docstring.partition("Args:")
+    params = {}
+    for line in args_section.splitlines():
+        name, sep, text = line.strip().partition(":")
+        if sep and name.isidentifier():
+            params[name] = text.strip()
+    return " ".join(description.split()), params
+
+
+def _tool_spec(module_name, node, keywords):
+    """Tool metadata in the shape Strands reports it: name, description, inputSchema"""
+    docstring = ast.get_docstring(node)
+    doc_description, param_docs = _parse_docstring(docstring)
+    name = _literal(keywords["name"]) if "name" in keywords else node.name
+    description = _literal(keywords["description"]) if "description" in keywords else doc_description
+
+    args = node.args.args
+    defaults = [None] * (len(args) - len(node.args.defaults)) + list(node.args.defaults)
+    properties = {}
+    required = []
+    for arg, default in zip(args, defaults):
+        schema, _ = _json_schema(arg.annotation)
+        if arg.arg in param_docs:
+            schema["description"] = param_docs[arg.arg]
+        if default is None:
+            required.append(arg.arg)
+        else:
+            value = _literal(default)
+            if value is not None:
+                schema["default"] = value
+        properties[arg.arg] = schema
+
+    return {
+        "name": name,
+        "description": " ".join((description or node.name).split()),
+        "inputSchema": {"json": {"type": "object", "properties": properties, "required": required}},
+        "module": module_name,
+        "function": node.name,
+    }
+
+
+def _module_specs(module_name, path):
+    """Specs for every @tool in one module file; a redefined function replaces the earlier one"""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    by_function = {}
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef):
+            found, keywords = _decorator_call(node)
+            if found:
+                by_function[node.name] = _tool_spec(module_name, node, keywords)
+            else:
+                by_function.pop(node.name, None)
+    return list(by_function.values())
+
+
+def discover(refresh=False):
+    """
+    Read tool metadata from the package source without importing any module.
+
+    Returns {"module.tool_name": spec}. Parsed once; pass refresh=True after
+    adding or editing modules.
+    """
+    with _lock:
+        if _specs and not refresh:
+            return dict(_specs)
+        _specs.clear()
+        for filename in sorted(os.listdir(PACKAGE_DIR)):
+            if not filename.endswith(".py") or filename.startswith("_"):
+                continue
+            module_name = filename[:-3]
+            for spec in _module_specs(module_name, os.path.join(PACKAGE_DIR, filename)):
+                _specs[f"{module_name}.{spec['name']}"] = spec
+        return dict(_specs)
+
+
+# -------------------------------------------------------------------
+# Lookup
+# -------------------------------------------------------------------
+
+def list_tools(module=None):
+    """Specs for every tool (or one module's tools), without loading anything"""
+    return [spec for spec in discover().values() if module is None or spec["module"] == module]
+
+
+def get_tool_spec(name):
+    """
+    Spec for a tool by "module.tool_name" or by bare tool name.
+
+    Several channel modules share tool names (get_campaign_performance, ...),
+    so bare names must be unique.
+    """
+    specs = discover()
+    if name in specs:
+        return specs[name]
+    matches = [key for key, spec in specs.items() if spec["name"] == name]
+    if len(matches) == 1:
+        return specs[matches[0]]
+    if not matches:
+        raise Exception(f"Unknown tool '{name}'")
+    raise Exception(f"Tool name '{name}' is ambiguous; use one of {', '.join(sorted(matches))}")
+
+
+# -------------------------------------------------------------------
+# Loading
+# -------------------------------------------------------------------
+
+def load_module(module_name):
+    """Import a tools module once (thread-safe) and remember how long it took"""
+    module = _loaded.get(module_name)
+    if module is not None:
+        return module
+
+    with _lock:
+        module = _loaded.get(module_name)
+        if module is None:
+            started = time.perf_counter()
+            module = importlib.import_module(f"{PACKAGE}.{module_name}")
+            _load_seconds[module_name] = time.perf_counter() - started
+            _loaded[module_name] = module
+    return module
+
+
+def preload(modules=None):
+    """Load the given modules now (default: TOOLS_PRELOAD_MODULES) so first calls skip the import"""
+    for module_name in modules if modules is not None else PRELOAD_MODULES:
+        load_module(module_name)
+
+
+def loaded_modules():
+    """module name -> import seconds for every module loaded through the registry"""
+    with _lock:
+        return dict(_load_seconds)
+
+
+def get_tool(name):
+    """The real @tool object for name, loading its module if needed"""
+    spec = get_tool_spec(name)
+    return getattr(load_module(spec["module"]), spec["function"])
+
+
+def invoke(name, **kwargs):
+    """Call a tool by name, loading its module on first use"""
+    return get_tool(name)(**kwargs)
+
+
+# -------------------------------------------------------------------
+# Strands Proxies
+# -------------------------------------------------------------------
+
+_proxy_class = None
+
+
+def _lazy_tool_class():
+    """AgentTool subclass that reports the parsed spec and loads the real tool on first use"""
+    global _proxy_class
+    if _proxy_class is not None:
+        return _proxy_class
+
+    from strands.types.tools import AgentTool
+
+    class LazyTool(AgentTool):
+        def __init__(self, key, spec):
+            super().__init__()
+            self._key = key
+            self._spec = {field: spec[field] for field in ("name", "description", "inputSchema")}
+
+        @property
+        def tool_name(self):
+            return self._spec["name"]
+
+        @property
+        def tool_spec(self):
+            return self._spec
+
+        @property
+        def tool_type(self):
+            return "python"
+
+        def __call__(self, *args, **kwargs):
+            return get_tool(self._key)(*args, **kwargs)
+
+        async def stream(self, tool_use, invocation_state, **kwargs):
+            async for event in get_tool(self._key).stream(tool_use, invocation_state, **kwargs):
+                yield event
+
+    _proxy_class = LazyTool
+    return _proxy_class
+
+
+def lazy_tools(names=None, modules=None):
+    """
+    Proxies for Agent(tools=[...]) that import their module on first invocation.
+
+    Select by "module.tool_name"/bare names, or every tool in the given modules;
+    with neither, every tool in the package.
+    """
+    specs = discover()
+    if names is not None:
+        keys = [f"{spec['module']}.{spec['name']}" for spec in map(get_tool_spec, names)]
+    else:
+        keys = [key for key, spec in specs.items() if modules is None or spec["module"] in modules]
+    proxy = _lazy_tool_class()
+    return [proxy(key, specs[key]) for key in keys]
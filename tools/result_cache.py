@@ -0,0 +1,231 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from tools import db_pool, instrumentation, snapshot
+
+
+# -------------------------------------------------------------------
+# Cache Settings
+# -------------------------------------------------------------------
+
+CACHE_ENABLED = os.environ.get("TOOLS_CACHE_ENABLED", "1") == "1"
+# Least recently used entries are evicted beyond this size
+CACHE_MAX_ENTRIES = int(os.environ.get("TOOLS_CACHE_MAX_ENTRIES", 512))
+# Results longer than this many characters are returned but never stored
+CACHE_MAX_RESULT_CHARS = int(os.environ.get("TOOLS_CACHE_MAX_RESULT_CHARS", 256 * 1024))
+# Entries older than this are treated as misses (covers CURRENT_DATE-relative queries)
+CACHE_TTL_SECONDS = float(os.environ.get("TOOLS_CACHE_TTL", 900))
+# How often each table's watermark is re-read from the database
+WATERMARK_CHECK_INTERVAL = float(os.environ.get("TOOLS_CACHE_WATERMARK_INTERVAL", 60))
+
+# key -> (result, stored_at, watermark); key[0] is always the table name
+_entries = OrderedDict()
+# table -> (watermark, checked_at)
+_watermarks = {}
+_lock = threading.Lock()
+
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "evictions": 0,
+    "expirations": 0,
+    "invalidations": 0,
+}
+
+_MISSING = object()
+
+
+# -------------------------------------------------------------------
+# Keys and Watermarks
+# -------------------------------------------------------------------
+
+def _normalize(value):
+    """Hashable, whitespace-insensitive form of a tool argument"""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_normalize(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _normalize(item)) for key, item in value.items()))
+    return value
+
+
+def _cache_key(table_name, func, signature, args, kwargs):
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = tuple((name, _normalize(value)) for name, value in bound.arguments.items())
+    key = (table_name, func.__module__, func.__qualname__, arguments)
+    hash(key)
+    return key
+
+
+def _read_watermark(table_name, db_config, date_column):
+    """Latest date in the table, or its write counters when it has no date column"""
+    if snapshot.enabled():
+        return snapshot.watermark(table_name)
+
+    connection = db_pool.get_connection(db_config)
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        if date_column:
+            cursor.execute(f"SELECT MAX({date_column}) FROM {table_name}")
+        else:
+            cursor.execute(
+                "SELECT n_tup_ins + n_tup_upd + n_tup_del FROM pg_stat_user_tables WHERE relname = %s",
+                (table_name,)
+            )
+        row = cursor.fetchone()
+        connection.rollback()
+        return row[0] if row else None
+    finally:
+        if cursor:
+            cursor.close()
+        db_pool.return_connection(connection)
+
+
+def _current_watermark(table_name, db_config, date_column):
+    """Table watermark, re-read at most every WATERMARK_CHECK_INTERVAL seconds"""
+    now = time.monotonic()
+    with _lock:
+        cached = _watermarks.get(table_name)
+    if cached and now - cached[1] < WATERMARK_CHECK_INTERVAL:
+        return cached[0]
+
+    watermark = _read_watermark(table_name, db_config, date_column)
+
+    with _lock:
+        previous = _watermarks.get(table_name)
+        _watermarks[table_name] = (watermark, now)
+        if previous and previous[0] != watermark:
+            _invalidate_table(table_name)
+    return watermark
+
+
+def _invalidate_table(table_name):
+    """Drop every entry for table_name; caller holds _lock"""
+    stale = [key for key in _entries if key[0] == table_name]
+    for key in stale:
+        del _entries[key]
+    _stats["invalidations"] += len(stale)
+
+
+# -------------------------------------------------------------------
+# Lookup / Store
+# -------------------------------------------------------------------
+
+def _lookup(key, watermark):
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            _stats["misses"] += 1
+            return _MISSING
+        result, stored_at, stored_watermark = entry
+        if stored_watermark != watermark:
+            del _entries[key]
+            _stats["invalidations"] += 1
+            _stats["misses"] += 1
+            return _MISSING
+        if time.monotonic() - stored_at > CACHE_TTL_SECONDS:
+            del _entries[key]
+            _stats["expirations"] += 1
+            _stats["misses"] += 1
+            return _MISSING
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        return result
+
+
+def _store(key, result, watermark):
+    with _lock:
+        _entries[key] = (result, time.monotonic(), watermark)
+        _entries.move_to_end(key)
+        while len(_entries) > CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def _cacheable(result):
+    """Tools report failures as strings starting with 'Error'; never cache those, or oversized results"""
+    if isinstance(result, str):
+        return not result.lstrip().startswith("Error") and len(result) <= CACHE_MAX_RESULT_CHARS
+    return True
+
+
+def cached_tool(table_name, db_config, date_column="date", uncached_when=None):
+    """
+    Cache a tool's results per normalized argument tuple and table.
+
+    Place it between @tool(...) and the function so the tool spec still sees the
+    original signature and docstring. Entries for a table are dropped as soon as
+    its MAX(date_column) watermark moves; pass date_column=None for tables without
+    a date column to use the table's write counters instead. uncached_when takes
+    the bound arguments dict and returns True for calls that must bypass the cache
+    (e.g. unbounded, streamed results). Every call, hit or miss, is also recorded
+    by instrumentation.instrumented_tool.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not CACHE_ENABLED:
+                return func(*args, **kwargs)
+
+            if uncached_when is not None:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                if uncached_when(bound.arguments):
+                    return func(*args, **kwargs)
+
+            try:
+                key = _cache_key(table_name, func, signature, args, kwargs)
+                watermark = _current_watermark(table_name, db_config, date_column)
+            except Exception:
+                # Unhashable arguments or an unreachable database: run uncached
+                return func(*args, **kwargs)
+
+            result = _lookup(key, watermark)
+            if result is not _MISSING:
+                instrumentation.annotate(cache_hit=True)
+                return result
+
+            result = func(*args, **kwargs)
+            if _cacheable(result):
+                _store(key, result, watermark)
+            return result
+
+        # Outermost, so cache hits are recorded as well
+        return instrumentation.instrumented_tool(wrapper)
+
+    return decorator
+
+
+# -------------------------------------------------------------------
+# Metrics
+# -------------------------------------------------------------------
+
+def cache_stats():
+    """Hit/miss/eviction counters plus current size"""
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_entries)
+    stats["max_entries"] = CACHE_MAX_ENTRIES
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+
+def clear_cache(table_name=None):
+    """Drop all cached results, or only those for one table"""
+    with _lock:
+        if table_name is None:
+            _entries.clear()
+            _watermarks.clear()
+        else:
+            _invalidate_table(table_name)
+            _watermarks.pop(table_name, None)
@@ -0,0 +1,337 @@
+import os
+import sys
+import threading
+import time
+
+import psycopg2
+from psycopg2 import Error
+
+
+# -------------------------------------------------------------------
+# Rollup Definitions
+# -------------------------------------------------------------------
+
+# Route trend tools to the daily rollup tables when they exist and are populated
+ROUTE_TRENDS_TO_ROLLUPS = os.environ.get("TOOLS_USE_ROLLUPS", "1") == "1"
+# How long a rollup availability check (and its watermark) is trusted before it is re-checked
+READINESS_CHECK_TTL = 300
+
+# Each rollup keeps one row per day per dimension combination. Column names match
+# the source table so the trend tools' filters and SUM() expressions work unchanged.
+# Averages are stored as <name>_sum / <name>_count so AVG() over any period stays exact.
+ROLLUP_SPECS = {
+    "facebook_campaigns_ads": {
+        "date_column": "date",
+        "dimensions": ["campaign_id", "campaign_name"],
+        "sums": ["impressions", "clicks", "spend", "conversions"],
+        "averages": {
+            "ctr": "clicks::DECIMAL / NULLIF(impressions, 0)",
+            "cpc": "spend / NULLIF(clicks, 0)",
+        },
+    },
+    "tiktok_campaign_ad_details": {
+        "date_column": "date",
+        "dimensions": ["campaign_id", "campaign_name"],
+        "sums": ["impressions", "clicks", "spend", "conversions"],
+        "averages": {
+            "ctr": "clicks::DECIMAL / NULLIF(impressions, 0)",
+            "cpc": "spend / NULLIF(clicks, 0)",
+        },
+    },
+    "linkedin_ads": {
+        "date_column": "date",
+        "dimensions": ["campaign_id", "campaign_name"],
+        "sums": ["impressions", "clicks", "spend", "conversions"],
+        "averages": {
+            "ctr": "clicks::DECIMAL / NULLIF(impressions, 0)",
+            "cpc": "spend / NULLIF(clicks, 0)",
+        },
+    },
+    "bing_advertising_data": {
+        "date_column": "date",
+        "dimensions": ["campaign_id", "campaign_name", "source"],
+        "sums": ["impressions", "clicks", "spend", "conversions"],
+        "averages": {},
+    },
+    "connected_tv_ads": {
+        "date_column": "date",
+        "dimensions": ["ad_slot", "platform"],
+        "sums": ["impressions", "conversions"],
+        "averages": {
+            "completion_rate": "completion_rate",
+            "click_through_rate": "click_through_rate",
+        },
+    },
+    "linear_tv_ads": {
+        "date_column": "date",
+        "dimensions": ["network", "program", "source"],
+        "sums": ["impressions", "reach", "conversions"],
+        "averages": {
+            "frequency": "frequency",
+        },
+    },
+    "seo_organic_ads": {
+        "date_column": "ad_date",
+        "dimensions": ["page_url", "source"],
+        "sums": ["sessions", "unique_visitors", "conversions"],
+        "averages": {
+            "bounce_rate": "bounce_rate",
+            "session_duration": "avg_session_duration_sec",
+        },
+    },
+}
+
+# source table -> (latest rollup day or None, checked_at)
+_readiness = {}
+_readiness_lock = threading.Lock()
+
+
+def rollup_table_name(source_table):
+    """Name of the daily rollup table for a source table"""
+    return f"{source_table}_daily_rollup"
+
+
+def _aggregate_select(source_table):
+    """SELECT list that aggregates raw rows into one row per day and dimension combination"""
+    spec = ROLLUP_SPECS[source_table]
+    date_column = spec["date_column"]
+    columns = [f"{date_column}::date AS {date_column}"]
+    columns += spec["dimensions"]
+    columns += [f"SUM({column}) AS {column}" for column in spec["sums"]]
+    columns.append("COUNT(*) AS row_count")
+    for name, expression in spec["averages"].items():
+        columns.append(f"SUM({expression}) AS {name}_sum")
+        columns.append(f"COUNT({expression}) AS {name}_count")
+    return ",\n            ".join(columns)
+
+
+def _group_by(source_table):
+    spec = ROLLUP_SPECS[source_table]
+    return ", ".join([f"{spec['date_column']}::date"] + spec["dimensions"])
+
+
+# -------------------------------------------------------------------
+# Maintenance
+# -------------------------------------------------------------------
+
+def ensure_rollup_table(cursor, source_table):
+    """Create the rollup table and its indexes if they do not exist yet"""
+    spec = ROLLUP_SPECS[source_table]
+    rollup_table = rollup_table_name(source_table)
+    date_column = spec["date_column"]
+
+    # Column types are inherited from the aggregate query itself
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {rollup_table} AS
+        SELECT
+            {_aggregate_select(source_table)}
+        FROM {source_table}
+        GROUP BY {_group_by(source_table)}
+        WITH NO DATA
+    """)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {rollup_table}_date_idx ON {rollup_table} ({date_column})")
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS {rollup_table}_dims_idx "
+        f"ON {rollup_table} ({', '.join(spec['dimensions'])}, {date_column})"
+    )
+
+
+def refresh_rollup(connection, source_table, full=False):
+    """
+    Bring one rollup up to date with its source table.
+
+    Incremental refreshes re-aggregate from the rollup's latest day onwards (that day
+    may have been only partially ingested last time). Use full=True to rebuild after
+    backfills or corrections to older days. Refreshes of the same rollup are
+    serialized on an advisory lock.
+
+    Returns the number of rollup rows written.
+    """
+    spec = ROLLUP_SPECS[source_table]
+    rollup_table = rollup_table_name(source_table)
+    date_column = spec["date_column"]
+
+    cursor = connection.cursor()
+    try:
+        ensure_rollup_table(cursor, source_table)
+        # Concurrent refreshes would each delete and re-insert the latest day
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (rollup_table,))
+
+        watermark = None
+        if full:
+            cursor.execute(f"TRUNCATE {rollup_table}")
+        else:
+            cursor.execute(f"SELECT MAX({date_column}) FROM {rollup_table}")
+            watermark = cursor.fetchone()[0]
+
+        where_clause = ""
+        params = []
+        if watermark is not None:
+            cursor.execute(f"DELETE FROM {rollup_table} WHERE {date_column} >= %s", (watermark,))
+            where_clause = f"WHERE {date_column} >= %s"
+            params.append(watermark)
+
+        cursor.execute(f"""
+            INSERT INTO {rollup_table}
+            SELECT
+                {_aggregate_select(source_table)}
+            FROM {source_table}
+            {where_clause}
+            GROUP BY {_group_by(source_table)}
+        """, params)
+        written = cursor.rowcount
+
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        raise Exception(f"Rollup refresh failed for {source_table}: {e}")
+    finally:
+        cursor.close()
+
+    with _readiness_lock:
+        _readiness.pop(source_table, None)
+    return written
+
+
+def refresh_all_rollups(connection, full=False):
+    """Refresh every rollup; returns {source_table: rows written}"""
+    return {
+        source_table: refresh_rollup(connection, source_table, full=full)
+        for source_table in ROLLUP_SPECS
+    }
+
+
+# -------------------------------------------------------------------
+# Query Routing
+# -------------------------------------------------------------------
+
+def _cached_watermark(source_table):
+    """(known, watermark) from the readiness cache"""
+    if not ROUTE_TRENDS_TO_ROLLUPS or source_table not in ROLLUP_SPECS:
+        return True, None
+    with _readiness_lock:
+        cached = _readiness.get(source_table)
+    if cached and time.monotonic() - cached[1] < READINESS_CHECK_TTL:
+        return True, cached[0]
+    return False, None
+
+
+def _store_watermark(source_table, watermark):
+    with _readiness_lock:
+        _readiness[source_table] = (watermark, time.monotonic())
+    return watermark
+
+
+def first_value(row):
+    """The boolean `ready` column of a readiness check, from a dict or tuple row"""
+    return bool(row["ready"] if isinstance(row, dict) else row[0])
+
+
+def _watermark_query(source_table):
+    return f"SELECT MAX({ROLLUP_SPECS[source_table]['date_column']}) AS watermark FROM {rollup_table_name(source_table)}"
+
+
+def _watermark_value(row):
+    return row["watermark"] if isinstance(row, dict) else row[0]
+
+
+def rollup_watermark(cursor, source_table):
+    """Latest day in the rollup for source_table, or None when it does not exist or is empty"""
+    known, watermark = _cached_watermark(source_table)
+    if known:
+        return watermark
+
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS ready", (rollup_table_name(source_table),))
+    if not first_value(cursor.fetchone()):
+        return _store_watermark(source_table, None)
+    cursor.execute(_watermark_query(source_table))
+    return _store_watermark(source_table, _watermark_value(cursor.fetchone()))
+
+
+async def rollup_watermark_async(cursor, source_table):
+    """rollup_watermark for an async (psycopg 3) cursor; shares the same cache"""
+    known, watermark = _cached_watermark(source_table)
+    if known:
+        return watermark
+
+    await cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS ready", (rollup_table_name(source_table),))
+    if not first_value(await cursor.fetchone()):
+        return _store_watermark(source_table, None)
+    await cursor.execute(_watermark_query(source_table))
+    return _store_watermark(source_table, _watermark_value(await cursor.fetchone()))
+
+
+def rollup_ready(cursor, source_table):
+    """True when the rollup for source_table exists and has been populated"""
+    return rollup_watermark(cursor, source_table) is not None
+
+
+async def rollup_ready_async(cursor, source_table):
+    """rollup_ready for an async (psycopg 3) cursor"""
+    return await rollup_watermark_async(cursor, source_table) is not None
+
+
+def rollup_source(source_table, watermark):
+    """
+    FROM expression reading the rollup up to date, or the source table when watermark is None.
+
+    Days before the watermark come from the rollup; the watermark day and anything
+    ingested since are aggregated from the source rows, so answers stay current
+    between refreshes. The expression is aliased to the rollup's name and has its columns.
+    """
+    if watermark is None:
+        return source_table
+    date_column = ROLLUP_SPECS[source_table]["date_column"]
+    rollup_table = rollup_table_name(source_table)
+    return f"""(
+            SELECT * FROM {rollup_table} WHERE {date_column} < DATE '{watermark.isoformat()}'
+            UNION ALL
+            SELECT
+                {_aggregate_select(source_table)}
+            FROM {source_table}
+            WHERE {date_column} >= DATE '{watermark.isoformat()}'
+            GROUP BY {_group_by(source_table)}
+        ) AS {rollup_table}"""
+
+
+def _trend_source(source_table, watermark):
+    spec = ROLLUP_SPECS[source_table]
+
+    if watermark is not None:
+        aggregates = {"row_count": "SUM(row_count)"}
+        for name in spec["averages"]:
+            aggregates[f"avg_{name}"] = f"(SUM({name}_sum) / NULLIF(SUM({name}_count), 0))"
+        return rollup_source(source_table, watermark), aggregates
+
+    aggregates = {"row_count": "COUNT(*)"}
+    for name, expression in spec["averages"].items():
+        aggregates[f"avg_{name}"] = f"AVG({expression})"
+    return source_table, aggregates
+
+
+def trend_source(cursor, source_table):
+    """
+    Pick the table expression a trend query should read and the aggregate expressions to use on it.
+
+    Returns (table_name, aggregates) where table_name is the source table or
+    rollup_source()'s expression, and aggregates maps:
+        row_count      -> number of raw rows in the group
+        avg_<name>     -> average of each ROLLUP_SPECS average (unrounded)
+    SUM() of source columns is identical on both and needs no mapping.
+    """
+    return _trend_source(source_table, rollup_watermark(cursor, source_table))
+
+
+async def trend_source_async(cursor, source_table):
+    """trend_source for an async (psycopg 3) cursor"""
+    return _trend_source(source_table, await rollup_watermark_async(cursor, source_table))
+
+
+if __name__ == "__main__":
+    # Usage: TOOLS_DB_DSN="host=... dbname=..." python -m tools.rollups [--full]
+    refresh_connection = psycopg2.connect(os.environ["TOOLS_DB_DSN"])
+    try:
+        for table, rows in refresh_all_rollups(refresh_connection, full="--full" in sys.argv).items():
+            print(f"{rollup_table_name(table)}: {rows} rows refreshed")
+    finally:
+        refresh_connection.close()
@@ -3,7 +3,9 @@ from strands import Agent, tool
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from psycopg2 import Error
-import psycopg2.pool
+from tools import db_pool, distinct_sketches, pagination, rollups
+from tools.result_cache import cached_tool
+from tools import agent_factory, async_db
 
 
 # Database configuration - update with your Aurora PostgreSQL details
@@ -16,93 +18,159 @@ DB_CONFIG = {
 }
 
 
-# Global connection pool
-connection_pool = None
-
+TABLE_NAME = "seo_organic_ads"  
 
 # -------------------------------------------------------------------
 # Connection Pool Setup
 # -------------------------------------------------------------------
 
 def initialize_connection_pool():
-    """Initialize connection pool"""                                                     
-    global connection_pool
-    try:
-        connection_pool = psycopg2.pool.SimpleConnectionPool(
-            1, 20,  # min and max connections
-            **DB_CONFIG
-        )
-        return connection_pool
-    except Error as e:
-        raise Exception(f"Connection pool initialization failed: {e}")
+    """Initialize (or reuse) the process-wide connection pool"""
+    return db_pool.get_pool(DB_CONFIG)
 
 
 def get_db_connection():
-    """Get database connection from pool"""
-    global connection_pool
-    if connection_pool is None:
-        initialize_connection_pool()
-
-    try:
-        connection = connection_pool.getconn()
-        return connection
-    except Error as e:
-        raise Exception(f"Database connection failed: {e}")
+    """Get database connection from the shared pool"""
+    return db_pool.get_connection(DB_CONFIG)
 
 
 def return_connection(connection):
-    """Return connection to pool"""
-    global connection_pool
-    if connection_pool and connection:
-        connection_pool.putconn(connection)
-
+    """Return connection to the shared pool"""
+    db_pool.return_connection(connection)
 
-TABLE_NAME = "seo_organic_ads"  
 
-# Global connection pool
-connection_pool = None
+db_pool.warm_up(DB_CONFIG)
 
 
 # -------------------------------------------------------------------
-# Connection Pool Setup
+# Merged Web Analytics Tools
 # -------------------------------------------------------------------
 
-def initialize_connection_pool():
-    """Initialize connection pool"""                                                     
-    global connection_pool
-    try:
-        connection_pool = psycopg2.pool.SimpleConnectionPool(
-            1, 20,  # min and max connections
-            **DB_CONFIG
-        )
-        return connection_pool
-    except Error as e:
-        raise Exception(f"Connection pool initialization failed: {e}")
+# Hidden columns carrying each row's keyset position; dropped before rows are returned
+_PAGE_KEY_COLUMNS = ["page_sort_key", "page_row_id"]
 
 
-def get_db_connection():
-    """Get database connection from pool"""
-    global connection_pool
-    if connection_pool is None:
-        initialize_connection_pool()
+def _page_analytics_sort(sort_by, sort_order):
+    """(sort expression, direction) for get_page_analytics"""
+    sort_mapping = {
+        "ad_date": "ad_date",
+        "sessions": "sessions",
+        "conversions": "conversions", 
+        "conversion_rate": "conversions * 100.0 / NULLIF(sessions, 0)",
+        "bounce_rate": "bounce_rate",
+        "avg_session_duration": "avg_session_duration_sec",
+        "unique_visitors": "unique_visitors"
+    }
 
-    try:
-        connection = connection_pool.getconn()
-        return connection
-    except Error as e:
-        raise Exception(f"Database connection failed: {e}")
+    if sort_by not in sort_mapping:
+        return "ad_date", "DESC"
+    if sort_by == "bounce_rate" and sort_order.lower() == "desc":
+        return sort_mapping[sort_by], "ASC"  # Lower bounce rate is better
+    return sort_mapping[sort_by], sort_order.upper()
 
 
-def return_connection(connection):
-    """Return connection to pool"""
-    global connection_pool
-    if connection_pool and connection:
-        connection_pool.putconn(connection)
+def _page_analytics_scope(start_date, end_date, page_url, min_sessions, max_bounce_rate, min_conversions, source, sort_by, sort_order):
+    return pagination.scope(
+        TABLE_NAME, start_date, end_date, page_url, min_sessions, max_bounce_rate, min_conversions, source, sort_by, sort_order
+    )
 
 
-# -------------------------------------------------------------------
-# Merged Web Analytics Tools
-# -------------------------------------------------------------------
+def _page_analytics_query(start_date, end_date, page_url, min_sessions, max_bounce_rate, min_conversions, source, sort_by, sort_order, limit, page_key=None):
+    """Build the page-level query; returns (query, params)"""
+    sort_expression, direction = _page_analytics_sort(sort_by, sort_order)
+    # The row id breaks ties so page tokens resume at an exact row
+    key_expressions = [sort_expression, pagination.ROW_TIE_BREAKER]
+
+    query = f"""
+        SELECT ad_date, page_url, sessions, unique_visitors, 
+               ROUND(bounce_rate * 100, 2) as bounce_rate_pct,
+               avg_session_duration_sec,
+               ROUND(avg_session_duration_sec / 60.0, 2) as avg_session_duration_min,
+               conversions, source,
+               ROUND(
+                   CAST(conversions * 100.0 / NULLIF(sessions, 0) AS NUMERIC), 
+                   2
+               ) as conversion_rate_pct,
+               ROUND(
+                   CAST(unique_visitors * 100.0 / NULLIF(sessions, 0) AS NUMERIC), 
+                   2
+               ) as unique_visitor_rate_pct,
+               {sort_expression} as page_sort_key,
+               {pagination.ROW_TIE_BREAKER} as page_row_id
+        FROM {TABLE_NAME}
+    """
+
+    where_conditions = []
+    params = []
+
+    if page_url:
+        where_conditions.append("page_url ILIKE %s")
+        params.append(f"%{page_url}%")
+    if start_date:
+        where_conditions.append("ad_date >= %s")
+        params.append(start_date)
+    if end_date:
+        where_conditions.append("ad_date <= %s")
+        params.append(end_date)
+    if min_sessions is not None:
+        where_conditions.append("sessions >= %s")
+        params.append(min_sessions)
+    if max_bounce_rate is not None:
+        where_conditions.append("bounce_rate <= %s")
+        params.append(max_bounce_rate)
+    if min_conversions is not None:
+        where_conditions.append("conversions >= %s")
+        params.append(min_conversions)
+    if source:
+        where_conditions.append("source ILIKE %s")
+        params.append(f"%{source}%")
+
+    if page_key:
+        condition, key_params = pagination.keyset_condition(key_expressions, direction, page_key, nullable=True)
+        where_conditions.append(condition)
+        params.extend(key_params)
+
+    if where_conditions:
+        query += " WHERE " + " AND ".join(where_conditions)
+
+    query += f" ORDER BY {pagination.order_by(key_expressions, direction, nullable=True)}"
+
+    query += " LIMIT %s"
+    params.append(limit)
+
+    return query, params
+
+
+def _format_page_analytics(results):
+    """Return the page rows (or a no-match message)"""
+    if not results:
+        return "No pages found matching the criteria."
+    else:
+        return results
+
+    # # Dynamic header based on search/filter context
+    # if page_url:
+    #     output = f"Found {len(results)} pages with '{page_url}' in URL:\n\n"
+    # elif sort_by != "date":
+    #     output = f"Top {len(results)} pages by {sort_by.replace('_', ' ').title()}:\n\n"
+    # else:
+    #     output = f"Page Analytics Results ({len(results)} records):\n\n"
+
+    # for i, row in enumerate(results, 1):
+    #     if sort_by != "date":
+    #         output += f"{i}. "
+
+    #     output += (
+    #         f"Date: {row['date']} | Page: {row['page_url']}\n"
+    #         f"   Sessions: {row['sessions']:,} | Unique Visitors: {row['unique_visitors']:,} ({row['unique_visitor_rate_pct']}%)\n"
+    #         f"   Bounce Rate: {row['bounce_rate_pct']}% | Avg Duration: {row['avg_session_duration_min']} min\n"
+    #         f"   Conversions: {row['conversions']} ({row['conversion_rate_pct'] or 0}%)\n"
+    #         f"   Source: {row['source']}\n"
+    #         + "-" * 60 + "\n"
+    #     )
+
+    # return output
+
 
 @tool(name="get_page_analytics",
     description=(
@@ -124,6 +192,7 @@ def return_connection(connection):
     )
 )
 
+@cached_tool(TABLE_NAME, DB_CONFIG, date_column="ad_date")
 def get_page_analytics(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
@@ -135,6 +204,7 @@ def get_page_analytics(
     sort_by: Optional[str] = "date",
     sort_order: Optional[str] = "desc",
     limit: Optional[int] = 10,
+    page_token: Optional[str] = None,
 ) -> str:
     """
     tool for page performance analysis - combines page performance, search, and ranking capabilities.
@@ -150,120 +220,280 @@ def get_page_analytics(
         sort_by: Sort by metric (date, sessions, conversions, conversion_rate, bounce_rate, avg_session_duration)
         sort_order: Sort order (asc, desc)
         limit: Number of results to return
+        page_token: next_page_token from the previous call, to fetch the following page
     """
     connection = None
+    cursor = None
+    
     try:
+        page_scope = _page_analytics_scope(start_date, end_date, page_url, min_sessions, max_bounce_rate, min_conversions, source, sort_by, sort_order)
+        page_key = pagination.decode_token(page_token, page_scope) if page_token else None
+        query, params = _page_analytics_query(
+            start_date, end_date, page_url, min_sessions, max_bounce_rate, min_conversions, source, sort_by, sort_order,
+            pagination.fetch_limit(limit), page_key
+        )
+        
         connection = get_db_connection()
-
         cursor = connection.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(query, params)
+        results, next_page_token = pagination.next_page(cursor.fetchall(), limit, _PAGE_KEY_COLUMNS, page_scope)
+        results = pagination.drop_key_columns(results, _PAGE_KEY_COLUMNS)
+        return pagination.attach_token(_format_page_analytics(results), next_page_token)
+    except Exception as e:
+        return f"Error retrieving page analytics: {str(e)}"
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            return_connection(connection)
 
-        query = f"""
-            SELECT ad_date, page_url, sessions, unique_visitors, 
-                   ROUND(bounce_rate * 100, 2) as bounce_rate_pct,
-                   avg_session_duration_sec,
-                   ROUND(avg_session_duration_sec / 60.0, 2) as avg_session_duration_min,
-                   conversions, source,
-                   ROUND(
-                       CAST(conversions * 100.0 / NULLIF(sessions, 0) AS NUMERIC), 
-                       2
-                   ) as conversion_rate_pct,
-                   ROUND(
-                       CAST(unique_visitors * 100.0 / NULLIF(sessions, 0) AS NUMERIC), 
-                       2
-                   ) as unique_visitor_rate_pct
-            FROM {TABLE_NAME}
-        """
-
-        where_conditions = []
-        params = []
-        
-        if page_url:
-            where_conditions.append("page_url ILIKE %s")
-            params.append(f"%{page_url}%")
-        if start_date:
-            where_conditions.append("ad_date >= %s")
-            params.append(start_date)
-        if end_date:
-            where_conditions.append("ad_date <= %s")
-            params.append(end_date)
-        if min_sessions is not None:
-            where_conditions.append("sessions >= %s")
-            params.append(min_sessions)
-        if max_bounce_rate is not None:
-            where_conditions.append("bounce_rate <= %s")
-            params.append(max_bounce_rate)
-        if min_conversions is not None:
-            where_conditions.append("conversions >= %s")
-            params.append(min_conversions)
-        if source:
-            where_conditions.append("source ILIKE %s")
-            params.append(f"%{source}%")
-
-        if where_conditions:
-            query += " WHERE " + " AND ".join(where_conditions)
-
-        # Handle sorting
-        sort_mapping = {
-            "ad_date": "ad_date",
-            "sessions": "sessions",
-            "conversions": "conversions", 
-            "conversion_rate": "conversions * 100.0 / NULLIF(sessions, 0)",
-            "bounce_rate": "bounce_rate",
-            "avg_session_duration": "avg_session_duration_sec",
-            "unique_visitors": "unique_visitors"
-        }
-        
-        if sort_by in sort_mapping:
-            if sort_by == "bounce_rate" and sort_order.lower() == "desc":
-                query += f" ORDER BY {sort_mapping[sort_by]} ASC NULLS LAST"  # Lower bounce rate is better
-            else:
-                query += f" ORDER BY {sort_mapping[sort_by]} {sort_order.upper()} NULLS LAST"
-        else:
-            query += " ORDER BY ad_date DESC"
 
-        query += " LIMIT %s"
-        params.append(limit)
-        
-        cursor.execute(query, params)
-        results = cursor.fetchall()
+async def get_page_analytics_async(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    page_url: Optional[str] = None,
+    min_sessions: Optional[int] = None,
+    max_bounce_rate: Optional[float] = None,
+    min_conversions: Optional[int] = None,
+    source: Optional[str] = None,
+    sort_by: Optional[str] = "date",
+    sort_order: Optional[str] = "desc",
+    limit: Optional[int] = 10,
+    page_token: Optional[str] = None,
+) -> str:
+    """Async variant of get_page_analytics on the psycopg 3 pool"""
+    try:
+        page_scope = _page_analytics_scope(start_date, end_date, page_url, min_sessions, max_bounce_rate, min_conversions, source, sort_by, sort_order)
+        page_key = pagination.decode_token(page_token, page_scope) if page_token else None
+        query, params = _page_analytics_query(
+            start_date, end_date, page_url, min_sessions, max_bounce_rate, min_conversions, source, sort_by, sort_order,
+            pagination.fetch_limit(limit), page_key
+        )
+        rows = await async_db.fetch_all(DB_CONFIG, query, params)
+        results, next_page_token = pagination.next_page(rows, limit, _PAGE_KEY_COLUMNS, page_scope)
+        results = pagination.drop_key_columns(results, _PAGE_KEY_COLUMNS)
+        return pagination.attach_token(_format_page_analytics(results), next_page_token)
+    except Exception as e:
+        return f"Error retrieving page analytics: {str(e)}"
+
+
+def _daily_trends_query(trend_table, aggregates, source, days_for_trends):
+    """Build the per-day trends query against trend_table; returns (query, params)"""
+    query = f"""
+        SELECT 
+            ad_date,
+            {aggregates['row_count']} as daily_pages,
+            SUM(sessions) as daily_sessions,
+            SUM(unique_visitors) as daily_unique_visitors,
+            ROUND({aggregates['avg_bounce_rate']} * 100, 2) as avg_bounce_rate,
+            ROUND({aggregates['avg_session_duration']} / 60.0, 2) as avg_session_duration_min,
+            SUM(conversions) as daily_conversions,
+            ROUND(
+                CAST(SUM(conversions) * 100.0 / NULLIF(SUM(sessions), 0) AS NUMERIC), 
+                2
+            ) as daily_conversion_rate
+        FROM {trend_table}
+        WHERE ad_date >= CURRENT_DATE - INTERVAL '{days_for_trends} DAYS'
+    """
+
+    params = []
+    if source:
+        query += " AND source ILIKE %s"
+        params.append(f"%{source}%")
+
+    query += """
+        GROUP BY ad_date
+        ORDER BY ad_date DESC
+    """
+
+    return query, params
+
+
+def _unique_pages_sketch(sketch_table, start_date, end_date, source, group_by=None):
+    """WITH clause merging the daily page_url sketches for the summary filters; returns (with_clause, params)"""
+    where_conditions = []
+    params = []
+
+    if start_date:
+        where_conditions.append("ad_date >= %s")
+        params.append(start_date)
+    if end_date:
+        where_conditions.append("ad_date <= %s")
+        params.append(end_date)
+    if source:
+        where_conditions.append("source ILIKE %s")
+        params.append(f"%{source}%")
+
+    where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+    distinct_counts = distinct_sketches.distinct_counts_query(sketch_table, ["page_url"], group_by, where_clause)
+    return f"WITH distinct_counts AS ({distinct_counts})", params
+
+
+def _source_summary_query(start_date, end_date, source, sketch_table=None):
+    """Build the per-source breakdown query; returns (query, params)"""
+    with_clause, params = "", []
+    unique_pages = "COUNT(DISTINCT page_url)"
+    from_clause = TABLE_NAME
+    if sketch_table:
+        # Approximate unique pages per source from the daily HyperLogLog sketches
+        with_clause, params = _unique_pages_sketch(sketch_table, start_date, end_date, source, {"sketch_source": "source"})
+        unique_pages = "COALESCE(MAX(distinct_counts.page_url_count), 0)"
+        from_clause = f"{TABLE_NAME} LEFT JOIN distinct_counts ON distinct_counts.sketch_source IS NOT DISTINCT FROM {TABLE_NAME}.source"
+
+    query = f"""
+        {with_clause}
+        SELECT 
+            source,
+            COUNT(*) as total_records,
+            {unique_pages} as unique_pages,
+            SUM(sessions) as total_sessions,
+            SUM(unique_visitors) as total_unique_visitors,
+            ROUND(AVG(bounce_rate) * 100, 2) as avg_bounce_rate,
+            ROUND(AVG(avg_session_duration_sec) / 60.0, 2) as avg_session_duration_min,
+            SUM(conversions) as total_conversions,
+            ROUND(
+                CAST(SUM(conversions) * 100.0 / NULLIF(SUM(sessions), 0) AS NUMERIC), 
+                2
+            ) as conversion_rate
+        FROM {from_clause}
+    """
+
+    where_conditions = []
+
+    if start_date:
+        where_conditions.append("date >= %s")
+        params.append(start_date)
+    if end_date:
+        where_conditions.append("date <= %s")
+        params.append(end_date)
+    if source:
+        where_conditions.append("source ILIKE %s")
+        params.append(f"%{source}%")
+
+    if where_conditions:
+        query += " WHERE " + " AND ".join(where_conditions)
+
+    query += """
+        GROUP BY source
+        ORDER BY SUM(sessions) DESC
+    """
+
+    return query, params
+
+
+def _overall_summary_query(start_date, end_date, source, sketch_table=None):
+    """Build the overall KPI query; returns (query, params)"""
+    with_clause, params = "", []
+    unique_pages = "COUNT(DISTINCT page_url)"
+    if sketch_table:
+        # Approximate unique pages from the daily HyperLogLog sketches
+        with_clause, params = _unique_pages_sketch(sketch_table, start_date, end_date, source)
+        unique_pages = "COALESCE((SELECT page_url_count FROM distinct_counts), 0)"
+
+    query = f"""
+        {with_clause}
+        SELECT 
+            COUNT(*) as total_records,
+            {unique_pages} as unique_pages,
+            SUM(sessions) as total_sessions,
+            SUM(unique_visitors) as total_unique_visitors,
+            ROUND(AVG(bounce_rate) * 100, 2) as avg_bounce_rate,
+            ROUND(AVG(avg_session_duration_sec), 2) as avg_session_duration,
+            ROUND(AVG(avg_session_duration_sec) / 60.0, 2) as avg_session_duration_min,
+            SUM(conversions) as total_conversions,
+            ROUND(
+                CAST(SUM(conversions) * 100.0 / NULLIF(SUM(sessions), 0) AS NUMERIC), 
+                2
+            ) as overall_conversion_rate,
+            ROUND(
+                CAST(SUM(unique_visitors) * 100.0 / NULLIF(SUM(sessions), 0) AS NUMERIC), 
+                2
+            ) as unique_visitor_rate,
+            MIN(ad_date) as earliest_date,
+            MAX(ad_date) as latest_date
+        FROM {TABLE_NAME}
+    """
+    where_conditions = []
+
+    if start_date:
+        where_conditions.append("date >= %s")
+        params.append(start_date)
+    if end_date:
+        where_conditions.append("date <= %s")
+        params.append(end_date)
+    if source:
+        where_conditions.append("source ILIKE %s")
+        params.append(f"%{source}%")
+
+    if where_conditions:
+        query += " WHERE " + " AND ".join(where_conditions)
+
+    return query, params
+
 
-        if not results:
-            return "No pages found matching the criteria."
+def _format_analytics_summary(rows, group_by, source, days_for_trends):
+    """Return the summary rows for group_by (or a no-data message)"""
+    if group_by == "daily_trends":
+        if not rows:
+            return f"No trend data available for the last {days_for_trends} days."
         else:
-            return results
+            return rows
 
-        # # Dynamic header based on search/filter context
-        # if page_url:
-        #     output = f"Found {len(results)} pages with '{page_url}' in URL:\n\n"
-        # elif sort_by != "date":
-        #     output = f"Top {len(results)} pages by {sort_by.replace('_', ' ').title()}:\n\n"
-        # else:
-        #     output = f"Page Analytics Results ({len(results)} records):\n\n"
+        # output = f"Traffic Trends (Last {days_for_trends} Days)\n" + "=" * 50 + "\n\n"
+        # for row in results:
+        #     output += (
+        #         f"{row['date']}: "
+        #         f"{row['daily_pages']} pages, "
+        #         f"{row['daily_sessions']:,} sessions, "
+        #         f"{row['daily_unique_visitors']:,} visitors, "
+        #         f"{row['avg_bounce_rate']}% bounce, "
+        #         f"{row['avg_session_duration_min']}min duration, "
+        #         f"{row['daily_conversions']} conversions ({row['daily_conversion_rate'] or 0}%)\n"
+        #     )
+
+    elif group_by == "source":
+        if not rows:
+            return f"No trend data available for the source {source} days."
+        else:
+            return rows
 
+        # output = f"Traffic Source Performance Analysis:\n" + "=" * 50 + "\n\n"
         # for i, row in enumerate(results, 1):
-        #     if sort_by != "date":
-        #         output += f"{i}. "
-            
         #     output += (
-        #         f"Date: {row['date']} | Page: {row['page_url']}\n"
-        #         f"   Sessions: {row['sessions']:,} | Unique Visitors: {row['unique_visitors']:,} ({row['unique_visitor_rate_pct']}%)\n"
-        #         f"   Bounce Rate: {row['bounce_rate_pct']}% | Avg Duration: {row['avg_session_duration_min']} min\n"
-        #         f"   Conversions: {row['conversions']} ({row['conversion_rate_pct'] or 0}%)\n"
-        #         f"   Source: {row['source']}\n"
-        #         + "-" * 60 + "\n"
+        #         f"{i}. {row['source']}\n"
+        #         f"   Records: {row['total_records']:,} | Unique Pages: {row['unique_pages']:,}\n"
+        #         f"   Sessions: {row['total_sessions']:,} | Unique Visitors: {row['total_unique_visitors']:,}\n"
+        #         f"   Bounce Rate: {row['avg_bounce_rate']}% | Avg Duration: {row['avg_session_duration_min']} min\n"
+        #         f"   Conversions: {row['total_conversions']:,} ({row['conversion_rate'] or 0}%)\n"
+        #         + "-" * 50 + "\n"
         #     )
 
-        # return output
+    else:
+        if not rows or rows["total_records"] == 0:
+            return "No data found for the specified criteria."
+        else:
+            return rows
 
-    except Exception as e:
-        return f"Error retrieving page analytics: {str(e)}"
-    finally:
-        if connection:
-            cursor.close()
-            return_connection(connection)
+        #     output = (
+        #         "Web Analytics Overview\n"
+        #         + "=" * 40 + "\n\n"
+        #         f"Analysis Period: {result['earliest_date']} to {result['latest_date']}\n"
+        #         f"Total Records: {result['total_records']:,}\n"
+        #         f"Unique Pages: {result['unique_pages']:,}\n"
+        #         f"Total Sessions: {result['total_sessions']:,}\n"
+        #         f"Total Unique Visitors: {result['total_unique_visitors']:,}\n"
+        #         f"Unique Visitor Rate: {result['unique_visitor_rate']}%\n"
+        #         f"Average Bounce Rate: {result['avg_bounce_rate']}%\n"
+        #         f"Average Session Duration: {result['avg_session_duration_min']} minutes\n"
+        #         f"Total Conversions: {result['total_conversions']:,}\n"
+        #         f"Overall Conversion Rate: {result['overall_conversion_rate'] or 0}%\n"
+        #     )
+
+        # return output
 
 
 @tool(name="get_analytics_summary",description="Generates a comprehensive SEO analytics summary from organic ads data. This tool aggregates performance metrics at different levels depending on the 'group_by' parameter: 'overall': Returns total sessions, unique visitors, bounce rate, conversions, average session duration, and overall conversion rates across the selected date range. 'source': Breaks down performance by traffic source, showing sessions, unique visitors, bounce rates, ""and conversion performance for each source.  'daily_trends': Provides daily trends over a configurable number of days, showing sessions, visitors, conversions, bounce rates, and average session duration per day. Filters can be applied by date range and traffic source.")
+@cached_tool(TABLE_NAME, DB_CONFIG, date_column="ad_date")
 def get_analytics_summary(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
@@ -282,208 +512,89 @@ def get_analytics_summary(
         days_for_trends: Number of days for trend analysis (when group_by='daily_trends')
     """
     connection = None
+    cursor = None
+    
     try:
         connection = get_db_connection()
         cursor = connection.cursor(cursor_factory=RealDictCursor)
 
         if group_by == "daily_trends":
-            # Daily trends analysis
-            query = f"""
-                SELECT 
-                    ad_date,
-                    COUNT(*) as daily_pages,
-                    SUM(sessions) as daily_sessions,
-                    SUM(unique_visitors) as daily_unique_visitors,
-                    ROUND(AVG(bounce_rate) * 100, 2) as avg_bounce_rate,
-                    ROUND(AVG(avg_session_duration_sec) / 60.0, 2) as avg_session_duration_min,
-                    SUM(conversions) as daily_conversions,
-                    ROUND(
-                        CAST(SUM(conversions) * 100.0 / NULLIF(SUM(sessions), 0) AS NUMERIC), 
-                        2
-                    ) as daily_conversion_rate
-                FROM {TABLE_NAME}
-                WHERE ad_date >= CURRENT_DATE - INTERVAL '{days_for_trends} DAYS'
-            """
-            
-            params = []
-            if source:
-                query += " AND source ILIKE %s"
-                params.append(f"%{source}%")
-                
-            query += """
-                GROUP BY ad_date
-                ORDER BY ad_date DESC
-            """
-            cursor.execute(query, params)
-            results = cursor.fetchall()
-
-            if not results:
-                return f"No trend data available for the last {days_for_trends} days."
-            else:
-                return results
-
-            # output = f"Traffic Trends (Last {days_for_trends} Days)\n" + "=" * 50 + "\n\n"
-            # for row in results:
-            #     output += (
-            #         f"{row['date']}: "
-            #         f"{row['daily_pages']} pages, "
-            #         f"{row['daily_sessions']:,} sessions, "
-            #         f"{row['daily_unique_visitors']:,} visitors, "
-            #         f"{row['avg_bounce_rate']}% bounce, "
-            #         f"{row['avg_session_duration_min']}min duration, "
-            #         f"{row['daily_conversions']} conversions ({row['daily_conversion_rate'] or 0}%)\n"
-            #     )
-
+            # Daily trends analysis, read from the per-day page rollup when it is available
+            trend_table, aggregates = rollups.trend_source(cursor, TABLE_NAME)
+            query, params = _daily_trends_query(trend_table, aggregates, source, days_for_trends)
         elif group_by == "source":
-            # Source performance analysis
-            query = f"""
-                SELECT 
-                    source,
-                    COUNT(*) as total_records,
-                    COUNT(DISTINCT page_url) as unique_pages,
-                    SUM(sessions) as total_sessions,
-                    SUM(unique_visitors) as total_unique_visitors,
-                    ROUND(AVG(bounce_rate) * 100, 2) as avg_bounce_rate,
-                    ROUND(AVG(avg_session_duration_sec) / 60.0, 2) as avg_session_duration_min,
-                    SUM(conversions) as total_conversions,
-                    ROUND(
-                        CAST(SUM(conversions) * 100.0 / NULLIF(SUM(sessions), 0) AS NUMERIC), 
-                        2
-                    ) as conversion_rate
-                FROM {TABLE_NAME}
-            """
-
-            where_conditions = []
-            params = []
-            
-            if start_date:
-                where_conditions.append("date >= %s")
-                params.append(start_date)
-            if end_date:
-                where_conditions.append("date <= %s")
-                params.append(end_date)
-            if source:
-                where_conditions.append("source ILIKE %s")
-                params.append(f"%{source}%")
-
-            if where_conditions:
-                query += " WHERE " + " AND ".join(where_conditions)
-
-            query += """
-                GROUP BY source
-                ORDER BY SUM(sessions) DESC
-            """
-
-            cursor.execute(query, params)
-            results = cursor.fetchall()
-            if not results:
-                return f"No trend data available for the source {source} days."
-            else:
-                return results
-
-
-            # output = f"Traffic Source Performance Analysis:\n" + "=" * 50 + "\n\n"
-            # for i, row in enumerate(results, 1):
-            #     output += (
-            #         f"{i}. {row['source']}\n"
-            #         f"   Records: {row['total_records']:,} | Unique Pages: {row['unique_pages']:,}\n"
-            #         f"   Sessions: {row['total_sessions']:,} | Unique Visitors: {row['total_unique_visitors']:,}\n"
-            #         f"   Bounce Rate: {row['avg_bounce_rate']}% | Avg Duration: {row['avg_session_duration_min']} min\n"
-            #         f"   Conversions: {row['total_conversions']:,} ({row['conversion_rate'] or 0}%)\n"
-            #         + "-" * 50 + "\n"
-            #     )
-
+            # Source performance analysis; unique pages come from the daily sketches in approximate mode
+            sketch_table = distinct_sketches.sketch_source(cursor, TABLE_NAME)
+            query, params = _source_summary_query(start_date, end_date, source, sketch_table)
         else:
             # Overall summary
-            query = f"""
-                SELECT 
-                    COUNT(*) as total_records,
-                    COUNT(DISTINCT page_url) as unique_pages,
-                    SUM(sessions) as total_sessions,
-                    SUM(unique_visitors) as total_unique_visitors,
-                    ROUND(AVG(bounce_rate) * 100, 2) as avg_bounce_rate,
-                    ROUND(AVG(avg_session_duration_sec), 2) as avg_session_duration,
-                    ROUND(AVG(avg_session_duration_sec) / 60.0, 2) as avg_session_duration_min,
-                    SUM(conversions) as total_conversions,
-                    ROUND(
-                        CAST(SUM(conversions) * 100.0 / NULLIF(SUM(sessions), 0) AS NUMERIC), 
-                        2
-                    ) as overall_conversion_rate,
-                    ROUND(
-                        CAST(SUM(unique_visitors) * 100.0 / NULLIF(SUM(sessions), 0) AS NUMERIC), 
-                        2
-                    ) as unique_visitor_rate,
-                    MIN(ad_date) as earliest_date,
-                    MAX(ad_date) as latest_date
-                FROM {TABLE_NAME}
-            """
-            where_conditions = []
-            params = []
-            
-            if start_date:
-                where_conditions.append("date >= %s")
-                params.append(start_date)
-            if end_date:
-                where_conditions.append("date <= %s")
-                params.append(end_date)
-            if source:
-                where_conditions.append("source ILIKE %s")
-                params.append(f"%{source}%")
-
-            if where_conditions:
-                query += " WHERE " + " AND ".join(where_conditions)
-      
-            cursor.execute(query, params)
-            result = cursor.fetchone()
-
-            if not result or result["total_records"] == 0:
-                return "No data found for the specified criteria."
-            else:
-                return result
-
-        #     output = (
-        #         "Web Analytics Overview\n"
-        #         + "=" * 40 + "\n\n"
-        #         f"Analysis Period: {result['earliest_date']} to {result['latest_date']}\n"
-        #         f"Total Records: {result['total_records']:,}\n"
-        #         f"Unique Pages: {result['unique_pages']:,}\n"
-        #         f"Total Sessions: {result['total_sessions']:,}\n"
-        #         f"Total Unique Visitors: {result['total_unique_visitors']:,}\n"
-        #         f"Unique Visitor Rate: {result['unique_visitor_rate']}%\n"
-        #         f"Average Bounce Rate: {result['avg_bounce_rate']}%\n"
-        #         f"Average Session Duration: {result['avg_session_duration_min']} minutes\n"
-        #         f"Total Conversions: {result['total_conversions']:,}\n"
-        #         f"Overall Conversion Rate: {result['overall_conversion_rate'] or 0}%\n"
-        #     )
+            sketch_table = distinct_sketches.sketch_source(cursor, TABLE_NAME)
+            query, params = _overall_summary_query(start_date, end_date, source, sketch_table)
 
-        # return output
+        cursor.execute(query, params)
+        rows = cursor.fetchall() if group_by in ("daily_trends", "source") else cursor.fetchone()
+        return _format_analytics_summary(rows, group_by, source, days_for_trends)
 
     except Exception as e:
         return f"Error generating analytics summary: {str(e)}"
     finally:
-        if connection:
+        if cursor:
             cursor.close()
+        if connection:
             return_connection(connection)
 
 
+async def get_analytics_summary_async(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    source: Optional[str] = None,
+    group_by: Optional[str] = "overall",
+    days_for_trends: Optional[int] = 30
+) -> str:
+    """Async variant of get_analytics_summary on the psycopg 3 pool"""
+    try:
+        async with async_db.connection(DB_CONFIG) as connection:
+            async with connection.cursor() as cursor:
+                if group_by == "daily_trends":
+                    trend_table, aggregates = await rollups.trend_source_async(cursor, TABLE_NAME)
+                    query, params = _daily_trends_query(trend_table, aggregates, source, days_for_trends)
+                elif group_by == "source":
+                    sketch_table = await distinct_sketches.sketch_source_async(cursor, TABLE_NAME)
+                    query, params = _source_summary_query(start_date, end_date, source, sketch_table)
+                else:
+                    sketch_table = await distinct_sketches.sketch_source_async(cursor, TABLE_NAME)
+                    query, params = _overall_summary_query(start_date, end_date, source, sketch_table)
+
+                await async_db.execute(cursor, query, params)
+                if group_by in ("daily_trends", "source"):
+                    rows = await cursor.fetchall()
+                else:
+                    rows = await cursor.fetchone()
+        return _format_analytics_summary(rows, group_by, source, days_for_trends)
+    except Exception as e:
+        return f"Error generating analytics summary: {str(e)}"
+
+
 @tool(name="SEO_analytics_agent", description="An intelligent SEO analytics agent for analyzing organic traffic performance.This tool allows querying and summarizing SEO organic ads data stored in the Aurora PostgreSQL database. It supports filtering by date ranges, page URLs, sessions, conversions, traffic sources, and bounce rates. It can return detailed page-level performance metrics (sessions, unique visitors, bounce rate, conversion rate, average session duration, etc.) as well as aggregated summaries by source, overall performance, or daily trends. The agent always returns results in **markdown format**, highlighting **key insights** from the retrieved data. ")
 def SEO_analytics_agent(prompt: str) -> str:
     """
     Intelligent web analytics analysis agent that orchestrates the merged analytics tools.
     """
-    agent = Agent(system_prompt="You are a helpful Seo Analytics agent always gives result in markdown format. Always include the Key insights from the retrieved result",tools=[
+    response = agent_factory.run_agent(__name__, _build_supervisor_agent, prompt)
+    return str(response)
+
+
+def _build_supervisor_agent():
+    """Build the supervisor once; agent_factory reuses it with a fresh conversation per prompt"""
+    return Agent(system_prompt="You are a helpful Seo Analytics agent always gives result in markdown format. Always include the Key insights from the retrieved result",tools=[
         get_page_analytics,
         get_analytics_summary
     ])
-    response = agent(prompt)
-    return response
 
 
 def cleanup_connections():
     """Clean up connection pool"""
-    global connection_pool
-    if connection_pool:
-        connection_pool.closeall()
+    db_pool.close_all()
 
 
 # SEO_analytics_agent("Give me analytics summary of the search/app page url")
\ No newline at end of file
@@ -0,0 +1,402 @@
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+import psycopg2
+from psycopg2 import Error
+
+from tools import rollups
+
+
+logger = logging.getLogger("tools.snapshot")
+
+
+# -------------------------------------------------------------------
+# Snapshot Settings
+# -------------------------------------------------------------------
+
+# Where the Parquet snapshots live, one directory per table
+SNAPSHOT_DIR = os.environ.get("TOOLS_SNAPSHOT_DIR", "snapshots")
+# 'postgres' (default) or 'snapshot': where the sync tools' connections come from
+QUERY_BACKEND = os.environ.get("TOOLS_QUERY_BACKEND", "postgres")
+# DuckDB worker threads; 0 keeps DuckDB's default of one per core
+SNAPSHOT_THREADS = int(os.environ.get("TOOLS_SNAPSHOT_THREADS", 0))
+
+# Exported tables -> date column the files are partitioned by (None: not partitioned)
+SNAPSHOT_TABLES = {
+    "facebook_campaigns_ads": "date",
+    "tiktok_campaign_ad_details": "date",
+    "linkedin_ads": "date",
+    "bing_advertising_data": "date",
+    "email_campaigns": "date",
+    "seo_organic_ads": "ad_date",
+    "linear_tv_ads": "date",
+    "connected_tv_ads": "date",
+    "consolidated_profit": None,
+}
+
+MANIFEST_FILE = "_manifest.json"
+# Hive partition columns written by export_table and hidden again by the views
+_PARTITION_COLUMNS = ("snapshot_year", "snapshot_month")
+
+# Postgres column types -> DuckDB types; anything else is read as text
+_DUCKDB_TYPES = {
+    "smallint": "SMALLINT",
+    "integer": "INTEGER",
+    "bigint": "BIGINT",
+    "numeric": "DOUBLE",
+    "real": "FLOAT",
+    "double precision": "DOUBLE",
+    "boolean": "BOOLEAN",
+    "date": "DATE",
+    "timestamp without time zone": "TIMESTAMP",
+    "timestamp with time zone": "TIMESTAMPTZ",
+}
+
+# Shared in-process DuckDB database holding one view per snapshot table
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        raise Exception("The snapshot engine needs DuckDB: pip install duckdb")
+    return duckdb
+
+
+def enabled():
+    """True when the tools should query the local snapshot instead of Postgres"""
+    return QUERY_BACKEND == "snapshot"
+
+
+def table_dir(table, snapshot_dir=None):
+    return os.path.join(snapshot_dir or SNAPSHOT_DIR, table)
+
+
+def _quote(text):
+    """SQL string literal (DuckDB DDL and COPY targets cannot take parameters)"""
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+# -------------------------------------------------------------------
+# Export
+# -------------------------------------------------------------------
+
+def _column_types(cursor, table):
+    cursor.execute(
+        """
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+        ORDER BY ordinal_position
+        """,
+        (table,)
+    )
+    columns = cursor.fetchall()
+    if not columns:
+        raise Exception(f"Table {table} not found")
+    return {name: _DUCKDB_TYPES.get(data_type, "VARCHAR") for name, data_type in columns}
+
+
+def _write_parquet(csv_path, column_types, date_column, data_dir):
+    """Convert the COPY output to Parquet, one file set per year/month of date_column"""
+    duckdb = _duckdb()
+    columns = "{" + ", ".join(f"{_quote(name)}: {_quote(kind)}" for name, kind in column_types.items()) + "}"
+    source = f"read_csv({_quote(csv_path)}, header = true, columns = {columns})"
+
+    engine = duckdb.connect()
+    try:
+        if date_column:
+            # Sorted by date so each file's min/max statistics prune date-range scans
+            engine.execute(f"""
+                COPY (
+                    SELECT *, year({date_column}) AS snapshot_year, month({date_column}) AS snapshot_month
+                    FROM {source}
+                    ORDER BY {date_column}
+                ) TO {_quote(data_dir)} (FORMAT parquet, PARTITION_BY (snapshot_year, snapshot_month))
+            """)
+        else:
+            os.makedirs(data_dir)
+            engine.execute(f"COPY (SELECT * FROM {source}) TO {_quote(os.path.join(data_dir, 'data.parquet'))} (FORMAT parquet)")
+        return engine.execute(
+            f"SELECT COUNT(*) FROM read_parquet({_quote(os.path.join(data_dir, '**', '*.parquet'))})"
+        ).fetchone()[0]
+    finally:
+        engine.close()
+
+
+def export_table(connection, table, date_column=None, snapshot_dir=None):
+    """
+    Snapshot one Postgres table to Parquet, partitioned by year and month of date_column.
+
+    Rows leave Postgres in a single COPY ... TO STDOUT stream. The new snapshot is
+    built next to the old one and swapped in only once it is complete, so readers
+    never see a half-written table. Returns the number of rows exported.
+    """
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    os.makedirs(snapshot_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{table}_", dir=snapshot_dir)
+    csv_path = os.path.join(staging, "rows.csv")
+    new_dir = os.path.join(staging, table)
+    cursor = connection.cursor()
+    try:
+        column_types = _column_types(cursor, table)
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            cursor.copy_expert(f"COPY {table} TO STDOUT WITH (FORMAT csv, HEADER true)", f)
+        connection.rollback()
+
+        os.makedirs(new_dir)
+        rows = _write_parquet(csv_path, column_types, date_column, os.path.join(new_dir, "data"))
+        manifest = {
+            "table": table,
+            "date_column": date_column,
+            "rows": rows,
+            "exported_at": datetime.now(timezone.utc).isoformat(),
+        }
+        with open(os.path.join(new_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        target = table_dir(table, snapshot_dir)
+        if os.path.exists(target):
+            os.replace(target, os.path.join(staging, "previous"))
+        os.replace(new_dir, target)
+        return rows
+    except Error as e:
+        raise Exception(f"Snapshot export failed for {table}: {e}")
+    finally:
+        cursor.close()
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _rollup_exists(connection, table):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (rollups.rollup_table_name(table),))
+        return bool(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+        connection.rollback()
+
+
+def export_all(connection, tables=None, include_rollups=True, snapshot_dir=None):
+    """
+    Snapshot every table (or the given subset) and, when present, its daily rollup.
+
+    Returns {table: rows exported}. The in-process engine is reloaded afterwards
+    so queries pick up the new files.
+    """
+    exported = {}
+    for table in tables or SNAPSHOT_TABLES:
+        date_column = SNAPSHOT_TABLES.get(table)
+        exported[table] = export_table(connection, table, date_column, snapshot_dir)
+        if include_rollups and table in rollups.ROLLUP_SPECS and _rollup_exists(connection, table):
+            rollup_table = rollups.rollup_table_name(table)
+            exported[rollup_table] = export_table(connection, rollup_table, date_column, snapshot_dir)
+    reload()
+    return exported
+
+
+# -------------------------------------------------------------------
+# Query Engine
+# -------------------------------------------------------------------
+
+def load_manifests(snapshot_dir=None):
+    """{table: manifest} for every complete snapshot in snapshot_dir"""
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    manifests = {}
+    if not os.path.isdir(snapshot_dir):
+        return manifests
+    for table in sorted(os.listdir(snapshot_dir)):
+        path = os.path.join(snapshot_dir, table, MANIFEST_FILE)
+        if os.path.isfile(path):
+            with open(path) as f:
+                manifests[table] = json.load(f)
+    return manifests
+
+
+def _view_sql(table, manifest, snapshot_dir):
+    """
+    View exposing the snapshot under the Postgres table name.
+
+    The partition columns are hidden again. ctid is rebuilt from file name and
+    row position, so keyset page tokens (which use it as a tie-breaker) still work.
+    """
+    partitioned = bool(manifest.get("date_column"))
+    hidden = ["filename", "file_row_number"] + (list(_PARTITION_COLUMNS) if partitioned else [])
+    files = os.path.join(os.path.abspath(table_dir(table, snapshot_dir)), "data", "**", "*.parquet")
+    return f"""
+        CREATE OR REPLACE VIEW {table} AS
+        SELECT * EXCLUDE ({', '.join(hidden)}),
+               filename || ':' || lpad(CAST(file_row_number AS VARCHAR), 12, '0') AS ctid
+        FROM read_parquet({_quote(files)}, hive_partitioning = {str(partitioned).lower()},
+                          filename = true, file_row_number = true)
+    """
+
+
+# Postgres functions the tools call that DuckDB lacks, as macros with the same behaviour
+_COMPATIBILITY_MACROS = (
+    "CREATE OR REPLACE MACRO to_char(value, format) AS "
+    "strftime(value, replace(replace(replace(format, 'YYYY', '%Y'), 'MM', '%m'), 'DD', '%d'))",
+    # Catalog lookups (rollup readiness, search index checks) see the snapshot's views
+    "CREATE OR REPLACE MACRO to_regclass(name) AS "
+    "(SELECT ANY_VALUE(view_name) FROM duckdb_views() WHERE view_name = name)",
+)
+
+
+def get_engine(snapshot_dir=None):
+    """The shared DuckDB database, opened with a view per snapshot table on first use"""
+    global _engine
+    if _engine is not None:
+        return _engine
+    with _engine_lock:
+        if _engine is None:
+            duckdb = _duckdb()
+            snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+            engine = duckdb.connect(database=":memory:")
+            if SNAPSHOT_THREADS:
+                engine.execute(f"SET threads = {SNAPSHOT_THREADS}")
+            for statement in _COMPATIBILITY_MACROS:
+                engine.execute(statement)
+            manifests = load_manifests(snapshot_dir)
+            for table, manifest in manifests.items():
+                engine.execute(_view_sql(table, manifest, snapshot_dir))
+            logger.info("Snapshot engine opened over %d tables in %s", len(manifests), snapshot_dir)
+            _engine = engine
+    return _engine
+
+
+def reload():
+    """Drop the engine so the next query re-reads the manifests (after an export)"""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.close()
+        _engine = None
+
+
+def watermark(table, snapshot_dir=None):
+    """Export time of a table's snapshot; the result cache treats a new export as a change"""
+    manifest = load_manifests(snapshot_dir).get(table)
+    return manifest["exported_at"] if manifest else None
+
+
+# Postgres-only syntax the tools emit -> DuckDB equivalent
+_REWRITES = (
+    (re.compile(r'([\w.]+|"[^"]+")\s*=\s*ANY\(%s\)'), r"list_contains(%s, \1)"),
+    (re.compile(r"::DECIMAL\b", re.IGNORECASE), "::DOUBLE"),
+    (re.compile(r"\bAS NUMERIC\)", re.IGNORECASE), "AS DOUBLE)"),
+)
+_PLACEHOLDERS = re.compile(r"%([s%])")
+
+
+def translate(query, params=None):
+    """Rewrite a psycopg2 query (pyformat placeholders, Postgres casts) for DuckDB"""
+    for pattern, replacement in _REWRITES:
+        query = pattern.sub(replacement, query)
+    if params is None:
+        return query
+    return _PLACEHOLDERS.sub(lambda match: "?" if match.group(1) == "s" else "%", query)
+
+
+# -------------------------------------------------------------------
+# DB-API Adapter
+# -------------------------------------------------------------------
+
+class SnapshotCursor:
+    """The subset of the psycopg2 cursor API the tools use, over a DuckDB cursor"""
+
+    def __init__(self, engine, dict_rows):
+        self._cursor = engine.cursor()
+        self._dict_rows = dict_rows
+        self._columns = []
+        self.description = None
+        self.rowcount = -1
+        self.itersize = 2000
+        self.closed = False
+
+    def execute(self, query, params=None):
+        self._cursor.execute(translate(query, params), list(params) if params is not None else None)
+        self.description = self._cursor.description
+        self._columns = [column[0] for column in self.description or ()]
+
+    def _shape(self, row):
+        if row is None or not self._dict_rows:
+            return row
+        return dict(zip(self._columns, row))
+
+    def fetchone(self):
+        return self._shape(self._cursor.fetchone())
+
+    def fetchmany(self, size=None):
+        return [self._shape(row) for row in self._cursor.fetchmany(size or self.itersize)]
+
+    def fetchall(self):
+        rows = [self._shape(row) for row in self._cursor.fetchall()]
+        self.rowcount = len(rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany()
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        if not self.closed:
+            self._cursor.close()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SnapshotConnection:
+    """Read-only stand-in for a pooled psycopg2 connection; transactions are no-ops"""
+
+    def __init__(self, engine):
+        self._engine = engine
+        self.autocommit = False
+        self.closed = False
+
+    def cursor(self, name=None, cursor_factory=None):
+        # Named (server-side) cursors just stream through fetchmany();
+        # any cursor_factory (RealDictCursor) means dict rows
+        return SnapshotCursor(self._engine, dict_rows=cursor_factory is not None)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def connect(snapshot_dir=None):
+    """A connection to the snapshot, handed out by db_pool when the backend is 'snapshot'"""
+    return SnapshotConnection(get_engine(snapshot_dir))
+
+
+if __name__ == "__main__":
+    # Usage: TOOLS_DB_DSN="host=... dbname=..." python -m tools.snapshot [table ...] [--no-rollups]
+    tables = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    export_connection = psycopg2.connect(os.environ["TOOLS_DB_DSN"])
+    try:
+        results = export_all(export_connection, tables or None, include_rollups="--no-rollups" not in sys.argv)
+        for table, rows in results.items():
+            print(f"{table}: {rows} rows exported to {table_dir(table)}")
+    finally:
+        export_connection.close()
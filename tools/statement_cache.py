@@ -0,0 +1,242 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import psycopg2
+import psycopg2.extensions
+
+from tools import instrumentation
+
+
+# -------------------------------------------------------------------
+# Statement Cache Settings
+# -------------------------------------------------------------------
+
+PREPARED_STATEMENTS_ENABLED = os.environ.get("TOOLS_PREPARED_STATEMENTS", "1") == "1"
+# A query shape is prepared once it has run this many times in the process;
+# one-off shapes are not worth the extra PREPARE
+PREPARE_THRESHOLD = int(os.environ.get("TOOLS_PREPARE_THRESHOLD", 2))
+# Prepared statements kept per connection; the least recently used is deallocated beyond this
+MAX_PREPARED_PER_CONNECTION = int(os.environ.get("TOOLS_PREPARED_MAX", 128))
+
+# Only plain reads are prepared; DDL, maintenance and COPY always run as sent
+_PREPARABLE = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+_PLACEHOLDER = re.compile(r"%([s%])")
+# Postgres raises this when a prepared plan's result columns changed under it (ALTER TABLE)
+_CACHED_PLAN_CHANGED = "0A000"
+# Bound on the shape counters so ad-hoc queries cannot grow them forever
+_MAX_TRACKED_SHAPES = 4096
+
+# statement name -> times run (process-wide)
+_shape_counts = {}
+# statement names Postgres refused to prepare (parameter types it cannot infer)
+_unpreparable = set()
+_lock = threading.Lock()
+
+_stats = {
+    "prepares": 0,
+    "prepared_executions": 0,
+    "plain_executions": 0,
+    "deallocations": 0,
+    "prepare_failures": 0,
+}
+
+
+def _count(stat):
+    with _lock:
+        _stats[stat] += 1
+
+
+# -------------------------------------------------------------------
+# Shapes
+# -------------------------------------------------------------------
+
+def statement_name(query):
+    """
+    Server-side name for an exact query text.
+
+    Keyed on the text itself rather than instrumentation.fingerprint(): shapes
+    that differ only in an interpolated literal (days back, limit) need separate plans.
+    """
+    return "tools_" + hashlib.sha1(query.encode("utf-8")).hexdigest()[:20]
+
+
+def to_prepare_text(query):
+    """psycopg2 placeholders -> $1..$n; returns (text, parameter count)"""
+    position = 0
+
+    def replace(match):
+        nonlocal position
+        if match.group(1) == "%":
+            return "%"
+        position += 1
+        return f"${position}"
+
+    text = _PLACEHOLDER.sub(replace, query)
+    return text, position
+
+
+def _should_prepare(name):
+    with _lock:
+        if name in _unpreparable:
+            return False
+        if len(_shape_counts) >= _MAX_TRACKED_SHAPES and name not in _shape_counts:
+            _shape_counts.clear()
+        count = _shape_counts.get(name, 0) + 1
+        _shape_counts[name] = count
+    return count >= PREPARE_THRESHOLD
+
+
+# -------------------------------------------------------------------
+# psycopg2 Hooks
+# -------------------------------------------------------------------
+
+class _PreparingCursorMixin:
+    """Runs repeated query shapes as EXECUTE of a statement prepared once per connection"""
+
+    def execute(self, query, vars=None):
+        connection = self.connection
+        if (
+            self.name is not None  # server-side cursors need DECLARE, which cannot wrap EXECUTE
+            or not isinstance(query, str)
+            or isinstance(vars, dict)
+            or not _PREPARABLE.match(query)
+        ):
+            return super().execute(query, vars)
+
+        name = statement_name(query)
+        prepared = connection.prepared_statements
+        if name in prepared:
+            prepared.move_to_end(name)
+            return self._execute_prepared(name, query, vars)
+        if not _should_prepare(name):
+            _count("plain_executions")
+            return super().execute(query, vars)
+
+        # Without vars psycopg2 sends the text as-is, so its % signs are literal
+        text, parameter_count = to_prepare_text(query) if vars is not None else (query, 0)
+        values = list(vars or ())
+        if parameter_count != len(values):
+            _count("plain_executions")
+            return super().execute(query, vars)
+
+        self._evict_if_full(prepared)
+        # PREPARE goes out on its own so only its failures mark the shape unpreparable;
+        # errors from the EXECUTE below propagate like any other query's
+        try:
+            super().execute(f"PREPARE {name} AS {text}")
+        except psycopg2.Error as e:
+            if isinstance(e, psycopg2.OperationalError) or connection.closed:
+                raise
+            # e.g. a parameter whose type Postgres cannot infer: run this shape unprepared from now on
+            with _lock:
+                _unpreparable.add(name)
+                _stats["prepare_failures"] += 1
+            self._reset_transaction()
+            return super().execute(query, vars)
+        prepared[name] = parameter_count
+        _count("prepares")
+        return self._execute_prepared(name, query, vars)
+
+    def _execute_prepared(self, name, query, vars):
+        parameter_count = self.connection.prepared_statements[name]
+        try:
+            result = super().execute(_execute_sql(name, parameter_count), list(vars or ()))
+        except psycopg2.Error as e:
+            if e.pgcode != _CACHED_PLAN_CHANGED:
+                raise
+            # Table changed shape since PREPARE: drop the plan and run the query as sent
+            self._reset_transaction()
+            self._deallocate(name)
+            return super().execute(query, vars)
+        _count("prepared_executions")
+        return result
+
+    def _evict_if_full(self, prepared):
+        while len(prepared) >= MAX_PREPARED_PER_CONNECTION:
+            oldest = next(iter(prepared))
+            self._deallocate(oldest)
+
+    def _deallocate(self, name):
+        self.connection.prepared_statements.pop(name, None)
+        super().execute(f"DEALLOCATE {name}")
+        _count("deallocations")
+
+    def _reset_transaction(self):
+        # Tool transactions are read-only, so rolling back only clears the aborted state
+        if not self.connection.autocommit:
+            self.connection.rollback()
+
+
+def _execute_sql(name, parameter_count):
+    if not parameter_count:
+        return f"EXECUTE {name}"
+    return f"EXECUTE {name} ({', '.join(['%s'] * parameter_count)})"
+
+
+_cursor_classes = {}
+
+
+def _preparing_cursor_class(cursor_factory):
+    cls = _cursor_classes.get(cursor_factory)
+    if cls is None:
+        cls = type(f"Preparing{cursor_factory.__name__}", (_PreparingCursorMixin, cursor_factory), {})
+        _cursor_classes[cursor_factory] = cls
+    return cls
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """
+    psycopg2 connection that prepares repeated query shapes.
+
+    Used as the pool's connection_factory; prepared statements live as long as the
+    session, so each pooled connection prepares a shape once and reuses the plan.
+    """
+
+    @property
+    def prepared_statements(self):
+        """statement name -> parameter count, in least recently used order"""
+        statements = self.__dict__.get("_prepared_statements")
+        if statements is None:
+            statements = self.__dict__["_prepared_statements"] = OrderedDict()
+        return statements
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _preparing_cursor_class(factory)
+        return super().cursor(*args, **kwargs)
+
+
+class InstrumentedPreparingConnection(PreparingConnection, instrumentation.InstrumentedConnection):
+    """
+    Both hooks; the instrumented cursor wraps the preparing one, so timings and
+    fingerprints are recorded against the original query text, not EXECUTE.
+    """
+
+
+def connection_factory(instrumented):
+    """psycopg2 connection_factory for the pool (None for plain connections)"""
+    if PREPARED_STATEMENTS_ENABLED:
+        return InstrumentedPreparingConnection if instrumented else PreparingConnection
+    return instrumentation.InstrumentedConnection if instrumented else None
+
+
+# -------------------------------------------------------------------
+# Metrics
+# -------------------------------------------------------------------
+
+def get_statement_stats():
+    """Prepared statement counters across every connection"""
+    with _lock:
+        stats = dict(_stats)
+        stats["tracked_shapes"] = len(_shape_counts)
+        stats["unpreparable_shapes"] = len(_unpreparable)
+    return stats
+
+
+def reset_statement_stats():
+    with _lock:
+        for key in _stats:
+            _stats[key] = 0
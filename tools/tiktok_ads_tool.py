@@ -3,7 +3,13 @@ from strands import Agent, tool
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from psycopg2 import Error
-import psycopg2.pool
+from tools import db_pool, rollups, campaign_search, campaign_dimensions
+from tools.result_cache import cached_tool
+from tools import agent_factory, async_db, formatters, pagination
+from tools.query_utils import (
+    SINGLE_SCAN_KEY_COLUMNS, batch_ids, build_grouped_summary_query, build_keyset_detail_query,
+    build_single_scan_query, match_requested_ids, split_single_scan_rows
+)
 
 
 # Database configuration - update with your Aurora PostgreSQL details
@@ -17,45 +23,224 @@ DB_CONFIG = {
 
 TABLE_NAME = "tiktok_campaign_ad_details"  
 
-# Global connection pool
-connection_pool = None
-
-
 # -------------------------------------------------------------------
 # Connection Pool Setup
 # -------------------------------------------------------------------
 
 def initialize_connection_pool():
-    """Initialize connection pool"""                                                     
-    global connection_pool
-    try:
-        connection_pool = psycopg2.pool.SimpleConnectionPool(
-            1, 20,  # min and max connections
-            **DB_CONFIG
-        )
-        return connection_pool
-    except Error as e:
-        raise Exception(f"Connection pool initialization failed: {e}")
+    """Initialize (or reuse) the process-wide connection pool"""
+    return db_pool.get_pool(DB_CONFIG)
 
 
 def get_db_connection():
-    """Get database connection from pool"""
-    global connection_pool
-    if connection_pool is None:
-        initialize_connection_pool()
+    """Get database connection from the shared pool"""
+    return db_pool.get_connection(DB_CONFIG)
+
+
+def return_connection(connection):
+    """Return connection to the shared pool"""
+    db_pool.return_connection(connection)
+
+
+db_pool.warm_up(DB_CONFIG)
+
+
+# Totals shared by the performance summary and the per-campaign batch summaries
+_PERFORMANCE_SUMMARY_SELECT = """
+            COUNT(*) as total_campaigns,
+            SUM(impressions) as total_impressions,
+            SUM(clicks) as total_clicks,
+            SUM(spend) as total_spend,
+            SUM(conversions) as total_conversions,
+            ROUND(AVG(clicks::DECIMAL / NULLIF(impressions, 0)), 4) as avg_ctr,
+            ROUND(AVG(spend / NULLIF(clicks, 0)), 2) as avg_cpc,
+            ROUND((SUM(conversions)::DECIMAL / NULLIF(SUM(impressions), 0)) * 100, 4) as overall_conversion_rate,
+            ROUND(SUM(spend) / NULLIF(SUM(conversions), 0), 2) as avg_cost_per_conversion,
+            MIN(date) as start_date,
+            MAX(date) as end_date"""
+
+
+def _campaign_performance_query(name_condition, campaign_id, date_from, date_to, time_operator, metrics, limit, page_key=None):
+    """Build the single-scan performance query (or a keyset continuation page); returns (query, params)"""
+    # Build WHERE conditions
+    where_conditions = []
+    params = []
+
+    campaign_search.add_name_filter(where_conditions, params, name_condition)
+
+    if campaign_id:
+        where_conditions.append("campaign_id = %s")
+        params.append(campaign_id)
+
+    # Date filtering
+    if date_from and date_to and time_operator == 'between':
+        where_conditions.append("date BETWEEN %s AND %s")
+        params.extend([date_from, date_to])
+    elif date_from:
+        where_conditions.append(f"date {time_operator} %s")
+        params.append(date_from)
+
+    where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+
+    # Build SELECT clause
+    if metrics:
+        metric_columns = ', '.join(metrics)
+        select_clause = f"date, campaign_id, campaign_name, {metric_columns}"
+    else:
+        select_clause = "date, campaign_id, campaign_name, impressions, clicks, spend, conversions"
+
+    detail_select = f"""{select_clause},
+           ROUND((clicks::DECIMAL / NULLIF(impressions, 0)) * 100, 2) as ctr_percent,
+           ROUND(spend / NULLIF(clicks, 0), 2) as cpc,
+           ROUND((conversions::DECIMAL / NULLIF(impressions, 0)) * 100, 4) as conversion_rate,
+           ROUND(spend / NULLIF(conversions, 0), 2) as cost_per_conversion,
+           ROUND((conversions::DECIMAL / NULLIF(clicks, 0)) * 100, 2) as click_to_conversion_rate"""
+
+    if page_key:
+        # Later pages resume after the token's (spend, ctid) and skip the summary
+        condition, keyset_params = pagination.keyset_condition(_PAGE_KEY, "DESC", page_key, nullable=True)
+        where_clause += (" AND " if where_clause else "WHERE ") + condition
+        params.extend(keyset_params)
+        query = build_keyset_detail_query(
+            TABLE_NAME, where_clause, detail_select, "spend", "DESC", pagination.ROW_TIE_BREAKER, nullable=True
+        )
+    else:
+        # Ranked detail rows and summary totals are read in a single scan
+        query = build_single_scan_query(
+            TABLE_NAME,
+            where_clause,
+            detail_select=detail_select,
+            sort_expression="spend",
+            sort_order="DESC",
+            summary_select=_PERFORMANCE_SUMMARY_SELECT,
+            tie_breaker=pagination.ROW_TIE_BREAKER,
+            nullable=True
+        )
+
+    params.append(limit)
+
+    return query, params
+
+
+# Keyset of the performance ranking: spend, then physical row id for ties
+_PAGE_KEY = ["spend", pagination.ROW_TIE_BREAKER]
 
+_PERFORMANCE_SUMMARY_COLUMNS = (
+    "total_campaigns",
+    "total_impressions",
+    "total_clicks",
+    "total_spend",
+    "total_conversions",
+    "avg_ctr",
+    "avg_cpc",
+    "overall_conversion_rate",
+    "avg_cost_per_conversion",
+    "start_date",
+    "end_date",
+)
+
+
+def _page_scope(campaign_name, campaign_id, date_from, date_to, time_operator, metrics):
+    return pagination.scope(TABLE_NAME, campaign_name, campaign_id, date_from, date_to, time_operator, metrics)
+
+
+def _split_performance_page(rows, limit, page_key, page_scope):
+    """(campaign_results, summary, next_page_token) from the rows fetched for one page"""
+    rows, next_page_token = pagination.next_page(rows, limit, SINGLE_SCAN_KEY_COLUMNS, page_scope)
+    campaign_results, summary = split_single_scan_rows(rows, () if page_key else _PERFORMANCE_SUMMARY_COLUMNS)
+    return campaign_results, summary, next_page_token
+
+
+def fetch_campaign_performance(
+    campaign_name=None,
+    campaign_id=None,
+    date_from=None,
+    date_to=None,
+    time_operator='between',
+    metrics=None,
+    limit=10,
+    page_token=None
+):
+    """
+    Run the performance query; returns (campaign_results, summary_data, next_page_token) for the tool and cross-channel callers.
+
+    With page_token the rows continue an earlier ranking and summary_data is empty.
+    """
+    page_scope = _page_scope(campaign_name, campaign_id, date_from, date_to, time_operator, metrics)
+    page_key = pagination.decode_token(page_token, page_scope) if page_token else None
+    connection = None
+    cursor = None
+    
     try:
-        connection = connection_pool.getconn()
-        return connection
-    except Error as e:
-        raise Exception(f"Database connection failed: {e}")
+        connection = get_db_connection()
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        name_condition = campaign_search.name_filter(cursor, TABLE_NAME, campaign_name)
+        query, params = _campaign_performance_query(
+            name_condition, campaign_id, date_from, date_to, time_operator, metrics, pagination.fetch_limit(limit), page_key
+        )
+        cursor.execute(query, params)
+        return _split_performance_page(cursor.fetchall(), limit, page_key, page_scope)
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            return_connection(connection)
 
 
-def return_connection(connection):
-    """Return connection to pool"""
-    global connection_pool
-    if connection_pool and connection:
-        connection_pool.putconn(connection)
+async def fetch_campaign_performance_async(
+    campaign_name=None,
+    campaign_id=None,
+    date_from=None,
+    date_to=None,
+    time_operator='between',
+    metrics=None,
+    limit=10,
+    page_token=None
+):
+    """Async variant of fetch_campaign_performance on the psycopg 3 pool"""
+    page_scope = _page_scope(campaign_name, campaign_id, date_from, date_to, time_operator, metrics)
+    page_key = pagination.decode_token(page_token, page_scope) if page_token else None
+    async with async_db.connection(DB_CONFIG) as connection:
+        async with connection.cursor() as cursor:
+            name_condition = await campaign_search.name_filter_async(cursor, TABLE_NAME, campaign_name)
+            query, params = _campaign_performance_query(
+                name_condition, campaign_id, date_from, date_to, time_operator, metrics, pagination.fetch_limit(limit), page_key
+            )
+            await async_db.execute(cursor, query, params)
+            rows = await cursor.fetchall()
+    return _split_performance_page(rows, limit, page_key, page_scope)
+
+
+def _format_campaign_performance(campaign_results, summary_data):
+    """Render the performance report from the detail rows and summary totals"""
+    # output = "Tiktok Campaign Performance Report\n" + "=" * 60 + "\n\n"
+
+    if summary_data:
+        return campaign_results,summary_data
+    else:
+        return campaign_results
+
+
+    # if campaign_results:
+    #     print("in the campaign result data")
+
+    #     output += f"Campaign Details ({len(campaign_results)} campaigns):\n" + "-" * 60 + "\n"
+    #     for row in campaign_results:
+    #         output += (
+    #             f"Date: {row.get('date')}\n"
+    #             f"Campaign ID: {row.get('campaign_id')}\n"
+    #             f"Campaign Name: {row.get('campaign_name')}\n"
+    #             f"Impressions: {row.get('impressions',0):,}\n"
+    #             f"Clicks: {row.get('clicks',0):,}\n"
+    #             f"Spend: ${row.get('spend',0):,.2f}\n"
+    #             f"Conversions: {row.get('conversions',0):,}\n"
+    #             f"CTR: {row.get('ctr_percent', 0)}%\n"
+    #             f"CPC: ${row.get('cpc', 0):.2f}\n"
+    #             f"Conversion Rate: {row.get('conversion_rate', 0):.4f}%\n"
+    #             f"Cost per Conversion: ${row.get('cost_per_conversion', 0):.2f}\n"
+    #             f"Click-to-Conversion Rate: {row.get('click_to_conversion_rate', 0)}%\n"
+    #             + "-" * 60 + "\n"
+    #         )
 
 
 @tool(
@@ -68,6 +253,7 @@ def return_connection(connection):
     Use this when users ask about campaign performance, CTR, CPC, conversion analysis, or spend efficiency.
     """
 )
+@cached_tool(TABLE_NAME, DB_CONFIG)
 def get_campaign_performance(
     campaign_name: Optional[str] = None,
     campaign_id: Optional[str] = None,
@@ -75,7 +261,9 @@ def get_campaign_performance(
     date_to: Optional[str] = None,
     time_operator: Literal['>', '<', '>=', '<=', '=', 'between'] = 'between',
     metrics: Optional[List[str]] = ['impressions', 'clicks', 'spend', 'conversions'],
-    limit: Optional[int] = 10
+    limit: Optional[int] = 10,
+    output_format: Literal['report', 'compact', 'markdown'] = 'report',
+    page_token: Optional[str] = None
 ) -> str:
     """
     Get Tiktok campaign performance data with flexible filtering
@@ -88,131 +276,299 @@ def get_campaign_performance(
         time_operator: How to apply date filtering
         metrics: List of metrics to return ['impressions', 'clicks', 'spend', 'conversions']
         limit: Maximum number of results to return
+        output_format: 'report' (readable text), 'compact' (column names once + value lists) or 'markdown' (table)
+        page_token: next_page_token from the previous call, to fetch the following page
     """
+    try:
+        campaign_results, summary_data, next_page_token = fetch_campaign_performance(
+            campaign_name=campaign_name, campaign_id=campaign_id, date_from=date_from, date_to=date_to,
+            time_operator=time_operator, metrics=metrics, limit=limit, page_token=page_token
+        )
+        if output_format != 'report':
+            return formatters.render_rows(
+                campaign_results, output_format, summary=pagination.summary_with_token(summary_data, next_page_token)
+            )
+        return pagination.attach_token(_format_campaign_performance(campaign_results, summary_data), next_page_token)
+    except Exception as e:
+        return f"Error processing request: {str(e)}"
+
+
+async def get_campaign_performance_async(
+    campaign_name: Optional[str] = None,
+    campaign_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    time_operator: Literal['>', '<', '>=', '<=', '=', 'between'] = 'between',
+    metrics: Optional[List[str]] = ['impressions', 'clicks', 'spend', 'conversions'],
+    limit: Optional[int] = 10,
+    output_format: Literal['report', 'compact', 'markdown'] = 'report',
+    page_token: Optional[str] = None
+) -> str:
+    """Async variant of get_campaign_performance on the psycopg 3 pool"""
+    try:
+        campaign_results, summary_data, next_page_token = await fetch_campaign_performance_async(
+            campaign_name=campaign_name, campaign_id=campaign_id, date_from=date_from, date_to=date_to,
+            time_operator=time_operator, metrics=metrics, limit=limit, page_token=page_token
+        )
+        if output_format != 'report':
+            return formatters.render_rows(
+                campaign_results, output_format, summary=pagination.summary_with_token(summary_data, next_page_token)
+            )
+        return pagination.attach_token(_format_campaign_performance(campaign_results, summary_data), next_page_token)
+    except Exception as e:
+        return f"Error processing request: {str(e)}"
+
+
+def _campaign_batch_query(campaign_ids, date_from, date_to, time_operator):
+    """Build one grouped summary query for several campaign ids; returns (query, params)"""
+    where_conditions = ["campaign_id = ANY(%s)"]
+    params = [campaign_ids]
+
+    # Date filtering
+    if date_from and date_to and time_operator == 'between':
+        where_conditions.append("date BETWEEN %s AND %s")
+        params.extend([date_from, date_to])
+    elif date_from:
+        where_conditions.append(f"date {time_operator} %s")
+        params.append(date_from)
+
+    where_clause = "WHERE " + " AND ".join(where_conditions)
+    query = build_grouped_summary_query(
+        TABLE_NAME, "campaign_id", where_clause, f"\n            MAX(campaign_name) as campaign_name,{_PERFORMANCE_SUMMARY_SELECT}"
+    )
+
+    return query, params
+
+
+def fetch_campaign_performance_batch(campaign_ids, date_from=None, date_to=None, time_operator='between'):
+    """Run the batch query; returns (summaries in request order, ids with no rows)"""
+    campaign_ids = batch_ids(campaign_ids, "campaign_ids")
     connection = None
     cursor = None
     
     try:
-        # Build WHERE conditions
-        where_conditions = []
-        params = []
-        
-        if campaign_name:
-            where_conditions.append("LOWER(campaign_name) LIKE LOWER(%s)")
-            params.append(f"%{campaign_name}%")
-        
-        if campaign_id:
-            where_conditions.append("campaign_id = %s")
-            params.append(campaign_id)
-        
-        # Date filtering
-        if date_from and date_to and time_operator == 'between':
-            where_conditions.append("date BETWEEN %s AND %s")
-            params.extend([date_from, date_to])
-        elif date_from:
-            where_conditions.append(f"date {time_operator} %s")
-            params.append(date_from)
-        
-        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-        
-        # Build SELECT clause
-        if metrics:
-            metric_columns = ', '.join(metrics)
-            select_clause = f"date, campaign_id, campaign_name, {metric_columns}"
-        else:
-            select_clause = "date, campaign_id, campaign_name, impressions, clicks, spend, conversions"
-        
-        # Build base query with calculated metrics
-        query = f"""
-        SELECT {select_clause},
-               ROUND((clicks::DECIMAL / NULLIF(impressions, 0)) * 100, 2) as ctr_percent,
-               ROUND(spend / NULLIF(clicks, 0), 2) as cpc,
-               ROUND((conversions::DECIMAL / NULLIF(impressions, 0)) * 100, 4) as conversion_rate,
-               ROUND(spend / NULLIF(conversions, 0), 2) as cost_per_conversion,
-               ROUND((conversions::DECIMAL / NULLIF(clicks, 0)) * 100, 2) as click_to_conversion_rate
-        FROM {TABLE_NAME} 
-        {where_clause}
-        ORDER BY spend DESC
-        LIMIT %s
-        """
-        
-        params.append(limit)
-        
-        print(f"Executing query: {query}")
-        print(f"Parameters: {params}")
-        
-        # Execute main query
         connection = get_db_connection()
         cursor = connection.cursor(cursor_factory=RealDictCursor)
+        query, params = _campaign_batch_query(campaign_ids, date_from, date_to, time_operator)
         cursor.execute(query, params)
-        campaign_results = cursor.fetchall()
+        return match_requested_ids(cursor.fetchall(), "campaign_id", campaign_ids)
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            return_connection(connection)
 
 
-        summary_where_clause = where_clause
-        summary_params = params[:-1]  # Remove limit parameter
-        
-        summary_query = f"""
-        SELECT 
-            COUNT(*) as total_campaigns,
-            SUM(impressions) as total_impressions,
-            SUM(clicks) as total_clicks,
-            SUM(spend) as total_spend,
-            SUM(conversions) as total_conversions,
-            ROUND(AVG(clicks::DECIMAL / NULLIF(impressions, 0)), 4) as avg_ctr,
-            ROUND(AVG(spend / NULLIF(clicks, 0)), 2) as avg_cpc,
-            ROUND((SUM(conversions)::DECIMAL / NULLIF(SUM(impressions), 0)) * 100, 4) as overall_conversion_rate,
-            ROUND(SUM(spend) / NULLIF(SUM(conversions), 0), 2) as avg_cost_per_conversion,
-            MIN(date) as start_date,
-            MAX(date) as end_date
-        FROM {TABLE_NAME}
-        {summary_where_clause}
-        """
-        
-        cursor.execute(summary_query, summary_params)
-        summary_results = cursor.fetchall()
-        summary_data = summary_results[0] if summary_results else {}
-        
-        # Format output
-        # output = "Tiktok Campaign Performance Report\n" + "=" * 60 + "\n\n"
-        
-        if summary_data:
-            return campaign_results,summary_data
-        else:
-            return campaign_results
-       
-       
-        # if campaign_results:
-        #     print("in the campaign result data")
-
-        #     output += f"Campaign Details ({len(campaign_results)} campaigns):\n" + "-" * 60 + "\n"
-        #     for row in campaign_results:
-        #         output += (
-        #             f"Date: {row.get('date')}\n"
-        #             f"Campaign ID: {row.get('campaign_id')}\n"
-        #             f"Campaign Name: {row.get('campaign_name')}\n"
-        #             f"Impressions: {row.get('impressions',0):,}\n"
-        #             f"Clicks: {row.get('clicks',0):,}\n"
-        #             f"Spend: ${row.get('spend',0):,.2f}\n"
-        #             f"Conversions: {row.get('conversions',0):,}\n"
-        #             f"CTR: {row.get('ctr_percent', 0)}%\n"
-        #             f"CPC: ${row.get('cpc', 0):.2f}\n"
-        #             f"Conversion Rate: {row.get('conversion_rate', 0):.4f}%\n"
-        #             f"Cost per Conversion: ${row.get('cost_per_conversion', 0):.2f}\n"
-        #             f"Click-to-Conversion Rate: {row.get('click_to_conversion_rate', 0)}%\n"
-        #             + "-" * 60 + "\n"
-        #         )
-        
-       
-        
+async def fetch_campaign_performance_batch_async(campaign_ids, date_from=None, date_to=None, time_operator='between'):
+    """Async variant of fetch_campaign_performance_batch on the psycopg 3 pool"""
+    campaign_ids = batch_ids(campaign_ids, "campaign_ids")
+    query, params = _campaign_batch_query(campaign_ids, date_from, date_to, time_operator)
+    rows = await async_db.fetch_all(DB_CONFIG, query, params)
+    return match_requested_ids(rows, "campaign_id", campaign_ids)
+
+
+def _format_campaign_batch(summaries, missing_ids):
+    """Return the per-campaign summaries (with the ids that had no data, if any)"""
+    if missing_ids:
+        return summaries, {"missing_campaign_ids": missing_ids}
+    return summaries
+
+
+def _render_campaign_batch(summaries, missing_ids, output_format):
+    if output_format != 'report':
+        return formatters.render_rows(
+            summaries, output_format, summary={"missing_campaign_ids": missing_ids} if missing_ids else None
+        )
+    return _format_campaign_batch(summaries, missing_ids)
+
+
+@tool(
+    name="get_campaign_performance_batch",
+    description="""
+    Get TikTok performance totals (impressions, clicks, spend, conversions, CTR, CPC, conversion rate)
+    for several campaign IDs at once, one summary per campaign, in a single query.
+    Use this instead of calling get_campaign_performance once per campaign when the user names multiple campaign IDs.
+    """
+)
+@cached_tool(TABLE_NAME, DB_CONFIG)
+def get_campaign_performance_batch(
+    campaign_ids: List[str],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    time_operator: Literal['>', '<', '>=', '<=', '=', 'between'] = 'between',
+    output_format: Literal['report', 'compact', 'markdown'] = 'report'
+) -> str:
+    """
+    Get per-campaign performance summaries for a list of campaign IDs
+    
+    Args:
+        campaign_ids: Campaign IDs to summarize (exact match)
+        date_from: Start date (YYYY-MM-DD format)
+        date_to: End date (YYYY-MM-DD format)
+        time_operator: How to apply date filtering
+        output_format: 'report' (readable text), 'compact' (column names once + value lists) or 'markdown' (table)
+    """
+    try:
+        summaries, missing_ids = fetch_campaign_performance_batch(campaign_ids, date_from, date_to, time_operator)
+        return _render_campaign_batch(summaries, missing_ids, output_format)
+    except Exception as e:
+        return f"Error processing request: {str(e)}"
+
+
+async def get_campaign_performance_batch_async(
+    campaign_ids: List[str],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    time_operator: Literal['>', '<', '>=', '<=', '=', 'between'] = 'between',
+    output_format: Literal['report', 'compact', 'markdown'] = 'report'
+) -> str:
+    """Async variant of get_campaign_performance_batch on the psycopg 3 pool"""
+    try:
+        summaries, missing_ids = await fetch_campaign_performance_batch_async(campaign_ids, date_from, date_to, time_operator)
+        return _render_campaign_batch(summaries, missing_ids, output_format)
     except Exception as e:
         return f"Error processing request: {str(e)}"
+
+
+def _campaign_trends_query(trend_table, aggregates, name_condition, period, date_from, date_to, days_back):
+    """Build the trends query against trend_table; returns (query, params)"""
+    # Build WHERE conditions
+    where_conditions = []
+    params = []
+
+    campaign_search.add_name_filter(where_conditions, params, name_condition)
+
+    if date_from:
+        where_conditions.append("date >= %s")
+        params.append(date_from)
+    elif not date_to:  # If no date range specified, use days_back
+        where_conditions.append(f"date >= CURRENT_DATE - INTERVAL '{days_back} days'")
+
+    if date_to:
+        where_conditions.append("date <= %s")
+        params.append(date_to)
+
+    where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+
+    # Build period grouping
+    if period == 'weekly':
+        period_group = "DATE_TRUNC('week', date)"
+        period_format = "TO_CHAR(DATE_TRUNC('week', date), 'YYYY-MM-DD')"
+    elif period == 'monthly':
+        period_group = "DATE_TRUNC('month', date)"
+        period_format = "TO_CHAR(DATE_TRUNC('month', date), 'YYYY-MM')"
+    else:  # daily
+        period_group = "date"
+        period_format = "TO_CHAR(date, 'YYYY-MM-DD')"
+
+    query = f"""
+    SELECT 
+        {period_format} as period,
+        SUM(impressions) as impressions,
+        SUM(clicks) as clicks,
+        SUM(spend) as spend,
+        SUM(conversions) as conversions,
+        ROUND({aggregates['avg_ctr']}, 4) as avg_ctr,
+        ROUND({aggregates['avg_cpc']}, 2) as avg_cpc,
+        ROUND((SUM(conversions)::DECIMAL / NULLIF(SUM(impressions), 0)) * 100, 4) as conversion_rate,
+        {aggregates['row_count']} as campaign_count
+    FROM {trend_table} 
+    {where_clause}
+    GROUP BY {period_group}
+    ORDER BY {period_group}
+    """
+
+    return query, params
+
+
+def fetch_campaign_trends(
+    campaign_name=None,
+    period='daily',
+    date_from=None,
+    date_to=None,
+    days_back=30
+):
+    """Run the trends query; returns one row per period"""
+    connection = None
+    cursor = None
     
+    try:
+        connection = get_db_connection()
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        
+        # Read the per-day campaign rollup when it is available, raw rows otherwise
+        trend_table, aggregates = rollups.trend_source(cursor, TABLE_NAME)
+        name_condition = campaign_search.name_filter(cursor, TABLE_NAME, campaign_name)
+        query, params = _campaign_trends_query(trend_table, aggregates, name_condition, period, date_from, date_to, days_back)
+        
+        cursor.execute(query, params)
+        return cursor.fetchall()
     finally:
         if cursor:
             cursor.close()
         if connection:
             return_connection(connection)
 
+
+async def fetch_campaign_trends_async(
+    campaign_name=None,
+    period='daily',
+    date_from=None,
+    date_to=None,
+    days_back=30
+):
+    """Async variant of fetch_campaign_trends on the psycopg 3 pool"""
+    async with async_db.connection(DB_CONFIG) as connection:
+        async with connection.cursor() as cursor:
+            trend_table, aggregates = await rollups.trend_source_async(cursor, TABLE_NAME)
+            name_condition = await campaign_search.name_filter_async(cursor, TABLE_NAME, campaign_name)
+            query, params = _campaign_trends_query(trend_table, aggregates, name_condition, period, date_from, date_to, days_back)
+            await async_db.execute(cursor, query, params)
+            return await cursor.fetchall()
+
+
+def _format_campaign_trends(trend_results):
+    """Render the per-period trend report"""
+    if not trend_results:
+        return f"No trend data found for the specified criteria."
+    else:
+        return trend_results
+
+    # output = f"Tiktok Campaign Trends Analysis ({period.title()})\n" + "=" * 60 + "\n\n"
+
+    # if len(trend_results) > 1:
+    #     # Handle metric-specific trend calculation
+    #     if metric == 'ctr':
+    #         first_value = float(trend_results[0].get('avg_ctr', 0))
+    #         last_value = float(trend_results[-1].get('avg_ctr', 0))
+    #     elif metric == 'cpc':
+    #         first_value = float(trend_results[0].get('avg_cpc', 0))
+    #         last_value = float(trend_results[-1].get('avg_cpc', 0))
+    #     else:
+    #         first_value = float(trend_results[0].get(metric, 0))
+    #         last_value = float(trend_results[-1].get(metric, 0))
+
+    #     if first_value > 0:
+    #         percent_change = ((last_value - first_value) / first_value) * 100
+    #         trend_direction = "increasing" if last_value > first_value else "decreasing"
+    #         output += f"Trend Direction for {metric.upper()}: {trend_direction.title()} ({percent_change:+.1f}%)\n"
+    #         output += f"Periods Analyzed: {len(trend_results)}\n\n"
+
+    # # Display trend data
+    # for row in trend_results:
+    #     output += (
+    #         f"{row['period']}: "
+    #         f"Impressions: {row['impressions']:,} | "
+    #         f"Clicks: {row['clicks']:,} | "
+    #         f"Spend: ${row['spend']:,.2f} | "
+    #         f"Conversions: {row['conversions']:,} | "
+    #         f"CTR: {(row['avg_ctr'] * 100):.2f}% | "
+    #         f"CPC: ${row['avg_cpc']:.2f} | "
+    #         f"Conv. Rate: {row['conversion_rate']:.4f}% | "
+    #         f"Campaigns: {row['campaign_count']}\n"
+    #     )
+
+
 @tool(
     name="get_campaign_trends", 
     description="""
@@ -222,6 +578,7 @@ def get_campaign_performance(
     Use this when users ask about performance trends, seasonal patterns, spend patterns, or time-based analysis.
     """
 )
+@cached_tool(TABLE_NAME, DB_CONFIG)
 def get_campaign_trends(
     campaign_name: Optional[str] = None,
     period: Literal['daily', 'weekly', 'monthly'] = 'daily',
@@ -241,114 +598,165 @@ def get_campaign_trends(
         date_to: End date (YYYY-MM-DD)
         days_back: Number of days to look back if no date range specified
     """
-    connection = None
-    cursor = None
-    
     try:
-        # Build WHERE conditions
-        where_conditions = []
-        params = []
-        
-        if campaign_name:
-            where_conditions.append("LOWER(campaign_name) LIKE LOWER(%s)")
-            params.append(f"%{campaign_name}%")
-        
-        if date_from:
-            where_conditions.append("date >= %s")
-            params.append(date_from)
-        elif not date_to:  # If no date range specified, use days_back
-            where_conditions.append(f"date >= CURRENT_DATE - INTERVAL '{days_back} days'")
-        
-        if date_to:
-            where_conditions.append("date <= %s")
-            params.append(date_to)
-        
-        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-        
-        # Build period grouping
-        if period == 'weekly':
-            period_group = "DATE_TRUNC('week', date)"
-            period_format = "TO_CHAR(DATE_TRUNC('week', date), 'YYYY-MM-DD')"
-        elif period == 'monthly':
-            period_group = "DATE_TRUNC('month', date)"
-            period_format = "TO_CHAR(DATE_TRUNC('month', date), 'YYYY-MM')"
-        else:  # daily
-            period_group = "date"
-            period_format = "TO_CHAR(date, 'YYYY-MM-DD')"
-        
-        query = f"""
-        SELECT 
-            {period_format} as period,
-            SUM(impressions) as impressions,
-            SUM(clicks) as clicks,
-            SUM(spend) as spend,
-            SUM(conversions) as conversions,
-            ROUND(AVG(clicks::DECIMAL / NULLIF(impressions, 0)), 4) as avg_ctr,
-            ROUND(AVG(spend / NULLIF(clicks, 0)), 2) as avg_cpc,
-            ROUND((SUM(conversions)::DECIMAL / NULLIF(SUM(impressions), 0)) * 100, 4) as conversion_rate,
-            COUNT(*) as campaign_count
-        FROM {TABLE_NAME} 
-        {where_clause}
-        GROUP BY {period_group}
-        ORDER BY {period_group}
-        """
-        
-        print(f"Executing trends query: {query}")
-        print(f"Parameters: {params}")
-        
-        connection = get_db_connection()
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        cursor.execute(query, params)
-        trend_results = cursor.fetchall()
-        
-        if not trend_results:
-            return f"No trend data found for the specified criteria."
-        else:
-            return trend_results
-        
-        # output = f"Tiktok Campaign Trends Analysis ({period.title()})\n" + "=" * 60 + "\n\n"
-        
-        # if len(trend_results) > 1:
-        #     # Handle metric-specific trend calculation
-        #     if metric == 'ctr':
-        #         first_value = float(trend_results[0].get('avg_ctr', 0))
-        #         last_value = float(trend_results[-1].get('avg_ctr', 0))
-        #     elif metric == 'cpc':
-        #         first_value = float(trend_results[0].get('avg_cpc', 0))
-        #         last_value = float(trend_results[-1].get('avg_cpc', 0))
-        #     else:
-        #         first_value = float(trend_results[0].get(metric, 0))
-        #         last_value = float(trend_results[-1].get(metric, 0))
-            
-        #     if first_value > 0:
-        #         percent_change = ((last_value - first_value) / first_value) * 100
-        #         trend_direction = "increasing" if last_value > first_value else "decreasing"
-        #         output += f"Trend Direction for {metric.upper()}: {trend_direction.title()} ({percent_change:+.1f}%)\n"
-        #         output += f"Periods Analyzed: {len(trend_results)}\n\n"
-        
-        # # Display trend data
-        # for row in trend_results:
-        #     output += (
-        #         f"{row['period']}: "
-        #         f"Impressions: {row['impressions']:,} | "
-        #         f"Clicks: {row['clicks']:,} | "
-        #         f"Spend: ${row['spend']:,.2f} | "
-        #         f"Conversions: {row['conversions']:,} | "
-        #         f"CTR: {(row['avg_ctr'] * 100):.2f}% | "
-        #         f"CPC: ${row['avg_cpc']:.2f} | "
-        #         f"Conv. Rate: {row['conversion_rate']:.4f}% | "
-        #         f"Campaigns: {row['campaign_count']}\n"
-        #     )
-        
-        
+        trend_results = fetch_campaign_trends(
+            campaign_name=campaign_name, period=period, date_from=date_from, date_to=date_to,
+            days_back=days_back
+        )
+        return _format_campaign_trends(trend_results)
     except Exception as e:
         return f"Error processing trends: {str(e)}"
-    
-    finally:
-        if cursor:
-            cursor.close()
-        if connection:
-            return_connection(connection)
+
+
+async def get_campaign_trends_async(
+    campaign_name: Optional[str] = None,
+    period: Literal['daily', 'weekly', 'monthly'] = 'daily',
+    metric: Literal['impressions', 'clicks', 'spend', 'conversions', 'ctr', 'cpc'] = 'impressions',
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    days_back: Optional[int] = 30
+) -> str:
+    """Async variant of get_campaign_trends on the psycopg 3 pool"""
+    try:
+        trend_results = await fetch_campaign_trends_async(
+            campaign_name=campaign_name, period=period, date_from=date_from, date_to=date_to,
+            days_back=days_back
+        )
+        return _format_campaign_trends(trend_results)
+    except Exception as e:
+        return f"Error processing trends: {str(e)}"
+
+
+# Search columns read from the campaign dimension table (same output as the GROUP BY search)
+_SEARCH_DIMENSION_SELECT = """
+        campaign_name,
+        campaign_id,
+        total_impressions,
+        total_clicks,
+        total_spend,
+        total_conversions,
+        ROUND((total_clicks::DECIMAL / NULLIF(total_impressions, 0)) * 100, 2) as avg_ctr,
+        ROUND(total_spend / NULLIF(total_clicks, 0), 2) as avg_cpc,
+        ROUND((total_conversions::DECIMAL / NULLIF(total_impressions, 0)) * 100, 4) as conversion_rate,
+        ROUND(total_spend / NULLIF(total_conversions, 0), 2) as cost_per_conversion,
+        first_date,
+        last_date,
+        total_records"""
+
+
+def _search_campaigns_query(name_condition, date_from, date_to, min_spend, min_impressions, has_conversions, limit, dimension_table=None):
+    """Build the campaign search query; returns (query, params)"""
+    if dimension_table:
+        # Lifetime totals are precomputed per campaign; thresholds become index range scans
+        return campaign_dimensions.search_query(
+            dimension_table, _SEARCH_DIMENSION_SELECT, name_condition, min_spend, min_impressions, has_conversions, limit
+        )
+
+    # Build WHERE conditions
+    where_conditions = []
+    params = []
+
+    campaign_search.add_name_filter(where_conditions, params, name_condition)
+
+    if date_from:
+        where_conditions.append("date >= %s")
+        params.append(date_from)
+
+    if date_to:
+        where_conditions.append("date <= %s")
+        params.append(date_to)
+
+    where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+
+    # Build HAVING conditions
+    having_conditions = []
+
+    if min_spend:
+        having_conditions.append("SUM(spend) >= %s")
+        params.append(min_spend)
+
+    if min_impressions:
+        having_conditions.append("SUM(impressions) >= %s")
+        params.append(min_impressions)
+
+    if has_conversions is not None:
+        if has_conversions:
+            having_conditions.append("SUM(conversions) > 0")
+        else:
+            having_conditions.append("SUM(conversions) = 0")
+
+    having_clause = ""
+    if having_conditions:
+        having_clause = f"HAVING {' AND '.join(having_conditions)}"
+
+    # Fixed SQL query - removed trailing comma and added calculated metrics
+    query = f"""
+    SELECT 
+        campaign_name,
+        campaign_id,
+        SUM(impressions) as total_impressions,
+        SUM(clicks) as total_clicks,
+        SUM(spend) as total_spend,
+        SUM(conversions) as total_conversions,
+        ROUND((SUM(clicks)::DECIMAL / NULLIF(SUM(impressions), 0)) * 100, 2) as avg_ctr,
+        ROUND(SUM(spend) / NULLIF(SUM(clicks), 0), 2) as avg_cpc,
+        ROUND((SUM(conversions)::DECIMAL / NULLIF(SUM(impressions), 0)) * 100, 4) as conversion_rate,
+        ROUND(SUM(spend) / NULLIF(SUM(conversions), 0), 2) as cost_per_conversion,
+        MIN(date) as first_date,
+        MAX(date) as last_date,
+        COUNT(*) as total_records
+    FROM {TABLE_NAME}
+    {where_clause} 
+    GROUP BY campaign_name, campaign_id
+    {having_clause}
+    ORDER BY total_spend DESC
+    LIMIT %s
+    """
+
+    params.append(limit)
+
+    return query, params
+
+
+def _format_search_campaigns(campaign_results):
+    """Render the campaign search results"""
+
+    if campaign_results:
+        return campaign_results
+    else:
+        return "No Relevant campaigns found"
+
+    # output = f"Campaign Search Results\n" + "=" * 60 + "\n\n"
+
+    # if campaign_results:
+
+    #     output += f"Found {len(campaign_results)} campaign(s) matching your criteria:\n" + "-" * 60 + "\n"
+
+    #     for result in campaign_results:
+    #         output += (
+    #             f"Campaign Name: {result.get('campaign_name', 'N/A')}\n"
+    #             f"Campaign ID: {result.get('campaign_id', 'N/A')}\n"
+    #             f"Date Range: {result.get('first_date', 'N/A')} to {result.get('last_date', 'N/A')}\n"
+    #             f"Total Records: {result.get('total_records', 0):,}\n"
+    #             f"Total Impressions: {result.get('total_impressions', 0):,}\n"
+    #             f"Total Clicks: {result.get('total_clicks', 0):,}\n"
+    #             f"Total Spend: ${result.get('total_spend', 0):,.2f}\n"
+    #             f"Total Conversions: {result.get('total_conversions', 0):,}\n"
+    #             f"Average CTR: {result.get('avg_ctr', 0):.2f}%\n"
+    #             f"Average CPC: ${result.get('avg_cpc', 0):.2f}\n"
+    #             f"Conversion Rate: {result.get('conversion_rate', 0):.4f}%\n"
+
+    #             + "-" * 60 + "\n"
+    #         ) 
+    # else:
+    #     output += "No campaigns found matching the specified criteria.\n"
+    #     if search_term:
+    #         output += f"Search term: '{search_term}'\n"
+    #     if date_from or date_to:
+    #         output += f"Date range: {date_from or 'Any'} to {date_to or 'Any'}\n"
+
+    return output  # Return string directly, not dict
+
 
 @tool(
     name="search_similar_campaigns",
@@ -359,6 +767,7 @@ def get_campaign_trends(
     Use this when users want to find specific campaigns or explore what campaigns were running on Tiktok.
     """
 )
+@cached_tool(TABLE_NAME, DB_CONFIG)
 def search_similar_campaigns(
     search_term: Optional[str] = None,
     date_from: Optional[str] = None,
@@ -381,125 +790,18 @@ def search_similar_campaigns(
         limit: Maximum number of results to return
     """
     connection = None
-    cursor = None  # Add cursor initialization
+    cursor = None
     
     try:
         connection = get_db_connection()
         cursor = connection.cursor(cursor_factory=RealDictCursor)
-        
-        # Build WHERE conditions
-        where_conditions = []
-        params = []
-        
-        if search_term:
-            where_conditions.append("LOWER(campaign_name) LIKE LOWER(%s)")
-            params.append(f"%{search_term}%")
-        
-        if date_from:
-            where_conditions.append("date >= %s")
-            params.append(date_from)
-            
-        if date_to:
-            where_conditions.append("date <= %s")
-            params.append(date_to)
-        
-        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-        
-        # Build HAVING conditions
-        having_conditions = []
-
-        if min_spend:
-            having_conditions.append("SUM(spend) >= %s")
-            params.append(min_spend)
-            
-        if min_impressions:
-            having_conditions.append("SUM(impressions) >= %s")
-            params.append(min_impressions)
-        
-        if has_conversions is not None:
-            if has_conversions:
-                having_conditions.append("SUM(conversions) > 0")
-            else:
-                having_conditions.append("SUM(conversions) = 0")
-        
-        having_clause = ""
-        if having_conditions:
-            having_clause = f"HAVING {' AND '.join(having_conditions)}"
-        
-        # Fixed SQL query - removed trailing comma and added calculated metrics
-        query = f"""
-        SELECT 
-            campaign_name,
-            campaign_id,
-            SUM(impressions) as total_impressions,
-            SUM(clicks) as total_clicks,
-            SUM(spend) as total_spend,
-            SUM(conversions) as total_conversions,
-            ROUND((SUM(clicks)::DECIMAL / NULLIF(SUM(impressions), 0)) * 100, 2) as avg_ctr,
-            ROUND(SUM(spend) / NULLIF(SUM(clicks), 0), 2) as avg_cpc,
-            ROUND((SUM(conversions)::DECIMAL / NULLIF(SUM(impressions), 0)) * 100, 4) as conversion_rate,
-            ROUND(SUM(spend) / NULLIF(SUM(conversions), 0), 2) as cost_per_conversion,
-            MIN(date) as first_date,
-            MAX(date) as last_date,
-            COUNT(*) as total_records
-        FROM {TABLE_NAME}
-        {where_clause} 
-        GROUP BY campaign_name, campaign_id
-        {having_clause}
-        ORDER BY total_spend DESC
-        LIMIT %s
-        """
-        
-        params.append(limit)
-        
-        print(f"Executing search campaigns query: {query}")
-        print(f"Parameters: {params}")
-
+        name_condition = campaign_search.name_filter(cursor, TABLE_NAME, search_term)
+        dimension_table = campaign_dimensions.dimension_source(cursor, TABLE_NAME) if campaign_dimensions.serves(date_from, date_to) else None
+        query, params = _search_campaigns_query(name_condition, date_from, date_to, min_spend, min_impressions, has_conversions, limit, dimension_table)
         cursor.execute(query, params)
-        campaign_results = cursor.fetchall()
-
-        print(f"Found {len(campaign_results)} campaigns")
-        print(campaign_results)
-
-        if campaign_results:
-            return campaign_results
-        else:
-            return "No Relevant campaigns found"
-
-        # output = f"Campaign Search Results\n" + "=" * 60 + "\n\n"
-        
-        # if campaign_results:
-            
-        #     output += f"Found {len(campaign_results)} campaign(s) matching your criteria:\n" + "-" * 60 + "\n"
-            
-        #     for result in campaign_results:
-        #         output += (
-        #             f"Campaign Name: {result.get('campaign_name', 'N/A')}\n"
-        #             f"Campaign ID: {result.get('campaign_id', 'N/A')}\n"
-        #             f"Date Range: {result.get('first_date', 'N/A')} to {result.get('last_date', 'N/A')}\n"
-        #             f"Total Records: {result.get('total_records', 0):,}\n"
-        #             f"Total Impressions: {result.get('total_impressions', 0):,}\n"
-        #             f"Total Clicks: {result.get('total_clicks', 0):,}\n"
-        #             f"Total Spend: ${result.get('total_spend', 0):,.2f}\n"
-        #             f"Total Conversions: {result.get('total_conversions', 0):,}\n"
-        #             f"Average CTR: {result.get('avg_ctr', 0):.2f}%\n"
-        #             f"Average CPC: ${result.get('avg_cpc', 0):.2f}\n"
-        #             f"Conversion Rate: {result.get('conversion_rate', 0):.4f}%\n"
-               
-        #             + "-" * 60 + "\n"
-        #         ) 
-        # else:
-        #     output += "No campaigns found matching the specified criteria.\n"
-        #     if search_term:
-        #         output += f"Search term: '{search_term}'\n"
-        #     if date_from or date_to:
-        #         output += f"Date range: {date_from or 'Any'} to {date_to or 'Any'}\n"
-
-        return output  # Return string directly, not dict
-        
+        return _format_search_campaigns(cursor.fetchall())
     except Exception as e:
         return f"Error searching campaigns: {str(e)}"
-    
     finally:
         if cursor:
             cursor.close()
@@ -507,6 +809,31 @@ def search_similar_campaigns(
             return_connection(connection)
 
 
+async def search_similar_campaigns_async(
+    search_term: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    min_spend: Optional[float] = None,
+    min_impressions: Optional[int] = None,
+    has_conversions: Optional[bool] = None,
+    limit: Optional[int] = 20
+) -> str:
+    """Async variant of search_similar_campaigns on the psycopg 3 pool"""
+    try:
+        async with async_db.connection(DB_CONFIG) as connection:
+            async with connection.cursor() as cursor:
+                name_condition = await campaign_search.name_filter_async(cursor, TABLE_NAME, search_term)
+                dimension_table = None
+                if campaign_dimensions.serves(date_from, date_to):
+                    dimension_table = await campaign_dimensions.dimension_source_async(cursor, TABLE_NAME)
+                query, params = _search_campaigns_query(name_condition, date_from, date_to, min_spend, min_impressions, has_conversions, limit, dimension_table)
+                await async_db.execute(cursor, query, params)
+                campaign_results = await cursor.fetchall()
+        return _format_search_campaigns(campaign_results)
+    except Exception as e:
+        return f"Error searching campaigns: {str(e)}"
+
+
 @tool(name="Tiktok_ads_agent",   description=(
         "An intelligent TikTok Ads analytics agent that routes user queries to specialized sub-tools "
         "for campaign performance, trend analysis, and campaign discovery. "
@@ -522,10 +849,14 @@ def search_similar_campaigns(
     ))
 def Tiktok_ads_agent(prompt: str) -> str:
     """Main Tiktok ads agent tool that routes to appropriate sub-tools"""
-    supervisor_agent = Agent(
-        tools=[get_campaign_performance, get_campaign_trends, search_similar_campaigns]
+    response = agent_factory.run_agent(__name__, _build_supervisor_agent, prompt)
+    return str(response)
+
+
+def _build_supervisor_agent():
+    """Build the supervisor once; agent_factory reuses it with a fresh conversation per prompt"""
+    return Agent(
+        tools=[get_campaign_performance, get_campaign_performance_batch, get_campaign_trends, search_similar_campaigns]
     )
-    
-    response = supervisor_agent(prompt)
 
 # Tiktok_ads_agent("Give me monthly report for the Tiktok Ads in 2023")
\ No newline at end of file
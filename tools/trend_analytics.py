@@ -0,0 +1,169 @@
+import logging
+import os
+
+
+logger = logging.getLogger("tools.trend_analytics")
+
+
+# -------------------------------------------------------------------
+# Trend Settings
+# -------------------------------------------------------------------
+
+# Periods the moving average spans, per trend granularity
+MOVING_AVERAGE_WINDOWS = {
+    "daily": int(os.environ.get("TOOLS_TREND_DAILY_WINDOW", 7)),
+    "weekly": int(os.environ.get("TOOLS_TREND_WEEKLY_WINDOW", 4)),
+    "monthly": int(os.environ.get("TOOLS_TREND_MONTHLY_WINDOW", 3)),
+}
+
+# Periods per comparison block: daily trends compare the last 7 days with the 7 before
+_COMPARISON_LAGS = {"daily": 7, "weekly": 1, "monthly": 1}
+_COMPARISON_LABELS = {"daily": "Week over Week", "weekly": "Week over Week", "monthly": "Month over Month"}
+
+_numpy_module = None
+
+
+def _numpy():
+    """NumPy, or None when it is not installed (trend reports then skip the analytics block)"""
+    global _numpy_module
+    if _numpy_module is None:
+        try:
+            import numpy
+            _numpy_module = numpy
+        except ImportError:
+            logger.info("NumPy is not installed; trend reports will not include moving averages or slopes")
+            _numpy_module = False
+    return _numpy_module or None
+
+
+def _float(value):
+    return float(value) if value is not None else float("nan")
+
+
+# -------------------------------------------------------------------
+# Series Analytics
+# -------------------------------------------------------------------
+
+def load_series(rows, columns):
+    """Per-period rows -> (periods x columns) float matrix, read once; NULLs become NaN"""
+    np = _numpy()
+    return np.array([[_float(row.get(column)) for column in columns] for row in rows], dtype=float).reshape(len(rows), len(columns))
+
+
+def _percent(current, previous, np):
+    """Vectorized percent change; NaN where the base is zero or missing"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(previous != 0, (current - previous) / np.abs(previous) * 100, np.nan)
+
+
+def analyze(rows, columns, period="daily"):
+    """
+    Trend statistics for each column of a per-period result, computed on all columns at once.
+
+    Returns {column: stats} with totals, mean, min / max, the latest moving average,
+    last-period delta, a week-over-week (or month-over-month) comparison, the
+    least-squares slope per period and volatility (coefficient of variation).
+    Returns None when NumPy is not installed or there are fewer than two periods.
+    """
+    np = _numpy()
+    if np is None or len(rows) < 2:
+        return None
+
+    series = load_series(rows, columns)
+    periods = len(series)
+    valid = ~np.isnan(series)
+    counts = valid.sum(axis=0)
+    filled = np.where(valid, series, 0.0)
+
+    totals = filled.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.where(counts > 0, totals / counts, np.nan)
+        deviations = np.where(valid, series - means, 0.0)
+        std = np.sqrt((deviations ** 2).sum(axis=0) / counts)
+        volatility = np.where(means != 0, std / np.abs(means), np.nan)
+
+        # Least-squares slope over the periods each column has values for
+        x = np.arange(periods, dtype=float)[:, None]
+        x_means = (valid * x).sum(axis=0) / counts
+        x_deviations = np.where(valid, x - x_means, 0.0)
+        slope = (x_deviations * deviations).sum(axis=0) / (x_deviations ** 2).sum(axis=0)
+
+        # Trailing moving average from a running sum
+        window = min(MOVING_AVERAGE_WINDOWS.get(period, 7), periods)
+        running_sum = filled[-window:].sum(axis=0)
+        running_count = valid[-window:].sum(axis=0)
+        moving_average = np.where(running_count > 0, running_sum / running_count, np.nan)
+
+        # Latest block of `lag` periods against the block before it
+        lag = _COMPARISON_LAGS.get(period, 1)
+        if periods >= 2 * lag:
+            current = filled[-lag:].sum(axis=0)
+            previous = filled[-2 * lag:-lag].sum(axis=0)
+            comparison = _percent(current, previous, np)
+        else:
+            comparison = np.full(len(columns), np.nan)
+
+    first, last = filled[0], filled[-1]
+    change = _percent(last, first, np)
+    last_delta = filled[-1] - filled[-2]
+    last_delta_pct = _percent(filled[-1], filled[-2], np)
+    masked_high = np.where(valid, series, -np.inf)
+    masked_low = np.where(valid, series, np.inf)
+    high_index = masked_high.argmax(axis=0)
+    low_index = masked_low.argmin(axis=0)
+
+    stats = {}
+    for index, column in enumerate(columns):
+        stats[column] = {
+            "periods": periods,
+            "first": float(first[index]),
+            "last": float(last[index]),
+            "change_pct": _nullable(change[index]),
+            "total": float(totals[index]),
+            "mean": _nullable(means[index]),
+            "max": _nullable(series[high_index[index], index]),
+            "max_period": rows[high_index[index]].get("period"),
+            "min": _nullable(series[low_index[index], index]),
+            "min_period": rows[low_index[index]].get("period"),
+            "moving_average": _nullable(moving_average[index]),
+            "moving_average_window": window,
+            "last_delta": float(last_delta[index]),
+            "last_delta_pct": _nullable(last_delta_pct[index]),
+            "comparison_pct": _nullable(comparison[index]),
+            "comparison_label": _COMPARISON_LABELS.get(period, "Period over Period"),
+            "slope": _nullable(slope[index]),
+            "slope_pct": _nullable(slope[index] / means[index] * 100) if means[index] else None,
+            "volatility": _nullable(volatility[index]),
+        }
+    return stats
+
+
+def _nullable(value):
+    value = float(value)
+    return None if value != value or value in (float("inf"), float("-inf")) else value
+
+
+# -------------------------------------------------------------------
+# Report Formatting
+# -------------------------------------------------------------------
+
+def _signed_percent(value):
+    return "n/a" if value is None else f"{value:+.1f}%"
+
+
+def describe(stats, label, indent="", value_format=",.2f"):
+    """Report lines for one column's trend statistics"""
+    if not stats:
+        return ""
+    lines = [f"{indent}Trend Analytics for {label}:"]
+    if stats["slope"] is not None:
+        lines.append(f"{indent}   Slope: {stats['slope']:{value_format}} per period ({_signed_percent(stats['slope_pct'])} of mean)")
+    if stats["moving_average"] is not None:
+        lines.append(f"{indent}   {stats['moving_average_window']}-Period Moving Average: {stats['moving_average']:{value_format}}")
+    lines.append(f"{indent}   Last Period Change: {stats['last_delta']:+{value_format}} ({_signed_percent(stats['last_delta_pct'])})")
+    lines.append(f"{indent}   {stats['comparison_label']}: {_signed_percent(stats['comparison_pct'])}")
+    if stats["volatility"] is not None:
+        lines.append(f"{indent}   Volatility (CV): {stats['volatility']:.2f}")
+    if stats["max"] is not None:
+        lines.append(f"{indent}   Peak: {stats['max']:{value_format}} ({stats['max_period']}) | Low: {stats['min']:{value_format}} ({stats['min_period']})")
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,298 @@
+import os
+import sys
+import threading
+import time
+
+import psycopg2
+from psycopg2 import Error
+
+from tools import rollups
+
+
+# -------------------------------------------------------------------
+# Unified Table Definition
+# -------------------------------------------------------------------
+
+# Answer cross-channel reports from the unified table when it exists and is populated
+ROUTE_TO_UNIFIED_METRICS = os.environ.get("TOOLS_USE_UNIFIED_METRICS", "1") == "1"
+
+UNIFIED_TABLE = "channel_daily_metrics"
+
+# Channel name -> source table; every one has date, campaign_id, campaign_name,
+# impressions, clicks, spend and conversions
+CHANNEL_TABLES = {
+    "facebook": "facebook_campaigns_ads",
+    "tiktok": "tiktok_campaign_ad_details",
+    "linkedin": "linkedin_ads",
+    "bing": "bing_advertising_data",
+}
+
+# Channel name -> condition restricting the source rows folded in, matching what the
+# channel's own tools read
+CHANNEL_FILTERS = {
+    "bing": "source = 'Bing Ads'",
+}
+
+# group_by option -> output key columns
+GROUPINGS = {
+    "channel": ["channel"],
+    "campaign": ["channel", "campaign_id", "campaign_name"],
+    "period": ["period"],
+    "channel_period": ["channel", "period"],
+}
+
+# One definition of each rate for every channel, computed from the summed totals.
+# Conversion rate is conversions per click on all channels (the channel tools differ:
+# Bing divides by clicks, the others by impressions).
+_METRICS_SELECT = """
+            SUM(impressions) AS impressions,
+            SUM(clicks) AS clicks,
+            SUM(spend) AS spend,
+            SUM(conversions) AS conversions,
+            ROUND(SUM(clicks) / NULLIF(SUM(impressions), 0) * 100, 4) AS ctr_percent,
+            ROUND(SUM(spend) / NULLIF(SUM(clicks), 0), 2) AS cpc,
+            ROUND(SUM(spend) / NULLIF(SUM(impressions), 0) * 1000, 2) AS cpm,
+            ROUND(SUM(conversions) / NULLIF(SUM(clicks), 0) * 100, 4) AS conversion_rate,
+            ROUND(SUM(spend) / NULLIF(SUM(conversions), 0), 2) AS cost_per_conversion,
+            COUNT(DISTINCT channel || ':' || campaign_id) AS campaign_count"""
+
+_PERIOD_FORMATS = {
+    "daily": "TO_CHAR(date, 'YYYY-MM-DD')",
+    "weekly": "TO_CHAR(DATE_TRUNC('week', date), 'YYYY-MM-DD')",
+    "monthly": "TO_CHAR(DATE_TRUNC('month', date), 'YYYY-MM')",
+}
+
+# (ready, checked_at)
+_readiness = None
+_readiness_lock = threading.Lock()
+
+
+def _channel_select(channel, *conditions):
+    """One channel's source rows folded into the unified columns, one row per day and campaign"""
+    source_table = CHANNEL_TABLES[channel]
+    conditions = [condition for condition in (CHANNEL_FILTERS.get(channel), *conditions) if condition]
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return f"""
+        SELECT
+            '{channel}'::text AS channel,
+            date::date AS date,
+            campaign_id::text AS campaign_id,
+            MAX(campaign_name)::text AS campaign_name,
+            COALESCE(SUM(impressions), 0)::NUMERIC AS impressions,
+            COALESCE(SUM(clicks), 0)::NUMERIC AS clicks,
+            COALESCE(SUM(spend), 0)::NUMERIC AS spend,
+            COALESCE(SUM(conversions), 0)::NUMERIC AS conversions,
+            COUNT(*) AS row_count
+        FROM {source_table}
+        {where_clause}
+        GROUP BY date::date, campaign_id
+    """
+
+
+# -------------------------------------------------------------------
+# Maintenance
+# -------------------------------------------------------------------
+
+def ensure_unified_table(cursor):
+    """Create the unified table and its indexes if they do not exist yet"""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {UNIFIED_TABLE} (
+            channel TEXT NOT NULL,
+            date DATE NOT NULL,
+            campaign_id TEXT,
+            campaign_name TEXT,
+            impressions NUMERIC NOT NULL,
+            clicks NUMERIC NOT NULL,
+            spend NUMERIC NOT NULL,
+            conversions NUMERIC NOT NULL,
+            row_count BIGINT NOT NULL
+        )
+    """)
+    # Date-range reports across channels, and one channel / campaign over time
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {UNIFIED_TABLE}_date_idx ON {UNIFIED_TABLE} (date, channel)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {UNIFIED_TABLE}_campaign_idx ON {UNIFIED_TABLE} (channel, campaign_id, date)")
+
+
+def refresh_unified_metrics(connection, full=False):
+    """
+    Bring the unified table up to date with every channel's source table.
+
+    Same watermark scheme as rollups.refresh_rollup, per channel: incremental
+    refreshes rebuild each channel's latest day onwards; full=True rebuilds
+    everything. Returns {channel: rows written}.
+    """
+    global _readiness
+    written = {}
+    cursor = connection.cursor()
+    try:
+        ensure_unified_table(cursor)
+        if full:
+            cursor.execute(f"TRUNCATE {UNIFIED_TABLE}")
+
+        for channel in CHANNEL_TABLES:
+            watermark = None
+            if not full:
+                cursor.execute(f"SELECT MAX(date) FROM {UNIFIED_TABLE} WHERE channel = %s", (channel,))
+                watermark = cursor.fetchone()[0]
+
+            conditions = []
+            params = []
+            if watermark is not None:
+                cursor.execute(f"DELETE FROM {UNIFIED_TABLE} WHERE channel = %s AND date >= %s", (channel, watermark))
+                conditions.append("date >= %s")
+                params.append(watermark)
+
+            cursor.execute(
+                f"INSERT INTO {UNIFIED_TABLE} {_channel_select(channel, *conditions)}",
+                params
+            )
+            written[channel] = cursor.rowcount
+
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        raise Exception(f"Unified metrics refresh failed: {e}")
+    finally:
+        cursor.close()
+
+    with _readiness_lock:
+        _readiness = None
+    return written
+
+
+# -------------------------------------------------------------------
+# Query Routing
+# -------------------------------------------------------------------
+
+def _cached_readiness():
+    if not ROUTE_TO_UNIFIED_METRICS:
+        return True, False
+    with _readiness_lock:
+        cached = _readiness
+    if cached and time.monotonic() - cached[1] < rollups.READINESS_CHECK_TTL:
+        return True, cached[0]
+    return False, None
+
+
+def _store_readiness(ready):
+    global _readiness
+    with _readiness_lock:
+        _readiness = (ready, time.monotonic())
+    return ready
+
+
+def unified_ready(cursor):
+    """True when the unified table exists and has been populated"""
+    known, ready = _cached_readiness()
+    if known:
+        return ready
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS ready", (UNIFIED_TABLE,))
+    ready = rollups.first_value(cursor.fetchone())
+    if ready:
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {UNIFIED_TABLE}) AS ready")
+        ready = rollups.first_value(cursor.fetchone())
+    return _store_readiness(ready)
+
+
+def _latest_day(table, conditions, count):
+    """Row of (latest day, rows on that day) in table under conditions"""
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    day_conditions = conditions + ["date >= latest.day", "date < latest.day + 1"]
+    return f"""(
+        SELECT ROW(latest.day, (SELECT {count} FROM {table} WHERE {' AND '.join(day_conditions)})::BIGINT)
+        FROM (SELECT MAX(date)::date AS day FROM {table}{where_clause}) latest
+    )"""
+
+
+def unified_current(cursor, channels=None):
+    """
+    True when the unified table holds every source row of the given channels.
+
+    Compares each channel's latest day and its row count on that day with the
+    source table, so a day or rows ingested since the last refresh are noticed.
+    Not cached: it is a few index lookups and decides which answer a caller gets.
+    """
+    comparisons = []
+    for channel in channels or CHANNEL_TABLES:
+        source_conditions = [condition for condition in (CHANNEL_FILTERS.get(channel),) if condition]
+        unified = _latest_day(UNIFIED_TABLE, [f"channel = '{channel}'"], "SUM(row_count)")
+        source = _latest_day(CHANNEL_TABLES[channel], source_conditions, "COUNT(*)")
+        comparisons.append(f"{unified} IS NOT DISTINCT FROM {source}")
+    cursor.execute(f"SELECT {' AND '.join(comparisons)} AS ready")
+    return rollups.first_value(cursor.fetchone())
+
+
+def metrics_query(
+    group_by="channel",
+    period="daily",
+    channels=None,
+    campaign_name=None,
+    date_from=None,
+    date_to=None,
+    days_back=None,
+    limit=None
+):
+    """
+    Blended metrics from the unified table, grouped per GROUPINGS[group_by].
+
+    days_back applies only when neither date bound is given. Period groupings come
+    back in period order, the others by spend (highest first).
+    """
+    where_conditions = []
+    params = []
+
+    if channels:
+        where_conditions.append("channel = ANY(%s)")
+        params.append(list(channels))
+
+    if campaign_name:
+        where_conditions.append("campaign_name ILIKE %s")
+        params.append(f"%{campaign_name}%")
+
+    if date_from:
+        where_conditions.append("date >= %s")
+        params.append(date_from)
+    elif not date_to and days_back:
+        where_conditions.append("date >= CURRENT_DATE - %s * INTERVAL '1 day'")
+        params.append(days_back)
+
+    if date_to:
+        where_conditions.append("date <= %s")
+        params.append(date_to)
+
+    where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+
+    keys = {
+        "channel": "channel",
+        "campaign_id": "campaign_id",
+        "campaign_name": "MAX(campaign_name)",
+        "period": _PERIOD_FORMATS[period],
+    }
+    columns = GROUPINGS[group_by]
+    select = [f"{keys[column]} AS {column}" for column in columns]
+    group_columns = [column for column in columns if column != "campaign_name"]
+    order_by = ", ".join(group_columns) if "period" in columns else "SUM(spend) DESC"
+
+    query = f"""
+        SELECT
+            {', '.join(select)},
+            {_METRICS_SELECT}
+        FROM {UNIFIED_TABLE}
+        {where_clause}
+        GROUP BY {', '.join(group_columns)}
+        ORDER BY {order_by}
+    """
+    if limit:
+        query += "LIMIT %s"
+        params.append(limit)
+    return query, params
+
+
+if __name__ == "__main__":
+    # Usage: TOOLS_DB_DSN="host=... dbname=..." python -m tools.unified_metrics [--full]
+    refresh_connection = psycopg2.connect(os.environ["TOOLS_DB_DSN"])
+    try:
+        for channel, rows in refresh_unified_metrics(refresh_connection, full="--full" in sys.argv).items():
+            print(f"{UNIFIED_TABLE} ({channel}): {rows} rows refreshed")
+    finally:
+        refresh_connection.close()